@@ -0,0 +1,39 @@
+import numpy as np
+
+from mosaic.domain.tilemap import TILE_ID_DTYPE, ChunkedTileModel
+
+
+def synthetic_ids(width: int, height: int, tile_count: int = 12, density: float = 0.8, seed: int = 0) -> np.ndarray:
+    """Tile ids that look like a painted map, with patches of the same tile, scattered detail and empty areas.
+
+    Args:
+        width: The width of the map in cells.
+        height: The height of the map in cells.
+        tile_count: The number of distinct tiles used, ids 1 to tile_count.
+        density: The fraction of cells that are not empty.
+        seed: The seed of the random generator, the same seed gives the same map.
+
+    Returns:
+        The tile ids indexed [row, column].
+    """
+    rng = np.random.default_rng(seed)
+    patch = 16
+    # Coarse patches of one tile, scaled up to the map size
+    coarse = rng.integers(1, tile_count + 1, (-(-height // patch), -(-width // patch)), dtype=TILE_ID_DTYPE)
+    ids = np.repeat(np.repeat(coarse, patch, axis=0), patch, axis=1)[:height, :width]
+    # Scattered single tiles, as painted detail
+    detail = rng.random((height, width)) < 0.05
+    ids[detail] = rng.integers(1, tile_count + 1, int(np.count_nonzero(detail)), dtype=TILE_ID_DTYPE)
+    # Empty areas, also in patches so that whole chunks stay unallocated
+    empty = np.repeat(np.repeat(rng.random(coarse.shape) > density, patch, axis=0), patch, axis=1)
+    ids[empty[:height, :width]] = 0
+    return ids
+
+
+def synthetic_map(
+    width: int, height: int, tile_count: int = 12, density: float = 0.8, seed: int = 0
+) -> ChunkedTileModel:
+    """A tile model filled with synthetic_ids, written with a single write per chunk."""
+    model = ChunkedTileModel(width, height)
+    model.write_region(0, 0, synthetic_ids(width, height, tile_count, density, seed))
+    return model
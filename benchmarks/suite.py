@@ -0,0 +1,290 @@
+"""Headless benchmarks of the scene, selection and builder hot paths.
+
+Builds synthetic maps and measures the construction of a TileScene, the offscreen render of a SceneView viewport
+at several zoom levels, selection drags replayed as synthetic mouse events, auto-tiling, panning over a layer of
+free-placed objects and the throughput of Builder.resolve. Everything runs on the offscreen Qt platform. Results are
+written as JSON and can be compared against a baseline to catch regressions.
+
+    poetry run benchmarks --size 4096 --output benchmarks.json --baseline baseline.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np  # noqa: E402
+from PySide6.QtCore import QPoint, Qt  # noqa: E402
+from PySide6.QtTest import QTest  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from benchmarks.maps import synthetic_map  # noqa: E402
+from mosaic.core.builder import Builder, Lifetime  # noqa: E402
+from mosaic.domain import painting  # noqa: E402
+from mosaic.domain.autotile import AutoTiler, Terrain  # noqa: E402
+from mosaic.domain.objects import ObjectStore  # noqa: E402
+from mosaic.domain.tilescene import TileScene  # noqa: E402
+from mosaic.domain.tileset import DEFAULT_PALETTE, Tileset  # noqa: E402
+from mosaic.widgets.scene_view import SceneView  # noqa: E402
+
+DEFAULT_ZOOMS = (4.0, 1.0, 0.25, 1 / 32)
+VIEWPORT = (1280, 720)
+
+
+@dataclass(frozen=True, slots=True)
+class Measurement:
+    """The repeated timings of one benchmark.
+
+    Args:
+        median: The median of the samples.
+        best: The best sample, the lowest time or the highest throughput.
+        unit: "ms" for durations, where lower is better, or "ops/s" for throughput, where higher is better.
+        samples: The number of samples.
+    """
+
+    median: float
+    best: float
+    unit: str
+    samples: int
+
+    @classmethod
+    def of_durations(cls, seconds: list[float]) -> "Measurement":
+        milliseconds = [value * 1e3 for value in seconds]
+        return cls(statistics.median(milliseconds), min(milliseconds), "ms", len(milliseconds))
+
+    @classmethod
+    def of_throughput(cls, rates: list[float]) -> "Measurement":
+        return cls(statistics.median(rates), max(rates), "ops/s", len(rates))
+
+
+def _timed(function: Callable[[], object], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _view(scene: TileScene) -> SceneView:
+    view = SceneView(scene)
+    view.resize(*VIEWPORT)
+    view.show()
+    QApplication.processEvents()
+    return view
+
+
+def bench_scene_construction(size: int, tileset: Tileset, repeat: int) -> dict[str, Measurement]:
+    timings = _timed(lambda: synthetic_map(size, size), repeat)
+    model = synthetic_map(size, size)
+    return {
+        "map_generation": Measurement.of_durations(timings),
+        "scene_construction": Measurement.of_durations(_timed(lambda: TileScene(model=model, tileset=tileset), repeat)),
+    }
+
+
+def bench_render(size: int, tileset: Tileset, zooms: list[float], repeat: int) -> dict[str, Measurement]:
+    """Render the viewport at each zoom level, once with an empty render cache and then with a warm one."""
+    scene = TileScene(model=synthetic_map(size, size), tileset=tileset)
+    view = _view(scene)
+    center = scene.tile_layer.boundingRect().center()
+    results = {}
+    for zoom in zooms:
+        view.resetTransform()
+        view.scale(zoom, zoom)
+        view.centerOn(center)
+        scene.render_cache.clear()
+        results[f"render_zoom_{zoom:g}_cold"] = Measurement.of_durations(_timed(view.viewport().grab, 1))
+        results[f"render_zoom_{zoom:g}"] = Measurement.of_durations(_timed(view.viewport().grab, repeat))
+    view.close()
+    return results
+
+
+def bench_selection_drag(size: int, tileset: Tileset, repeat: int, steps: int = 60) -> dict[str, Measurement]:
+    """Drag a selection rectangle across the viewport with synthetic mouse events, repainting after each move."""
+    scene = TileScene(model=synthetic_map(size, size), tileset=tileset)
+    view = _view(scene)
+    view.centerOn(scene.tile_layer.boundingRect().center())
+    viewport = view.viewport()
+    width, height = VIEWPORT
+
+    def drag():
+        start = QPoint(width // 8, height // 8)
+        QTest.mousePress(viewport, Qt.LeftButton, Qt.NoModifier, start)
+        for step in range(1, steps + 1):
+            position = QPoint(start.x() + step * width * 3 // 4 // steps, start.y() + step * height * 3 // 4 // steps)
+            QTest.mouseMove(viewport, position)
+            viewport.repaint()
+        QTest.mouseRelease(viewport, Qt.LeftButton, Qt.NoModifier, position)
+        QApplication.processEvents()
+
+    timings = _timed(drag, repeat)
+    view.close()
+    return {
+        "selection_drag": Measurement.of_durations(timings),
+        "selection_drag_event": Measurement.of_durations([timing / steps for timing in timings]),
+    }
+
+
+def bench_autotile(size: int, repeat: int, stroke: int = 1000) -> dict[str, Measurement]:
+    """A full auto-tile pass of a map, and the incremental update of a diagonal stroke of stroke cells across it."""
+    model = synthetic_map(size, size, tile_count=2, density=1.0)
+    tiler = AutoTiler([Terrain.edges(range(1, 17)), Terrain.edges(range(101, 117))])
+    # Later passes find every variant up to date, so only the first one is timed
+    full = _timed(lambda: tiler.apply(model), 1)
+    tiler.attach(model)
+    length = min(stroke, size) - 1
+    tiles = itertools.cycle((1, 101))
+
+    def paint():
+        painting.fill_line(model, 0, 0, length, length, tile_id=next(tiles))
+
+    return {
+        "autotile_full": Measurement.of_durations(full),
+        "autotile_stroke": Measurement.of_durations(_timed(paint, repeat)),
+    }
+
+
+def bench_object_pan(
+    size: int, tileset: Tileset, repeat: int, count: int = 50_000, steps: int = 30
+) -> dict[str, Measurement]:
+    """Pan the viewport across count randomly placed objects of eight types, repainting after each step."""
+    rng = np.random.default_rng(0)
+    objects = ObjectStore()
+    objects.add_many(
+        rng.uniform(0, size, count), rng.uniform(0, size, count), rng.integers(0, 8, count), rng.uniform(0, 360, count)
+    )
+    scene = TileScene(model=synthetic_map(size, size), tileset=tileset, objects=objects)
+    view = _view(scene)
+    results = {}
+    for zoom in (1.0, 1 / 8):
+        view.resetTransform()
+        view.scale(zoom, zoom)
+        view.centerOn(scene.tile_layer.boundingRect().center())
+        viewport = view.viewport()
+        viewport.repaint()
+
+        def pan():
+            for _ in range(steps):
+                view.horizontalScrollBar().setValue(view.horizontalScrollBar().value() + 16)
+                viewport.repaint()
+
+        timings = _timed(pan, repeat)
+        results[f"objects_pan_zoom_{zoom:g}"] = Measurement.of_durations([timing / steps for timing in timings])
+    view.close()
+    return results
+
+
+class _Grid:
+    def __init__(self, rows: int = 64, cols: int = 64):
+        self.rows = rows
+        self.cols = cols
+
+
+class _Palette:
+    def __init__(self, name: str = "default"):
+        self.name = name
+
+
+class _Renderer:
+    def __init__(self, grid: _Grid, palette: _Palette, antialias: bool = True):
+        self.grid = grid
+        self.palette = palette
+        self.antialias = antialias
+
+
+class _Document:
+    def __init__(self, renderer: _Renderer, grid: _Grid, title: str = "untitled"):
+        self.renderer = renderer
+        self.grid = grid
+        self.title = title
+
+
+def bench_builder_resolve(repeat: int, resolves: int = 20_000) -> dict[str, Measurement]:
+    """Resolves per second of a transient type with a graph of dependencies, and of a singleton."""
+    builder = Builder()
+    builder.register(_Grid, lifetime=Lifetime.TRANSIENT)
+    builder.register(_Palette, lifetime=Lifetime.SINGLETON)
+    builder.register(_Renderer, lifetime=Lifetime.TRANSIENT)
+    builder.register(_Document, lifetime=Lifetime.TRANSIENT)
+    builder.resolve(_Document)
+
+    def throughput(cls: type) -> list[float]:
+        return [resolves / timing for timing in _timed(lambda: [builder.resolve(cls) for _ in range(resolves)], repeat)]
+
+    return {
+        "builder_resolve_transient": Measurement.of_throughput(throughput(_Document)),
+        "builder_resolve_singleton": Measurement.of_throughput(throughput(_Palette)),
+    }
+
+
+def run(size: int = 2048, zooms: list[float] = DEFAULT_ZOOMS, repeat: int = 5) -> dict:
+    """Run every benchmark on a synthetic map of size x size cells."""
+    application = QApplication.instance() or QApplication([])
+    tileset = Tileset.from_colors(DEFAULT_PALETTE, 32)
+
+    metrics: dict[str, Measurement] = {}
+    metrics.update(bench_scene_construction(size, tileset, repeat))
+    metrics.update(bench_render(size, tileset, list(zooms), repeat))
+    metrics.update(bench_selection_drag(size, tileset, repeat))
+    metrics.update(bench_autotile(size, repeat))
+    metrics.update(bench_object_pan(size, tileset, repeat))
+    metrics.update(bench_builder_resolve(repeat))
+    # Deliver the deferred deletions of the closed views
+    application.processEvents()
+    return {
+        "config": {"size": size, "zooms": list(zooms), "repeat": repeat, "viewport": list(VIEWPORT)},
+        "metrics": {name: asdict(measurement) for name, measurement in metrics.items()},
+    }
+
+
+def regressions(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """The metrics whose median is worse than in the baseline by more than the relative threshold."""
+    failures = []
+    for name, metric in result["metrics"].items():
+        reference = baseline.get("metrics", {}).get(name)
+        if reference is None:
+            continue
+        if metric["unit"] == "ms" and metric["median"] > reference["median"] * (1.0 + threshold):
+            failures.append(f"{name}: {metric['median']:.2f} ms vs baseline {reference['median']:.2f} ms")
+        elif metric["unit"] == "ops/s" and metric["median"] < reference["median"] / (1.0 + threshold):
+            failures.append(f"{name}: {metric['median']:.0f} ops/s vs baseline {reference['median']:.0f} ops/s")
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite")
+    parser.add_argument("--size", type=int, default=2048, help="width and height of the synthetic map in cells")
+    parser.add_argument("--zoom", type=float, action="append", help="zoom levels to render at, repeatable")
+    parser.add_argument("--repeat", type=int, default=5, help="number of samples per benchmark, the median is kept")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown over the baseline")
+    args = parser.parse_args(argv)
+
+    result = run(args.size, args.zoom or DEFAULT_ZOOMS, args.repeat)
+    for name, metric in result["metrics"].items():
+        print(f"{name:32} {metric['median']:12.2f} {metric['unit']:6} (best {metric['best']:.2f})")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures = regressions(result, json.load(file), args.threshold)
+        for failure in failures:
+            print(f"Regression {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
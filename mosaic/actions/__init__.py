@@ -1 +1,4 @@
 from .application import Quit  # noqa: F401
+from .edit import Redo, Undo  # noqa: F401
+from .file import ExportMap, OpenMap  # noqa: F401
+from .view import ExportTrace, TogglePerformance  # noqa: F401
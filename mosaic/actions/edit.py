@@ -0,0 +1,42 @@
+from typing import TYPE_CHECKING
+
+from PySide6.QtGui import QAction, QKeySequence
+
+if TYPE_CHECKING:
+    from mosaic.domain.history import UndoStack
+
+
+class Undo(QAction):
+    def __init__(self, stack: "UndoStack", parent=None):
+        super(Undo, self).__init__(parent)
+        self._stack = stack
+        self.setShortcut(QKeySequence.Undo)
+        self.setStatusTip("Undo the last edit")
+        self.triggered.connect(self._undo)
+        stack.changed.connect(self._refresh)
+        self._refresh()
+
+    def _undo(self):
+        self._stack.undo()
+
+    def _refresh(self):
+        self.setEnabled(self._stack.can_undo())
+        self.setText(f"Undo {self._stack.undo_text()}".strip())
+
+
+class Redo(QAction):
+    def __init__(self, stack: "UndoStack", parent=None):
+        super(Redo, self).__init__(parent)
+        self._stack = stack
+        self.setShortcut(QKeySequence.Redo)
+        self.setStatusTip("Redo the last undone edit")
+        self.triggered.connect(self._redo)
+        stack.changed.connect(self._refresh)
+        self._refresh()
+
+    def _redo(self):
+        self._stack.redo()
+
+    def _refresh(self):
+        self.setEnabled(self._stack.can_redo())
+        self.setText(f"Redo {self._stack.redo_text()}".strip())
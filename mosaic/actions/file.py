@@ -0,0 +1,69 @@
+import logging
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QAction
+from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox
+
+if TYPE_CHECKING:
+    from mosaic.domain.tilescene import TileScene
+    from mosaic.widgets.main_window import MainWindow
+
+_logger = logging.getLogger(__name__)
+
+
+class OpenMap(QAction):
+    def __init__(self, window: "MainWindow"):
+        super(OpenMap, self).__init__(window)
+        self._window = window
+        self.setText("Open...")
+        self.setStatusTip("Open a map file, recovering the edits its journal holds")
+        self.triggered.connect(self._open)
+
+    def _open(self):
+        path, _ = QFileDialog.getOpenFileName(self._window, "Open Map", "", "Mosaic map (*.mosaic)")
+        if path:
+            self.open(path)
+
+    def open(self, path: str):
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self._window.open_map(path)
+        except (OSError, ValueError) as error:
+            _logger.error(f"Failed to open the map {path}: {error}")
+            QMessageBox.warning(self._window, "Open Map", f"Failed to open the map {path}:\n{error}")
+        finally:
+            QApplication.restoreOverrideCursor()
+
+
+class ExportMap(QAction):
+    def __init__(self, scene: "TileScene", parent=None):
+        super(ExportMap, self).__init__(parent)
+        self._scene = scene
+        self._parent = parent
+        self.setText("Export...")
+        self.setStatusTip("Export the map as a PNG image, or as a Tiled TMX or JSON map")
+        self.setEnabled(scene.tile_layer is not None)
+        self.triggered.connect(self._export)
+
+    def _export(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self._parent, "Export Map", "map.png", "PNG image (*.png);;Tiled map (*.tmx);;Tiled JSON map (*.json)"
+        )
+        if path:
+            self.export(path)
+
+    def export(self, path: str):
+        # Imported when used, the exporters load the persistence layer and numpy
+        from mosaic.export_cli import export_map
+
+        layer = self._scene.tile_layer
+        source = self._scene.layers if self._scene.layers is not None else layer.model
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            export_map(path, source, layer.tileset)
+        except (OSError, ValueError) as error:
+            _logger.error(f"Failed to export the map to {path}: {error}")
+            QMessageBox.warning(self._parent, "Export Map", f"Failed to export the map to {path}:\n{error}")
+        finally:
+            QApplication.restoreOverrideCursor()
@@ -0,0 +1,43 @@
+from typing import TYPE_CHECKING
+
+from PySide6.QtGui import QAction
+from PySide6.QtWidgets import QFileDialog
+
+from mosaic.core.instrumentation import profiler
+
+if TYPE_CHECKING:
+    from mosaic.widgets.status_bar import StatusBar
+
+
+class TogglePerformance(QAction):
+    def __init__(self, status_bar: "StatusBar", parent=None):
+        super(TogglePerformance, self).__init__(parent)
+        self._status_bar = status_bar
+        self.setText("Performance Overlay")
+        self.setStatusTip("Show the frame rate, paint time and cache statistics")
+        self.setCheckable(True)
+        self.setChecked(status_bar.performance_visible)
+        self.toggled.connect(self._toggle)
+
+    def _toggle(self, checked: bool):
+        self._status_bar.show_performance(checked)
+
+
+class ExportTrace(QAction):
+    def __init__(self, parent=None):
+        super(ExportTrace, self).__init__(parent)
+        self._parent = parent
+        self.setText("Export Performance Trace...")
+        self.setStatusTip("Save the recorded timings as a Chrome trace, or as a JSON summary")
+        self.triggered.connect(self._export)
+
+    def _export(self):
+        path, selected = QFileDialog.getSaveFileName(
+            self._parent, "Export Performance Trace", "trace.json", "Chrome trace (*.json);;Summary (*.json)"
+        )
+        if not path:
+            return
+        if selected.startswith("Summary"):
+            profiler.export_json(path)
+        else:
+            profiler.export_chrome_trace(path)
@@ -1,15 +1,14 @@
-import os
+from importlib import metadata
 
-import toml
 from PySide6.QtWidgets import QApplication
 
-_project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-_project_toml = os.path.join(_project_root, "pyproject.toml")
-_project_data = toml.load(_project_toml)
-
 
 def _version() -> str:
-    return _project_data["tool"]["poetry"]["version"]
+    try:
+        return metadata.version("mosaic")
+    except metadata.PackageNotFoundError:
+        # Running from a source checkout that has not been installed
+        return "0.0.0"
 
 
 class MosaicEditor(QApplication):
@@ -0,0 +1,337 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import NamedTuple
+
+from mosaic import config
+from mosaic.core.builder import Builder
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tileset import DEFAULT_PALETTE, Tileset
+from mosaic.domain.transforms import ValidationError, lookup_table, match_tiles, remap_tiles, rechunk, validate_model
+from mosaic.persistence.mapfile import MapFile
+
+_logger = logging.getLogger(__name__)
+
+MAP_FORMAT = ".mosaic"
+
+
+@dataclass
+class BatchOptions:
+    """The transforms of a batch run and how it is spread over worker processes.
+
+    Args:
+        output: The directory to write the transformed maps to, maps are rewritten in place if not given.
+        remap: A mapping of tile ids to replace with other tile ids.
+        source_colors: The colors of the tileset the maps are painted with.
+        target_colors: The colors of a tileset to swap to, each tile becoming the tile of the closest color.
+        validate: Whether to check that maps only use tiles of their tileset, failing those that do not.
+        chunk_size: A chunk size to rewrite the maps with.
+        compress: Whether chunks are written compressed.
+        workers: The number of worker processes, one per core by default, or 0 to run in the calling process.
+        memory_limit: The address space each worker process may use in bytes, unlimited if not given. Only enforced
+            on POSIX systems, elsewhere a warning is logged and the workers run unlimited.
+    """
+
+    output: str | None = None
+    remap: dict[int, int] = field(default_factory=dict)
+    source_colors: list[tuple[int, ...]] = field(default_factory=lambda: list(DEFAULT_PALETTE))
+    target_colors: list[tuple[int, ...]] | None = None
+    validate: bool = False
+    chunk_size: int | None = None
+    compress: bool = True
+    workers: int | None = None
+    memory_limit: int | None = None
+
+
+class MapReport(NamedTuple):
+    """The outcome of processing a map, with the time taken by each step in seconds."""
+
+    path: str
+    cells: int = 0
+    chunks: int = 0
+    timings: dict[str, float] = {}
+    peak_memory: int = 0
+    error: str | None = None
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+class Step(NamedTuple):
+    """A transform of a pipeline, which returns the transformed model, either the model it was given or a new one."""
+
+    name: str
+    apply: Callable[[ChunkedTileModel], ChunkedTileModel]
+
+
+def _remap(table) -> Callable[[ChunkedTileModel], ChunkedTileModel]:
+    def apply(model: ChunkedTileModel) -> ChunkedTileModel:
+        remap_tiles(model, table)
+        return model
+
+    return apply
+
+
+def _validate(tile_count: int) -> Callable[[ChunkedTileModel], ChunkedTileModel]:
+    def apply(model: ChunkedTileModel) -> ChunkedTileModel:
+        if problems := validate_model(model, tile_count):
+            raise ValidationError(problems)
+        return model
+
+    return apply
+
+
+def _rechunk(chunk_size: int) -> Callable[[ChunkedTileModel], ChunkedTileModel]:
+    def apply(model: ChunkedTileModel) -> ChunkedTileModel:
+        return rechunk(model, chunk_size) if chunk_size != model.chunk_size else model
+
+    return apply
+
+
+def peak_memory() -> int:
+    """The peak resident memory of the calling process in bytes, or 0 where it is not available, such as on Windows."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # Reported in kilobytes on Linux and in bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def limit_memory(limit: int | None):
+    """Limit the address space of the calling process, so that a runaway map raises MemoryError in its worker.
+
+    Limits rely on setrlimit and are POSIX only, on other platforms a warning is logged and nothing is limited.
+    """
+    if limit is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        _logger.warning("Memory limits are not supported on this platform")
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = limit if hard == resource.RLIM_INFINITY else min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+class Pipeline:
+    """Loads a map file, applies the transforms of a batch run to it in order and writes the result.
+
+    Maps are loaded through MapFile alone, chunks are decoded as the transforms touch them. A map that is rewritten
+    in place is saved incrementally, unless it was rechunked, in which case a new file replaces it once complete.
+
+    Args:
+        options: The transforms to apply and where to write the maps.
+    """
+
+    def __init__(self, options: BatchOptions):
+        self._options = options
+        self._steps: list[Step] = []
+        source = Tileset.from_colors(options.source_colors, 1)
+        if options.remap:
+            self._steps.append(Step("remap", _remap(lookup_table(options.remap))))
+        tileset = source
+        if options.target_colors is not None:
+            tileset = Tileset.from_colors(options.target_colors, 1)
+            self._steps.append(Step("swap", _remap(match_tiles(source, tileset))))
+        if options.validate:
+            self._steps.append(Step("validate", _validate(len(tileset))))
+        if options.chunk_size is not None:
+            self._steps.append(Step("rechunk", _rechunk(options.chunk_size)))
+
+    @property
+    def steps(self) -> list[Step]:
+        return list(self._steps)
+
+    def process(self, path: str | os.PathLike) -> MapReport:
+        """Transform a map, reporting rather than raising the errors that fail it."""
+        path = os.fspath(path)
+        timings = {}
+        try:
+            start = time.perf_counter()
+            with MapFile.open(path, self._options.compress) as map_file:
+                timings["load"] = time.perf_counter() - start
+                model = map_file.model
+                for step in self._steps:
+                    start = time.perf_counter()
+                    model = step.apply(model)
+                    timings[step.name] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                self._write(path, map_file, model)
+                timings["save"] = time.perf_counter() - start
+                return MapReport(path, len(model), len(model.chunk_keys()), timings, peak_memory())
+        except (OSError, ValueError, KeyError, MemoryError) as error:
+            return MapReport(path, timings=timings, peak_memory=peak_memory(), error=str(error) or type(error).__name__)
+
+    def _write(self, path: str, map_file: MapFile, model: ChunkedTileModel):
+        output = Path(self._options.output or os.path.dirname(path)) / Path(path).name
+        if not output.exists() or not output.samefile(path):
+            MapFile.create(output, model, self._options.compress).close()
+        elif model is not map_file.model:
+            temporary = f"{path}.tmp"
+            MapFile.create(temporary, model, self._options.compress).close()
+            map_file.close()
+            os.replace(temporary, path)
+        else:
+            map_file.save()
+
+
+_pipeline: Pipeline | None = None
+
+
+def _initialize_worker(options: BatchOptions):
+    global _pipeline
+    limit_memory(options.memory_limit)
+    _pipeline = create_builder(options).resolve(Pipeline)
+
+
+def _process(path: str) -> MapReport:
+    return _pipeline.process(path)
+
+
+class BatchRunner:
+    """Fans maps out across a pool of worker processes, each with its own pipeline and memory limit.
+
+    Workers are spawned rather than forked and resolve their pipeline from a builder of their own.
+
+    Args:
+        options: The options of the batch run.
+        pipeline: The pipeline used when running in the calling process.
+    """
+
+    def __init__(self, options: BatchOptions, pipeline: Pipeline):
+        self._options = options
+        self._pipeline = pipeline
+
+    def run(self, paths: Iterable[str | os.PathLike]) -> Iterator[MapReport]:
+        """Process maps, yielding their reports in the order of the paths."""
+        paths = [os.fspath(path) for path in paths]
+        workers = (os.cpu_count() or 1) if self._options.workers is None else max(self._options.workers, 0)
+        if workers == 0 or not paths:
+            for path in paths:
+                yield self._pipeline.process(path)
+            return
+
+        context = multiprocessing.get_context("spawn")
+        workers = min(workers, len(paths))
+        with ProcessPoolExecutor(workers, context, initializer=_initialize_worker, initargs=(self._options,)) as pool:
+            futures = [pool.submit(_process, path) for path in paths]
+            for path, future in zip(paths, futures):
+                try:
+                    yield future.result()
+                except BrokenProcessPool as error:
+                    yield MapReport(path, error=f"Worker process failed: {error}")
+
+
+def create_builder(options: BatchOptions) -> Builder:
+    builder = Builder()
+    config.populate_batch_builder(builder, options)
+    return builder
+
+
+def format_summary(reports: list[MapReport]) -> str:
+    """A table of the time taken by each step of each map, in milliseconds, followed by the totals."""
+    steps = list(dict.fromkeys(name for report in reports for name in report.timings))
+    header = ["map", "cells", "chunks"] + steps + ["total ms", "peak MB", "status"]
+    rows = [header]
+    for report in reports:
+        timings = [f"{report.timings[name] * 1000:.1f}" if name in report.timings else "-" for name in steps]
+        status = "ok" if report.error is None else f"failed: {report.error}"
+        rows.append(
+            [Path(report.path).name, str(report.cells), str(report.chunks)]
+            + timings
+            + [f"{report.total * 1000:.1f}", f"{report.peak_memory / 2**20:.0f}", status]
+        )
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header) - 1)]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(row, widths)) + "  " + row[-1] for row in rows]
+    failed = sum(report.error is not None for report in reports)
+    lines.append(f"{len(reports) - failed} of {len(reports)} maps processed, {failed} failed")
+    return "\n".join(lines)
+
+
+def map_paths(paths: Iterable[str]) -> list[str]:
+    """The map files given on the command line, directories standing for the map files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(str(file) for file in sorted(Path(path).glob(f"*{MAP_FORMAT}")))
+        else:
+            files.append(path)
+    return files
+
+
+def _load_json(path: str):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _options(args: argparse.Namespace) -> BatchOptions:
+    options = BatchOptions(
+        output=args.output,
+        validate=args.validate,
+        chunk_size=args.chunk_size,
+        compress=not args.raw,
+        workers=args.workers,
+        memory_limit=args.memory_limit * 2**20 if args.memory_limit is not None else None,
+    )
+    if args.remap is not None:
+        options.remap = {int(old): int(new) for old, new in _load_json(args.remap).items()}
+    if args.source_tileset is not None:
+        options.source_colors = [tuple(color) for color in _load_json(args.source_tileset)]
+    if args.tileset is not None:
+        options.target_colors = [tuple(color) for color in _load_json(args.tileset)]
+    return options
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="mosaic-batch",
+        description="Apply tile remapping, tileset swaps, validation and rechunking to many map files at once",
+    )
+    parser.add_argument("maps", nargs="+", help="map files, or directories of map files")
+    parser.add_argument("--output", help="a directory to write the maps to, they are rewritten in place by default")
+    parser.add_argument("--remap", help='a JSON object of tile ids to replace, such as {"3": 7}')
+    parser.add_argument("--source-tileset", help="a JSON list of the RGB colors of the tileset of the maps")
+    parser.add_argument("--tileset", help="a JSON list of the RGB colors of a tileset to swap to")
+    parser.add_argument("--validate", action="store_true", help="fail maps using tiles missing from their tileset")
+    parser.add_argument("--chunk-size", type=int, help="a chunk size to rewrite the maps with")
+    parser.add_argument("--raw", action="store_true", help="write chunks uncompressed")
+    parser.add_argument("--workers", type=int, help="the number of worker processes, one per core by default")
+    parser.add_argument(
+        "--memory-limit", type=int, help="the memory each worker process may use, in megabytes, POSIX only"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    try:
+        options = _options(args)
+        if options.output is not None:
+            os.makedirs(options.output, exist_ok=True)
+        runner = create_builder(options).resolve(BatchRunner)
+    except (OSError, ValueError, TypeError) as error:
+        _logger.error(f"Invalid batch options: {error}")
+        return 1
+
+    start = time.perf_counter()
+    reports = list(runner.run(map_paths(args.maps)))
+    print(format_summary(reports))
+    _logger.info(f"Finished in {time.perf_counter() - start:.2f} s")
+    return 0 if all(report.error is None for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,15 @@
-from mosaic import widgets
-from mosaic.core.builder import Builder, LazyInit
+from mosaic.core.builder import Builder, LazyInit, Lifetime
 
 
 def populate_builder(builder: Builder):
-    builder.register(widgets.MainMenu, instance=LazyInit)
-    builder.register(widgets.StatusBar, instance=LazyInit)
-    builder.register(widgets.MainWindow)
+    # Registered by import path, so the widget modules are only imported once the main window is resolved
+    builder.register("mosaic.widgets.main_menu.MainMenu", instance=LazyInit)
+    builder.register("mosaic.widgets.status_bar.StatusBar", instance=LazyInit)
+    builder.register("mosaic.widgets.main_window.MainWindow")
+
+
+def populate_batch_builder(builder: Builder, options):
+    # Only the services of a batch run, which works on the domain layer and never creates a QApplication
+    builder.register("mosaic.batch.BatchOptions", instance=options)
+    builder.register("mosaic.batch.Pipeline", lifetime=Lifetime.SINGLETON)
+    builder.register("mosaic.batch.BatchRunner")
@@ -1,9 +1,16 @@
+import importlib
 import inspect
 import logging
+import threading
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
 from typing import Any, TypeVar, Type
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, PrivateAttr, model_validator
+
+from mosaic.core.instrumentation import profiler
 
 _logger = logging.getLogger(__name__)
 
@@ -20,8 +27,216 @@ class LazyInit(BaseModel):
     pass
 
 
+class Lifetime(Enum):
+    """How long a resolved instance is reused.
+
+    SINGLETON instances are created once per builder, SCOPED instances once per Scope, for example per document or
+    per view, and TRANSIENT instances are created on every resolve.
+    """
+
+    SINGLETON = "singleton"
+    SCOPED = "scoped"
+    TRANSIENT = "transient"
+
+
+_MISSING = object()
+
+
 T = TypeVar("T")
 
+_excluded_params = ("self", "args", "kwargs")
+
+
+def qualified_name(cls: type) -> str:
+    """The dotted import path of a type, as used for deferred registrations."""
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def import_type(path: str) -> type:
+    """Import a type from its dotted path, such as 'mosaic.widgets.main_window.MainWindow'."""
+    module_name, _, name = path.rpartition(".")
+    try:
+        return getattr(importlib.import_module(module_name), name)
+    except (ImportError, AttributeError, ValueError) as error:
+        raise ResolutionError(f"Unable to import {path}") from error
+
+
+@dataclass(frozen=True, slots=True)
+class DeferredRegistration:
+    """A registration given by import path, kept until the type is first needed."""
+
+    path: str
+    alias: type | None
+    instance: Any
+    factory: Callable[..., Any] | None
+    lifetime: Lifetime | None
+    kwargs: dict[str, Any]
+
+
+def is_gui_type(cls: type) -> bool:
+    """Whether a type derives from a Qt class, which must be constructed on the GUI thread."""
+    return any(base.__module__.startswith("PySide6") for base in inspect.getmro(cls))
+
+
+@dataclass(frozen=True, slots=True)
+class MissingDependency:
+    """A constructor or factory parameter that no registration can be resolved for."""
+
+    typename: type
+    parameter: str
+    annotation: Any
+
+
+@dataclass(frozen=True, slots=True)
+class DependencyGraph:
+    """The dependencies between the registrations of a builder.
+
+    Args:
+        dependencies: The registered types each registered type depends on, after resolving aliases.
+        missing: The parameters that have no registration to be resolved from.
+        cycles: The cycles of registrations that depend on each other, each listed in dependency order.
+        layers: The registrations grouped so that each only depends on those in earlier layers, types that are part
+            of, or depend on, a cycle are left out.
+    """
+
+    dependencies: dict[type, tuple[type, ...]]
+    missing: tuple[MissingDependency, ...]
+    cycles: tuple[tuple[type, ...], ...]
+    layers: tuple[tuple[type, ...], ...]
+
+    @property
+    def order(self) -> list[type]:
+        """The registrations in topological order, each type after its dependencies."""
+        return [cls for layer in self.layers for cls in layer]
+
+    @property
+    def valid(self) -> bool:
+        return not self.missing and not self.cycles
+
+    def errors(self) -> list[str]:
+        errors = [
+            f"{item.typename} parameter '{item.parameter}' has no registration for {item.annotation}"
+            for item in self.missing
+        ]
+        errors.extend(
+            "Dependency cycle " + " -> ".join(cls.__qualname__ for cls in (*cycle, cycle[0])) for cycle in self.cycles
+        )
+        return errors
+
+
+def _layers(dependencies: dict[type, tuple[type, ...]]) -> list[tuple[type, ...]]:
+    """Kahn's algorithm, peeling off the types whose dependencies are all in earlier layers."""
+    remaining = {cls: set(depends) for cls, depends in dependencies.items()}
+    dependents: dict[type, list[type]] = {cls: [] for cls in dependencies}
+    for cls, depends in dependencies.items():
+        for dependency in depends:
+            dependents[dependency].append(cls)
+
+    layers = []
+    layer = [cls for cls, depends in remaining.items() if not depends]
+    while layer:
+        layers.append(tuple(layer))
+        ready = []
+        for cls in layer:
+            for dependent in dependents[cls]:
+                depends = remaining[dependent]
+                depends.discard(cls)
+                if not depends:
+                    ready.append(dependent)
+        layer = ready
+    return layers
+
+
+def _cycles(dependencies: dict[type, tuple[type, ...]], nodes: set[type]) -> list[tuple[type, ...]]:
+    """Cycles among the nodes, found as the back edges of a depth first search, at least one per strongly connected
+    group of types."""
+    cycles: dict[frozenset, tuple[type, ...]] = {}
+    visited: set[type] = set()
+    for root in nodes:
+        if root in visited:
+            continue
+        path: list[type] = [root]
+        on_path = {root: 0}
+        stack = [iter(dependencies[root])]
+        visited.add(root)
+        while stack:
+            dependency = next(stack[-1], None)
+            if dependency is None:
+                stack.pop()
+                del on_path[path.pop()]
+            elif dependency in on_path:
+                cycle = tuple(path[on_path[dependency] :])
+                cycles.setdefault(frozenset(cycle), cycle)
+            elif dependency in nodes and dependency not in visited:
+                visited.add(dependency)
+                on_path[dependency] = len(path)
+                path.append(dependency)
+                stack.append(iter(dependencies[dependency]))
+    return list(cycles.values())
+
+
+class ParameterSource(Enum):
+    """Where a constructor parameter gets its value from when no override is given."""
+
+    KWARG = "kwarg"
+    DEFAULT = "default"
+    DEPENDENCY = "dependency"
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedParameter:
+    """A single, pre-resolved step of a resolution plan.
+
+    Args:
+        name: The name of the parameter.
+        source: Where the value comes from unless it is overridden at resolve time.
+        value: The registered kwarg or default value, for non-dependency sources.
+        annotation: The annotated type of the parameter.
+        dependency: The registration the annotation resolves to, if any.
+    """
+
+    name: str
+    source: ParameterSource
+    value: Any = None
+    annotation: Any = None
+    dependency: "Context | None" = None
+
+    def resolve(self, resolver: "Builder | Scope") -> Any:
+        if self.dependency is None:
+            raise ResolutionError(f"Unable to resolve type {self.annotation}, no registration found")
+        return self.dependency.resolve(resolver)
+
+
+class ResolutionPlan:
+    """A registration compiled into the steps needed to construct it.
+
+    Plans are built once per registration and cached by the builder, so resolving a type does not need to inspect
+    its signature again. A plan is only valid as long as the registrations of the builder are unchanged, since the
+    dependency chain is resolved when the plan is compiled.
+    """
+
+    __slots__ = ("target", "parameters", "_static", "_names", "_dependencies")
+
+    def __init__(self, target: Callable[..., Any], static: dict[str, Any], parameters: list[PlannedParameter]):
+        self.target = target
+        self.parameters = tuple(parameters)
+        self._static = static
+        self._names = frozenset(param.name for param in self.parameters)
+        self._dependencies = tuple(param for param in self.parameters if param.source is ParameterSource.DEPENDENCY)
+
+    def execute(self, resolver: "Builder | Scope", **kwargs) -> Any:
+        resolved_kwargs = self._static.copy()
+
+        for param in self._dependencies:
+            if param.name not in kwargs:
+                resolved_kwargs[param.name] = param.resolve(resolver)
+
+        if kwargs:
+            for name in self._names.intersection(kwargs):
+                resolved_kwargs[name] = kwargs[name]
+
+        return self.target(**resolved_kwargs)
+
 
 class Context(BaseModel):
     """Context for a type registration.
@@ -32,6 +247,7 @@ class Context(BaseModel):
         instance: An optional instance to register the type with.
         kwargs: Additional keyword arguments to use for resolving the type.
         factory: An optional factory to use for resolving the type.
+        lifetime: How long resolved instances are reused, a singleton if an instance is given and transient otherwise.
     """
 
     typename: Type[T]
@@ -39,10 +255,15 @@ class Context(BaseModel):
     kwargs: dict[str, Any] = {}
     instance: T | LazyInit = None
     factory: Callable[[Any], T] | None = None
+    lifetime: Lifetime | None = None
+
+    _parameters: list[inspect.Parameter] | None = PrivateAttr(default=None)
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
 
     @model_validator(mode="after")
     def validate_model(self) -> "Context":
         self._validate_instance()
+        self._validate_lifetime()
         self._validate_aliases()
         self._validate_factory()
 
@@ -62,6 +283,14 @@ class Context(BaseModel):
             if self.factory:
                 raise ValueError("Cannot provide instance when using factory")
 
+    def _validate_lifetime(self):
+        if self.lifetime is None:
+            self.lifetime = Lifetime.TRANSIENT if self.instance is None else Lifetime.SINGLETON
+        elif self.lifetime is Lifetime.SINGLETON and self.instance is None:
+            self.instance = LazyInit
+        elif self.lifetime is not Lifetime.SINGLETON and self.instance is not None:
+            raise ValueError(f"Cannot provide instance for a {self.lifetime.value} lifetime")
+
     def _validate_aliases(self):
         if self.aliases:
             for alias in self.aliases:
@@ -77,15 +306,24 @@ class Context(BaseModel):
     def _lazy_init_instance(self) -> bool:
         return self.instance is LazyInit or isinstance(self.instance, LazyInit)
 
-    def resolve(self, builder: "Builder", **kwargs) -> Any:
-        return self._instance(builder, **kwargs) or self._create(builder, **kwargs)
+    def resolve(self, resolver: "Builder | Scope", **kwargs) -> Any:
+        if self.lifetime is Lifetime.SINGLETON:
+            return resolver._singleton(self, **kwargs)
+        if self.lifetime is Lifetime.SCOPED:
+            return resolver._scoped(self, **kwargs)
+        return self._create(resolver, **kwargs)
 
     def _instance(self, builder: "Builder", **kwargs) -> Any:
-        if self.instance is LazyInit:
-            self.instance = self._create(builder, **kwargs)
-        return self.instance
-
-    def _create(self, builder: "Builder", **kwargs) -> Any:
+        # Double-checked locking, so concurrent first resolves construct the singleton once
+        instance = self.instance
+        if instance is LazyInit:
+            with self._lock:
+                if self.instance is LazyInit:
+                    self.instance = self._create(builder, **kwargs)
+                instance = self.instance
+        return instance
+
+    def _create(self, resolver: "Builder | Scope", **kwargs) -> Any:
         """Resolve the type from the context using the provided builder.
 
         Resolution of arguments is done in the following order:
@@ -95,67 +333,96 @@ class Context(BaseModel):
         4. Else, resolve from builder
 
         Args:
-            builder: The builder to use for resolving the type.
+            resolver: The builder or scope to resolve the dependencies from.
             kwargs: Additional keyword arguments to use for resolving the type.
         """
-
-        # Inspect signature and remove 'self, *args and **kwargs' from it
-        signature = inspect.signature(self.factory or self.typename.__init__)
-        excluded_params = ["self", "args", "kwargs"]
-        trimmed_params = [param for param in signature.parameters.values() if param.name not in excluded_params]
-        signature = signature.replace(parameters=trimmed_params)
-
-        resolved_kwargs = self.kwargs.copy()
-
-        for param in signature.parameters.values():
-            if param.name in kwargs:
-                resolved_kwargs[param.name] = kwargs[param.name]
-            elif param.name in self.kwargs:
-                resolved_kwargs[param.name] = self.kwargs[param.name]
+        with profiler.span("builder.create"):
+            return resolver._plan(self).execute(resolver, **kwargs)
+
+    def parameters(self) -> list[inspect.Parameter]:
+        """The parameters of the factory or constructor, excluding 'self, *args and **kwargs'."""
+        if self._parameters is None:
+            signature = inspect.signature(self.factory or self.typename.__init__)
+            self._parameters = [param for param in signature.parameters.values() if param.name not in _excluded_params]
+        return self._parameters
+
+    def compile(self, builder: "Builder") -> ResolutionPlan:
+        """Compile the context into a resolution plan against the current registrations of the builder."""
+        static = self.kwargs.copy()
+        planned = []
+
+        for param in self.parameters():
+            if param.name in self.kwargs:
+                planned.append(PlannedParameter(param.name, ParameterSource.KWARG, value=self.kwargs[param.name]))
             elif param.default != param.empty:
-                resolved_kwargs[param.name] = param.default
+                static[param.name] = param.default
+                planned.append(PlannedParameter(param.name, ParameterSource.DEFAULT, value=param.default))
             else:
-                resolved_kwargs[param.name] = builder.resolve(param.annotation)
+                dependency = builder._context(param.annotation)
+                planned.append(
+                    PlannedParameter(
+                        param.name, ParameterSource.DEPENDENCY, annotation=param.annotation, dependency=dependency
+                    )
+                )
 
-        if self.factory:
-            return self.factory(**resolved_kwargs)
-        else:
-            return self.typename(**resolved_kwargs)
+        return ResolutionPlan(self.factory or self.typename, static, planned)
 
 
 class Builder:
+    """Registers types and resolves them, together with their dependencies.
+
+    Resolving is thread-safe. Singletons that have been built are returned by a plain dict lookup without locking,
+    their first construction, as well as registration and the compilation of resolution plans, is serialized.
+    """
+
     def __init__(self):
         self._registrations: dict[type, Context] = {}
         self._aliases: dict[type, type] = {}
+        self._plans: dict[type, ResolutionPlan] = {}
+        self._deferred: dict[str, DeferredRegistration] = {}
+        self._deferred_aliases: dict[type, str] = {}
+        self._singletons: dict[type | str, Any] = {}
+        self._lock = threading.RLock()
 
     def register(
         self,
-        cls: Type[T],
+        cls: Type[T] | str,
         alias: type = None,
         instance: T | LazyInit = None,
         factory: Callable[[Any], T] | None = None,
+        lifetime: Lifetime | None = None,
         **kwargs,
     ) -> None:
         """Register a type with the builder.
 
+        A type can also be registered by its dotted import path, in which case its module is only imported, and the
+        registration validated, when the type is first resolved or needed as a dependency.
+
         Args:
-            cls: The type to register.
+            cls: The type to register, or its dotted import path.
             alias: An optional alias to register the type with.
             instance: An optional instance to register the type with.
             kwargs: Additional keyword arguments to use for resolving the type.
             factory: An optional factory to use for resolving the type.
+            lifetime: How long resolved instances are reused. Defaults to a singleton if an instance, or LazyInit,
+                is given and to transient otherwise.
         """
-
-        context = Context(
-            typename=cls,
-            aliases={alias} if alias else set(),
-            instance=instance,
-            factory=factory,
-            kwargs=kwargs,
-        )
-
-        self._validate(context)
-        self._register(context)
+        with self._lock:
+            if isinstance(cls, str):
+                self._register_deferred(DeferredRegistration(cls, alias, instance, factory, lifetime, kwargs))
+                return
+
+            context = Context(
+                typename=cls,
+                aliases={alias} if alias else set(),
+                instance=instance,
+                factory=factory,
+                lifetime=lifetime,
+                kwargs=kwargs,
+            )
+
+            self._validate(context)
+            self._register(context)
 
     def _resolve_alias(self, alias: type) -> type:
         if alias in self._aliases:
@@ -163,19 +430,157 @@ class Builder:
 
         return alias
 
-    def resolve(self, cls: type[T], **kwargs) -> T:
+    def resolve(self, cls: type[T] | str, **kwargs) -> T:
         """Resolve a type from the builder.
 
         Args:
-            cls: The type to resolve.
+            cls: The type to resolve, or its dotted import path.
             kwargs: Additional keyword arguments to use for resolving the type.
         """
-        resolved_type = self._resolve_alias(cls)
-        context = self._registrations.get(resolved_type, None)
+        instance = self._singletons.get(cls, _MISSING)
+        if instance is not _MISSING:
+            return instance
+
+        context = self._context(cls)
         if not context:
             raise ResolutionError(f"Unable to resolve type {cls}, no registration found")
 
-        return context.resolve(self, **kwargs)
+        instance = context.resolve(self, **kwargs)
+        if context.lifetime is Lifetime.SINGLETON:
+            self._singletons[cls] = instance
+        return instance
+
+    def create_scope(self) -> "Scope":
+        """Create a scope for instances that live as long as, for example, a document or a view."""
+        return Scope(self)
+
+    def build_graph(self) -> DependencyGraph:
+        """Build the dependency graph of all registrations from their cached signatures, without constructing any.
+
+        Deferred registrations are imported, since their signatures are needed.
+        """
+        with self._lock:
+            for path in list(self._deferred):
+                self._import_deferred(path)
+
+            dependencies: dict[type, tuple[type, ...]] = {}
+            missing = []
+            for typename, context in self._registrations.items():
+                depends = []
+                for param in context.parameters():
+                    if param.name in context.kwargs or param.default != param.empty:
+                        continue
+                    dependency = self._locked_context(param.annotation)
+                    if dependency is None:
+                        missing.append(MissingDependency(typename, param.name, param.annotation))
+                    elif dependency.typename not in depends:
+                        depends.append(dependency.typename)
+                dependencies[typename] = tuple(depends)
+
+        layers = _layers(dependencies)
+        ordered = {cls for layer in layers for cls in layer}
+        cycles = _cycles(dependencies, set(dependencies) - ordered)
+        return DependencyGraph(dependencies, tuple(missing), tuple(cycles), tuple(layers))
+
+    def validate(self) -> DependencyGraph:
+        """Build the dependency graph, and raise a ResolutionError listing any missing registrations and cycles."""
+        graph = self.build_graph()
+        if not graph.valid:
+            raise ResolutionError("Invalid registrations:\n" + "\n".join(graph.errors()))
+        return graph
+
+    def warm_up(self, max_workers: int | None = None) -> list[type]:
+        """Construct the lazy singletons that are safe to build off the GUI thread, concurrently, layer by layer.
+
+        A singleton is built if neither it nor anything it depends on, directly or through transient registrations,
+        is a Qt type. The singletons of a layer are built in parallel once those of the earlier layers are done.
+
+        Args:
+            max_workers: The maximum number of threads, defaults to that of a ThreadPoolExecutor.
+
+        Returns:
+            The types that were constructed, in the order of their layers.
+        """
+        graph = self.validate()
+        safe: set[type] = set()
+        for cls in graph.order:
+            context = self._registrations[cls]
+            if not is_gui_type(cls) and context.lifetime is not Lifetime.SCOPED:
+                if all(dependency in safe for dependency in graph.dependencies[cls]):
+                    safe.add(cls)
+
+        layers = [
+            [cls for cls in layer if cls in safe and self._registrations[cls].instance is LazyInit]
+            for layer in graph.layers
+        ]
+        warmed = []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="builder-warm-up") as executor:
+            for layer in filter(None, layers):
+                list(executor.map(self.resolve, layer))
+                warmed.extend(layer)
+        _logger.debug(f"Warmed up {len(warmed)} singletons in {sum(map(bool, layers))} layers")
+        return warmed
+
+    def _singleton(self, context: Context, **kwargs) -> Any:
+        return context._instance(self, **kwargs)
+
+    def _scoped(self, context: Context, **kwargs) -> Any:
+        raise ResolutionError(f"Type {context.typename} is scoped and can only be resolved from a scope")
+
+    def _context(self, cls: type | str) -> Context | None:
+        context = self._registrations.get(self._resolve_alias(cls), None) if not isinstance(cls, str) else None
+        if context is not None:
+            return context
+
+        with self._lock:
+            return self._locked_context(cls)
+
+    def _locked_context(self, cls: type | str) -> Context | None:
+        if isinstance(cls, str):
+            cls = self._import_deferred(cls) if cls in self._deferred else import_type(cls)
+
+        context = self._registrations.get(self._resolve_alias(cls), None)
+        if context is None and self._deferred:
+            path = self._deferred_aliases.get(cls) or qualified_name(cls)
+            if path in self._deferred:
+                self._import_deferred(path)
+                context = self._registrations.get(self._resolve_alias(cls), None)
+        return context
+
+    def _register_deferred(self, registration: DeferredRegistration):
+        if registration.path in self._deferred:
+            raise RegistrationError(f"Type {registration.path} is already registered")
+        if registration.alias is not None:
+            if registration.alias in self._deferred_aliases or registration.alias in self:
+                raise RegistrationError(f"Alias {registration.alias} is already registered")
+            self._deferred_aliases[registration.alias] = registration.path
+        self._deferred[registration.path] = registration
+
+    def _import_deferred(self, path: str) -> type:
+        registration = self._deferred.pop(path)
+        if registration.alias is not None:
+            del self._deferred_aliases[registration.alias]
+
+        cls = import_type(path)
+        _logger.debug(f"Imported deferred registration {path}")
+        self.register(
+            cls,
+            alias=registration.alias,
+            instance=registration.instance,
+            factory=registration.factory,
+            lifetime=registration.lifetime,
+            **registration.kwargs,
+        )
+        return cls
+
+    def _plan(self, context: Context) -> ResolutionPlan:
+        plan = self._plans.get(context.typename, None)
+        if plan is None:
+            with self._lock:
+                plan = self._plans.get(context.typename, None)
+                if plan is None:
+                    plan = self._plans[context.typename] = context.compile(self)
+        return plan
 
     def _validate(self, context: Context):
         if context.typename in self._registrations:
@@ -190,11 +595,125 @@ class Builder:
 
     def _register(self, context: Context) -> None:
         self._registrations[context.typename] = context
+        self._plans.clear()
 
         if context.aliases:
             for alias in context.aliases:
                 self._aliases[alias] = context.typename
 
-    def __contains__(self, cls: type) -> bool:
-        """Check if the builder contains a type or alias."""
-        return cls in self._registrations or cls in self._aliases
+    def __contains__(self, cls: type | str) -> bool:
+        """Check if the builder contains a type or alias, without importing deferred registrations."""
+        if isinstance(cls, str):
+            return cls in self._deferred or any(qualified_name(registered) == cls for registered in self._registrations)
+        if cls in self._registrations or cls in self._aliases or cls in self._deferred_aliases:
+            return True
+        return bool(self._deferred) and qualified_name(cls) in self._deferred
+
+
+class Scope:
+    """A scope in which each SCOPED registration of a builder is resolved to a single instance.
+
+    Scopes are cheap to create, and nested scopes, for example one per view of a document, are disposed together
+    with their parent. Disposing a scope calls `dispose()` on the scoped instances that have one, newest first.
+    Singletons are shared with the builder, and transient types are created from the scope so that their scoped
+    dependencies come from it.
+
+    Args:
+        builder: The builder that holds the registrations.
+        parent: The scope this scope is nested in, if any.
+    """
+
+    __slots__ = ("_builder", "_parent", "_instances", "_resolved", "_children", "_lock", "_disposed")
+
+    def __init__(self, builder: Builder, parent: "Scope | None" = None):
+        self._builder = builder
+        self._parent = parent
+        self._instances: dict[type, Any] = {}
+        self._resolved: dict[type | str, Any] = {}
+        self._children: dict[Scope, None] = {}
+        self._lock = threading.RLock()
+        self._disposed = False
+
+    @property
+    def disposed(self) -> bool:
+        return self._disposed
+
+    def resolve(self, cls: type[T] | str, **kwargs) -> T:
+        """Resolve a type within the scope.
+
+        Args:
+            cls: The type to resolve, or its dotted import path.
+            kwargs: Additional keyword arguments to use for resolving the type.
+        """
+        instance = self._resolved.get(cls, _MISSING)
+        if instance is not _MISSING:
+            return instance
+        if self._disposed:
+            raise ResolutionError(f"Unable to resolve type {cls}, the scope is disposed")
+
+        context = self._builder._context(cls)
+        if not context:
+            raise ResolutionError(f"Unable to resolve type {cls}, no registration found")
+        if context.lifetime is Lifetime.SINGLETON:
+            return self._builder.resolve(cls, **kwargs)
+
+        instance = context.resolve(self, **kwargs)
+        if context.lifetime is Lifetime.SCOPED:
+            self._resolved[cls] = instance
+        return instance
+
+    def create_scope(self) -> "Scope":
+        """Create a nested scope that is disposed with this one."""
+        with self._lock:
+            if self._disposed:
+                raise ResolutionError("Unable to create a scope within a disposed scope")
+            child = Scope(self._builder, parent=self)
+            self._children[child] = None
+            return child
+
+    def dispose(self):
+        """Dispose the nested scopes and the scoped instances, and release them."""
+        with self._lock:
+            if self._disposed:
+                return
+            self._disposed = True
+            children, self._children = list(self._children), {}
+            instances = list(self._instances.values())
+            self._instances.clear()
+            self._resolved.clear()
+
+        for child in reversed(children):
+            child.dispose()
+        for instance in reversed(instances):
+            dispose = getattr(instance, "dispose", None)
+            if callable(dispose):
+                dispose()
+        if self._parent is not None:
+            self._parent._remove(self)
+
+    def _remove(self, child: "Scope"):
+        with self._lock:
+            self._children.pop(child, None)
+
+    def _singleton(self, context: Context, **kwargs) -> Any:
+        return context._instance(self._builder, **kwargs)
+
+    def _scoped(self, context: Context, **kwargs) -> Any:
+        instance = self._instances.get(context.typename, _MISSING)
+        if instance is _MISSING:
+            with self._lock:
+                instance = self._instances.get(context.typename, _MISSING)
+                if instance is _MISSING:
+                    if self._disposed:
+                        raise ResolutionError(f"Unable to resolve type {context.typename}, the scope is disposed")
+                    instance = self._instances[context.typename] = context._create(self, **kwargs)
+        return instance
+
+    def _plan(self, context: Context) -> ResolutionPlan:
+        return self._builder._plan(context)
+
+    def __enter__(self) -> "Scope":
+        return self
+
+    def __exit__(self, *args):
+        self.dispose()
@@ -0,0 +1,227 @@
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 1024
+DEFAULT_TRACE_LIMIT = 100_000
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass(frozen=True, slots=True)
+class SpanStats:
+    """A summary of the most recent durations of a span, in milliseconds."""
+
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class Histogram:
+    """A rolling window of the most recent samples of a duration.
+
+    Samples are kept in a fixed size ring buffer and only sorted when percentiles are requested, so adding a sample
+    is constant time.
+
+    Args:
+        window: The number of most recent samples kept.
+    """
+
+    __slots__ = ("_samples", "_window", "_next", "count")
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self._samples: list[float] = []
+        self._window = window
+        self._next = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, value: float):
+        if len(self._samples) < self._window:
+            self._samples.append(value)
+        else:
+            self._samples[self._next] = value
+            self._next = (self._next + 1) % self._window
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """The nearest-rank percentile q, from 0 to 100, of the samples in the window, 0 if there are none."""
+        return _rank(sorted(self._samples), q)
+
+    def stats(self) -> SpanStats:
+        ordered = sorted(self._samples)
+        return SpanStats(
+            count=self.count,
+            mean_ms=sum(ordered) / len(ordered) if ordered else 0.0,
+            p50_ms=_rank(ordered, 50),
+            p95_ms=_rank(ordered, 95),
+            p99_ms=_rank(ordered, 99),
+            max_ms=ordered[-1] if ordered else 0.0,
+        )
+
+
+def _rank(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class _Span:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        self._profiler.record(self._name, self._start, time.perf_counter_ns() - self._start)
+        return False
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Profiler:
+    """Collects the durations of named spans and the frame rate of the views.
+
+    Hot paths are wrapped in spans, such as `with profiler.span("scene.paint"):`. While the profiler is disabled, a
+    span is a shared no-op context manager, so instrumented code only pays for checking a flag. Once enabled, every
+    span adds its duration to a rolling histogram of its name and an event to a bounded trace, which can be exported
+    in the Chrome trace event format for chrome://tracing or Perfetto.
+
+    Args:
+        window: The number of most recent durations kept per span.
+        trace_limit: The number of most recent span events kept for trace exports.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, trace_limit: int = DEFAULT_TRACE_LIMIT):
+        self.enabled = False
+        self._window = window
+        self._histograms: dict[str, Histogram] = {}
+        self._trace: deque[tuple[str, int, int, int]] = deque(maxlen=trace_limit)
+        self._frames: deque[int] = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def span(self, name: str):
+        """A context manager that times its body as an event of the span with the given name."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """Decorate a function to time every call as a span, checked per call so the profiler can be toggled."""
+
+        def decorator(function: F) -> F:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter_ns() - start)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, name: str, start_ns: int, duration_ns: int):
+        """Add an event of a span that started at a time.perf_counter_ns() value and took a duration."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self._window)
+            histogram.add(duration_ns / 1e6)
+            self._trace.append((name, start_ns, duration_ns, threading.get_ident()))
+
+    def frame(self):
+        """Mark that a view presented a frame."""
+        if self.enabled:
+            self._frames.append(time.perf_counter_ns())
+
+    def fps(self, period: float = 1.0) -> float:
+        """The number of frames presented per second over the most recent period in seconds."""
+        since = time.perf_counter_ns() - int(period * 1e9)
+        return sum(1 for frame in self._frames if frame >= since) / period
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return sorted(self._histograms)
+
+    def stats(self, name: str) -> SpanStats | None:
+        """The summary of a span, or None if it has not been recorded."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            return histogram.stats() if histogram is not None else None
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """The summaries of all spans by name."""
+        with self._lock:
+            return {name: asdict(histogram.stats()) for name, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._trace.clear()
+            self._frames.clear()
+
+    def export_json(self, path: str | Path):
+        """Write the summaries of all spans and the current frame rate as JSON."""
+        document = {"fps": self.fps(), "spans": self.summary()}
+        Path(path).write_text(json.dumps(document, indent=2))
+        _logger.info(f"Exported {len(document['spans'])} span summaries to {path}")
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """The recorded events in the Chrome trace event format, with the span summaries as metadata."""
+        with self._lock:
+            events = list(self._trace)
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": "mosaic",
+                    "ph": "X",
+                    "ts": start / 1e3,
+                    "dur": duration / 1e3,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, tid in events
+            ],
+            "displayTimeUnit": "ms",
+            "otherData": {"spans": self.summary()},
+        }
+
+    def export_chrome_trace(self, path: str | Path):
+        """Write the recorded events as a Chrome trace, which chrome://tracing and Perfetto can open."""
+        trace = self.chrome_trace()
+        Path(path).write_text(json.dumps(trace))
+        _logger.info(f"Exported {len(trace['traceEvents'])} trace events to {path}")
+
+
+profiler = Profiler()
@@ -0,0 +1,231 @@
+import logging
+from collections.abc import Sequence
+
+import numpy as np
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+from mosaic.domain.render_cache import to_qimage
+from mosaic.domain.tileset import Tileset
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 4096
+
+# Columns of TextureAtlas.rects
+PAGE, X, Y, WIDTH, HEIGHT = range(5)
+
+
+class SkylinePacker:
+    """Packs rectangles into a fixed size bin using the bottom-left skyline heuristic.
+
+    The skyline is the outline of the top edges of the packed rectangles, stored as segments sorted by x. Each
+    rectangle is placed where its top edge ends up lowest, ties broken by the narrowest segment.
+
+    Args:
+        width: The width of the bin.
+        height: The height of the bin.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        # Segments of the skyline as [x, y, width]
+        self._skyline: list[list[int]] = [[0, 0, width]]
+        self._used = 0
+
+    @property
+    def used_height(self) -> int:
+        """The height up to the highest top edge of the skyline."""
+        return max(segment[1] for segment in self._skyline)
+
+    @property
+    def occupancy(self) -> float:
+        """The fraction of the bin covered by packed rectangles."""
+        return self._used / (self.width * self.height)
+
+    def insert(self, width: int, height: int) -> tuple[int, int] | None:
+        """Place a rectangle, returning its top left corner or None if it does not fit."""
+        best: tuple[int, int, int] | None = None
+        best_index = -1
+        for index in range(len(self._skyline)):
+            y = self._fit(index, width, height)
+            if y is None:
+                continue
+            score = (y + height, self._skyline[index][2], self._skyline[index][0])
+            if best is None or score < best:
+                best, best_index = score, index
+        if best is None:
+            return None
+
+        x, y = self._skyline[best_index][0], best[0] - height
+        self._place(best_index, x, y + height, width)
+        self._used += width * height
+        return x, y
+
+    def _fit(self, index: int, width: int, height: int) -> int | None:
+        """The lowest y at which a rectangle starting at a segment rests on the skyline, or None if it does not fit."""
+        x = self._skyline[index][0]
+        if x + width > self.width:
+            return None
+        y, remaining = 0, width
+        while remaining > 0:
+            if index >= len(self._skyline):
+                return None
+            _, top, segment_width = self._skyline[index]
+            y = max(y, top)
+            if y + height > self.height:
+                return None
+            remaining -= segment_width
+            index += 1
+        return y
+
+    def _place(self, index: int, x: int, top: int, width: int):
+        self._skyline.insert(index, [x, top, width])
+        # Shrink or drop the segments now covered by the new one
+        right = x + width
+        following = index + 1
+        while following < len(self._skyline) and self._skyline[following][0] < right:
+            segment = self._skyline[following]
+            overlap = right - segment[0]
+            if overlap >= segment[2]:
+                del self._skyline[following]
+            else:
+                segment[0] += overlap
+                segment[2] -= overlap
+                break
+        # Merge neighbours at the same height
+        merged = [self._skyline[0]]
+        for segment in self._skyline[1:]:
+            if segment[1] == merged[-1][1]:
+                merged[-1][2] += segment[2]
+            else:
+                merged.append(segment)
+        self._skyline = merged
+
+
+class TextureAtlas:
+    """Tile images packed into a few large pages, so a region of tiles is drawn from a single shared pixmap.
+
+    The source rect of every tile id is precomputed into a flat array, so looking up the rects of a whole region is
+    one vectorized gather. Each image is surrounded by a border of its repeated edge pixels, which keeps neighbouring
+    images from bleeding in when the atlas is sampled with smooth scaling.
+
+    Args:
+        pages: The atlas pages as RGBA (premultiplied) arrays of shape (height, width, 4).
+        rects: The source rect of each tile id as rows of (page, x, y, width, height), page -1 for no image.
+    """
+
+    def __init__(self, pages: list[np.ndarray], rects: np.ndarray):
+        self._pages = pages
+        self._rects = rects
+        self._pixmaps: list[QPixmap] | None = None
+
+    @classmethod
+    def pack(
+        cls, images: Sequence[np.ndarray | None], page_size: int = DEFAULT_PAGE_SIZE, padding: int = 1
+    ) -> "TextureAtlas":
+        """Pack images into as few pages as needed, largest first.
+
+        Args:
+            images: The RGBA image of each tile id, or None for ids without an image such as the empty tile.
+            page_size: The width and height of each page, for example the maximum texture size of the GPU.
+            padding: The width of the border of repeated edge pixels around each image.
+        """
+        rects = np.full((len(images), 5), -1, dtype=np.int32)
+        order = sorted(
+            (index for index, image in enumerate(images) if image is not None),
+            key=lambda index: (-images[index].shape[0], -images[index].shape[1]),
+        )
+
+        packers: list[SkylinePacker] = []
+        placements: list[tuple[int, int, int, int]] = []
+        for index in order:
+            height, width = images[index].shape[:2]
+            padded = (width + 2 * padding, height + 2 * padding)
+            if max(padded) > page_size:
+                raise ValueError(f"Image {index} of size {width}x{height} does not fit on a {page_size} page")
+            # Earlier pages may still have room for smaller images
+            for page, packer in enumerate(packers):
+                if (position := packer.insert(*padded)) is not None:
+                    break
+            else:
+                page = len(packers)
+                packers.append(SkylinePacker(page_size, page_size))
+                position = packers[page].insert(*padded)
+            rects[index] = (page, position[0] + padding, position[1] + padding, width, height)
+            placements.append((index, page, position[0], position[1]))
+
+        pages = [np.zeros((packer.used_height, page_size, 4), dtype=np.uint8) for packer in packers]
+        for index, page, x, y in placements:
+            image = images[index]
+            if padding:
+                image = np.pad(image, ((padding, padding), (padding, padding), (0, 0)), mode="edge")
+            pages[page][y : y + image.shape[0], x : x + image.shape[1]] = image
+
+        _logger.debug(f"Packed {len(order)} images into {len(pages)} atlas pages")
+        return cls(pages, rects)
+
+    @classmethod
+    def from_tileset(cls, tileset: Tileset, page_size: int = DEFAULT_PAGE_SIZE, padding: int = 1) -> "TextureAtlas":
+        """Pack the full resolution tiles of a tileset, the empty tile has no image."""
+        tiles = tileset.tiles()
+        return cls.pack([None] + [tiles[index] for index in range(1, len(tiles))], page_size, padding)
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    @property
+    def rects(self) -> np.ndarray:
+        return self._rects
+
+    @property
+    def pages(self) -> list[np.ndarray]:
+        return self._pages
+
+    @property
+    def nbytes(self) -> int:
+        return sum(page.nbytes for page in self._pages) + self._rects.nbytes
+
+    def source_rects(self, ids: np.ndarray) -> np.ndarray:
+        """The (page, x, y, width, height) rows of an array of tile ids, unknown ids have page -1."""
+        ids = np.asarray(ids)
+        return self._rects[np.where(ids < len(self._rects), ids, 0)]
+
+    def images(self) -> list[QImage]:
+        return [to_qimage(page) for page in self._pages]
+
+    def pixmaps(self) -> list[QPixmap]:
+        """The pages as pixmaps, converted on first use, which has to be on the GUI thread."""
+        if self._pixmaps is None:
+            self._pixmaps = [QPixmap.fromImage(image) for image in self.images()]
+        return self._pixmaps
+
+    def draw(self, painter: QPainter, ids: np.ndarray, left: float, top: float, cell_size: float):
+        """Draw a region of tile ids, one page at a time so that the painter keeps using the same texture.
+
+        Args:
+            painter: The painter to draw with.
+            ids: The tile ids of the region, indexed [row, column].
+            left: The left edge of the region in painter coordinates.
+            top: The top edge of the region in painter coordinates.
+            cell_size: The size of a cell in painter coordinates.
+        """
+        rects = self.source_rects(ids)
+        rows, cols = np.nonzero(rects[..., PAGE] >= 0)
+        if not len(rows):
+            return
+
+        # Sort the cells by page, the pixmap only changes between the runs of cells of the same page
+        order = np.argsort(rects[rows, cols, PAGE], kind="stable")
+        rows, cols = rows[order], cols[order]
+        sources = rects[rows, cols].tolist()
+        xs = (left + cols * cell_size).tolist()
+        ys = (top + rows * cell_size).tolist()
+
+        pixmaps = self.pixmaps()
+        pixmap, current = None, -1
+        for (page, x, y, width, height), target_x, target_y in zip(sources, xs, ys):
+            if page != current:
+                pixmap, current = pixmaps[page], page
+            painter.drawPixmap(QRectF(target_x, target_y, cell_size, cell_size), pixmap, QRectF(x, y, width, height))
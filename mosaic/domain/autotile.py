@@ -0,0 +1,218 @@
+import logging
+from collections.abc import Sequence
+
+import numpy as np
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.tilemap import EMPTY, TILE_ID_DTYPE, ChunkedTileModel, DirtyRegion
+
+_logger = logging.getLogger(__name__)
+
+# The bit of each neighbour in the mask of a cell, as (dx, dy) offsets in row-major order
+NEIGHBOURS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+NORTH_WEST, NORTH, NORTH_EAST, WEST, EAST, SOUTH_WEST, SOUTH, SOUTH_EAST = (1 << bit for bit in range(8))
+
+# Marks cells outside of the map in an array of terrain indices
+OUTSIDE = -1
+
+
+def reduce_corners(masks: np.ndarray) -> np.ndarray:
+    """Clear the corner bits of masks whose two adjacent edges are not both set, as a corner is only visible then."""
+    masks = np.asarray(masks, dtype=np.uint8)
+    corners = (
+        (NORTH_WEST, NORTH | WEST),
+        (NORTH_EAST, NORTH | EAST),
+        (SOUTH_WEST, SOUTH | WEST),
+        (SOUTH_EAST, SOUTH | EAST),
+    )
+    for corner, edges in corners:
+        masks = np.where(masks & edges == edges, masks, masks & ~np.uint8(corner))
+    return masks
+
+
+# The 47 distinct masks after reduce_corners, in ascending order, one per tile of a blob terrain
+BLOB_MASKS = np.unique(reduce_corners(np.arange(256))).tolist()
+
+
+def neighbour_masks(terrain: np.ndarray, connect_edges: bool = True) -> np.ndarray:
+    """The neighbour mask of every cell, the bits of the neighbours of the same terrain.
+
+    The mask is built from eight shifted views of the terrain array, one vectorized comparison per neighbour.
+
+    Args:
+        terrain: The terrain index of each cell, with a border of one cell around those to compute the masks of.
+            Cells outside of the map are marked with OUTSIDE.
+        connect_edges: Whether cells outside of the map count as the same terrain, so terrain runs off the edges.
+
+    Returns:
+        The masks of the cells inside the border, of shape (height - 2, width - 2).
+    """
+    height, width = terrain.shape[0] - 2, terrain.shape[1] - 2
+    center = terrain[1:-1, 1:-1]
+    masks = np.zeros((height, width), dtype=np.uint8)
+    for bit, (dx, dy) in enumerate(NEIGHBOURS):
+        neighbour = terrain[1 + dy : 1 + dy + height, 1 + dx : 1 + dx + width]
+        same = neighbour == center
+        if connect_edges:
+            same |= neighbour == OUTSIDE
+        masks |= same.view(np.uint8) << bit
+    return masks
+
+
+class Terrain:
+    """A terrain drawn with a tile variant for each combination of neighbours of the same terrain.
+
+    Every tile of the terrain marks a cell as belonging to it, whichever variant it currently shows.
+
+    Args:
+        variants: The tile of each of the 256 neighbour masks, see NEIGHBOURS for the bits.
+    """
+
+    def __init__(self, variants: Sequence[int] | np.ndarray):
+        variants = np.asarray(variants, dtype=TILE_ID_DTYPE)
+        if variants.shape != (256,):
+            raise ValueError(f"Expected a tile for each of the 256 neighbour masks, got {variants.shape}")
+        if (variants == EMPTY).any():
+            raise ValueError("A terrain cannot use the empty tile")
+        self.variants = variants
+
+    @classmethod
+    def blob(cls, tiles: Sequence[int]) -> "Terrain":
+        """A terrain of 47 tiles, one per mask of BLOB_MASKS in order, with corners that follow reduce_corners."""
+        if len(tiles) != len(BLOB_MASKS):
+            raise ValueError(f"A blob terrain needs {len(BLOB_MASKS)} tiles, got {len(tiles)}")
+        table = np.zeros(256, dtype=TILE_ID_DTYPE)
+        table[BLOB_MASKS] = tiles
+        return cls(table[reduce_corners(np.arange(256))])
+
+    @classmethod
+    def edges(cls, tiles: Sequence[int]) -> "Terrain":
+        """A terrain of 16 tiles that only follows the edge neighbours, indexed by north | east | south | west.
+
+        The bits are 1 for north, 2 for east, 4 for south and 8 for west, as in the edge sets of Wang tiles.
+        """
+        if len(tiles) != 16:
+            raise ValueError(f"An edge terrain needs 16 tiles, got {len(tiles)}")
+        masks = np.arange(256)
+        index = np.zeros(256, dtype=np.intp)
+        for bit, edge in enumerate((NORTH, EAST, SOUTH, WEST)):
+            index |= (masks & edge != 0) << bit
+        return cls(np.asarray(tiles, dtype=TILE_ID_DTYPE)[index])
+
+    @property
+    def tile_ids(self) -> list[int]:
+        return np.unique(self.variants).tolist()
+
+
+class AutoTiler:
+    """Picks the variant of every terrain cell from which of its eight neighbours belong to the same terrain.
+
+    A cell belongs to the terrain of its tile, and its variant is looked up in a table of its terrain by the mask of
+    its neighbours. A full pass computes the masks chunk by chunk with shifted views of the terrain indices, and
+    after an edit only the cells around the change are computed again: those within one cell of the changed box of
+    each chunk, which is where the masks can have changed. Only cells whose variant changes are written.
+
+    Args:
+        terrains: The terrains, which must not share tiles.
+        connect_edges: Whether terrain runs off the edges of the map, rather than ending in a border there.
+    """
+
+    def __init__(self, terrains: Sequence[Terrain], connect_edges: bool = True):
+        self._connect_edges = connect_edges
+        highest = max((max(terrain.tile_ids) for terrain in terrains), default=EMPTY)
+        self._terrain_of = np.zeros(highest + 1, dtype=np.int16)
+        for index, terrain in enumerate(terrains, start=1):
+            ids = terrain.tile_ids
+            if self._terrain_of[ids].any():
+                raise ValueError(f"Terrain {index - 1} shares tiles with another terrain")
+            self._terrain_of[ids] = index
+        # Row 0 stands for cells outside of any terrain, which are never written
+        self._variants = np.zeros((len(terrains) + 1, 256), dtype=TILE_ID_DTYPE)
+        for index, terrain in enumerate(terrains, start=1):
+            self._variants[index] = terrain.variants
+        self._attached: dict[ChunkedTileModel, object] = {}
+        self._updating: set[ChunkedTileModel] = set()
+
+    def terrain_of(self, ids: np.ndarray) -> np.ndarray:
+        """The terrain index of each tile id, 1 for the first terrain, and 0 for tiles of no terrain."""
+        ids = np.asarray(ids)
+        last = len(self._terrain_of) - 1
+        return np.where(ids <= last, self._terrain_of[np.minimum(ids, last)], 0).astype(np.int16)
+
+    def apply(self, model: ChunkedTileModel) -> int:
+        """Compute the variant of every terrain cell of a model, one chunk at a time.
+
+        Returns:
+            The number of cells whose tile changed.
+        """
+        size = model.chunk_size
+        changed = 0
+        with profiler.span("autotile.apply"), model.batch():
+            for cx, cy in model.chunk_keys():
+                changed += self._retile(model, cx * size, cy * size, (cx + 1) * size, (cy + 1) * size)
+        _logger.debug(f"Auto-tiled {changed} cells")
+        return changed
+
+    def update(self, model: ChunkedTileModel, region: DirtyRegion) -> int:
+        """Compute the variants of the cells around a change again.
+
+        Returns:
+            The number of cells whose tile changed.
+        """
+        changed = 0
+        with profiler.span("autotile.update"), model.batch():
+            for _, (x0, y0, x1, y1) in region.boxes():
+                changed += self._retile(model, x0 - 1, y0 - 1, x1 + 1, y1 + 1)
+        return changed
+
+    def attach(self, model: ChunkedTileModel):
+        """Keep a model auto-tiled, updating the cells around every change.
+
+        The variants are written while listeners are notified of the change, so they are part of the same undoable
+        edit when the change is made inside UndoStack.edit.
+        """
+        if model in self._attached:
+            return
+
+        def on_changed(region: DirtyRegion):
+            # The variants written by the update notify again, which needs no update of its own
+            if model in self._updating:
+                return
+            self._updating.add(model)
+            try:
+                self.update(model, region)
+            finally:
+                self._updating.discard(model)
+
+        self._attached[model] = on_changed
+        model.subscribe(on_changed)
+
+    def detach(self, model: ChunkedTileModel):
+        if (listener := self._attached.pop(model, None)) is not None:
+            model.unsubscribe(listener)
+
+    def _retile(self, model: ChunkedTileModel, x0: int, y0: int, x1: int, y1: int) -> int:
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, model.width), min(y1, model.height)
+        if x1 <= x0 or y1 <= y0:
+            return 0
+
+        # A border of one cell around the box, as the masks of its cells depend on their neighbours
+        ids, flags = model.read_region(x0 - 1, y0 - 1, x1 - x0 + 2, y1 - y0 + 2)
+        terrain = self.terrain_of(ids)
+        if x0 == 0:
+            terrain[:, 0] = OUTSIDE
+        if y0 == 0:
+            terrain[0] = OUTSIDE
+        if x1 == model.width:
+            terrain[:, -1] = OUTSIDE
+        if y1 == model.height:
+            terrain[-1] = OUTSIDE
+
+        center = terrain[1:-1, 1:-1]
+        current = ids[1:-1, 1:-1]
+        variants = self._variants[center, neighbour_masks(terrain, self._connect_edges)]
+        changed = (center > 0) & (variants != current)
+        ys, xs = np.nonzero(changed)
+        if len(xs):
+            model.insert_many(xs + x0, ys + y0, variants[ys, xs], flags[1:-1, 1:-1][ys, xs])
+        return len(xs)
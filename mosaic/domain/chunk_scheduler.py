@@ -0,0 +1,212 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QImage
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.render_cache import ChunkRenderCache, to_qimage
+from mosaic.domain.tilemap import Chunk, ChunkedTileModel, ChunkKey, DirtyRegion
+from mosaic.domain.tileset import Tileset
+
+_logger = logging.getLogger(__name__)
+
+JobKey = tuple[ChunkKey, int]
+
+
+@dataclass(frozen=True, slots=True)
+class ChunkResult:
+    """The outcome of a background job, delivered back on the GUI thread."""
+
+    job: "ChunkJob"
+    image: QImage | None
+    chunk: Chunk | None = None
+
+
+class _JobSignals(QObject):
+    finished = Signal(object)
+
+
+class ChunkJob(QRunnable):
+    """Decodes a chunk if needed and rasterizes it at a level of detail, on a worker thread.
+
+    Args:
+        key: The key of the chunk.
+        level: The level of detail to rasterize at.
+        version: The version of the chunk the job was created for, used to discard outdated results.
+        ids: A copy of the tile ids of a loaded chunk, or None to decode the chunk from the model's source.
+        model: The model the chunk belongs to.
+        tileset: The tileset used to rasterize the chunk.
+        signals: The object that delivers the result back to the scheduler.
+    """
+
+    def __init__(
+        self,
+        key: ChunkKey,
+        level: int,
+        version: int,
+        ids: np.ndarray | None,
+        model: ChunkedTileModel,
+        tileset: Tileset,
+        signals: _JobSignals,
+    ):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.key = key
+        self.level = level
+        self.version = version
+        self._ids = ids
+        self._model = model
+        self._tileset = tileset
+        self._signals = signals
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        chunk, image = None, None
+        try:
+            if not self.cancelled:
+                chunk, image = self._prepare()
+        except Exception:
+            _logger.exception(f"Failed to prepare chunk {self.key} at level {self.level}")
+
+        self._signals.finished.emit(ChunkResult(self, image, chunk))
+
+    def _prepare(self) -> tuple[Chunk | None, QImage | None]:
+        chunk, ids = None, self._ids
+        if ids is None:
+            chunk = self._model.source.load_chunk(self.key)
+            ids = chunk.ids
+        if self.cancelled:
+            return chunk, None
+        with profiler.span("chunk.rasterize"):
+            return chunk, to_qimage(self._tileset.compose(ids, self.level))
+
+
+def by_distance(keys: list[ChunkKey], center: tuple[float, float]) -> list[tuple[int, ChunkKey]]:
+    """Pair chunk keys with a priority that is higher the closer the chunk is to the center, closest first."""
+    cx, cy = center
+    distances = [(math.hypot(key[0] + 0.5 - cx, key[1] + 0.5 - cy), key) for key in keys]
+    distances.sort()
+    return [(-int(distance * 16), key) for distance, key in distances]
+
+
+class ChunkScheduler(QObject):
+    """Loads and rasterizes chunks on a thread pool and hands the images back to the GUI thread.
+
+    Requests are prioritized by their distance to the center of the viewport. Each new request replaces the previous
+    one, so jobs for chunks that are no longer wanted are taken off the queue or, if already running, have their
+    result discarded. Finished images are stored in the render cache and announced through the rendered signal, which
+    is delivered as a queued signal on the GUI thread.
+
+    Args:
+        model: The model to load and rasterize chunks of.
+        tileset: The tileset used to rasterize chunks.
+        cache: The cache that receives the rasterized images.
+        max_threads: The maximum number of worker threads, defaults to one less than the number of cores.
+    """
+
+    rendered = Signal(tuple, int)
+
+    def __init__(
+        self,
+        model: ChunkedTileModel,
+        tileset: Tileset,
+        cache: ChunkRenderCache,
+        max_threads: int | None = None,
+        parent: QObject | None = None,
+    ):
+        super().__init__(parent)
+        self._model = model
+        self._tileset = tileset
+        self._cache = cache
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads or max(QThreadPool.globalInstance().maxThreadCount() - 1, 1))
+        self._signals = _JobSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        self._pending: dict[JobKey, ChunkJob] = {}
+        # Started jobs are referenced until their result arrives, even when cancelled while running
+        self._running: set[ChunkJob] = set()
+        self._versions: dict[ChunkKey, int] = {}
+
+        model.subscribe(self._on_model_changed)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def is_pending(self, key: ChunkKey, level: int) -> bool:
+        return (key, level) in self._pending
+
+    def request(self, keys: list[ChunkKey], level: int, center: tuple[float, float]):
+        """Request the images of chunks at a level of detail, replacing any previous request.
+
+        Args:
+            keys: The chunks that are wanted, cached chunks are skipped.
+            level: The level of detail the chunks are displayed at.
+            center: The center of the viewport in chunk coordinates.
+        """
+        wanted = {(key, level) for key in keys}
+        for job_key in [job_key for job_key in self._pending if job_key not in wanted]:
+            self._cancel(job_key)
+
+        for priority, key in by_distance(keys, center):
+            if (key, level) in self._pending or (key, level) in self._cache:
+                continue
+
+            ids = None
+            if self._model.is_loaded(key):
+                chunk = self._model.chunk(key)
+                if chunk is None:
+                    continue
+                ids = chunk.ids.copy()
+
+            job = ChunkJob(key, level, self._versions.get(key, 0), ids, self._model, self._tileset, self._signals)
+            self._pending[(key, level)] = job
+            self._running.add(job)
+            self._pool.start(job, priority)
+
+    def cancel_all(self):
+        for job_key in list(self._pending):
+            self._cancel(job_key)
+
+    def wait_for_done(self, timeout_ms: int = -1) -> bool:
+        """Block until all started jobs have finished, results are still delivered through the event loop."""
+        return self._pool.waitForDone(timeout_ms)
+
+    def _cancel(self, job_key: JobKey):
+        job = self._pending.pop(job_key)
+        if self._pool.tryTake(job):
+            self._running.discard(job)
+        else:
+            job.cancel()
+
+    def _on_model_changed(self, region: DirtyRegion):
+        for key in region.chunks():
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _on_finished(self, result: ChunkResult):
+        job = result.job
+        self._running.discard(job)
+        if self._pending.get((job.key, job.level)) is job:
+            del self._pending[(job.key, job.level)]
+
+        # A decoded chunk is still valid if the job was cancelled, the model ignores it if it was loaded meanwhile
+        if result.chunk is not None:
+            self._model.install_chunk(job.key, result.chunk)
+
+        # Results of cancelled jobs or of chunks edited while the job ran are outdated
+        if job.cancelled or result.image is None or job.version != self._versions.get(job.key, 0):
+            return
+
+        self._cache.put(job.key, job.level, result.image)
+        self.rendered.emit(job.key, job.level)
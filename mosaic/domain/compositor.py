@@ -0,0 +1,93 @@
+import logging
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage, QPainter
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.layers import Layer, LayerStack
+from mosaic.domain.render_cache import ChunkRenderCache, to_qimage
+from mosaic.domain.tilemap import Chunk, ChunkKey, DirtyRegion
+from mosaic.domain.tileset import Tileset
+
+_logger = logging.getLogger(__name__)
+
+
+class ChunkCompositor:
+    """Flattens the drawn layers of a layer stack into a single cached image per chunk and level of detail.
+
+    Each layer keeps its rasterized chunks in its own render cache and the flattened chunks are kept in another. An
+    edit marks only the edited chunks of its layer dirty, so flattening them again rasterizes just that layer and
+    blends in the cached images of the others. Showing, hiding, fading or moving a layer flattens the chunks it has
+    tiles in again without rasterizing any layer. Layers that are not drawn are skipped, and painting only draws
+    flattened images, so a frame costs the same however many hidden or unchanged layers there are.
+
+    Args:
+        stack: The layers to flatten.
+        tileset: The tileset used to rasterize every layer.
+        cache: The cache for flattened chunks, defaults to a cache with the default budget.
+    """
+
+    def __init__(self, stack: LayerStack, tileset: Tileset, cache: ChunkRenderCache | None = None):
+        self._stack = stack
+        self._tileset = tileset
+        self._cache = cache or ChunkRenderCache()
+        stack.subscribe(self._on_layer_edited)
+        stack.subscribe_display(self._on_display_changed)
+
+    @property
+    def stack(self) -> LayerStack:
+        return self._stack
+
+    @property
+    def cache(self) -> ChunkRenderCache:
+        return self._cache
+
+    def layer_image(self, layer: Layer, key: ChunkKey, chunk: Chunk, level: int) -> QImage:
+        """The image of the chunk of one layer, rasterized only if it is not in the cache of the layer."""
+        image = layer.cache.get(key, level)
+        if image is None:
+            with profiler.span("chunk.rasterize"):
+                image = to_qimage(self._tileset.compose(chunk.ids, level))
+            layer.cache.put(key, level, image)
+        return image
+
+    def image(self, key: ChunkKey, level: int) -> QImage | None:
+        """The flattened image of a chunk, or None if no drawn layer has tiles in it."""
+        image = self._cache.get(key, level)
+        if image is None:
+            with profiler.span("chunk.flatten"):
+                image = self._flatten(key, level)
+            if image is not None:
+                self._cache.put(key, level, image)
+        return image
+
+    def _flatten(self, key: ChunkKey, level: int) -> QImage | None:
+        parts = [
+            (layer, chunk) for layer in self._stack.drawn_layers() if (chunk := layer.model.chunk(key)) is not None
+        ]
+        if not parts:
+            return None
+        images = [(layer.opacity, self.layer_image(layer, key, chunk, level)) for layer, chunk in parts]
+        if len(images) == 1 and images[0][0] == 1.0:
+            # A single opaque layer is used as is, the flattened entry shares the pixels of the layer image
+            return images[0][1]
+
+        image = QImage(images[0][1].size(), QImage.Format_RGBA8888_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        for opacity, layer_image in images:
+            painter.setOpacity(opacity)
+            painter.drawImage(0, 0, layer_image)
+        painter.end()
+        return image
+
+    def _on_layer_edited(self, layer: Layer, region: DirtyRegion):
+        chunks = region.chunks()
+        layer.cache.mark_dirty(chunks)
+        if layer.drawn:
+            self._cache.mark_dirty(chunks)
+
+    def _on_display_changed(self, layer: Layer):
+        keys = layer.model.chunk_keys()
+        _logger.debug(f"Flattening {len(keys)} chunks of {layer} again")
+        self._cache.mark_dirty(keys)
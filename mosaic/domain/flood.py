@@ -0,0 +1,406 @@
+from collections.abc import Iterator
+
+import numpy as np
+
+from mosaic.domain.spatial_index import CellRuns
+from mosaic.domain.tilemap import EMPTY, ChunkedTileModel, ChunkKey, GridCoordinate
+
+
+def run_edges(runs: CellRuns, diagonal: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """The pairs of runs in adjacent rows that touch each other.
+
+    Args:
+        runs: The runs to connect.
+        diagonal: Whether runs that only touch at a corner are connected (8-connectivity) or not (4-connectivity).
+
+    Returns:
+        The indices of the upper and of the lower run of every connected pair.
+    """
+    if not runs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # Key every position by row so a single sorted search finds the overlapping runs of the next row
+    reach = 1 if diagonal else 0
+    origin = min(int(runs.starts.min()), 0) - 1
+    span = int(runs.ends.max()) - origin + 2
+    start_keys = (runs.rows - runs.rows[0]) * span + runs.starts - origin
+    end_keys = (runs.rows - runs.rows[0]) * span + runs.ends - origin
+
+    below = (runs.rows - runs.rows[0] + 1) * span
+    first = np.searchsorted(end_keys, below + runs.starts - origin - reach, side="right")
+    last = np.searchsorted(start_keys, below + runs.ends - origin + reach, side="left")
+
+    counts = np.maximum(last - first, 0)
+    upper = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return upper, np.repeat(first, counts) + offsets
+
+
+def label_runs(runs: CellRuns, diagonal: bool = False) -> np.ndarray:
+    """Label runs by connected component, every run gets the smallest index of the runs in its component."""
+    upper, lower = run_edges(runs, diagonal)
+    return _union(runs.run_count, upper, lower)
+
+
+def _union(count: int, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """Label the runs linked by pairs of run indices, every run gets the smallest index of the runs in its component."""
+    labels = np.arange(count)
+    if not len(upper):
+        return labels
+
+    # Hook every run onto the smallest label among its neighbours, then compress the label chains
+    while True:
+        previous = labels
+        labels = labels.copy()
+        np.minimum.at(labels, upper, labels[lower])
+        np.minimum.at(labels, lower, labels[upper])
+        np.minimum.at(labels, labels[upper], labels[lower])
+        np.minimum.at(labels, labels[lower], labels[upper])
+        while not np.array_equal(labels, compressed := labels[labels]):
+            labels = compressed
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def connected_runs(mask: np.ndarray, x: int, y: int, diagonal: bool = False) -> CellRuns:
+    """The cells of a boolean mask that are connected to the cell (x, y), as runs in mask coordinates.
+
+    The mask is split into horizontal runs, runs that touch in adjacent rows are linked and labelled in a few
+    vectorized passes, so the cost scales with the number of runs rather than the number of cells.
+
+    Args:
+        mask: The cells that may be filled, indexed [row, column].
+        x: The column of the seed cell.
+        y: The row of the seed cell.
+        diagonal: Whether cells that only touch at a corner are connected.
+    """
+    height, width = mask.shape
+    if not (0 <= x < width and 0 <= y < height) or not mask[y, x]:
+        return CellRuns()
+
+    runs = CellRuns.from_mask(mask)
+    keep = _seed_component(runs, x, y, diagonal)
+    return CellRuns(runs.rows[keep], runs.starts[keep], runs.ends[keep])
+
+
+def connected_mask(mask: np.ndarray, x: int, y: int, diagonal: bool = False) -> tuple[np.ndarray, int, int]:
+    """The cells of a boolean mask that are connected to the cell (x, y), as a mask of their bounding box.
+
+    Like connected_runs, but returns a dense mask, which is the input mask itself when all of its cells are connected.
+
+    Returns:
+        The mask of the connected cells and the column and row of its first cell in mask coordinates.
+    """
+    height, width = mask.shape
+    if not (0 <= x < width and 0 <= y < height) or not mask[y, x]:
+        return np.zeros((0, 0), dtype=bool), 0, 0
+
+    runs = CellRuns.from_mask(mask)
+    keep = _seed_component(runs, x, y, diagonal)
+    if keep.all():
+        return mask, 0, 0
+
+    component = CellRuns(runs.rows[keep], runs.starts[keep], runs.ends[keep])
+    x0, y0, x1, y1 = component.bounds()
+    return component.to_mask(x0, y0, x1, y1), x0, y0
+
+
+def _seed_component(runs: CellRuns, x: int, y: int, diagonal: bool) -> np.ndarray:
+    """Which runs are in the same component as the run holding the cell (x, y)."""
+    labels = label_runs(runs, diagonal)
+    row_first = np.searchsorted(runs.rows, y)
+    seed = row_first + np.searchsorted(runs.starts[row_first : np.searchsorted(runs.rows, y + 1)], x, side="right") - 1
+    return labels == labels[seed]
+
+
+def connected_chunks(model: ChunkedTileModel, x: int, y: int, diagonal: bool = False) -> dict[ChunkKey, np.ndarray]:
+    """The cells connected to the cell (x, y) that hold the same tile, as a boolean mask per chunk.
+
+    The area is grown chunk by chunk from the chunk of the seed. In each chunk it reaches, the matching cells that
+    connect to the cells it was entered from are labelled like in connected_runs, and the cells added on the border of
+    the chunk enter its neighbours. Chunks whose cells all match are taken whole without labelling, so the cost scales
+    with the chunks the area reaches rather than with the size of the map.
+
+    An area that has to label more than BATCH_CHUNKS chunks, such as one broken up by scattered cells, is labelled
+    again in one vectorized pass over every chunk holding the tile that it may reach, see _ChunkFlood.grow_batched.
+
+    Args:
+        model: The model to compare tiles of.
+        x: The column of the seed cell.
+        y: The row of the seed cell.
+        diagonal: Whether cells that only touch at a corner are connected.
+
+    Returns:
+        The masks of the chunks holding connected cells, indexed [row, column], by chunk key. The masks of chunks
+        taken whole are shared and read-only.
+    """
+    if not model.contains(x, y):
+        return {}
+
+    tile = model.tile_at(GridCoordinate(x, y))
+    flood = _ChunkFlood(model, tile.tile_id if tile is not None else EMPTY, diagonal)
+    size = model.chunk_size
+    key, cell = (x // size, y // size), (y % size, x % size)
+    if not flood.grow(key, (cell, np.True_)):
+        flood.grow_batched(key, cell)
+    return flood.filled
+
+
+# The number of chunks an area labels one by one before all the chunks it may reach are labelled at once instead.
+# Areas that only cross a few borders, such as a wall running across 64 chunks, stay chunk by chunk
+BATCH_CHUNKS = 64
+
+
+# The cells of a chunk an area enters it at, as an index of the chunk and the mask or flag of the indexed cells
+Seeds = tuple[tuple, np.ndarray | np.bool_]
+
+
+class _ChunkFlood:
+    """The state of connected_chunks, with the matching cells and their labels cached per chunk."""
+
+    def __init__(self, model: ChunkedTileModel, tile_id: int, diagonal: bool):
+        self._model = model
+        self._tile_id = tile_id
+        self._diagonal = diagonal
+        size = model.chunk_size
+        self._columns, self._rows = model.chunk_columns, model.chunk_rows
+        self._full = np.ones((size, size), dtype=bool)
+        self._full.flags.writeable = False
+        self._matches: dict[ChunkKey, np.ndarray | None] = {}
+        self._whole: set[ChunkKey] = set()
+        self._labels: dict[ChunkKey, tuple[np.ndarray, int]] = {}
+        self.filled: dict[ChunkKey, np.ndarray] = {}
+
+    def grow(self, key: ChunkKey, seeds: Seeds) -> bool:
+        """Fill the area chunk by chunk, returns False if it stopped after labelling more than BATCH_CHUNKS chunks."""
+        # The seeds of the chunks still to visit, as the borders they are entered at, merged over all their sides
+        pending = {key: [seeds]}
+        while pending:
+            if len(self._labels) > BATCH_CHUNKS:
+                return False
+            key, entries = pending.popitem()
+            if (added := self._fill(key, entries)) is None:
+                continue
+            for neighbour, target, edge in self._edges(key, added):
+                if (neighbour_entries := pending.get(neighbour)) is None:
+                    pending[neighbour] = [(target, edge)]
+                else:
+                    neighbour_entries.append((target, edge))
+        return True
+
+    def grow_batched(self, key: ChunkKey, cell: tuple[int, int]):
+        """Fill the area from a cell of a chunk, indexed [row, column], by labelling the chunks it may reach at once.
+
+        The chunks holding the tile that connect to the chunk of the cell are stacked into a single mask. Its runs
+        are linked within each chunk like in label_runs, and across the border of every pair of neighbouring chunks
+        by comparing the cells on either side of it for all pairs at once. A single union of those links labels the
+        whole area, replacing what grow filled before.
+        """
+        size = self._model.chunk_size
+        keys = self._reachable(key)
+        stack = np.empty((len(keys), size, size), dtype=bool)
+        for slot, reached in enumerate(keys):
+            stack[slot] = self._match(reached)
+
+        runs = CellRuns.from_mask(stack.reshape(-1, size))
+        upper, lower = run_edges(runs, self._diagonal)
+        # The last row of a chunk is followed by the first row of the next chunk of the stack, which it does not touch
+        within = runs.rows[upper] % size != size - 1
+        links = [(upper[within], lower[within]), *self._border_links(keys, stack, runs)]
+        labels = _union(runs.run_count, np.concatenate([a for a, _ in links]), np.concatenate([b for _, b in links]))
+
+        slot = keys.index(key)
+        seed = _run_at(runs, size, np.array([slot]), np.array([cell[0]]), np.array([cell[1]]))[0]
+        keep = labels == labels[seed]
+        component = CellRuns(runs.rows[keep], runs.starts[keep], runs.ends[keep])
+        masks = component.to_mask(0, 0, size, len(keys) * size).reshape(len(keys), size, size)
+        self.filled = {keys[slot]: masks[slot] for slot in np.unique(component.rows // size).tolist()}
+
+    def _reachable(self, key: ChunkKey) -> list[ChunkKey]:
+        """The chunks holding the tile that connect to a chunk through chunks holding the tile, that chunk first."""
+        offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if self._diagonal:
+            offsets += [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+        reached, pending = [key], [key]
+        seen = {key}
+        while pending:
+            cx, cy = pending.pop()
+            for dx, dy in offsets:
+                neighbour = (cx + dx, cy + dy)
+                if neighbour in seen or not (0 <= neighbour[0] < self._columns and 0 <= neighbour[1] < self._rows):
+                    continue
+                seen.add(neighbour)
+                if self._match(neighbour) is not None:
+                    reached.append(neighbour)
+                    pending.append(neighbour)
+        return reached
+
+    def _border_links(
+        self, keys: list[ChunkKey], stack: np.ndarray, runs: CellRuns
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """The pairs of runs of stacked chunks that touch across the border of neighbouring chunks."""
+        size = self._model.chunk_size
+        last = size - 1
+        along = np.arange(size)
+        slots = {key: slot for slot, key in enumerate(keys)}
+        # The offset of a neighbour, the row and column of the cells of a chunk on the border facing it, and those of
+        # the cells of the neighbour on the border facing back, in the same order along the border
+        borders = [((1, 0), (along, last), (along, 0)), ((0, 1), (last, along), (0, along))]
+        if self._diagonal:
+            borders += [((1, 1), (last, last), (0, 0)), ((-1, 1), (last, 0), (0, last))]
+        # Cells along a border also touch the cells next to the facing cell across it when corners connect
+        shifts = (-1, 0, 1) if self._diagonal else (0,)
+
+        for (dx, dy), (rows, columns), (facing_rows, facing_columns) in borders:
+            pairs = [(slot, slots.get((cx + dx, cy + dy))) for slot, (cx, cy) in enumerate(keys)]
+            pairs = np.array([pair for pair in pairs if pair[1] is not None], dtype=np.int64).reshape(-1, 2)
+            if not len(pairs):
+                continue
+            rows, columns = np.broadcast_arrays(np.atleast_1d(rows), np.atleast_1d(columns))
+            facing_rows, facing_columns = np.broadcast_arrays(np.atleast_1d(facing_rows), np.atleast_1d(facing_columns))
+            for shift in shifts if len(rows) > 1 else (0,):
+                cells = np.arange(max(0, -shift), len(rows) - max(0, shift))
+                touching = (
+                    stack[pairs[:, :1], rows[cells], columns[cells]]
+                    & stack[pairs[:, 1:], facing_rows[cells + shift], facing_columns[cells + shift]]
+                )
+                pair, cell = np.nonzero(touching)
+                cell = cells[cell]
+                yield (
+                    _run_at(runs, size, pairs[pair, 0], rows[cell], columns[cell]),
+                    _run_at(runs, size, pairs[pair, 1], facing_rows[cell + shift], facing_columns[cell + shift]),
+                )
+
+    def _fill(self, key: ChunkKey, entries: list[Seeds]) -> np.ndarray | None:
+        """Fill the cells of a chunk connected to the seeds, returning the added cells or None if there are none."""
+        match = self._match(key)
+        if match is None:
+            return None
+
+        if key in self._whole:
+            # Every cell of a chunk within the map matches, so any seed enters it
+            if key in self.filled or (match is not self._full and not (self._seeds(entries) & match).any()):
+                return None
+            self.filled[key] = match
+            return match
+
+        filled = self.filled.get(key)
+        seeds = self._seeds(entries) & match
+        if filled is not None:
+            seeds &= ~filled
+        if not seeds.any():
+            return None
+
+        labels, count = self._label(key, match)
+        # The components holding a seed, looked up for every cell at once
+        entered = np.zeros(count + 1, dtype=bool)
+        entered[labels[seeds]] = True
+        component = entered[labels]
+        if filled is None:
+            self.filled[key] = component
+            return component
+        self.filled[key] = filled | component
+        return component & ~filled
+
+    def _seeds(self, entries: list[Seeds]) -> np.ndarray:
+        size = self._model.chunk_size
+        seeds = np.zeros((size, size), dtype=bool)
+        for target, edge in entries:
+            seeds[target] |= edge
+        return seeds
+
+    def _match(self, key: ChunkKey) -> np.ndarray | None:
+        """The cells of a chunk within the map that hold the tile, or None if there are none."""
+        if key in self._matches:
+            return self._matches[key]
+
+        valid = self._valid(key)
+        chunk = self._model.chunk(key)
+        if chunk is None:
+            match = valid if self._tile_id == EMPTY else None
+            whole = match is not None
+        else:
+            match = chunk.ids == self._tile_id
+            if valid is self._full:
+                whole = bool(match.all())
+            else:
+                match &= valid
+                whole = np.array_equal(match, valid)
+            if not whole and not match.any():
+                match = None
+        if whole:
+            match = valid
+            self._whole.add(key)
+        self._matches[key] = match
+        return match
+
+    def _valid(self, key: ChunkKey) -> np.ndarray:
+        model, size = self._model, self._model.chunk_size
+        if key[0] < self._columns - 1 and key[1] < self._rows - 1:
+            return self._full
+        valid = np.zeros((size, size), dtype=bool)
+        valid[: model.height - key[1] * size, : model.width - key[0] * size] = True
+        valid.flags.writeable = False
+        return valid
+
+    def _label(self, key: ChunkKey, match: np.ndarray) -> tuple[np.ndarray, int]:
+        """The component of every matching cell of a chunk numbered from 1, 0 for the other cells, and the count."""
+        if (cached := self._labels.get(key)) is not None:
+            return cached
+
+        runs = CellRuns.from_mask(match)
+        height, width = match.shape
+        components = label_runs(runs, self._diagonal) + 1
+        # A running sum over the flattened chunk that steps up to the component at the start of each run and back
+        # down at its end. Starts and ends are each distinct, so both are added with one assignment
+        steps = np.zeros(height * width + 1, dtype=np.int64)
+        steps[runs.rows * width + runs.starts] += components
+        steps[runs.rows * width + runs.ends] -= components
+        labels = np.cumsum(steps[:-1]).reshape(height, width)
+        self._labels[key] = labels, runs.run_count
+        return labels, runs.run_count
+
+    def _edges(self, key: ChunkKey, added: np.ndarray) -> Iterator[tuple[ChunkKey, tuple, np.ndarray | np.bool_]]:
+        """The neighbouring chunks entered from the cells added on a chunk, with the border and cells they enter."""
+        size = self._model.chunk_size
+        # Every border cell of a chunk taken whole enters its neighbours, without checking them one by one
+        whole = added is self._full
+        cx, cy = key
+        # The border of the chunk facing each neighbour, and the border of the neighbour it enters
+        edges = [
+            ((cx - 1, cy), (slice(None), size - 1), added[:, 0]),
+            ((cx + 1, cy), (slice(None), 0), added[:, -1]),
+            ((cx, cy - 1), (size - 1, slice(None)), added[0, :]),
+            ((cx, cy + 1), (0, slice(None)), added[-1, :]),
+        ]
+        if self._diagonal:
+            edges += [
+                ((cx - 1, cy - 1), (size - 1, size - 1), added[0, 0]),
+                ((cx + 1, cy - 1), (size - 1, 0), added[0, -1]),
+                ((cx - 1, cy + 1), (0, size - 1), added[-1, 0]),
+                ((cx + 1, cy + 1), (0, 0), added[-1, -1]),
+            ]
+
+        for neighbour, target, edge in edges:
+            if not (0 <= neighbour[0] < self._columns and 0 <= neighbour[1] < self._rows):
+                continue
+            if neighbour in self.filled and neighbour in self._whole:
+                continue
+            if whole:
+                yield neighbour, target, edge
+                continue
+            if not edge.any():
+                continue
+            if self._diagonal and edge.ndim:
+                # Cells that touch an added cell at a corner across the border are entered as well
+                spread = edge.copy()
+                spread[1:] |= edge[:-1]
+                spread[:-1] |= edge[1:]
+                edge = spread
+            yield neighbour, target, edge
+
+
+def _run_at(runs: CellRuns, size: int, slots: np.ndarray, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """The index of the run holding each given cell of chunks stacked [slot, row, column], which must be set."""
+    keys = runs.rows * size + runs.starts
+    return np.searchsorted(keys, ((slots * size + rows) * size + columns), side="right") - 1
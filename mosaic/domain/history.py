@@ -0,0 +1,428 @@
+import contextlib
+import functools
+import logging
+from collections import deque
+from collections.abc import Hashable, Iterator
+
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from mosaic.domain.tilemap import EMPTY, FLAGS_DTYPE, TILE_ID_DTYPE, Chunk, ChunkedTileModel, ChunkKey
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+
+# The tile id and the flags of every cell of a chunk that holds a single tile
+Uniform = tuple[int, int]
+
+
+class ChunkDelta:
+    """The old and new contents of the cells of one chunk that an edit changed.
+
+    Args:
+        key: The key of the chunk.
+        cells: The flat row-major indices of the changed cells within the chunk.
+        old_ids: The tile ids of the cells before the edit.
+        old_flags: The flags of the cells before the edit.
+        new_ids: The tile ids of the cells after the edit.
+        new_flags: The flags of the cells after the edit.
+    """
+
+    __slots__ = ("key", "cells", "old_ids", "old_flags", "new_ids", "new_flags")
+
+    def __init__(
+        self,
+        key: ChunkKey,
+        cells: np.ndarray,
+        old_ids: np.ndarray,
+        old_flags: np.ndarray,
+        new_ids: np.ndarray,
+        new_flags: np.ndarray,
+    ):
+        self.key = key
+        self.cells = cells
+        self.old_ids = old_ids
+        self.old_flags = old_flags
+        self.new_ids = new_ids
+        self.new_flags = new_flags
+
+    @classmethod
+    def between(cls, key: ChunkKey, before: Chunk | None, after: Chunk | None, size: int) -> "ChunkDelta | None":
+        """The delta between two states of a chunk, or None if nothing changed. Missing chunks are empty."""
+        old_ids, old_flags = _contents(before, size)
+        new_ids, new_flags = _contents(after, size)
+        cells = np.flatnonzero((old_ids != new_ids) | (old_flags != new_flags))
+        if not len(cells):
+            return None
+        return cls(key, cells.astype(np.uint32), old_ids[cells], old_flags[cells], new_ids[cells], new_flags[cells])
+
+    @classmethod
+    def between_many(
+        cls, keys: list[ChunkKey], before: list[Chunk | Uniform], after: list[Chunk | None], size: int
+    ) -> list["ChunkDelta"]:
+        """The deltas of many chunks at once, compared in a single vectorized pass. Unchanged chunks are left out.
+
+        Chunks that hold a single tile both before and after the edit, such as the chunks within a large fill, are
+        compared by that tile alone, and their deltas broadcast it instead of storing it for every cell.
+
+        Args:
+            keys: The keys of the chunks.
+            before: The chunks before the edit, or the tile id and flags of the chunks that held a single tile.
+            after: The chunks after the edit, None for missing chunks.
+            size: The width and height of a chunk in cells.
+        """
+        deltas: dict[int, ChunkDelta] = {}
+        compared = []
+        for index, (old, new) in enumerate(zip(before, after)):
+            if isinstance(old, tuple) and (value := _uniform(new)) is not None:
+                if value != old:
+                    deltas[index] = cls._broadcast(keys[index], old, value, size)
+            else:
+                compared.append(index)
+        if not compared:
+            return [deltas[index] for index in sorted(deltas)]
+
+        old_ids, old_flags = _stacked([before[index] for index in compared], size)
+        new_ids, new_flags = _stacked([after[index] for index in compared], size)
+        changed = (old_ids != new_ids) | (old_flags != new_flags)
+        counts = np.count_nonzero(changed, axis=1)
+        keys = [keys[index] for index in compared]
+
+        # Chunks that changed entirely keep rows of the stacked arrays, and share the indices of all cells
+        for row in np.flatnonzero(counts == size * size).tolist():
+            fields = (old_ids[row], old_flags[row], new_ids[row], new_flags[row])
+            deltas[compared[row]] = cls(keys[row], _every_cell(size), *fields)
+
+        # The other changed chunks gather their cells at once and get views split at the boundaries between chunks
+        partial = np.flatnonzero((counts > 0) & (counts < size * size))
+        if len(partial):
+            flat = np.flatnonzero(changed[partial])
+            bounds = np.cumsum(counts[partial])[:-1]
+            fields = [
+                np.split(array, bounds)
+                for array in (
+                    (flat % (size * size)).astype(np.uint32),
+                    old_ids[partial].ravel().take(flat),
+                    old_flags[partial].ravel().take(flat),
+                    new_ids[partial].ravel().take(flat),
+                    new_flags[partial].ravel().take(flat),
+                )
+            ]
+            for row, *parts in zip(partial.tolist(), *fields):
+                deltas[compared[row]] = cls(keys[row], *parts)
+
+        return [deltas[index] for index in sorted(deltas)]
+
+    @classmethod
+    def _broadcast(cls, key: ChunkKey, old: Uniform, new: Uniform, size: int) -> "ChunkDelta":
+        """The delta of a chunk that held a single tile before and after an edit, without per-cell values."""
+        count = size * size
+        return cls(
+            key,
+            _every_cell(size),
+            _repeated(TILE_ID_DTYPE, old[0], count),
+            _repeated(FLAGS_DTYPE, old[1], count),
+            _repeated(TILE_ID_DTYPE, new[0], count),
+            _repeated(FLAGS_DTYPE, new[1], count),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        # The read-only indices of all cells are shared by the deltas of whole chunks, broadcast values take one element
+        arrays = (self.old_ids, self.old_flags, self.new_ids, self.new_flags)
+        cells = self.cells.nbytes if self.cells.flags.writeable else 0
+        return cells + sum(array.itemsize if array.strides == (0,) else array.nbytes for array in arrays)
+
+    def merged(self, later: "ChunkDelta") -> "ChunkDelta":
+        """The delta of this edit followed by a later one, keeping the oldest and the newest value of each cell."""
+        cells = np.union1d(self.cells, later.cells)
+        old_ids = _gather(cells, later.cells, later.old_ids, self.cells, self.old_ids)
+        old_flags = _gather(cells, later.cells, later.old_flags, self.cells, self.old_flags)
+        new_ids = _gather(cells, self.cells, self.new_ids, later.cells, later.new_ids)
+        new_flags = _gather(cells, self.cells, self.new_flags, later.cells, later.new_flags)
+        return ChunkDelta(self.key, cells, old_ids, old_flags, new_ids, new_flags)
+
+
+def _uniform(chunk: Chunk | None) -> Uniform | None:
+    """The tile id and flags shared by all cells of a chunk, or None if they differ. Missing chunks are empty."""
+    if chunk is None:
+        return EMPTY, 0
+    tile_id, flags = chunk.ids[0, 0], chunk.flags[0, 0]
+    if (chunk.ids == tile_id).all() and (chunk.flags == flags).all():
+        return int(tile_id), int(flags)
+    return None
+
+
+@functools.cache
+def _every_cell(size: int) -> np.ndarray:
+    cells = np.arange(size * size, dtype=np.uint32)
+    cells.flags.writeable = False
+    return cells
+
+
+@functools.lru_cache(maxsize=1024)
+def _repeated(dtype: type, value: int, count: int) -> np.ndarray:
+    """A read-only array of a value repeated count times, broadcast from a single element."""
+    return np.broadcast_to(dtype(value), count)
+
+
+def _contents(chunk: Chunk | None, size: int) -> tuple[np.ndarray, np.ndarray]:
+    if chunk is None:
+        return np.zeros(size * size, dtype=TILE_ID_DTYPE), np.zeros(size * size, dtype=FLAGS_DTYPE)
+    return chunk.ids.ravel(), chunk.flags.ravel()
+
+
+def _stacked(chunks: list[Chunk | Uniform | None], size: int) -> tuple[np.ndarray, np.ndarray]:
+    ids = np.zeros((len(chunks), size * size), dtype=TILE_ID_DTYPE)
+    flags = np.zeros((len(chunks), size * size), dtype=FLAGS_DTYPE)
+    for index, chunk in enumerate(chunks):
+        if isinstance(chunk, tuple):
+            ids[index], flags[index] = chunk
+        elif chunk is not None:
+            ids[index] = chunk.ids.ravel()
+            flags[index] = chunk.flags.ravel()
+    return ids, flags
+
+
+def _gather(cells: np.ndarray, first: np.ndarray, first_values: np.ndarray, last: np.ndarray, last_values):
+    """Values for sorted cells, taken from the last arrays where they have the cell and from the first otherwise."""
+    values = np.empty(len(cells), dtype=first_values.dtype)
+    values[np.searchsorted(cells, first)] = first_values
+    values[np.searchsorted(cells, last)] = last_values
+    return values
+
+
+class EditCommand:
+    """A single undoable edit of a tile model, stored as per-chunk deltas.
+
+    Args:
+        text: The description of the edit shown in the user interface.
+        deltas: The deltas of the chunks changed by the edit.
+        merge_key: Consecutive commands with the same merge key, such as the events of one brush stroke, are merged.
+        model: The model the edit was made to, such as one layer of a map, defaults to the model of the undo stack.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        deltas: list[ChunkDelta],
+        merge_key: Hashable | None = None,
+        model: ChunkedTileModel | None = None,
+    ):
+        self.text = text
+        self.deltas = {delta.key: delta for delta in deltas}
+        self.merge_key = merge_key
+        self.model = model
+
+    @property
+    def nbytes(self) -> int:
+        return sum(delta.nbytes for delta in self.deltas.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.deltas)
+
+    def merge(self, later: "EditCommand"):
+        for key, delta in later.deltas.items():
+            current = self.deltas.get(key)
+            self.deltas[key] = delta if current is None else current.merged(delta)
+
+    def apply(self, model: ChunkedTileModel):
+        self._write(model, new=True)
+
+    def revert(self, model: ChunkedTileModel):
+        self._write(model, new=False)
+
+    def _write(self, model: ChunkedTileModel, new: bool):
+        # All deltas are written by a single call, which notifies listeners once
+        if new:
+            model.write_cells(
+                (delta.key, delta.cells, delta.new_ids, delta.new_flags) for delta in self.deltas.values()
+            )
+        else:
+            model.write_cells(
+                (delta.key, delta.cells, delta.old_ids, delta.old_flags) for delta in self.deltas.values()
+            )
+
+
+class _Recorder:
+    """Keeps a copy of every chunk as it was before the first write of an edit.
+
+    Chunks holding a single tile, including missing chunks, are kept as that tile and its flags instead of a copy.
+    """
+
+    def __init__(self, model: ChunkedTileModel):
+        self._model = model
+        self._before: dict[ChunkKey, Chunk | Uniform] = {}
+
+    def __call__(self, key: ChunkKey, chunk: Chunk | None):
+        if key in self._before:
+            return
+        if (value := _uniform(chunk)) is not None:
+            self._before[key] = value
+        else:
+            copy = self._before[key] = Chunk(self._model.chunk_size)
+            copy.ids[:] = chunk.ids
+            copy.flags[:] = chunk.flags
+
+    def deltas(self) -> list[ChunkDelta]:
+        keys = list(self._before)
+        after = [self._model.chunk(key) for key in keys]
+        return ChunkDelta.between_many(keys, list(self._before.values()), after, self._model.chunk_size)
+
+
+class UndoStack(QObject):
+    """The undo and redo history of the edits of a tile model.
+
+    Edits made inside UndoStack.edit are recorded as per-chunk deltas of only the cells they changed. Commands with
+    the same merge key are merged into one, so a whole brush stroke is undone at once. The oldest commands are
+    dropped once the history uses more memory than the limit, the newest command is always kept. Edits of other
+    models, such as the layers of a map, can be recorded too, and are undone on the model they were made to.
+
+    Args:
+        model: The model whose edits are recorded by default.
+        memory_limit: The maximum number of bytes used by the deltas of all commands.
+    """
+
+    changed = Signal()
+
+    def __init__(
+        self, model: ChunkedTileModel, memory_limit: int = DEFAULT_MEMORY_LIMIT, parent: QObject | None = None
+    ):
+        super().__init__(parent)
+        self._model = model
+        self._memory_limit = memory_limit
+        self._commands: deque[EditCommand] = deque()
+        self._index = 0
+        self._nbytes = 0
+        self._state = self._current_state()
+
+    @property
+    def count(self) -> int:
+        return len(self._commands)
+
+    @property
+    def index(self) -> int:
+        """The number of commands that are applied, commands from the index on can be redone."""
+        return self._index
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    @property
+    def memory_limit(self) -> int:
+        return self._memory_limit
+
+    @memory_limit.setter
+    def memory_limit(self, memory_limit: int):
+        self._memory_limit = memory_limit
+        self._evict()
+        self._notify()
+
+    def can_undo(self) -> bool:
+        return self._index > 0
+
+    def can_redo(self) -> bool:
+        return self._index < len(self._commands)
+
+    def undo_text(self) -> str:
+        return self._commands[self._index - 1].text if self.can_undo() else ""
+
+    def redo_text(self) -> str:
+        return self._commands[self._index].text if self.can_redo() else ""
+
+    @contextlib.contextmanager
+    def edit(
+        self, text: str, merge_key: Hashable | None = None, model: ChunkedTileModel | None = None
+    ) -> Iterator[None]:
+        """Record the edits made to the model inside the context as one command.
+
+        Listeners of the model are notified once, when the context exits.
+
+        Args:
+            text: The description of the edit.
+            merge_key: Merge the command into the previous one if that has the same merge key.
+            model: The model to record the edits of, such as one layer of a map, defaults to the model of the stack.
+        """
+        model = self._model if model is None else model
+        recorder = _Recorder(model)
+        model.subscribe_writes(recorder)
+        try:
+            with model.batch():
+                yield
+        finally:
+            model.unsubscribe_writes(recorder)
+            self.push(EditCommand(text, recorder.deltas(), merge_key, model))
+
+    def push(self, command: EditCommand):
+        """Add a command that has already been applied, discarding the commands that could be redone."""
+        if not command:
+            return
+
+        while len(self._commands) > self._index:
+            self._nbytes -= self._commands.pop().nbytes
+
+        previous = self._commands[-1] if self._commands else None
+        if (
+            previous is not None
+            and command.merge_key is not None
+            and previous.merge_key == command.merge_key
+            and self._target(previous) is self._target(command)
+        ):
+            self._nbytes -= previous.nbytes
+            previous.merge(command)
+            self._nbytes += previous.nbytes
+        else:
+            self._commands.append(command)
+            self._nbytes += command.nbytes
+            self._index += 1
+
+        self._evict()
+        self._notify()
+
+    def undo(self) -> bool:
+        if not self.can_undo():
+            return False
+        self._index -= 1
+        command = self._commands[self._index]
+        command.revert(self._target(command))
+        self._notify()
+        return True
+
+    def redo(self) -> bool:
+        if not self.can_redo():
+            return False
+        command = self._commands[self._index]
+        command.apply(self._target(command))
+        self._index += 1
+        self._notify()
+        return True
+
+    def clear(self):
+        self._commands.clear()
+        self._index = 0
+        self._nbytes = 0
+        self._notify()
+
+    def _target(self, command: EditCommand) -> ChunkedTileModel:
+        return self._model if command.model is None else command.model
+
+    def _current_state(self) -> tuple[int, int, str, str]:
+        return self._index, len(self._commands), self.undo_text(), self.redo_text()
+
+    def _notify(self):
+        # Merging stroke events into the top command changes nothing that is shown, so it is not announced
+        state = self._current_state()
+        if state != self._state:
+            self._state = state
+            self.changed.emit()
+
+    def _evict(self):
+        # Only commands that have been applied can be dropped, and the newest one is always kept
+        while self._nbytes > self._memory_limit and self._index > 1:
+            command = self._commands.popleft()
+            self._nbytes -= command.nbytes
+            self._index -= 1
+            _logger.debug(f"Dropped '{command.text}' from the undo history, {command.nbytes} bytes")
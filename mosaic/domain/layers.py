@@ -0,0 +1,237 @@
+import logging
+from collections.abc import Callable, Iterator
+
+from mosaic.domain.render_cache import ChunkRenderCache
+from mosaic.domain.tilemap import CHUNK_SIZE, ChunkedTileModel, ChunkKey, DirtyRegion
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_LAYER_BUDGET = 64 * 1024 * 1024
+
+
+class Layer:
+    """A layer of a tile map, with its own chunked storage, display settings and cache of rasterized chunks.
+
+    Args:
+        name: The name of the layer, such as "ground" or "collision".
+        model: The tiles of the layer.
+        visible: Whether the layer is drawn.
+        opacity: The opacity the layer is drawn with, from 0 to 1.
+        cache: The cache for rasterized chunks of the layer, defaults to a cache with the default layer budget.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: ChunkedTileModel,
+        visible: bool = True,
+        opacity: float = 1.0,
+        cache: ChunkRenderCache | None = None,
+    ):
+        self.name = name
+        self._model = model
+        self._visible = visible
+        self._opacity = _checked_opacity(opacity)
+        self._cache = cache or ChunkRenderCache(DEFAULT_LAYER_BUDGET)
+        self._listeners: list[Callable[[Layer], None]] = []
+
+    def __repr__(self) -> str:
+        return f"Layer({self.name!r}, visible={self._visible}, opacity={self._opacity})"
+
+    @property
+    def model(self) -> ChunkedTileModel:
+        return self._model
+
+    @property
+    def cache(self) -> ChunkRenderCache:
+        return self._cache
+
+    @property
+    def visible(self) -> bool:
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible: bool):
+        if visible != self._visible:
+            self._visible = visible
+            self._notify()
+
+    @property
+    def opacity(self) -> float:
+        return self._opacity
+
+    @opacity.setter
+    def opacity(self, opacity: float):
+        opacity = _checked_opacity(opacity)
+        if opacity != self._opacity:
+            self._opacity = opacity
+            self._notify()
+
+    @property
+    def drawn(self) -> bool:
+        """Whether the layer contributes to the map, which it does not while hidden or fully transparent."""
+        return self._visible and self._opacity > 0.0
+
+    def subscribe(self, listener: Callable[["Layer"], None]):
+        """Register a callback that receives the layer whenever its visibility or opacity changes."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[["Layer"], None]):
+        self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            listener(self)
+
+
+def _checked_opacity(opacity: float) -> float:
+    if not 0.0 <= opacity <= 1.0:
+        raise ValueError(f"Invalid layer opacity {opacity}")
+    return float(opacity)
+
+
+class LayerStack:
+    """The layers of a tile map in drawing order, from the bottom layer to the top one.
+
+    All layers have the size and chunk size of the map, so the chunks of different layers with the same key cover
+    the same cells. Edits of any layer are forwarded to the listeners of the stack along with the edited layer, and
+    changes to how layers are drawn, including adding, removing and reordering them, to its display listeners.
+
+    Args:
+        width: The width of the map in cells.
+        height: The height of the map in cells.
+        chunk_size: The width and height of a chunk in cells.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = CHUNK_SIZE):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid map size {width}x{height}")
+
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self._layers: list[Layer] = []
+        self._forwarders: dict[Layer, Callable[[DirtyRegion], None]] = {}
+        self._active: Layer | None = None
+        self._listeners: list[Callable[[Layer, DirtyRegion], None]] = []
+        self._display_listeners: list[Callable[[Layer], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._layers)
+
+    def __iter__(self) -> Iterator[Layer]:
+        return iter(list(self._layers))
+
+    def __getitem__(self, index: int) -> Layer:
+        return self._layers[index]
+
+    def __contains__(self, layer: Layer) -> bool:
+        return layer in self._forwarders
+
+    def index(self, layer: Layer) -> int:
+        return self._layers.index(layer)
+
+    def layer(self, name: str) -> Layer:
+        """The bottom-most layer with a name."""
+        for layer in self._layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(f"No layer named '{name}'")
+
+    @property
+    def active(self) -> Layer | None:
+        """The layer that is edited, the first layer added unless changed."""
+        return self._active
+
+    @active.setter
+    def active(self, layer: Layer):
+        if layer not in self:
+            raise ValueError(f"{layer} is not in the layer stack")
+        self._active = layer
+
+    def drawn_layers(self) -> list[Layer]:
+        """The layers that contribute to the map, bottom first."""
+        return [layer for layer in self._layers if layer.drawn]
+
+    def add_layer(
+        self,
+        name: str,
+        model: ChunkedTileModel | None = None,
+        index: int | None = None,
+        visible: bool = True,
+        opacity: float = 1.0,
+    ) -> Layer:
+        """Add a layer, on top of the others unless an index is given.
+
+        Args:
+            name: The name of the layer.
+            model: The tiles of the layer, defaults to an empty model of the size of the map.
+            index: The position of the layer in drawing order.
+            visible: Whether the layer is drawn.
+            opacity: The opacity the layer is drawn with.
+        """
+        if model is None:
+            model = ChunkedTileModel(self.width, self.height, self.chunk_size)
+        elif (model.width, model.height, model.chunk_size) != (self.width, self.height, self.chunk_size):
+            raise ValueError(
+                f"Layer '{name}' of size {model.width}x{model.height} with chunks of {model.chunk_size} does not "
+                f"match the map of size {self.width}x{self.height} with chunks of {self.chunk_size}"
+            )
+
+        layer = Layer(name, model, visible, opacity)
+        self._forwarders[layer] = forwarder = lambda region: self._edited(layer, region)
+        model.subscribe(forwarder)
+        layer.subscribe(self._display_changed)
+        self._layers.insert(len(self._layers) if index is None else index, layer)
+        if self._active is None:
+            self._active = layer
+        self._display_changed(layer)
+        return layer
+
+    def remove_layer(self, layer: Layer):
+        """Remove a layer, releasing its rasterized chunks. The layer below becomes active if it was."""
+        index = self.index(layer)
+        del self._layers[index]
+        layer.model.unsubscribe(self._forwarders.pop(layer))
+        layer.unsubscribe(self._display_changed)
+        if self._active is layer:
+            self._active = self._layers[max(index - 1, 0)] if self._layers else None
+        self._display_changed(layer)
+        layer.cache.clear()
+
+    def move_layer(self, layer: Layer, index: int):
+        """Move a layer to another position in drawing order."""
+        self._layers.remove(layer)
+        self._layers.insert(index, layer)
+        self._display_changed(layer)
+
+    def chunk_keys_in(self, x0: int, y0: int, x1: int, y1: int, drawn_only: bool = True) -> list[ChunkKey]:
+        """The keys of the chunks intersecting [x0, x1) x [y0, y1) that are non-empty in any (drawn) layer."""
+        layers = self.drawn_layers() if drawn_only else self._layers
+        keys: dict[ChunkKey, None] = {}
+        for layer in layers:
+            keys.update(dict.fromkeys(layer.model.chunk_keys_in(x0, y0, x1, y1)))
+        return list(keys)
+
+    def subscribe(self, listener: Callable[[Layer, DirtyRegion], None]):
+        """Register a callback that receives the layer and the dirty region of every edit of any layer."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[Layer, DirtyRegion], None]):
+        self._listeners.remove(listener)
+
+    def subscribe_display(self, listener: Callable[[Layer], None]):
+        """Register a callback that receives every layer that is shown, hidden, faded, added, removed or moved."""
+        self._display_listeners.append(listener)
+
+    def unsubscribe_display(self, listener: Callable[[Layer], None]):
+        self._display_listeners.remove(listener)
+
+    def _edited(self, layer: Layer, region: DirtyRegion):
+        for listener in list(self._listeners):
+            listener(layer, region)
+
+    def _display_changed(self, layer: Layer):
+        _logger.debug(f"Display of {layer} changed")
+        for listener in list(self._display_listeners):
+            listener(layer)
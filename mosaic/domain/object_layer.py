@@ -0,0 +1,342 @@
+import math
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.objects import ObjectStore
+from mosaic.domain.render_cache import to_qimage
+from mosaic.domain.spatial_index import PointGrid
+from mosaic.domain.tile_layer import TileLayerItem
+from mosaic.domain.tileset import DEFAULT_PALETTE
+
+# The number of rotations each sprite is resampled at, rotations are rounded to the closest one
+ROTATION_STEPS = 32
+# Objects smaller than this many pixels on screen are drawn as squares of the average color of their sprite
+MIN_SPRITE_PIXELS = 6
+# The number of pixels stamped per paint past which objects are drawn as single pixels instead
+STAMP_BUDGET = 1 << 21
+# The premultiplied RGBA of selection outlines, as a single pixel value
+SELECTION_COLOR = np.array([255, 255, 255, 255], dtype=np.uint8).view(np.uint32)[0]
+# The number of resampled sprites kept before the cache is cleared, such as after zooming through many sizes
+MAX_STAMPS = 4096
+
+
+class Stamp(NamedTuple):
+    """The visible pixels of a sprite at a size and rotation, as offsets from its center and premultiplied colors."""
+
+    rows: np.ndarray
+    columns: np.ndarray
+    colors: np.ndarray
+
+
+class ObjectSprites:
+    """The sprite image of each object type, indexed by type id.
+
+    Sprites are stored as a single RGBA (premultiplied) array of shape (count, size, size, 4), like the tiles of a
+    Tileset. They are resampled on demand to the size they are displayed at and to each of ROTATION_STEPS rotations,
+    and every object of a type and rotation is drawn by stamping the same resampled pixels.
+
+    Args:
+        sprites: The sprite images, as an array of shape (count, size, size, 4).
+    """
+
+    def __init__(self, sprites: np.ndarray):
+        if sprites.ndim != 4 or sprites.shape[3] != 4 or sprites.shape[1] != sprites.shape[2] or not len(sprites):
+            raise ValueError(f"Expected square sprites of shape (count, size, size, 4), got {sprites.shape}")
+        self._levels: list[np.ndarray] = [sprites.astype(np.uint8)]
+        self._stamps: dict[tuple[int, int, int], Stamp] = {}
+        alpha = sprites[..., 3:].astype(np.float64)
+        coverage = np.maximum(alpha.sum(axis=(1, 2)), 1)
+        # The average color of the covered pixels of each sprite, un-premultiplied, opaque
+        rgb = sprites[..., :3].sum(axis=(1, 2)) * 255 / coverage
+        self._colors = np.concatenate([rgb.clip(0, 255), np.full((len(sprites), 1), 255)], axis=1).astype(np.uint8)
+
+    @classmethod
+    def from_colors(cls, colors: Sequence[tuple[int, ...]] = DEFAULT_PALETTE, size: int = 32) -> "ObjectSprites":
+        """Create sprites of discs, where color i is used for type id i, with a tick pointing along rotation 0."""
+        rgba = np.array([tuple(color[:3]) + (255,) for color in colors], dtype=np.float64)
+        centers = np.arange(size) + 0.5 - size / 2
+        ys, xs = np.meshgrid(centers, centers, indexing="ij")
+        distance = np.hypot(xs, ys)
+        radius = size / 2 - 1
+        coverage = np.clip(radius + 0.5 - distance, 0, 1)
+        rim = distance > radius - max(size / 16, 1)
+        tick = (np.abs(ys) <= max(size / 20, 0.5)) & (xs >= 0) & ~rim
+
+        sprites = np.broadcast_to(rgba[:, None, None, :], (len(rgba), size, size, 4)).copy()
+        sprites[:, rim, :3] *= 0.6
+        sprites[:, tick, :3] = 255
+        # Premultiply by the coverage of the disc
+        sprites *= coverage[None, :, :, None]
+        return cls(sprites.round().astype(np.uint8))
+
+    def __len__(self) -> int:
+        return len(self._levels[0])
+
+    @property
+    def size(self) -> int:
+        return self._levels[0].shape[1]
+
+    def colors(self) -> np.ndarray:
+        """The average color of each sprite, as an array of shape (count, 4)."""
+        return self._colors
+
+    def stamp(self, type_id: int, step: int, pixels: int) -> Stamp:
+        """The pixels of a sprite displayed pixels wide, rotated by step / ROTATION_STEPS of a full turn.
+
+        Below MIN_SPRITE_PIXELS, the stamp is a square of the average color of the sprite, whatever the rotation.
+        """
+        pixels = max(pixels, 1)
+        type_id %= len(self)
+        step = 0 if pixels < MIN_SPRITE_PIXELS else step % ROTATION_STEPS
+        key = (type_id, step, pixels)
+        if (stamp := self._stamps.get(key)) is None:
+            if len(self._stamps) >= MAX_STAMPS:
+                self._stamps.clear()
+            stamp = self._stamps[key] = self._resample(type_id, step, pixels)
+        return stamp
+
+    def _level(self, pixels: int) -> np.ndarray:
+        """The smallest box-filtered copy of the sprites that is still at least pixels wide."""
+        level = 0
+        while True:
+            sprites = self._levels[level]
+            count, size, _, channels = sprites.shape
+            if size // 2 < pixels or size % 2:
+                return sprites
+            if level + 1 == len(self._levels):
+                blocks = sprites.reshape(count, size // 2, 2, size // 2, 2, channels).astype(np.uint16)
+                self._levels.append((blocks.sum(axis=(2, 4)) // 4).astype(np.uint8))
+            level += 1
+
+    def _resample(self, type_id: int, step: int, pixels: int) -> Stamp:
+        offsets = np.arange(pixels) - (pixels - 1) // 2
+        if pixels < MIN_SPRITE_PIXELS:
+            rows, columns = np.meshgrid(offsets, offsets, indexing="ij")
+            colors = np.broadcast_to(self._colors[type_id], (pixels * pixels, 4))
+            return Stamp(rows.ravel(), columns.ravel(), colors.view(np.uint32).ravel())
+
+        # Sample the source pixel under the center of every displayed pixel, rotated back to the unrotated sprite
+        source = self._level(pixels)[type_id]
+        size = source.shape[0]
+        angle = math.radians(step * 360 / ROTATION_STEPS)
+        cos, sin = math.cos(angle), math.sin(angle)
+        centers = offsets - (0.5 if pixels % 2 == 0 else 0.0)
+        dy, dx = np.meshgrid(centers, centers, indexing="ij")
+        factor = size / pixels
+        sx = np.floor((cos * dx + sin * dy) * factor + size / 2).astype(np.int64)
+        sy = np.floor((cos * dy - sin * dx) * factor + size / 2).astype(np.int64)
+        inside = (sx >= 0) & (sx < size) & (sy >= 0) & (sy < size)
+        colors = np.zeros((pixels, pixels, 4), dtype=np.uint8)
+        colors[inside] = source[sy[inside], sx[inside]]
+        rows, columns = np.meshgrid(offsets, offsets, indexing="ij")
+        visible = colors[..., 3] > 0
+        return Stamp(rows[visible], columns[visible], np.ascontiguousarray(colors[visible]).view(np.uint32).ravel())
+
+
+class ObjectLayerItem(QGraphicsItem):
+    """A single graphics item that draws every object of an ObjectStore.
+
+    No item is created per object. Painting looks up the objects near the exposed rect in a PointGrid and stamps
+    them into a single image at the resolution of the paint device, which is drawn in one call. Objects are stamped
+    grouped by type and rotation step, each group writing the same resampled sprite at every position with one
+    vectorized write, so no Qt call is made per object. When so many objects are visible that their sprites would
+    take too many pixels, each is drawn as a single pixel instead.
+
+    The grid is built lazily. Objects that moved since it was built are marked stale and tested directly against the
+    queried rect, so dragging does not rebuild the grid on every move, and flush_index builds it again afterwards.
+
+    Args:
+        store: The objects to draw.
+        tile_size: The size of a cell in item coordinates, as object positions are in cell units.
+        sprites: The sprites to draw the objects with, defaults to sprites of the default palette one cell in size.
+    """
+
+    def __init__(
+        self,
+        store: ObjectStore,
+        tile_size: int,
+        sprites: ObjectSprites | None = None,
+        parent: QGraphicsItem | None = None,
+    ):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self._store = store
+        self._tile_size = tile_size
+        self._sprites = sprites or ObjectSprites.from_colors(size=tile_size)
+        self._grid = PointGrid()
+        self._stale = np.zeros(0, dtype=bool)
+        self._stale_count = 0
+        self._rebuild = True
+        self._bounds = QRectF()
+        self._update_bounds(None)
+        store.subscribe(self._on_changed)
+
+    @property
+    def store(self) -> ObjectStore:
+        return self._store
+
+    @property
+    def sprites(self) -> ObjectSprites:
+        return self._sprites
+
+    @property
+    def tile_size(self) -> int:
+        return self._tile_size
+
+    @property
+    def object_size(self) -> float:
+        """The size of an object in item coordinates."""
+        return self._sprites.size
+
+    @property
+    def stale_count(self) -> int:
+        """The number of objects that moved since the index was built."""
+        return self._stale_count
+
+    def boundingRect(self) -> QRectF:
+        return self._bounds
+
+    def flush_index(self):
+        """Build the index again if objects moved since it was built, such as after a drag."""
+        if self._stale_count:
+            self._rebuild = True
+
+    def objects_in(self, rect: QRectF, margin: float = 0.0) -> np.ndarray:
+        """The slots of the objects whose position lies within a rect in item coordinates grown by a margin."""
+        self._refresh_index()
+        size = self._tile_size
+        x0, y0 = (rect.left() - margin) / size, (rect.top() - margin) / size
+        x1, y1 = (rect.right() + margin) / size, (rect.bottom() + margin) / size
+        found = self._grid.query_rect(x0, y0, x1, y1)
+        if self._stale_count:
+            stale = np.flatnonzero(self._stale)
+            xs, ys = self._store.xs[stale], self._store.ys[stale]
+            moved = stale[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+            found = np.concatenate([found[~self._stale[found]], moved])
+        return found
+
+    def object_at(self, position: QPointF) -> int | None:
+        """The slot of the topmost object whose sprite covers a position in item coordinates, or None."""
+        half = self.object_size / 2
+        candidates = self.objects_in(QRectF(position, position), half)
+        if not len(candidates):
+            return None
+        xs = self._store.xs[candidates] * self._tile_size
+        ys = self._store.ys[candidates] * self._tile_size
+        inside = candidates[np.hypot(xs - position.x(), ys - position.y()) <= half]
+        # Prefer the most recently added of overlapping objects
+        return int(inside.max()) if len(inside) else None
+
+    def object_rect(self, index: int) -> QRectF:
+        size = self.object_size
+        x = self._store.xs[index] * self._tile_size
+        y = self._store.ys[index] * self._tile_size
+        return QRectF(x - size / 2, y - size / 2, size, size)
+
+    def _refresh_index(self):
+        if self._rebuild or self._stale_count > len(self._store) // 2:
+            self._grid.build(self._store.xs, self._store.ys)
+            self._stale = np.zeros(len(self._store), dtype=bool)
+            self._stale_count = 0
+            self._rebuild = False
+
+    def _on_changed(self, indices: np.ndarray | None):
+        if indices is None:
+            self._rebuild = True
+        elif not self._rebuild:
+            self._stale[indices] = True
+            self._stale_count = int(np.count_nonzero(self._stale))
+        self._update_bounds(indices)
+        self.update()
+
+    def _update_bounds(self, indices: np.ndarray | None):
+        """Grow the bounding rect to hold the objects in the given slots, or fit it to every object."""
+        store = self._store
+        if indices is None:
+            indices, bounds = slice(None), QRectF()
+        else:
+            bounds = self._bounds
+        xs, ys = store.xs[indices], store.ys[indices]
+        if len(xs):
+            half = self.object_size / 2
+            size = self._tile_size
+            rect = QRectF(
+                QPointF(float(xs.min()) * size - half, float(ys.min()) * size - half),
+                QPointF(float(xs.max()) * size + half, float(ys.max()) * size + half),
+            )
+            bounds = bounds.united(rect) if bounds.isValid() else rect
+        if bounds != self._bounds:
+            self.prepareGeometryChange()
+            self._bounds = bounds
+
+    @profiler.timed("object_layer.paint")
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        exposed = TileLayerItem.visible_rect(painter, option)
+        visible = self.objects_in(exposed, self.object_size / 2)
+        if not len(visible):
+            return
+
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        width = max(math.ceil(exposed.width() * scale), 1)
+        height = max(math.ceil(exposed.height() * scale), 1)
+        pixels = max(round(self.object_size * scale), 1)
+        if len(visible) * pixels * pixels > STAMP_BUDGET:
+            pixels = 1
+
+        store = self._store
+        rows = np.floor((store.ys[visible] * self._tile_size - exposed.top()) * scale).astype(np.int64)
+        columns = np.floor((store.xs[visible] * self._tile_size - exposed.left()) * scale).astype(np.int64)
+        frame = np.zeros((height, width), dtype=np.uint32)
+        self._stamp_sprites(frame, visible, rows, columns, pixels)
+        selected = store.selected[visible]
+        if selected.any():
+            self._stamp_selection(frame, rows[selected], columns[selected], pixels)
+
+        target = QRectF(exposed.left(), exposed.top(), width / scale, height / scale)
+        painter.drawImage(target, to_qimage(frame.view(np.uint8).reshape(height, width, 4)))
+
+    def _stamp_sprites(
+        self, frame: np.ndarray, visible: np.ndarray, rows: np.ndarray, columns: np.ndarray, pixels: int
+    ):
+        store = self._store
+        groups = store.types[visible].astype(np.int64) * ROTATION_STEPS
+        if pixels >= MIN_SPRITE_PIXELS:
+            groups += np.round(store.rotations[visible] * (ROTATION_STEPS / 360)).astype(np.int64) % ROTATION_STEPS
+        keys, inverse = np.unique(groups, return_inverse=True)
+        stamps = [self._sprites.stamp(*divmod(key, ROTATION_STEPS), pixels) for key in keys.tolist()]
+        lengths = np.array([len(stamp.rows) for stamp in stamps], dtype=np.int64)
+        firsts = np.cumsum(lengths) - lengths
+
+        # The stamps of all objects laid end to end, in the order of their slots so later objects are drawn on top
+        counts = lengths[inverse]
+        owners = np.repeat(np.arange(len(visible)), counts)
+        offsets = np.repeat(firsts[inverse] - (np.cumsum(counts) - counts), counts) + np.arange(len(owners))
+        stamp_rows = np.concatenate([stamp.rows for stamp in stamps])[offsets]
+        stamp_columns = np.concatenate([stamp.columns for stamp in stamps])[offsets]
+        colors = np.concatenate([stamp.colors for stamp in stamps])[offsets]
+        _write(frame, rows[owners] + stamp_rows, columns[owners] + stamp_columns, colors)
+
+    def _stamp_selection(self, frame: np.ndarray, rows: np.ndarray, columns: np.ndarray, pixels: int):
+        offsets = np.arange(-1, pixels + 1) - (pixels - 1) // 2
+        stamp_rows, stamp_columns = np.meshgrid(offsets, offsets, indexing="ij")
+        if pixels >= MIN_SPRITE_PIXELS:
+            # Outline larger objects, and cover smaller ones entirely
+            first, last = offsets[0], offsets[-1]
+            border = (stamp_rows == first) | (stamp_rows == last) | (stamp_columns == first) | (stamp_columns == last)
+            stamp_rows, stamp_columns = stamp_rows[border], stamp_columns[border]
+        ys = rows[:, None] + stamp_rows.ravel()[None, :]
+        xs = columns[:, None] + stamp_columns.ravel()[None, :]
+        _write(frame, ys.ravel(), xs.ravel(), SELECTION_COLOR)
+
+
+def _write(frame: np.ndarray, ys: np.ndarray, xs: np.ndarray, colors: np.ndarray | int):
+    """Write pixels into a frame in one vectorized assignment, skipping those outside of it."""
+    height, width = frame.shape
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    frame[ys[inside], xs[inside]] = colors[inside] if isinstance(colors, np.ndarray) and colors.ndim else colors
@@ -0,0 +1,296 @@
+from collections.abc import Callable
+
+import numpy as np
+
+POSITION_DTYPE = np.float64
+TYPE_DTYPE = np.uint16
+ROTATION_DTYPE = np.float32
+KEY_DTYPE = np.int64
+
+# Marks removed keys in the table of slots
+_REMOVED = -1
+
+
+class ObjectHandle:
+    """A light reference to one object of an ObjectStore, reading and writing its fields in the arrays of the store.
+
+    Handles stay valid while other objects are added and removed, as they refer to the key of the object rather than
+    to its slot in the arrays.
+    """
+
+    __slots__ = ("_store", "key")
+
+    def __init__(self, store: "ObjectStore", key: int):
+        self._store = store
+        self.key = key
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ObjectHandle) and other._store is self._store and other.key == self.key
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self.key))
+
+    def __repr__(self) -> str:
+        if not self.alive:
+            return f"ObjectHandle({self.key}, removed)"
+        return f"ObjectHandle({self.key}, type_id={self.type_id}, position={self.position}, rotation={self.rotation})"
+
+    @property
+    def alive(self) -> bool:
+        return self._store.contains(self.key)
+
+    @property
+    def index(self) -> int:
+        """The slot of the object in the arrays of the store, which changes when objects are removed."""
+        return self._store.index_of(self.key)
+
+    @property
+    def position(self) -> tuple[float, float]:
+        index = self.index
+        return float(self._store.xs[index]), float(self._store.ys[index])
+
+    @position.setter
+    def position(self, position: tuple[float, float]):
+        self._store.set_positions(np.array([self.index]), [position[0]], [position[1]])
+
+    @property
+    def type_id(self) -> int:
+        return int(self._store.types[self.index])
+
+    @type_id.setter
+    def type_id(self, type_id: int):
+        self._store.set_types(np.array([self.index]), type_id)
+
+    @property
+    def rotation(self) -> float:
+        return float(self._store.rotations[self.index])
+
+    @rotation.setter
+    def rotation(self, rotation: float):
+        self._store.set_rotations(np.array([self.index]), rotation)
+
+    @property
+    def selected(self) -> bool:
+        return bool(self._store.selected[self.index])
+
+
+class ObjectStore:
+    """Free-placed objects, such as spawn points, props and triggers, stored as a struct of arrays.
+
+    Each object has a position in cell units, a type id, a rotation in degrees and a selection state, kept in one
+    array per field, so that culling, selection and moving are vectorized over all objects rather than looping over
+    them. Objects are identified by a key that never changes, while their slot in the arrays does: removing objects
+    compacts the arrays. Use ObjectHandle for a reference to a single object.
+
+    Listeners are notified of every change with the slots of the objects that changed, or None when objects were
+    added or removed, which changes the slots of others.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._xs = np.empty(0, dtype=POSITION_DTYPE)
+        self._ys = np.empty(0, dtype=POSITION_DTYPE)
+        self._types = np.empty(0, dtype=TYPE_DTYPE)
+        self._rotations = np.empty(0, dtype=ROTATION_DTYPE)
+        self._selected = np.empty(0, dtype=bool)
+        self._keys = np.empty(0, dtype=KEY_DTYPE)
+        # The slot of each key, indexed by key, grown geometrically like the fields, and the key of the next object
+        self._slots = np.empty(0, dtype=np.int64)
+        self._next_key = 0
+        self._listeners: list[Callable[[np.ndarray | None], None]] = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def xs(self) -> np.ndarray:
+        return self._xs[: self._count]
+
+    @property
+    def ys(self) -> np.ndarray:
+        return self._ys[: self._count]
+
+    @property
+    def types(self) -> np.ndarray:
+        return self._types[: self._count]
+
+    @property
+    def rotations(self) -> np.ndarray:
+        return self._rotations[: self._count]
+
+    @property
+    def selected(self) -> np.ndarray:
+        return self._selected[: self._count]
+
+    @property
+    def keys(self) -> np.ndarray:
+        return self._keys[: self._count]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self._xs, self._ys, self._types, self._rotations, self._selected, self._keys, self._slots)
+        return sum(array.nbytes for array in arrays)
+
+    def subscribe(self, listener: Callable[[np.ndarray | None], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[np.ndarray | None], None]):
+        self._listeners.remove(listener)
+
+    def contains(self, key: int) -> bool:
+        return 0 <= key < self._next_key and self._slots[key] != _REMOVED
+
+    def index_of(self, key: int) -> int:
+        if not self.contains(key):
+            raise KeyError(f"No object with key {key}")
+        return int(self._slots[key])
+
+    def indices_of(self, keys: np.ndarray) -> np.ndarray:
+        """The slots of objects given by their keys."""
+        keys = np.asarray(keys, dtype=KEY_DTYPE)
+        if len(keys) and (keys.min() < 0 or keys.max() >= self._next_key or (self._slots[keys] == _REMOVED).any()):
+            raise KeyError("No object for some of the keys")
+        return self._slots[keys]
+
+    def handle(self, key: int) -> ObjectHandle:
+        self.index_of(key)
+        return ObjectHandle(self, key)
+
+    def add(self, x: float, y: float, type_id: int, rotation: float = 0.0) -> ObjectHandle:
+        return ObjectHandle(self, int(self.add_many([x], [y], type_id, rotation)[0]))
+
+    def add_many(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        types: np.ndarray | int,
+        rotations: np.ndarray | float = 0.0,
+    ) -> np.ndarray:
+        """Add many objects at once, growing the arrays geometrically.
+
+        Args:
+            xs: The columns of the objects, in cell units.
+            ys: The rows of the objects, in cell units.
+            types: The type id of each object, or a single type id for all of them.
+            rotations: The rotation of each object in degrees, or a single rotation for all of them.
+
+        Returns:
+            The keys of the new objects.
+        """
+        xs = np.asarray(xs, dtype=POSITION_DTYPE).ravel()
+        ys = np.asarray(ys, dtype=POSITION_DTYPE).ravel()
+        if xs.shape != ys.shape:
+            raise ValueError("Coordinate arrays must have the same length")
+
+        count, start = len(xs), self._count
+        self._reserve(start + count)
+        end = start + count
+        self._xs[start:end] = xs
+        self._ys[start:end] = ys
+        self._types[start:end] = types
+        self._rotations[start:end] = rotations
+        self._selected[start:end] = False
+
+        first_key = self._next_key
+        keys = np.arange(first_key, first_key + count, dtype=KEY_DTYPE)
+        self._keys[start:end] = keys
+        self._reserve_keys(first_key + count)
+        self._slots[first_key : first_key + count] = np.arange(start, end)
+        self._next_key = first_key + count
+        self._count = end
+        self._notify(None)
+        return keys
+
+    def remove(self, indices: np.ndarray):
+        """Remove the objects in the given slots, compacting the arrays in one pass."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if not len(indices):
+            return
+
+        keep = np.ones(self._count, dtype=bool)
+        keep[indices] = False
+        self._slots[self.keys[~keep]] = _REMOVED
+        remaining = int(np.count_nonzero(keep))
+        for array in (self._xs, self._ys, self._types, self._rotations, self._selected, self._keys):
+            array[:remaining] = array[: self._count][keep]
+        self._count = remaining
+        self._slots[self.keys] = np.arange(remaining)
+        self._notify(None)
+
+    def remove_selected(self):
+        self.remove(np.flatnonzero(self.selected))
+
+    def clear(self):
+        self._slots[self.keys] = _REMOVED
+        self._count = 0
+        self._notify(None)
+
+    def set_positions(self, indices: np.ndarray, xs: np.ndarray, ys: np.ndarray):
+        self._xs[indices] = xs
+        self._ys[indices] = ys
+        self._notify(np.asarray(indices))
+
+    def set_types(self, indices: np.ndarray, types: np.ndarray | int):
+        self._types[indices] = types
+        self._notify(np.asarray(indices))
+
+    def set_rotations(self, indices: np.ndarray, rotations: np.ndarray | float):
+        self._rotations[indices] = rotations
+        self._notify(np.asarray(indices))
+
+    def move(self, indices: np.ndarray, dx: float, dy: float):
+        """Offset the positions of many objects with one vectorized addition per axis."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if not len(indices) or (dx == 0 and dy == 0):
+            return
+        self._xs[indices] += dx
+        self._ys[indices] += dy
+        self._notify(indices)
+
+    def move_selected(self, dx: float, dy: float):
+        self.move(np.flatnonzero(self.selected), dx, dy)
+
+    def select(self, indices: np.ndarray, extend: bool = False):
+        """Select the objects in the given slots, replacing the selection unless extending it."""
+        indices = np.asarray(indices, dtype=np.int64)
+        changed = indices if extend else np.union1d(np.flatnonzero(self.selected), indices)
+        if not extend:
+            self.selected[:] = False
+        self.selected[indices] = True
+        if len(changed):
+            self._notify(changed)
+
+    def toggle(self, indices: np.ndarray):
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices):
+            self.selected[indices] = ~self.selected[indices]
+            self._notify(indices)
+
+    def clear_selection(self):
+        self.select(np.empty(0, dtype=np.int64))
+
+    def in_rect(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """The slots of the objects whose position lies in [x0, x1] x [y0, y1], tested on all objects at once."""
+        xs, ys = self.xs, self.ys
+        return np.flatnonzero((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1))
+
+    def _reserve(self, count: int):
+        if count <= len(self._xs):
+            return
+        capacity = max(count, 2 * len(self._xs), 64)
+        for name in ("_xs", "_ys", "_types", "_rotations", "_selected", "_keys"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[: self._count] = array[: self._count]
+            setattr(self, name, grown)
+
+    def _reserve_keys(self, count: int):
+        if count <= len(self._slots):
+            return
+        grown = np.full(max(count, 2 * len(self._slots), 64), _REMOVED, dtype=np.int64)
+        grown[: self._next_key] = self._slots[: self._next_key]
+        self._slots = grown
+
+    def _notify(self, indices: np.ndarray | None):
+        for listener in list(self._listeners):
+            listener(indices)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from mosaic.domain.flood import connected_chunks
+from mosaic.domain.selection import Selection
+from mosaic.domain.tilemap import EMPTY, FLAGS_DTYPE, TILE_ID_DTYPE, ChunkedTileModel, GridCoordinate
+
+
+def fill_selection(model: ChunkedTileModel, selection: Selection, tile_id: int, flags: int = 0):
+    """Fill the selected cells with a single tile, one masked assignment per chunk and one notification."""
+    size = selection.chunk_size
+    with model.batch():
+        for key in selection.chunk_keys():
+            model.fill_mask(key[0] * size, key[1] * size, selection.mask(key), tile_id, flags)
+
+
+def flood_fill(model: ChunkedTileModel, x: int, y: int, tile_id: int, flags: int = 0, diagonal: bool = False) -> int:
+    """Fill the area of cells connected to (x, y) that hold the same tile, like a paint bucket.
+
+    The area is grown chunk by chunk from the seed, see flood.connected_chunks, and written with one masked
+    assignment per chunk, so the cost scales with the chunks the area reaches rather than with the size of the map.
+
+    Args:
+        model: The model to fill.
+        x: The column of the seed cell.
+        y: The row of the seed cell.
+        tile_id: The tile to fill with.
+        flags: The flags of the filled cells.
+        diagonal: Whether cells that only touch at a corner are connected.
+
+    Returns:
+        The number of filled cells, 0 if the seed is outside of the map or already holds the tile.
+    """
+    if not model.contains(x, y):
+        return 0
+
+    seed = model.tile_at(GridCoordinate(x, y))
+    seed_id = seed.tile_id if seed is not None else EMPTY
+    if seed_id == tile_id and (seed is None or seed.flags == flags):
+        return 0
+
+    area = connected_chunks(model, x, y, diagonal)
+    size = model.chunk_size
+    with model.batch():
+        for (cx, cy), mask in area.items():
+            model.fill_mask(cx * size, cy * size, mask, tile_id, flags)
+    return sum(int(np.count_nonzero(mask)) for mask in area.values())
+
+
+def line_cells(x0: int, y0: int, x1: int, y1: int) -> tuple[np.ndarray, np.ndarray]:
+    """The cells on the line between two cells, one per step along the major axis, both ends included."""
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    t = np.arange(steps + 1) / max(steps, 1)
+    xs = np.floor(x0 + (x1 - x0) * t + 0.5).astype(np.int64)
+    ys = np.floor(y0 + (y1 - y0) * t + 0.5).astype(np.int64)
+    return xs, ys
+
+
+def fill_line(
+    model: ChunkedTileModel, x0: int, y0: int, x1: int, y1: int, tile_id: int, flags: int = 0, width: int = 1
+):
+    """Draw a line of tiles between two cells with a square brush, as a single write.
+
+    Args:
+        model: The model to draw into.
+        x0: The column of the first end.
+        y0: The row of the first end.
+        x1: The column of the last end.
+        y1: The row of the last end.
+        tile_id: The tile to draw with.
+        flags: The flags of the drawn cells.
+        width: The width of the brush in cells.
+    """
+    xs, ys = line_cells(x0, y0, x1, y1)
+    offsets = np.arange(width) - (width - 1) // 2
+    xs = (xs[:, None, None] + offsets[None, None, :]).repeat(width, axis=1).ravel()
+    ys = (ys[:, None, None] + offsets[None, :, None]).repeat(width, axis=2).ravel()
+    inside = (xs >= 0) & (ys >= 0) & (xs < model.width) & (ys < model.height)
+    model.insert_many(xs[inside], ys[inside], tile_id, flags)
+
+
+def stamp(model: ChunkedTileModel, x: int, y: int, ids: np.ndarray, flags: np.ndarray | None = None):
+    """Stamp a pattern of tiles with its top left corner at (x, y).
+
+    Empty cells of the pattern are transparent and keep the tiles underneath, parts outside of the map are clipped.
+
+    Args:
+        model: The model to stamp into.
+        x: The column of the top left corner.
+        y: The row of the top left corner.
+        ids: The tile ids of the pattern, indexed [row, column].
+        flags: The flags of the pattern, defaults to none.
+    """
+    ids = np.asarray(ids, dtype=TILE_ID_DTYPE)
+    flags = np.zeros_like(ids, dtype=FLAGS_DTYPE) if flags is None else np.asarray(flags, dtype=FLAGS_DTYPE)
+    height, width = ids.shape
+    current_ids, current_flags = model.read_region(x, y, width, height)
+    opaque = ids != EMPTY
+    model.write_region(x, y, np.where(opaque, ids, current_ids), np.where(opaque, flags, current_flags))
+
+
+def fill_pattern(
+    model: ChunkedTileModel, x0: int, y0: int, x1: int, y1: int, ids: np.ndarray, flags: np.ndarray | None = None
+):
+    """Fill the rect [x0, x1) x [y0, y1) by repeating a pattern aligned to the top left corner of the rect."""
+    ids = np.asarray(ids, dtype=TILE_ID_DTYPE)
+    width, height = x1 - x0, y1 - y0
+    if width <= 0 or height <= 0:
+        return
+
+    reps = (-(-height // ids.shape[0]), -(-width // ids.shape[1]))
+    tiled_flags = None if flags is None else np.tile(np.asarray(flags, dtype=FLAGS_DTYPE), reps)[:height, :width]
+    stamp(model, x0, y0, np.tile(ids, reps)[:height, :width], tiled_flags)
@@ -0,0 +1,105 @@
+import logging
+
+import numpy as np
+from PySide6.QtGui import QImage
+
+from mosaic.domain.render_cache import to_qimage
+from mosaic.domain.tilemap import ChunkedTileModel, DirtyRegion
+
+_logger = logging.getLogger(__name__)
+
+
+def downsample(block: np.ndarray) -> np.ndarray:
+    """Average 2x2 blocks of an RGBA (premultiplied) array, padding odd edges with transparent pixels."""
+    height, width, _ = block.shape
+    if height % 2 or width % 2:
+        block = np.pad(block, ((0, height % 2), (0, width % 2), (0, 0)))
+    block = block.astype(np.uint16)
+    return ((block[0::2, 0::2] + block[1::2, 0::2] + block[0::2, 1::2] + block[1::2, 1::2]) // 4).astype(np.uint8)
+
+
+class TilePyramid:
+    """A downsampled pyramid of the average tile colors of a map.
+
+    Level k holds one RGBA pixel per 2**k x 2**k block of cells, so a zoomed-out view can draw a single small image
+    instead of every tile. The pyramid is built on first use from the allocated chunks only, and after that every
+    edit updates just the cells above the changed region on each level.
+
+    Args:
+        model: The tile model to build the pyramid from.
+        colors: The RGBA (premultiplied) color of each tile id, as an array of shape (count, 4).
+    """
+
+    def __init__(self, model: ChunkedTileModel, colors: np.ndarray):
+        self._model = model
+        self._colors = np.ascontiguousarray(colors, dtype=np.uint8)
+        self._levels: list[np.ndarray] = []
+        self._images: dict[int, QImage] = {}
+
+        model.subscribe(self.update)
+
+    @property
+    def max_level(self) -> int:
+        """The coarsest level, where the whole map fits in a single pixel."""
+        return max(max(self._model.width, self._model.height) - 1, 1).bit_length()
+
+    @property
+    def built(self) -> bool:
+        return bool(self._levels)
+
+    def level(self, level: int) -> np.ndarray:
+        """The averaged colors of level 1 up to max_level, as an array indexed [row, column]."""
+        if not 1 <= level <= self.max_level:
+            raise IndexError(f"Pyramid level {level} outside of [1, {self.max_level}]")
+        if not self._levels:
+            self.build()
+        return self._levels[level - 1]
+
+    def image(self, level: int) -> QImage:
+        """The colors of a level as an image, converted again only after the level has changed."""
+        image = self._images.get(level)
+        if image is None:
+            image = self._images[level] = to_qimage(self.level(level))
+        return image
+
+    def build(self):
+        """Build all levels from the allocated chunks of the model."""
+        width, height = self._model.width, self._model.height
+        self._levels = []
+        for _ in range(self.max_level):
+            width, height = -(-width // 2), -(-height // 2)
+            self._levels.append(np.zeros((height, width, 4), dtype=np.uint8))
+        self._images.clear()
+
+        size = self._model.chunk_size
+        for cx, cy in self._model.chunk_keys():
+            self._refresh(cx * size, cy * size, (cx + 1) * size, (cy + 1) * size, levels=1)
+
+        for index in range(1, len(self._levels)):
+            height, width, _ = self._levels[index].shape
+            self._levels[index][:] = downsample(self._levels[index - 1])[:height, :width]
+
+    def update(self, region: DirtyRegion):
+        """Update the cells above an edited region, does nothing until the pyramid has been built."""
+        if not self._levels:
+            return
+        for _, box in region.boxes():
+            self._refresh(*box)
+
+    def _refresh(self, x0: int, y0: int, x1: int, y1: int, levels: int | None = None):
+        """Recompute the cells of the lowest levels that cover the cells [x0, x1) x [y0, y1)."""
+        for index, level in enumerate(self._levels[:levels]):
+            x0, y0, x1, y1 = x0 // 2, y0 // 2, -(-x1 // 2), -(-y1 // 2)
+            height, width, _ = level.shape
+            x1, y1 = min(x1, width), min(y1, height)
+            if x1 <= x0 or y1 <= y0:
+                return
+
+            if index == 0:
+                ids, _ = self._model.read_region(2 * x0, 2 * y0, 2 * (x1 - x0), 2 * (y1 - y0))
+                block = self._colors[np.where(ids < len(self._colors), ids, 0)]
+            else:
+                block = self._levels[index - 1][2 * y0 : 2 * y1, 2 * x0 : 2 * x1]
+
+            level[y0:y1, x0:x1] = downsample(block)[: y1 - y0, : x1 - x0]
+            self._images.pop(index + 1, None)
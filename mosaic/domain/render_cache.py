@@ -0,0 +1,159 @@
+import logging
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+from PySide6.QtGui import QImage
+
+from mosaic.domain.tilemap import ChunkKey
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 256 * 1024 * 1024
+
+CacheKey = tuple[ChunkKey, int]
+
+
+def to_qimage(rgba: np.ndarray) -> QImage:
+    """Wrap a contiguous RGBA (premultiplied) array in a QImage that owns a copy of the pixels."""
+    rgba = np.ascontiguousarray(rgba)
+    height, width, _ = rgba.shape
+    return QImage(rgba.data, width, height, rgba.strides[0], QImage.Format_RGBA8888_Premultiplied).copy()
+
+
+@dataclass(frozen=True, slots=True)
+class CacheStats:
+    """A snapshot of the counters of a render cache."""
+
+    entries: int
+    size_bytes: int
+    budget_bytes: int
+    hits: int
+    misses: int
+    rasterizations: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry:
+    __slots__ = ("image", "dirty")
+
+    def __init__(self, image: QImage):
+        self.image = image
+        self.dirty = False
+
+
+class ChunkRenderCache:
+    """A memory-bounded LRU cache of rasterized chunk images, keyed by chunk and level of detail.
+
+    Entries of edited chunks are marked dirty rather than dropped, so a stale image is still available as a
+    placeholder until the chunk has been rasterized again.
+
+    Args:
+        budget_bytes: The maximum memory used by cached images, least recently used entries are evicted beyond it.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET):
+        self._budget = budget_bytes
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._levels: dict[ChunkKey, set[int]] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.rasterizations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not entry.dirty
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    @property
+    def budget_bytes(self) -> int:
+        return self._budget
+
+    @budget_bytes.setter
+    def budget_bytes(self, budget_bytes: int):
+        self._budget = budget_bytes
+        self._evict()
+
+    def get(self, chunk: ChunkKey, level: int) -> QImage | None:
+        """The cached image of a chunk, or None if it is missing or dirty."""
+        entry = self._entries.get((chunk, level))
+        if entry is None or entry.dirty:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end((chunk, level))
+        self.hits += 1
+        return entry.image
+
+    def stale(self, chunk: ChunkKey, level: int) -> QImage | None:
+        """The cached image of a chunk even if it is dirty, without touching the counters or the LRU order."""
+        entry = self._entries.get((chunk, level))
+        return entry.image if entry is not None else None
+
+    def put(self, chunk: ChunkKey, level: int, image: QImage):
+        """Store a freshly rasterized chunk image, evicting the least recently used entries if over budget."""
+        self._remove((chunk, level))
+        self._entries[(chunk, level)] = _Entry(image)
+        self._levels.setdefault(chunk, set()).add(level)
+        self._size += image.sizeInBytes()
+        self.rasterizations += 1
+        self._evict()
+
+    def mark_dirty(self, chunks: Iterable[ChunkKey]):
+        """Mark all levels of the given chunks as needing to be rasterized again."""
+        for chunk in chunks:
+            for level in self._levels.get(chunk, ()):
+                self._entries[(chunk, level)].dirty = True
+
+    def clear(self):
+        self._entries.clear()
+        self._levels.clear()
+        self._size = 0
+
+    def reset_counters(self):
+        self.hits = self.misses = self.rasterizations = self.evictions = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            entries=len(self._entries),
+            size_bytes=self._size,
+            budget_bytes=self._budget,
+            hits=self.hits,
+            misses=self.misses,
+            rasterizations=self.rasterizations,
+            evictions=self.evictions,
+        )
+
+    def _remove(self, key: CacheKey) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        self._size -= entry.image.sizeInBytes()
+        levels = self._levels[key[0]]
+        levels.discard(key[1])
+        if not levels:
+            del self._levels[key[0]]
+        return True
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone exceeds the budget
+        while self._size > self._budget and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            _logger.debug(f"Evicted chunk {key[0]} at level {key[1]} from render cache")
@@ -0,0 +1,287 @@
+from collections.abc import Iterator
+
+import numpy as np
+
+from mosaic.domain.flood import connected_chunks
+from mosaic.domain.spatial_index import CellRuns
+from mosaic.domain.tilemap import CHUNK_SIZE, EMPTY, ChunkedTileModel, ChunkKey, GridCoordinate
+
+
+class Selection:
+    """A set of selected cells on a map, stored as boolean masks per chunk.
+
+    Only chunks with at least one selected cell hold a mask, and every set operation works on whole chunk masks at
+    once, so selecting, extending or clearing large areas never touches individual cells from Python.
+
+    Args:
+        width: The width of the map in cells.
+        height: The height of the map in cells.
+        chunk_size: The width and height of a chunk in cells.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self._masks: dict[ChunkKey, np.ndarray] = {}
+        self.version = 0
+
+    @classmethod
+    def like(cls, model: ChunkedTileModel) -> "Selection":
+        """An empty selection covering the same map as a model."""
+        return cls(model.width, model.height, model.chunk_size)
+
+    @classmethod
+    def from_rect(cls, model: ChunkedTileModel, x0: int, y0: int, x1: int, y1: int) -> "Selection":
+        selection = cls.like(model)
+        selection.add_rect(x0, y0, x1, y1)
+        return selection
+
+    @classmethod
+    def similar(
+        cls, model: ChunkedTileModel, x: int, y: int, contiguous: bool = True, diagonal: bool = False
+    ) -> "Selection":
+        """The cells holding the same tile as the cell (x, y).
+
+        Args:
+            model: The model to compare tiles of.
+            x: The column of the seed cell.
+            y: The row of the seed cell.
+            contiguous: Whether only cells connected to the seed are selected, or all cells with the same tile.
+            diagonal: Whether cells that only touch at a corner are connected, if contiguous.
+        """
+        selection = cls.like(model)
+        if not model.contains(x, y):
+            return selection
+
+        if contiguous:
+            selection._masks = {key: mask.copy() for key, mask in connected_chunks(model, x, y, diagonal).items()}
+            return selection
+
+        tile = model.tile_at(GridCoordinate(x, y))
+        tile_id = tile.tile_id if tile is not None else EMPTY
+        for key in selection._all_keys() if tile_id == EMPTY else model.chunk_keys():
+            chunk = model.chunk(key)
+            if chunk is None:
+                selection._set(key, selection._valid(key))
+            else:
+                selection._set(key, (chunk.ids == tile_id) & selection._valid(key))
+        return selection
+
+    def copy(self) -> "Selection":
+        selection = Selection(self.width, self.height, self.chunk_size)
+        selection._masks = {key: mask.copy() for key, mask in self._masks.items()}
+        return selection
+
+    def __len__(self) -> int:
+        return int(sum(np.count_nonzero(mask) for mask in self._masks.values()))
+
+    def __bool__(self) -> bool:
+        return bool(self._masks)
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        x, y = cell
+        size = self.chunk_size
+        mask = self._masks.get((x // size, y // size))
+        return mask is not None and 0 <= x < self.width and 0 <= y < self.height and bool(mask[y % size, x % size])
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Selection):
+            return NotImplemented
+        return self._masks.keys() == other._masks.keys() and all(
+            np.array_equal(mask, other._masks[key]) for key, mask in self._masks.items()
+        )
+
+    def chunk_keys(self) -> list[ChunkKey]:
+        return list(self._masks)
+
+    def mask(self, key: ChunkKey) -> np.ndarray | None:
+        """The mask of a chunk indexed [row, column], or None if nothing is selected in it."""
+        return self._masks.get(key)
+
+    def bounds(self) -> tuple[int, int, int, int] | None:
+        """The cell bounds [x0, x1) x [y0, y1) of the selection, or None if it is empty."""
+        if not self._masks:
+            return None
+
+        size = self.chunk_size
+        x0 = y0 = np.iinfo(np.int64).max
+        x1 = y1 = np.iinfo(np.int64).min
+        for (cx, cy), mask in self._masks.items():
+            rows, columns = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+            x0, x1 = min(x0, cx * size + columns[0]), max(x1, cx * size + columns[-1] + 1)
+            y0, y1 = min(y0, cy * size + rows[0]), max(y1, cy * size + rows[-1] + 1)
+        return int(x0), int(y0), int(x1), int(y1)
+
+    def to_mask(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """A boolean mask of the window [x0, x1) x [y0, y1), indexed [row, column]."""
+        window = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=bool)
+        for key, (chunk_rows, chunk_columns, rows, columns) in self._windows(x0, y0, x1, y1):
+            if (mask := self._masks.get(key)) is not None:
+                window[rows, columns] = mask[chunk_rows, chunk_columns]
+        return window
+
+    def to_runs(self) -> CellRuns:
+        size = self.chunk_size
+        parts = [CellRuns.from_mask(mask, cx * size, cy * size) for (cx, cy), mask in self._masks.items()]
+        if not parts:
+            return CellRuns()
+        return CellRuns(
+            np.concatenate([part.rows for part in parts]),
+            np.concatenate([part.starts for part in parts]),
+            np.concatenate([part.ends for part in parts]),
+        )
+
+    def cells(self) -> tuple[np.ndarray, np.ndarray]:
+        """The columns and rows of every selected cell."""
+        return self.to_runs().cells()
+
+    def outline(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """The boundary of the selection within the window [x0, x1) x [y0, y1), as merged line segments.
+
+        Returns:
+            An array of shape (count, 4) with the start and end point (x0, y0, x1, y1) of each segment in cell units.
+        """
+        if x1 <= x0 or y1 <= y0:
+            return np.empty((0, 4), dtype=np.int64)
+
+        # Include a ring of neighbouring cells so edges on the window border are found as well
+        mask = self.to_mask(x0 - 1, y0 - 1, x1 + 1, y1 + 1)
+        horizontal = mask[1:, 1:-1] != mask[:-1, 1:-1]
+        vertical = mask[1:-1, 1:] != mask[1:-1, :-1]
+
+        rows = CellRuns.from_mask(horizontal, x0, y0)
+        columns = CellRuns.from_mask(vertical.T, y0, x0)
+        return np.concatenate(
+            [
+                np.stack([rows.starts, rows.rows, rows.ends, rows.rows], axis=1),
+                np.stack([columns.rows, columns.starts, columns.rows, columns.ends], axis=1),
+            ]
+        )
+
+    def clear(self):
+        self._masks.clear()
+        self.version += 1
+
+    def add_rect(self, x0: int, y0: int, x1: int, y1: int):
+        """Select the cells [x0, x1) x [y0, y1), clipped to the map."""
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, self.width), min(y1, self.height)
+        for key in self._keys_in(x0, y0, x1, y1):
+            mask = self._writable(key)
+            size = self.chunk_size
+            ox, oy = key[0] * size, key[1] * size
+            mask[max(y0 - oy, 0) : min(y1 - oy, size), max(x0 - ox, 0) : min(x1 - ox, size)] = True
+        self.version += 1
+
+    def add_runs(self, runs: CellRuns):
+        """Select cells given as runs, clipped to the map."""
+        runs = runs.clipped(0, 0, self.width, self.height)
+        if bounds := runs.bounds():
+            x0, y0, x1, y1 = bounds
+            self.add_mask(runs.to_mask(x0, y0, x1, y1), x0, y0)
+
+    def add_mask(self, mask: np.ndarray, x: int = 0, y: int = 0):
+        """Select the set cells of a mask whose first cell is at (x, y)."""
+        height, width = mask.shape
+        for key, (chunk_rows, chunk_columns, rows, columns) in self._windows(x, y, x + width, y + height):
+            part = mask[rows, columns]
+            if part.any():
+                self._writable(key)[chunk_rows, chunk_columns] |= part
+        self.version += 1
+
+    def union(self, other: "Selection") -> "Selection":
+        result = self.copy()
+        result |= other
+        return result
+
+    def intersection(self, other: "Selection") -> "Selection":
+        result = self.copy()
+        result &= other
+        return result
+
+    def difference(self, other: "Selection") -> "Selection":
+        result = self.copy()
+        result -= other
+        return result
+
+    def inverted(self) -> "Selection":
+        result = Selection(self.width, self.height, self.chunk_size)
+        for key in self._all_keys():
+            mask = self._masks.get(key)
+            result._set(key, self._valid(key) if mask is None else ~mask & self._valid(key))
+        return result
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __invert__ = inverted
+
+    def __ior__(self, other: "Selection") -> "Selection":
+        for key, mask in other._masks.items():
+            current = self._masks.get(key)
+            self._masks[key] = mask.copy() if current is None else current | mask
+        self.version += 1
+        return self
+
+    def __iand__(self, other: "Selection") -> "Selection":
+        for key in list(self._masks):
+            mask = other._masks.get(key)
+            self._set(key, None if mask is None else self._masks[key] & mask)
+        self.version += 1
+        return self
+
+    def __isub__(self, other: "Selection") -> "Selection":
+        for key in list(self._masks):
+            mask = other._masks.get(key)
+            if mask is not None:
+                self._set(key, self._masks[key] & ~mask)
+        self.version += 1
+        return self
+
+    def _set(self, key: ChunkKey, mask: np.ndarray | None):
+        if mask is None or not mask.any():
+            self._masks.pop(key, None)
+        else:
+            self._masks[key] = mask
+
+    def _writable(self, key: ChunkKey) -> np.ndarray:
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = np.zeros((self.chunk_size, self.chunk_size), dtype=bool)
+        return mask
+
+    def _valid(self, key: ChunkKey) -> np.ndarray:
+        """The cells of a chunk that lie within the map."""
+        size = self.chunk_size
+        valid = np.zeros((size, size), dtype=bool)
+        valid[: self.height - key[1] * size, : self.width - key[0] * size] = True
+        return valid
+
+    def _all_keys(self) -> Iterator[ChunkKey]:
+        return self._keys_in(0, 0, self.width, self.height)
+
+    def _keys_in(self, x0: int, y0: int, x1: int, y1: int) -> Iterator[ChunkKey]:
+        if x1 <= x0 or y1 <= y0:
+            return
+        size = self.chunk_size
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                yield cx, cy
+
+    def _windows(self, x0: int, y0: int, x1: int, y1: int) -> Iterator[tuple[ChunkKey, tuple[slice, ...]]]:
+        """Slices of each chunk and of a window starting at (x0, y0) where they overlap, clipped to the map."""
+        size = self.chunk_size
+        cx0, cy0, cx1, cy1 = max(x0, 0), max(y0, 0), min(x1, self.width), min(y1, self.height)
+        for key in self._keys_in(cx0, cy0, cx1, cy1):
+            ox, oy = key[0] * size, key[1] * size
+            sx0, sy0 = max(cx0, ox), max(cy0, oy)
+            sx1, sy1 = min(cx1, ox + size), min(cy1, oy + size)
+            yield (
+                key,
+                (
+                    slice(sy0 - oy, sy1 - oy),
+                    slice(sx0 - ox, sx1 - ox),
+                    slice(sy0 - y0, sy1 - y0),
+                    slice(sx0 - x0, sx1 - x0),
+                ),
+            )
@@ -0,0 +1,363 @@
+import math
+from collections.abc import Iterator
+
+import numpy as np
+
+from mosaic.domain.tilemap import EMPTY, ChunkedTileModel, GridCoordinate, GridTile
+
+Box = tuple[float, float, float, float]
+
+
+class CellRuns:
+    """A compact set of cells, stored as sorted and non-overlapping horizontal runs [start, end) per row.
+
+    A rectangle of any size costs one run per row, so large dragged or rubber-band selections stay small and set
+    operations on them are vectorized over runs rather than cells.
+
+    Args:
+        rows: The row of each run.
+        starts: The first column of each run.
+        ends: The column after the last column of each run.
+    """
+
+    __slots__ = ("rows", "starts", "ends")
+
+    def __init__(self, rows=(), starts=(), ends=()):
+        self.rows, self.starts, self.ends = _normalize(
+            np.asarray(rows, dtype=np.int64), np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        )
+
+    @classmethod
+    def from_rect(cls, x0: int, y0: int, x1: int, y1: int) -> "CellRuns":
+        """The cells [x0, x1) x [y0, y1)."""
+        if x1 <= x0 or y1 <= y0:
+            return cls()
+        rows = np.arange(y0, y1)
+        return cls(rows, np.full(len(rows), x0), np.full(len(rows), x1))
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray, x: int = 0, y: int = 0) -> "CellRuns":
+        """The set cells of a boolean mask indexed [row, column] whose first cell is at (x, y)."""
+        height, width = mask.shape
+        padded = np.zeros((height, width + 2), dtype=bool)
+        padded[:, 1:-1] = mask
+        # Every row starts and ends unset, so its changes alternate between the start and the end of a run
+        changes = np.flatnonzero(padded[:, 1:] != padded[:, :-1])
+        rows, starts = np.divmod(changes[0::2], width + 1)
+        return cls(rows + y, starts + x, changes[1::2] - rows * (width + 1) + x)
+
+    @classmethod
+    def from_cells(cls, xs: np.ndarray, ys: np.ndarray) -> "CellRuns":
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        return cls(ys, xs, xs + 1)
+
+    def __len__(self) -> int:
+        return int((self.ends - self.starts).sum())
+
+    def __bool__(self) -> bool:
+        return len(self.rows) > 0
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CellRuns):
+            return NotImplemented
+        return (
+            np.array_equal(self.rows, other.rows)
+            and np.array_equal(self.starts, other.starts)
+            and np.array_equal(self.ends, other.ends)
+        )
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        x, y = cell
+        first, last = np.searchsorted(self.rows, [y, y + 1])
+        index = first + np.searchsorted(self.starts[first:last], x, side="right") - 1
+        return bool(first <= index < last and x < self.ends[index])
+
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        """Iterate over (row, start, end) of each run."""
+        return zip(self.rows.tolist(), self.starts.tolist(), self.ends.tolist())
+
+    @property
+    def run_count(self) -> int:
+        return len(self.rows)
+
+    def union(self, other: "CellRuns") -> "CellRuns":
+        return CellRuns(
+            np.concatenate([self.rows, other.rows]),
+            np.concatenate([self.starts, other.starts]),
+            np.concatenate([self.ends, other.ends]),
+        )
+
+    def clipped(self, x0: int, y0: int, x1: int, y1: int) -> "CellRuns":
+        """The runs within [x0, x1) x [y0, y1)."""
+        keep = (self.rows >= y0) & (self.rows < y1) & (self.ends > x0) & (self.starts < x1)
+        return CellRuns(self.rows[keep], np.maximum(self.starts[keep], x0), np.minimum(self.ends[keep], x1))
+
+    def bounds(self) -> tuple[int, int, int, int] | None:
+        """The cell bounds [x0, x1) x [y0, y1) of all runs, or None if empty."""
+        if not len(self.rows):
+            return None
+        return int(self.starts.min()), int(self.rows[0]), int(self.ends.max()), int(self.rows[-1]) + 1
+
+    def cells(self) -> tuple[np.ndarray, np.ndarray]:
+        """The columns and rows of every cell."""
+        lengths = self.ends - self.starts
+        ys = np.repeat(self.rows, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(self.starts, lengths) + offsets, ys
+
+    def to_mask(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """A boolean mask of the window [x0, x1) x [y0, y1), indexed [row, column]."""
+        mask = np.zeros((y1 - y0, x1 - x0 + 1), dtype=np.int8)
+        runs = self.clipped(x0, y0, x1, y1)
+        # Runs never touch, so no start shares its cell with another start or an end. Every row sums to zero, which
+        # lets a single running sum over the flattened mask fill all rows at once
+        mask[runs.rows - y0, runs.starts - x0] = 1
+        mask[runs.rows - y0, runs.ends - x0] = -1
+        return np.cumsum(mask.ravel(), dtype=np.int8).reshape(mask.shape)[:, :-1].view(bool)
+
+
+def _normalize(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort runs and merge the overlapping or touching ones of each row."""
+    keep = ends > starts
+    rows, starts, ends = rows[keep], starts[keep], ends[keep]
+    if len(rows) < 2:
+        return rows, starts, ends
+    # Runs taken from a mask or from other runs are already sorted and apart, which is cheaper to check than to sort
+    if ((rows[1:] > rows[:-1]) | ((rows[1:] == rows[:-1]) & (starts[1:] > ends[:-1]))).all():
+        return rows, starts, ends
+
+    order = np.lexsort((starts, rows))
+    rows, starts, ends = rows[order], starts[order], ends[order]
+
+    # Offset every row so that a running maximum of the ends never carries over into the next row
+    span = int(ends.max() - min(starts.min(), 0)) + 1
+    reach = np.maximum.accumulate((rows - rows[0]) * span + ends)
+    begins = np.ones(len(rows), dtype=bool)
+    begins[1:] = (rows[1:] != rows[:-1]) | ((rows[1:] - rows[0]) * span + starts[1:] > reach[:-1])
+
+    first = np.flatnonzero(begins)
+    last = np.append(first[1:], len(rows)) - 1
+    return rows[first], starts[first], reach[last] - (rows[first] - rows[0]) * span
+
+
+class TileGridIndex:
+    """A spatial index over the tiles of a model, using its chunks as the buckets of a uniform grid.
+
+    Point queries are answered arithmetically, and rect and nearest queries only visit the chunks that are allocated,
+    so none of them depend on the number of tiles outside of the queried area.
+
+    Args:
+        model: The tile model to index.
+    """
+
+    def __init__(self, model: ChunkedTileModel):
+        self._model = model
+
+    @property
+    def model(self) -> ChunkedTileModel:
+        return self._model
+
+    def query_point(self, x: float, y: float) -> GridTile | None:
+        """The tile in the cell containing a position in cell units, or None if the cell is empty."""
+        cx, cy = math.floor(x), math.floor(y)
+        if not self._model.contains(cx, cy):
+            return None
+        return self._model.tile_at(GridCoordinate(cx, cy))
+
+    def query_rect(self, x0: int, y0: int, x1: int, y1: int) -> CellRuns:
+        """The non-empty cells within [x0, x1) x [y0, y1)."""
+        size = self._model.chunk_size
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self._model.width), min(y1, self._model.height)
+
+        runs = []
+        for (cx, cy), chunk in self._model.chunks_in(x0, y0, x1, y1):
+            left, top = cx * size, cy * size
+            wx0, wy0 = max(x0, left) - left, max(y0, top) - top
+            wx1, wy1 = min(x1, left + size) - left, min(y1, top + size) - top
+            runs.append(CellRuns.from_mask(chunk.ids[wy0:wy1, wx0:wx1] != EMPTY, left + wx0, top + wy0))
+        return _concatenate(runs)
+
+    def nearest(self, x: float, y: float, max_distance: float = math.inf) -> GridCoordinate | None:
+        """The non-empty cell whose center is closest to a position in cell units, or None if there is none."""
+        size = self._model.chunk_size
+        keys = np.array(self._model.chunk_keys(), dtype=np.int64).reshape(-1, 2)
+        if not len(keys):
+            return None
+
+        # The distance to each chunk's rect is a lower bound for the distance to any of its cells
+        left, top = keys[:, 0] * size, keys[:, 1] * size
+        dx = np.maximum(np.maximum(left + 0.5 - x, x - (left + size - 0.5)), 0)
+        dy = np.maximum(np.maximum(top + 0.5 - y, y - (top + size - 0.5)), 0)
+        bounds = np.hypot(dx, dy)
+        order = np.argsort(bounds)
+
+        best, best_distance = None, max_distance
+        for index in order:
+            if bounds[index] > best_distance:
+                break
+            key = (int(keys[index, 0]), int(keys[index, 1]))
+            chunk = self._model.chunk(key)
+            if chunk is None:
+                continue
+            rows, columns = np.nonzero(chunk.ids)
+            distances = np.hypot(key[0] * size + columns + 0.5 - x, key[1] * size + rows + 0.5 - y)
+            closest = int(np.argmin(distances))
+            if distances[closest] <= best_distance:
+                best_distance = float(distances[closest])
+                best = GridCoordinate(key[0] * size + int(columns[closest]), key[1] * size + int(rows[closest]))
+        return best
+
+
+def _concatenate(runs: list[CellRuns]) -> CellRuns:
+    if not runs:
+        return CellRuns()
+    return CellRuns(
+        np.concatenate([part.rows for part in runs]),
+        np.concatenate([part.starts for part in runs]),
+        np.concatenate([part.ends for part in runs]),
+    )
+
+
+class PointGrid:
+    """A spatial index over many points held in arrays, such as the positions of the objects of an ObjectStore.
+
+    The points are sorted by the cell of a uniform grid they fall in, row of cells by row of cells, so the points of
+    any range of cells within a row are contiguous. A rect query looks up one slice per row of cells and tests the
+    points of those slices with a single vectorized comparison, never visiting points one by one. Building the index
+    is a sort of the cells, cheap enough to build it again after bulk edits.
+
+    Args:
+        cell_size: The size of the cells of the grid, in the units of the points.
+    """
+
+    def __init__(self, cell_size: float = 4.0):
+        if cell_size <= 0:
+            raise ValueError("The cell size must be positive")
+        self._cell_size = cell_size
+        self._xs = np.empty(0, dtype=np.float64)
+        self._ys = np.empty(0, dtype=np.float64)
+        self._order = np.empty(0, dtype=np.int64)
+        self._cells = np.empty(0, dtype=np.int64)
+        self._origin = (0, 0)
+        self._columns = 0
+        self._rows = 0
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    @property
+    def cell_size(self) -> float:
+        return self._cell_size
+
+    def build(self, xs: np.ndarray, ys: np.ndarray):
+        """Index points, replacing those indexed before. Queries return indices into these arrays."""
+        self._xs = np.array(xs, dtype=np.float64)
+        self._ys = np.array(ys, dtype=np.float64)
+        if not len(self._xs):
+            self._order = np.empty(0, dtype=np.int64)
+            self._cells = np.empty(0, dtype=np.int64)
+            self._columns = self._rows = 0
+            return
+
+        columns = np.floor(self._xs / self._cell_size).astype(np.int64)
+        rows = np.floor(self._ys / self._cell_size).astype(np.int64)
+        self._origin = (int(columns.min()), int(rows.min()))
+        self._columns = int(columns.max()) - self._origin[0] + 1
+        self._rows = int(rows.max()) - self._origin[1] + 1
+        cells = (rows - self._origin[1]) * self._columns + (columns - self._origin[0])
+        self._order = np.argsort(cells, kind="stable")
+        self._cells = cells[self._order]
+
+    def bounds(self) -> Box | None:
+        """The bounds of the indexed points, or None if there are none."""
+        if not len(self._xs):
+            return None
+        return float(self._xs.min()), float(self._ys.min()), float(self._xs.max()), float(self._ys.max())
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """The indices of the points within [x0, x1] x [y0, y1], in no particular order."""
+        if not len(self._order):
+            return np.empty(0, dtype=np.int64)
+        c0 = max(math.floor(x0 / self._cell_size) - self._origin[0], 0)
+        c1 = min(math.floor(x1 / self._cell_size) - self._origin[0], self._columns - 1)
+        r0 = max(math.floor(y0 / self._cell_size) - self._origin[1], 0)
+        r1 = min(math.floor(y1 / self._cell_size) - self._origin[1], self._rows - 1)
+        if c1 < c0 or r1 < r0:
+            return np.empty(0, dtype=np.int64)
+
+        if c0 == 0 and c1 == self._columns - 1:
+            # Full rows of cells are a single slice
+            first, last = np.searchsorted(self._cells, [r0 * self._columns, (r1 + 1) * self._columns])
+            candidates = self._order[first:last]
+        else:
+            candidates = self._gather(np.arange(r0, r1 + 1, dtype=np.int64), c0, c1)
+
+        xs, ys = self._xs[candidates], self._ys[candidates]
+        return candidates[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+
+    def query_point(self, x: float, y: float, radius: float) -> np.ndarray:
+        """The indices of the points within a square of half size radius around a point."""
+        return self.query_rect(x - radius, y - radius, x + radius, y + radius)
+
+    def nearest(self, x: float, y: float, max_distance: float | None = None) -> int | None:
+        """The index of the point closest to a point, or None if no point lies within max_distance of it.
+
+        The cells are searched in square rings around the cell of the point, one vectorized lookup per ring. A point
+        outside the first k rings is k - 1 cells further away than the edge of the cell searched first, so the search
+        stops at the first ring whose inner radius is beyond the closest point found so far, or beyond max_distance.
+        """
+        if not len(self._order):
+            return None
+        cx, cy = x / self._cell_size, y / self._cell_size
+        column, row = math.floor(cx) - self._origin[0], math.floor(cy) - self._origin[1]
+        # The distance from the point to the nearest edge of its own cell, in cells
+        fx, fy = cx - math.floor(cx), cy - math.floor(cy)
+        margin = min(fx, 1 - fx, fy, 1 - fy)
+        # The rings before the first that reaches the grid, and after the last that does, hold no cells
+        first = max(0, -column, column - self._columns + 1, -row, row - self._rows + 1)
+        last = max(column, self._columns - 1 - column, row, self._rows - 1 - row)
+
+        best, best_distance = None, math.inf
+        for ring in range(first, last + 1):
+            inner = max(ring - 1 + margin, 0) * self._cell_size
+            if best_distance <= inner or (max_distance is not None and inner > max_distance):
+                break
+            candidates = self._ring(column, row, ring)
+            if not len(candidates):
+                continue
+            distances = np.hypot(self._xs[candidates] - x, self._ys[candidates] - y)
+            closest = int(np.argmin(distances))
+            if distances[closest] < best_distance:
+                best, best_distance = int(candidates[closest]), float(distances[closest])
+
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None
+        return best
+
+    def _ring(self, column: int, row: int, ring: int) -> np.ndarray:
+        """The indices of the points in the cells at a Chebyshev distance of ring cells from a cell of the grid."""
+        if ring == 0:
+            rows = np.array([row], dtype=np.int64)
+            c0 = c1 = np.array([column], dtype=np.int64)
+        else:
+            # The top and bottom rows of the ring span it, the rows between only hold its left and right cells
+            sides = np.arange(row - ring + 1, row + ring, dtype=np.int64)
+            rows = np.concatenate([[row - ring, row + ring], sides, sides])
+            left, right = np.full(len(sides), column - ring), np.full(len(sides), column + ring)
+            c0 = np.concatenate([[column - ring] * 2, left, right])
+            c1 = np.concatenate([[column + ring] * 2, left, right])
+
+        c0, c1 = np.maximum(c0, 0), np.minimum(c1, self._columns - 1)
+        inside = (rows >= 0) & (rows < self._rows) & (c0 <= c1)
+        return self._gather(rows[inside], c0[inside], c1[inside])
+
+    def _gather(self, rows: np.ndarray, c0: np.ndarray | int, c1: np.ndarray | int) -> np.ndarray:
+        """The indices of the points in columns c0 to c1 of each row of cells, given in grid coordinates."""
+        rows = rows * self._columns
+        starts = np.searchsorted(self._cells, rows + c0)
+        ends = np.searchsorted(self._cells, rows + c1, side="right")
+        lengths = ends - starts
+        # The positions of every slice laid end to end, without a loop over the slices
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self._order[offsets + np.arange(len(offsets))]
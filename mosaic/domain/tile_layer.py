@@ -0,0 +1,398 @@
+import math
+
+from PySide6.QtCore import QLineF, QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter, QPen
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.atlas import TextureAtlas
+from mosaic.domain.chunk_scheduler import ChunkScheduler
+from mosaic.domain.compositor import ChunkCompositor
+from mosaic.domain.layers import Layer, LayerStack
+from mosaic.domain.pyramid import TilePyramid
+from mosaic.domain.render_cache import ChunkRenderCache, to_qimage
+from mosaic.domain.selection import Selection
+from mosaic.domain.spatial_index import TileGridIndex
+from mosaic.domain.tilemap import Chunk, ChunkedTileModel, ChunkKey, DirtyRegion, GridCoordinate
+from mosaic.domain.tileset import Tileset
+
+
+def level_for_scale(scale: float, max_level: int) -> int:
+    """The tileset level whose tile resolution best matches a view scale."""
+    if scale >= 1.0:
+        return 0
+    if scale <= 0.0:
+        return max_level
+    return min(math.floor(math.log2(1.0 / scale)), max_level)
+
+
+class TileLayerItem(QGraphicsItem):
+    """A single graphics item that draws a whole tile model.
+
+    No item is created per tile. Each chunk of the model is rasterized into an image at the level of detail it is
+    displayed at and kept in a render cache, so painting only draws the cached images of the chunks intersecting the
+    exposed rect. Edits mark the affected chunks dirty, and only those are rasterized again. When zoomed out so far that
+    several tiles share a pixel, a level of the map pyramid is drawn instead.
+
+    With background loading, chunks missing from the cache are decoded and rasterized on a worker pool instead of
+    during paint. Until their image arrives, a stale or differently detailed cached image of the chunk is drawn, or a
+    flat placeholder if there is none.
+
+    With an atlas, the full resolution level is drawn tile by tile from the pages of a texture atlas instead of from
+    rasterized chunks, which would each take a full resolution image in the render cache.
+
+    Args:
+        model: The tile model to draw.
+        tileset: The tileset used to look up tile images.
+        cache: The cache for rasterized chunks, defaults to a cache with the default budget.
+        background_loading: Whether to load and rasterize chunks on a worker pool rather than while painting.
+        use_atlas: Whether to draw the full resolution level from a texture atlas of the tileset.
+    """
+
+    PLACEHOLDER = QColor(128, 128, 128, 64)
+
+    def __init__(
+        self,
+        model: ChunkedTileModel,
+        tileset: Tileset,
+        cache: ChunkRenderCache | None = None,
+        background_loading: bool = False,
+        use_atlas: bool = False,
+        parent: QGraphicsItem | None = None,
+    ):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self._model = model
+        self._tileset = tileset
+        self._cache = cache or ChunkRenderCache()
+        # Built on first use, a layer stack item keeps a pyramid and an index per layer instead
+        self._pyramid: TilePyramid | None = None
+        self._index: TileGridIndex | None = None
+        self._selection = Selection.like(model)
+        self._outline: tuple[tuple, list[QLineF]] | None = None
+        self._use_atlas = use_atlas
+        self._atlas: TextureAtlas | None = None
+        self._model.subscribe(self._on_model_changed)
+
+        self._scheduler: ChunkScheduler | None = None
+        if background_loading:
+            self._scheduler = ChunkScheduler(model, tileset, self._cache)
+            self._scheduler.rendered.connect(self._on_chunk_rendered)
+
+    @property
+    def model(self) -> ChunkedTileModel:
+        return self._model
+
+    @property
+    def tileset(self) -> Tileset:
+        return self._tileset
+
+    @property
+    def cache(self) -> ChunkRenderCache:
+        return self._cache
+
+    @property
+    def pyramid(self) -> TilePyramid:
+        if self._pyramid is None:
+            self._pyramid = TilePyramid(self._model, self._tileset.colors())
+        return self._pyramid
+
+    @property
+    def index(self) -> TileGridIndex:
+        if self._index is None:
+            self._index = TileGridIndex(self._model)
+        return self._index
+
+    @property
+    def scheduler(self) -> ChunkScheduler | None:
+        return self._scheduler
+
+    @property
+    def atlas(self) -> TextureAtlas | None:
+        """The texture atlas of the tileset, packed on first use, or None if the layer does not draw from one."""
+        if self._use_atlas and self._atlas is None:
+            self._atlas = TextureAtlas.from_tileset(self._tileset)
+        return self._atlas
+
+    @property
+    def tile_size(self) -> int:
+        return self._tileset.tile_size
+
+    def boundingRect(self) -> QRectF:
+        size = self.tile_size
+        return QRectF(0, 0, self._model.width * size, self._model.height * size)
+
+    def cell_at(self, position: QPointF, clamp: bool = False) -> GridCoordinate | None:
+        """The cell under a position in item coordinates.
+
+        Args:
+            position: The position in item coordinates.
+            clamp: Whether positions outside of the map map to the closest cell on its border instead of None.
+        """
+        x = math.floor(position.x() / self.tile_size)
+        y = math.floor(position.y() / self.tile_size)
+        if clamp:
+            return GridCoordinate(min(max(x, 0), self._model.width - 1), min(max(y, 0), self._model.height - 1))
+        return GridCoordinate(x, y) if self._model.contains(x, y) else None
+
+    def cells_in(self, rect: QRectF) -> tuple[int, int, int, int]:
+        """The range of cells [x0, x1) x [y0, y1) intersecting a rect, clipped to the map."""
+        size = self.tile_size
+        x0 = max(math.floor(rect.left() / size), 0)
+        y0 = max(math.floor(rect.top() / size), 0)
+        x1 = min(math.ceil(rect.right() / size), self._model.width)
+        y1 = min(math.ceil(rect.bottom() / size), self._model.height)
+        return x0, y0, x1, y1
+
+    def cell_rect(self, x0: int, y0: int, x1: int, y1: int) -> QRectF:
+        size = self.tile_size
+        return QRectF(x0 * size, y0 * size, (x1 - x0) * size, (y1 - y0) * size)
+
+    @property
+    def selection(self) -> Selection:
+        return self._selection
+
+    def set_selection(self, selection: Selection):
+        """Replace the selected cells, repainting only the area covered by the old and the new selection."""
+        previous, self._selection = self._selection, selection
+        for bounds in (previous.bounds(), selection.bounds()):
+            if bounds:
+                self.update(self.cell_rect(*bounds))
+
+    def selected_cells(self) -> set[tuple[int, int]]:
+        xs, ys = self._selection.cells()
+        return set(zip(xs.tolist(), ys.tolist()))
+
+    def select_cell(self, cell: GridCoordinate) -> bool:
+        """Add a cell to the selection, returns False if it was already selected."""
+        if (cell.x, cell.y) in self._selection:
+            return False
+        self._selection.add_rect(cell.x, cell.y, cell.x + 1, cell.y + 1)
+        self.update(self.cell_rect(cell.x - 1, cell.y - 1, cell.x + 2, cell.y + 2))
+        return True
+
+    def clear_selection(self):
+        if self._selection:
+            self.set_selection(Selection.like(self._model))
+
+    def chunk_rect(self, key: ChunkKey) -> QRectF:
+        size = self._model.chunk_size
+        return self.cell_rect(key[0] * size, key[1] * size, (key[0] + 1) * size, (key[1] + 1) * size)
+
+    def _on_model_changed(self, region: DirtyRegion):
+        self._cache.mark_dirty(region.chunks())
+        if bounds := region.bounds():
+            self.update(self.cell_rect(*bounds))
+
+    def _on_chunk_rendered(self, key: ChunkKey, _level: int):
+        self.update(self.chunk_rect(key))
+
+    def rasterize(self, chunk: Chunk, level: int) -> QImage:
+        with profiler.span("chunk.rasterize"):
+            return to_qimage(self._tileset.compose(chunk.ids, level))
+
+    def chunk_image(self, key: ChunkKey, chunk: Chunk, level: int) -> QImage:
+        """The image of a chunk at a level of detail, rasterized only if it is not cached."""
+        image = self._cache.get(key, level)
+        if image is None:
+            image = self.rasterize(chunk, level)
+            self._cache.put(key, level, image)
+        return image
+
+    def placeholder_image(self, key: ChunkKey, level: int) -> tuple[QImage, int] | None:
+        """The closest cached image of a chunk to a level of detail, preferring the same level even if stale."""
+        for candidate in sorted(range(self._tileset.max_level + 1), key=lambda other: abs(other - level)):
+            image = self._cache.stale(key, candidate)
+            if image is not None:
+                return image, candidate
+        return None
+
+    @staticmethod
+    def device_rect(painter: QPainter) -> QRectF | None:
+        """The paint device area in item coordinates, or None if the transform cannot be inverted."""
+        inverted, invertible = painter.worldTransform().inverted()
+        if not invertible:
+            return None
+        return inverted.mapRect(QRectF(0, 0, painter.device().width(), painter.device().height()))
+
+    @classmethod
+    def visible_rect(cls, painter: QPainter, option: QStyleOptionGraphicsItem) -> QRectF:
+        """The exposed rect, limited to the part that maps onto the paint device."""
+        device = cls.device_rect(painter)
+        return option.exposedRect if device is None else option.exposedRect.intersected(device)
+
+    @profiler.timed("tile_layer.paint")
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        exposed = self.visible_rect(painter, option)
+        x0, y0, x1, y1 = self.cells_in(exposed)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        # Once several tiles fall within a single pixel, draw the averaged colors from the pyramid instead
+        overview_level = level_for_scale(scale * self.tile_size, self.pyramid.max_level)
+        if overview_level > 0:
+            self._paint_overview(painter, exposed, overview_level)
+            return
+
+        level = level_for_scale(scale, self._tileset.max_level)
+        if level == 0 and self._use_atlas:
+            ids, _ = self._model.read_region(x0, y0, x1 - x0, y1 - y0)
+            self.atlas.draw(painter, ids, x0 * self.tile_size, y0 * self.tile_size, self.tile_size)
+        elif self._scheduler is None:
+            self._paint_chunks(painter, exposed, x0, y0, x1, y1, level)
+        else:
+            self._paint_pending(painter, exposed, level)
+
+        self._paint_selection(painter, x0, y0, x1, y1)
+
+    def _paint_chunks(self, painter: QPainter, exposed: QRectF, x0: int, y0: int, x1: int, y1: int, level: int):
+        for key, chunk in self._model.chunks_in(x0, y0, x1, y1):
+            self._paint_chunk(painter, exposed, key, self.chunk_image(key, chunk, level), level)
+
+    def _paint_pending(self, painter: QPainter, exposed: QRectF, level: int):
+        missing = []
+        for key in self._model.chunk_keys_in(*self.cells_in(exposed)):
+            image = self._cache.get(key, level)
+            if image is not None:
+                self._paint_chunk(painter, exposed, key, image, level)
+                continue
+
+            missing.append(key)
+            if placeholder := self.placeholder_image(key, level):
+                self._paint_chunk(painter, exposed, key, *placeholder)
+            else:
+                painter.fillRect(self.chunk_rect(key).intersected(exposed), self.PLACEHOLDER)
+
+        if missing:
+            # Request every chunk on the device, not just the exposed ones, so that a partial repaint does not
+            # cancel the jobs of chunks that are still in view
+            device = self.device_rect(painter) or exposed
+            x0, y0, x1, y1 = self.cells_in(device)
+            size = self._model.chunk_size
+            center = ((x0 + x1) / 2 / size, (y0 + y1) / 2 / size)
+            self._scheduler.request(self._model.chunk_keys_in(x0, y0, x1, y1), level, center)
+
+    def _paint_chunk(self, painter: QPainter, exposed: QRectF, key: ChunkKey, image: QImage, level: int):
+        pixels_per_unit = 1.0 / (1 << level)
+        chunk_rect = self.chunk_rect(key)
+        target = chunk_rect.intersected(exposed)
+        source = QRectF(
+            (target.left() - chunk_rect.left()) * pixels_per_unit,
+            (target.top() - chunk_rect.top()) * pixels_per_unit,
+            target.width() * pixels_per_unit,
+            target.height() * pixels_per_unit,
+        )
+        painter.drawImage(target, image, source)
+
+    def _paint_overview(self, painter: QPainter, exposed: QRectF, level: int):
+        self._paint_pyramid(painter, exposed, self.pyramid, level)
+
+    def _paint_pyramid(self, painter: QPainter, exposed: QRectF, pyramid: TilePyramid, level: int):
+        scene_units_per_pixel = self.tile_size * (1 << level)
+        source = QRectF(
+            exposed.left() / scene_units_per_pixel,
+            exposed.top() / scene_units_per_pixel,
+            exposed.width() / scene_units_per_pixel,
+            exposed.height() / scene_units_per_pixel,
+        )
+        painter.drawImage(exposed, pyramid.image(level), source)
+
+    def _paint_selection(self, painter: QPainter, x0: int, y0: int, x1: int, y1: int):
+        if not self._selection:
+            return
+
+        painter.setPen(QPen(Qt.white, 0))
+        painter.drawLines(self._outline_lines(x0, y0, x1, y1))
+
+    def _outline_lines(self, x0: int, y0: int, x1: int, y1: int) -> list[QLineF]:
+        """The selection outline within a range of cells, reused until the selection or the range changes."""
+        key = (id(self._selection), self._selection.version, x0, y0, x1, y1)
+        if self._outline is None or self._outline[0] != key:
+            segments = (self._selection.outline(x0, y0, x1, y1) * self.tile_size).tolist()
+            self._outline = key, [QLineF(*segment) for segment in segments]
+        return self._outline[1]
+
+
+class LayerStackItem(TileLayerItem):
+    """A tile layer item that draws every layer of a layer stack, flattened per chunk by a ChunkCompositor.
+
+    The model of the item is the model of the active layer, so the selection and painting tools edit that layer.
+    Edits of a layer that is not drawn repaint nothing. When zoomed far out, the pyramids of the drawn layers are
+    drawn on top of each other.
+
+    Args:
+        stack: The layers to draw, with at least one layer.
+        tileset: The tileset used to look up tile images of every layer.
+        cache: The cache for flattened chunks, defaults to a cache with the default budget.
+    """
+
+    def __init__(
+        self,
+        stack: LayerStack,
+        tileset: Tileset,
+        cache: ChunkRenderCache | None = None,
+        parent: QGraphicsItem | None = None,
+    ):
+        if stack.active is None:
+            raise ValueError("A layer stack needs a layer to be drawn")
+        super().__init__(stack.active.model, tileset, cache, parent=parent)
+        # Edits of every layer arrive through the stack instead
+        self._model.unsubscribe(self._on_model_changed)
+        self._stack = stack
+        self._compositor = ChunkCompositor(stack, tileset, self._cache)
+        self._pyramids: dict[Layer, TilePyramid] = {}
+        self._indexes: dict[Layer, TileGridIndex] = {}
+        stack.subscribe(self._on_layer_edited)
+        stack.subscribe_display(self._on_display_changed)
+
+    @property
+    def stack(self) -> LayerStack:
+        return self._stack
+
+    @property
+    def compositor(self) -> ChunkCompositor:
+        return self._compositor
+
+    @property
+    def model(self) -> ChunkedTileModel:
+        return self._stack.active.model
+
+    @property
+    def pyramid(self) -> TilePyramid:
+        return self._layer_pyramid(self._stack.active)
+
+    @property
+    def index(self) -> TileGridIndex:
+        layer = self._stack.active
+        if layer not in self._indexes:
+            self._indexes[layer] = TileGridIndex(layer.model)
+        return self._indexes[layer]
+
+    def _layer_pyramid(self, layer: Layer) -> TilePyramid:
+        if layer not in self._pyramids:
+            self._pyramids[layer] = TilePyramid(layer.model, self._tileset.colors())
+        return self._pyramids[layer]
+
+    def _on_layer_edited(self, layer: Layer, region: DirtyRegion):
+        if layer.drawn and (bounds := region.bounds()):
+            self.update(self.cell_rect(*bounds))
+
+    def _on_display_changed(self, layer: Layer):
+        if layer not in self._stack:
+            self._indexes.pop(layer, None)
+            if pyramid := self._pyramids.pop(layer, None):
+                layer.model.unsubscribe(pyramid.update)
+        self.update()
+
+    def _paint_chunks(self, painter: QPainter, exposed: QRectF, x0: int, y0: int, x1: int, y1: int, level: int):
+        for key in self._stack.chunk_keys_in(x0, y0, x1, y1):
+            if (image := self._compositor.image(key, level)) is not None:
+                self._paint_chunk(painter, exposed, key, image, level)
+
+    def _paint_overview(self, painter: QPainter, exposed: QRectF, level: int):
+        opacity = painter.opacity()
+        for layer in self._stack.drawn_layers():
+            painter.setOpacity(opacity * layer.opacity)
+            self._paint_pyramid(painter, exposed, self._layer_pyramid(layer), level)
+        painter.setOpacity(opacity)
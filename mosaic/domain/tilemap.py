@@ -0,0 +1,710 @@
+import contextlib
+import logging
+import threading
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from typing import Protocol
+
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64
+EMPTY = 0
+
+TILE_ID_DTYPE = np.uint32
+FLAGS_DTYPE = np.uint8
+
+ChunkKey = tuple[int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class GridCoordinate:
+    """A cell coordinate on the tile grid, in columns (x) and rows (y)."""
+
+    x: int
+    y: int
+
+
+@dataclass(frozen=True, slots=True)
+class GridTile:
+    """A tile placed on the grid.
+
+    Args:
+        x: The column of the tile.
+        y: The row of the tile.
+        tile_id: The id of the tile in its tileset, 0 is reserved for empty cells.
+        flags: Per-cell flags such as flips and rotations.
+    """
+
+    x: int
+    y: int
+    tile_id: int
+    flags: int = 0
+
+    def coordinate(self) -> GridCoordinate:
+        return GridCoordinate(self.x, self.y)
+
+
+class Chunk:
+    """A fixed-size block of cells, storing a tile id and flags per cell.
+
+    The epoch is that of the model when the chunk was allocated or last copied, a chunk from an earlier epoch may be
+    shared with a snapshot and is copied before it is written to.
+    """
+
+    __slots__ = ("ids", "flags", "count", "epoch")
+
+    def __init__(self, size: int):
+        self.ids = np.zeros((size, size), dtype=TILE_ID_DTYPE)
+        self.flags = np.zeros((size, size), dtype=FLAGS_DTYPE)
+        self.count = 0
+        self.epoch = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.flags.nbytes
+
+    def recount(self) -> int:
+        self.count = int(np.count_nonzero(self.ids))
+        return self.count
+
+    def copy(self) -> "Chunk":
+        chunk = Chunk(self.ids.shape[0])
+        chunk.ids[:] = self.ids
+        chunk.flags[:] = self.flags
+        chunk.count = self.count
+        return chunk
+
+
+class DirtyRegion:
+    """The set of cells changed by one or more edits, tracked as a bounding box per chunk.
+
+    Bounding boxes are in map cell coordinates and exclusive at the far edge.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._boxes: dict[ChunkKey, list[int]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._boxes)
+
+    def __contains__(self, key: ChunkKey) -> bool:
+        return key in self._boxes
+
+    def _add_box(self, key: ChunkKey, x0: int, y0: int, x1: int, y1: int):
+        if box := self._boxes.get(key):
+            box[0], box[1] = min(box[0], x0), min(box[1], y0)
+            box[2], box[3] = max(box[2], x1), max(box[3], y1)
+        else:
+            self._boxes[key] = [x0, y0, x1, y1]
+
+    def add(self, x0: int, y0: int, x1: int, y1: int):
+        """Mark the cells in [x0, x1) x [y0, y1) as changed."""
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        size = self.chunk_size
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                self._add_box(
+                    (cx, cy),
+                    max(x0, cx * size),
+                    max(y0, cy * size),
+                    min(x1, (cx + 1) * size),
+                    min(y1, (cy + 1) * size),
+                )
+
+    def add_cells(self, xs: np.ndarray, ys: np.ndarray):
+        """Mark individual cells as changed, grouping them per chunk."""
+        for key, (cxs, cys) in _group_by_chunk(xs, ys, self.chunk_size):
+            self._add_box(key, int(cxs.min()), int(cys.min()), int(cxs.max()) + 1, int(cys.max()) + 1)
+
+    def update(self, other: "DirtyRegion"):
+        for key, box in other._boxes.items():
+            self._add_box(key, *box)
+
+    def chunks(self) -> list[ChunkKey]:
+        return list(self._boxes)
+
+    def boxes(self) -> Iterator[tuple[ChunkKey, tuple[int, int, int, int]]]:
+        for key, box in self._boxes.items():
+            yield key, tuple(box)
+
+    def bounds(self) -> tuple[int, int, int, int] | None:
+        """The bounding box of all changes, or None if nothing changed."""
+        if not self._boxes:
+            return None
+        boxes = np.array(list(self._boxes.values()))
+        return (
+            int(boxes[:, 0].min()),
+            int(boxes[:, 1].min()),
+            int(boxes[:, 2].max()),
+            int(boxes[:, 3].max()),
+        )
+
+
+class ChunkSource(Protocol):
+    """A store of chunks that a model loads from on first access, such as a map file."""
+
+    def chunk_keys(self) -> Iterable[ChunkKey]: ...
+
+    def cell_count(self, key: ChunkKey) -> int: ...
+
+    def load_chunk(self, key: ChunkKey) -> Chunk: ...
+
+
+def _group_by_chunk(xs: np.ndarray, ys: np.ndarray, size: int, *arrays: np.ndarray):
+    """Group cell coordinates (and any matching value arrays) by the chunk they fall in."""
+    if len(xs) == 0:
+        return
+
+    cx = xs // size
+    cy = ys // size
+    # Pack chunk coordinates into a single sortable key, chunk counts per axis stay well below 2**31
+    keys = (cy.astype(np.int64) << 32) | cx.astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    splits = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate(([0], splits))
+    ends = np.concatenate((splits, [len(keys)]))
+
+    sorted_arrays = [xs[order], ys[order]] + [array[order] for array in arrays]
+    for start, end in zip(starts, ends):
+        key = (int(cx[order[start]]), int(cy[order[start]]))
+        yield key, [array[start:end] for array in sorted_arrays]
+
+
+class ChunkedTileModel:
+    """A sparse tile model that stores cells in fixed-size chunks.
+
+    Chunks are only allocated once something is written into them and are released again when they become empty,
+    so memory scales with the painted area rather than the bounds of the map. Tile id 0 marks an empty cell.
+
+    A model can be backed by a ChunkSource, in which case chunks of the source are only decoded when an edit or a
+    query first touches them.
+
+    Taking a snapshot is O(1): the snapshot shares the chunks of the model, and the model copies a chunk before its
+    first write after the snapshot, so memory only grows with the chunks edited since. Chunks are freed by reference
+    counting once neither the model nor any snapshot holds them.
+
+    Args:
+        width: The width of the map in cells.
+        height: The height of the map in cells.
+        chunk_size: The width and height of a chunk in cells.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = CHUNK_SIZE):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid map size {width}x{height}")
+        if chunk_size <= 0:
+            raise ValueError(f"Invalid chunk size {chunk_size}")
+
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self._chunks: dict[ChunkKey, Chunk] = {}
+        self._source: ChunkSource | None = None
+        self._unloaded: set[ChunkKey] = set()
+        self._listeners: list[Callable[[DirtyRegion], None]] = []
+        self._write_listeners: list[Callable[[ChunkKey, Chunk | None], None]] = []
+        self._batch_depth = 0
+        self._pending: DirtyRegion | None = None
+        # Snapshots share the chunk table and the set of unloaded keys until the model first changes them
+        self._epoch = 0
+        self._shared = False
+        self._snapshots: weakref.WeakSet[TileSnapshot] = weakref.WeakSet()
+
+    @property
+    def chunk_columns(self) -> int:
+        return -(-self.width // self.chunk_size)
+
+    @property
+    def chunk_rows(self) -> int:
+        return -(-self.height // self.chunk_size)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by loaded chunks."""
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+    def __len__(self) -> int:
+        """The number of non-empty cells."""
+        loaded = sum(chunk.count for chunk in self._chunks.values())
+        return loaded + sum(self._source.cell_count(key) for key in self._unloaded)
+
+    def contains(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def chunk_keys(self) -> list[ChunkKey]:
+        """The keys of all non-empty chunks, loaded or not."""
+        return list(self._chunks) + list(self._unloaded)
+
+    def loaded_chunk_keys(self) -> list[ChunkKey]:
+        return list(self._chunks)
+
+    def is_loaded(self, key: ChunkKey) -> bool:
+        return key not in self._unloaded
+
+    def chunk(self, key: ChunkKey) -> Chunk | None:
+        """The chunk with the given key, loading it from the source if needed."""
+        chunk = self._chunks.get(key)
+        if chunk is None and key in self._unloaded:
+            chunk = self._load(key)
+        return chunk
+
+    def attach_source(self, source: ChunkSource):
+        """Back the model by a source, whose chunks are loaded on first access.
+
+        Chunks that are already loaded in the model take precedence over those of the source.
+        """
+        self._own()
+        self._source = source
+        self._unloaded = set(source.chunk_keys()) - self._chunks.keys()
+
+    @property
+    def source(self) -> ChunkSource | None:
+        return self._source
+
+    def install_chunk(self, key: ChunkKey, chunk: Chunk) -> bool:
+        """Install a chunk that was decoded from the source elsewhere, such as on a worker thread.
+
+        Returns False, leaving the model unchanged, if the chunk has been loaded in the meantime.
+        """
+        if key not in self._unloaded:
+            return False
+        self._install(key, chunk)
+        return True
+
+    def _load(self, key: ChunkKey) -> Chunk:
+        chunk = self._source.load_chunk(key)
+        self._install(key, chunk)
+        return chunk
+
+    def _install(self, key: ChunkKey, chunk: Chunk):
+        # Snapshots that have not decoded the chunk yet get this one, as the source may change once it is edited
+        shared = False
+        for snapshot in list(self._snapshots):
+            shared |= snapshot._preload(key, chunk)
+        chunk.epoch = self._epoch - 1 if shared else self._epoch
+        self._own()
+        self._chunks[key] = chunk
+        self._unloaded.discard(key)
+
+    def snapshot(self) -> "TileSnapshot":
+        """A read-only view of the model as it is now, in O(1), which later edits of the model do not change.
+
+        A snapshot can be read from other threads without locking while the model keeps being edited.
+        """
+        snapshot = TileSnapshot(self)
+        self._epoch += 1
+        self._shared = True
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def _own(self):
+        """Copy the chunk table and the unloaded keys before changing them, if a snapshot shares them."""
+        if self._shared:
+            self._chunks = dict(self._chunks)
+            self._unloaded = set(self._unloaded)
+            self._shared = False
+
+    def subscribe(self, listener: Callable[[DirtyRegion], None]):
+        """Register a callback that receives the dirty region of every edit, or of every batch of edits."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[DirtyRegion], None]):
+        self._listeners.remove(listener)
+
+    def subscribe_writes(self, listener: Callable[[ChunkKey, Chunk | None], None]):
+        """Register a callback that receives every chunk, or None if unallocated, right before it is written to."""
+        self._write_listeners.append(listener)
+
+    def unsubscribe_writes(self, listener: Callable[[ChunkKey, Chunk | None], None]):
+        self._write_listeners.remove(listener)
+
+    def _before_write(self, key: ChunkKey, chunk: Chunk | None):
+        for listener in self._write_listeners:
+            listener(key, chunk)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Coalesce all edits made inside the context into a single change notification."""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._pending is not None:
+                pending, self._pending = self._pending, None
+                self._notify(pending)
+
+    def _changed(self, region: DirtyRegion):
+        if not region:
+            return
+        if self._batch_depth:
+            if self._pending is None:
+                self._pending = DirtyRegion(self.chunk_size)
+            self._pending.update(region)
+        else:
+            self._notify(region)
+
+    def _notify(self, region: DirtyRegion):
+        for listener in list(self._listeners):
+            listener(region)
+
+    def _writable_chunk(self, key: ChunkKey) -> Chunk:
+        chunk = self.chunk(key)
+        if self._write_listeners:
+            self._before_write(key, chunk)
+        if chunk is None:
+            chunk = Chunk(self.chunk_size)
+        elif chunk.epoch == self._epoch:
+            return chunk
+        else:
+            # Copy on write, the chunk may be shared with a snapshot taken since it was last copied
+            chunk = chunk.copy()
+        chunk.epoch = self._epoch
+        self._own()
+        self._chunks[key] = chunk
+        return chunk
+
+    def _release_if_empty(self, key: ChunkKey, chunk: Chunk):
+        if chunk.recount() == 0:
+            self._own()
+            del self._chunks[key]
+
+    def _check_bounds(self, xs: np.ndarray, ys: np.ndarray):
+        if len(xs) and (xs.min() < 0 or ys.min() < 0 or xs.max() >= self.width or ys.max() >= self.height):
+            raise IndexError(f"Coordinates outside of map bounds {self.width}x{self.height}")
+
+    def _clip(self, x: int, y: int, width: int, height: int) -> tuple[int, int, int, int]:
+        return max(x, 0), max(y, 0), min(x + width, self.width), min(y + height, self.height)
+
+    def chunk_keys_in(self, x0: int, y0: int, x1: int, y1: int) -> list[ChunkKey]:
+        """The keys of the non-empty chunks intersecting [x0, x1) x [y0, y1), without loading them."""
+        if x1 <= x0 or y1 <= y0:
+            return []
+
+        size = self.chunk_size
+        cx0, cy0, cx1, cy1 = x0 // size, y0 // size, (x1 - 1) // size, (y1 - 1) // size
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(self._chunks) + len(self._unloaded):
+            keys = ((cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1))
+            return [key for key in keys if key in self._chunks or key in self._unloaded]
+        return [key for key in self.chunk_keys() if cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1]
+
+    def chunks_in(self, x0: int, y0: int, x1: int, y1: int) -> Iterator[tuple[ChunkKey, Chunk]]:
+        """Yield the non-empty chunks intersecting [x0, x1) x [y0, y1), loading them if needed."""
+        for key in self.chunk_keys_in(x0, y0, x1, y1):
+            if (chunk := self.chunk(key)) is not None:
+                yield key, chunk
+
+    def _window(self, key: ChunkKey, x0: int, y0: int, x1: int, y1: int) -> tuple[slice, slice, slice, slice]:
+        """Slices of the chunk and of a region array starting at (x0, y0) where they overlap."""
+        size = self.chunk_size
+        ox, oy = key[0] * size, key[1] * size
+        sx0, sy0 = max(x0, ox), max(y0, oy)
+        sx1, sy1 = min(x1, ox + size), min(y1, oy + size)
+        chunk_window = (slice(sy0 - oy, sy1 - oy), slice(sx0 - ox, sx1 - ox))
+        region_window = (slice(sy0 - y0, sy1 - y0), slice(sx0 - x0, sx1 - x0))
+        return chunk_window + region_window
+
+    def insert(self, tile: GridTile):
+        """Place a single tile on the grid, replacing whatever was in its cell."""
+        self.insert_many(np.array([tile.x]), np.array([tile.y]), np.array([tile.tile_id]), np.array([tile.flags]))
+
+    def remove(self, tile: GridTile | GridCoordinate):
+        """Clear the cell of a tile or coordinate."""
+        self.remove_region(tile.x, tile.y, 1, 1)
+
+    def tile_at(self, coordinate: GridCoordinate) -> GridTile | None:
+        """The tile at a coordinate, or None if the cell is empty or outside of the map."""
+        x, y = coordinate.x, coordinate.y
+        if not self.contains(x, y):
+            return None
+
+        size = self.chunk_size
+        chunk = self.chunk((x // size, y // size))
+        if chunk is None:
+            return None
+
+        tile_id = chunk.ids[y % size, x % size]
+        if tile_id == EMPTY:
+            return None
+        return GridTile(x, y, int(tile_id), int(chunk.flags[y % size, x % size]))
+
+    def insert_many(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        tile_ids: np.ndarray | int,
+        flags: np.ndarray | int = 0,
+    ):
+        """Write tiles into many cells at once.
+
+        Cells are grouped per chunk and written with a single vectorized assignment per chunk. Writing tile id 0
+        clears a cell.
+
+        Args:
+            xs: The columns of the cells.
+            ys: The rows of the cells.
+            tile_ids: The tile id for each cell, or a single id for all cells.
+            flags: The flags for each cell, or a single value for all cells.
+        """
+        xs = np.asarray(xs, dtype=np.int64).ravel()
+        ys = np.asarray(ys, dtype=np.int64).ravel()
+        if xs.shape != ys.shape:
+            raise ValueError("Coordinate arrays must have the same length")
+        self._check_bounds(xs, ys)
+
+        tile_ids = np.broadcast_to(np.asarray(tile_ids, dtype=TILE_ID_DTYPE).ravel(), xs.shape)
+        flags = np.broadcast_to(np.asarray(flags, dtype=FLAGS_DTYPE).ravel(), xs.shape)
+
+        size = self.chunk_size
+        region = DirtyRegion(size)
+        for key, (cxs, cys, cids, cflags) in _group_by_chunk(xs, ys, size, tile_ids, flags):
+            if not cids.any() and self.chunk(key) is None:
+                continue
+
+            chunk = self._writable_chunk(key)
+            lx, ly = cxs - key[0] * size, cys - key[1] * size
+            chunk.ids[ly, lx] = cids
+            chunk.flags[ly, lx] = np.where(cids == EMPTY, 0, cflags)
+            self._release_if_empty(key, chunk)
+            region._add_box(key, int(cxs.min()), int(cys.min()), int(cxs.max()) + 1, int(cys.max()) + 1)
+
+        self._changed(region)
+
+    def fill_region(self, x: int, y: int, width: int, height: int, tile_id: int, flags: int = 0):
+        """Fill a rectangular region with a single tile."""
+        if tile_id == EMPTY:
+            self.remove_region(x, y, width, height)
+            return
+
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        size = self.chunk_size
+        region = DirtyRegion(size)
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                chunk = self._writable_chunk((cx, cy))
+                cy_slice, cx_slice, _, _ = self._window((cx, cy), x0, y0, x1, y1)
+                chunk.ids[cy_slice, cx_slice] = tile_id
+                chunk.flags[cy_slice, cx_slice] = flags
+                chunk.recount()
+        region.add(x0, y0, x1, y1)
+        self._changed(region)
+
+    def write_cells(self, cells: Iterable[tuple[ChunkKey, np.ndarray, np.ndarray, np.ndarray]]):
+        """Write cells given per chunk as flat row-major indices within the chunk, notifying listeners once.
+
+        Args:
+            cells: Tuples of a chunk key, the flat indices of the cells, and their tile ids and flags.
+        """
+        size = self.chunk_size
+        region = DirtyRegion(size)
+        for key, indices, ids, flags in cells:
+            if not len(indices) or (not ids.any() and self.chunk(key) is None):
+                continue
+
+            chunk = self._writable_chunk(key)
+            chunk.ids.ravel()[indices] = ids
+            chunk.flags.ravel()[indices] = np.where(ids == EMPTY, 0, flags)
+            self._release_if_empty(key, chunk)
+            rows, columns = np.divmod(indices, size)
+            ox, oy = key[0] * size, key[1] * size
+            region._add_box(
+                key,
+                ox + int(columns.min()),
+                oy + int(rows.min()),
+                ox + int(columns.max()) + 1,
+                oy + int(rows.max()) + 1,
+            )
+
+        self._changed(region)
+
+    def fill_mask(self, x: int, y: int, mask: np.ndarray, tile_id: int, flags: int = 0):
+        """Fill the set cells of a boolean mask whose first cell is at (x, y) with a single tile.
+
+        Each chunk is written with one assignment, a slice assignment where the mask covers the whole window of the
+        chunk, and listeners are notified once. Parts of the mask outside of the map are ignored.
+
+        Args:
+            x: The column of the first cell of the mask.
+            y: The row of the first cell of the mask.
+            mask: The cells to fill, indexed [row, column].
+            tile_id: The tile to fill with, tile id 0 clears the cells.
+            flags: The flags of the filled cells.
+        """
+        height, width = mask.shape
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        size = self.chunk_size
+        flags = flags if tile_id != EMPTY else 0
+        region = DirtyRegion(size)
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                key = (cx, cy)
+                cy_slice, cx_slice, ry_slice, rx_slice = self._window(key, x, y, x1, y1)
+                window = mask[ry_slice, rx_slice]
+                if window.all():
+                    chunk = self._writable_chunk(key)
+                    chunk.ids[cy_slice, cx_slice] = tile_id
+                    chunk.flags[cy_slice, cx_slice] = flags
+                elif window.any() and (tile_id != EMPTY or self.chunk(key) is not None):
+                    chunk = self._writable_chunk(key)
+                    chunk.ids[cy_slice, cx_slice][window] = tile_id
+                    chunk.flags[cy_slice, cx_slice][window] = flags
+                else:
+                    continue
+                self._release_if_empty(key, chunk)
+                # The whole window is marked dirty, finding the bounds of the set cells costs more than it saves
+                region._add_box(key, x + rx_slice.start, y + ry_slice.start, x + rx_slice.stop, y + ry_slice.stop)
+
+        self._changed(region)
+
+    def remove_region(self, x: int, y: int, width: int, height: int):
+        """Clear all cells in a rectangular region, releasing chunks that become empty."""
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+
+        region = DirtyRegion(self.chunk_size)
+        for key in self.chunk_keys_in(x0, y0, x1, y1):
+            chunk = self._writable_chunk(key)
+            cy_slice, cx_slice, ry_slice, rx_slice = self._window(key, x0, y0, x1, y1)
+            chunk.ids[cy_slice, cx_slice] = EMPTY
+            chunk.flags[cy_slice, cx_slice] = 0
+            self._release_if_empty(key, chunk)
+            region._add_box(key, x0 + rx_slice.start, y0 + ry_slice.start, x0 + rx_slice.stop, y0 + ry_slice.stop)
+
+        self._changed(region)
+
+    def read_region(self, x: int, y: int, width: int, height: int) -> tuple[np.ndarray, np.ndarray]:
+        """Copy the tile ids and flags of a rectangular region into dense arrays, indexed [row, column].
+
+        Cells outside of the map or in unallocated chunks read as empty.
+        """
+        ids = np.zeros((max(height, 0), max(width, 0)), dtype=TILE_ID_DTYPE)
+        flags = np.zeros_like(ids, dtype=FLAGS_DTYPE)
+
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        for key, chunk in self.chunks_in(x0, y0, x1, y1):
+            cy_slice, cx_slice, ry_slice, rx_slice = self._window(key, x, y, x1, y1)
+            ids[ry_slice, rx_slice] = chunk.ids[cy_slice, cx_slice]
+            flags[ry_slice, rx_slice] = chunk.flags[cy_slice, cx_slice]
+
+        return ids, flags
+
+    def read_ids(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        """Copy only the tile ids of a rectangular region into a dense array, see read_region."""
+        ids = np.zeros((max(height, 0), max(width, 0)), dtype=TILE_ID_DTYPE)
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        for key, chunk in self.chunks_in(x0, y0, x1, y1):
+            cy_slice, cx_slice, ry_slice, rx_slice = self._window(key, x, y, x1, y1)
+            ids[ry_slice, rx_slice] = chunk.ids[cy_slice, cx_slice]
+        return ids
+
+    def write_region(self, x: int, y: int, ids: np.ndarray, flags: np.ndarray | None = None):
+        """Write dense arrays of tile ids and flags into the region starting at (x, y)."""
+        height, width = ids.shape
+        if flags is None:
+            flags = np.zeros_like(ids, dtype=FLAGS_DTYPE)
+
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        size = self.chunk_size
+        region = DirtyRegion(size)
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                cy_slice, cx_slice, ry_slice, rx_slice = self._window((cx, cy), x, y, x1, y1)
+                window_ids = ids[ry_slice, rx_slice]
+                if not window_ids.any() and self.chunk((cx, cy)) is None:
+                    continue
+                chunk = self._writable_chunk((cx, cy))
+                chunk.ids[cy_slice, cx_slice] = window_ids
+                chunk.flags[cy_slice, cx_slice] = np.where(window_ids == EMPTY, 0, flags[ry_slice, rx_slice])
+                self._release_if_empty((cx, cy), chunk)
+        region.add(x0, y0, x1, y1)
+        self._changed(region)
+
+
+class TileSnapshot(ChunkedTileModel):
+    """A read-only view of a model at the time it was taken, see ChunkedTileModel.snapshot.
+
+    A snapshot shares the chunks of its model and never changes, so it can be read from any thread without locking.
+    Chunks that were not loaded from the source of the model yet are decoded by the snapshot itself, or handed over
+    by the model when it loads them first. Writing to a snapshot raises a TypeError.
+
+    Args:
+        model: The model to take a snapshot of.
+    """
+
+    def __init__(self, model: ChunkedTileModel):
+        super().__init__(model.width, model.height, model.chunk_size)
+        self._chunks = model._chunks
+        self._unloaded = model._unloaded
+        self._source = model._source
+        self._decoded: dict[ChunkKey, Chunk] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            decoded = list(self._decoded.values())
+        return super().nbytes + sum(chunk.nbytes for chunk in decoded)
+
+    def __len__(self) -> int:
+        loaded = sum(chunk.count for chunk in self._chunks.values())
+        with self._lock:
+            decoded = dict(self._decoded)
+        return loaded + sum(
+            decoded[key].count if key in decoded else self._source.cell_count(key) for key in self._unloaded
+        )
+
+    def snapshot(self) -> "TileSnapshot":
+        return self
+
+    def loaded_chunk_keys(self) -> list[ChunkKey]:
+        with self._lock:
+            return list(self._chunks) + list(self._decoded)
+
+    def is_loaded(self, key: ChunkKey) -> bool:
+        return key not in self._unloaded or key in self._decoded
+
+    def attach_source(self, source: ChunkSource):
+        raise TypeError("Cannot attach a source to a snapshot")
+
+    def install_chunk(self, key: ChunkKey, chunk: Chunk) -> bool:
+        return self._preload(key, chunk)
+
+    def _preload(self, key: ChunkKey, chunk: Chunk) -> bool:
+        if key not in self._unloaded:
+            return False
+        with self._lock:
+            return self._decoded.setdefault(key, chunk) is chunk
+
+    def _load(self, key: ChunkKey) -> Chunk:
+        with self._lock:
+            chunk = self._decoded.get(key)
+        if chunk is not None:
+            return chunk
+        try:
+            chunk = self._source.load_chunk(key)
+        except Exception:
+            # The model may have loaded the chunk, and saved an edit of it over the data being decoded
+            with self._lock:
+                if key in self._decoded:
+                    return self._decoded[key]
+            raise
+        with self._lock:
+            return self._decoded.setdefault(key, chunk)
+
+    def _writable_chunk(self, key: ChunkKey) -> Chunk:
+        raise TypeError("Cannot write to a snapshot")
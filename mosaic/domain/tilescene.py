@@ -1,9 +1,21 @@
 from typing import Protocol
 
-from PySide6.QtCore import QSize, Qt
+from PySide6.QtCore import QPointF, QSize, Qt
 from PySide6.QtGui import QBrush, QColor, QPen
 from PySide6.QtWidgets import QGraphicsScene, QGraphicsItem
 
+from mosaic.domain.history import UndoStack
+from mosaic.domain.render_cache import DEFAULT_BUDGET, CacheStats, ChunkRenderCache
+from mosaic.domain.layers import LayerStack
+from mosaic.domain.object_layer import ObjectLayerItem
+from mosaic.domain.objects import ObjectStore
+from mosaic.domain.tile_layer import LayerStackItem, TileLayerItem
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate
+from mosaic.domain.tileset import DEFAULT_PALETTE, Tileset
+
+BOUNDARY_Z = 1.0
+OBJECTS_Z = 0.5
+
 
 class Coordinate(Protocol):
     pass
@@ -22,11 +34,98 @@ class TileModel(Protocol):
 
 
 class TileScene(QGraphicsScene):
-    def __init__(self):
+    """The scene holding the tile map being edited.
+
+    When a tile model is provided, the whole map is drawn by a single TileLayerItem that only paints the cells in
+    view, instead of keeping one graphics item per tile, and its edits are recorded in an undo stack. A map with
+    several layers is drawn by a LayerStackItem instead, which flattens the layers per chunk, and the edits of every
+    layer are recorded in the same undo stack.
+
+    Args:
+        model: An optional tile model to display.
+        layers: An optional stack of layers to display instead of a single model.
+        tileset: The tileset to draw the model with, defaults to a palette of solid colors.
+        cache_budget: The memory budget in bytes for rasterized chunks of the tile layer.
+        background_loading: Whether the tile layer loads and rasterizes chunks on a worker pool.
+        use_atlas: Whether the tile layer draws the full resolution level from a texture atlas of the tileset.
+        objects: An optional store of free-placed objects, drawn above the tiles by a single ObjectLayerItem.
+    """
+
+    def __init__(
+        self,
+        model: ChunkedTileModel | None = None,
+        layers: LayerStack | None = None,
+        tileset: Tileset | None = None,
+        cache_budget: int = DEFAULT_BUDGET,
+        background_loading: bool = False,
+        use_atlas: bool = False,
+        objects: ObjectStore | None = None,
+    ):
         super().__init__()
+        if model is not None and layers is not None:
+            raise ValueError("A scene displays either a model or a stack of layers")
+        self._tile_layer: TileLayerItem | None = None
+        self._undo_stack: UndoStack | None = None
+        self._object_layer: ObjectLayerItem | None = None
+        self._layers = layers
+
+        if layers is not None:
+            tileset = tileset or Tileset.from_colors(DEFAULT_PALETTE, 32)
+            self._tile_layer = LayerStackItem(layers, tileset, ChunkRenderCache(cache_budget))
+            self.addItem(self._tile_layer)
+            self._undo_stack = UndoStack(layers.active.model, parent=self)
+            self.create_boundary(QSize(layers.width, layers.height), QSize(tileset.tile_size, tileset.tile_size))
+        elif model is not None:
+            tileset = tileset or Tileset.from_colors(DEFAULT_PALETTE, 32)
+            self._tile_layer = TileLayerItem(
+                model,
+                tileset,
+                ChunkRenderCache(cache_budget),
+                background_loading=background_loading,
+                use_atlas=use_atlas,
+            )
+            self.addItem(self._tile_layer)
+            self._undo_stack = UndoStack(model, parent=self)
+            self.create_boundary(QSize(model.width, model.height), QSize(tileset.tile_size, tileset.tile_size))
+        else:
+            # self.create_tiles(10, 15, 50)
+            self.create_boundary(QSize(30, 20), QSize(32, 32))
 
-        # self.create_tiles(10, 15, 50)
-        self.create_boundary(QSize(30, 20), QSize(32, 32))
+        if objects is not None:
+            self._object_layer = ObjectLayerItem(objects, tileset.tile_size if tileset is not None else 32)
+            self._object_layer.setZValue(OBJECTS_Z)
+            self.addItem(self._object_layer)
+
+    @property
+    def tile_layer(self) -> TileLayerItem | None:
+        return self._tile_layer
+
+    @property
+    def object_layer(self) -> ObjectLayerItem | None:
+        return self._object_layer
+
+    @property
+    def layers(self) -> LayerStack | None:
+        return self._layers
+
+    @property
+    def undo_stack(self) -> UndoStack | None:
+        return self._undo_stack
+
+    @property
+    def render_cache(self) -> ChunkRenderCache | None:
+        return self._tile_layer.cache if self._tile_layer is not None else None
+
+    def cache_stats(self) -> CacheStats | None:
+        """Size and hit/miss counters of the chunk render cache, or None if there is no tile layer."""
+        cache = self.render_cache
+        return cache.stats() if cache is not None else None
+
+    def cell_at(self, position: QPointF) -> GridCoordinate | None:
+        """The cell under a scene position, or None if there is no tile layer or the position is outside of it."""
+        if self._tile_layer is None:
+            return None
+        return self._tile_layer.cell_at(self._tile_layer.mapFromScene(position))
 
     def create_tiles(
         self,
@@ -48,5 +147,5 @@ class TileScene(QGraphicsScene):
         item.setFlag(QGraphicsItem.ItemIsSelectable)
         # red pen, 2px width
         item.setPen(QPen(Qt.red, 2))
-
-        # item.setZValue(-1)
+        # Keep the outline above the tiles regardless of the order items are added in
+        item.setZValue(BOUNDARY_Z)
@@ -0,0 +1,101 @@
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+
+from mosaic.domain.tilemap import EMPTY
+
+DEFAULT_PALETTE = [
+    (86, 130, 89),
+    (125, 161, 97),
+    (176, 190, 118),
+    (218, 200, 140),
+    (196, 150, 96),
+    (142, 108, 80),
+    (104, 110, 122),
+    (150, 158, 168),
+    (72, 118, 170),
+    (110, 168, 204),
+    (210, 226, 234),
+    (180, 84, 72),
+]
+
+
+class Tileset:
+    """A set of equally sized tile images, indexed by tile id.
+
+    Tile images are stored as a single RGBA (premultiplied) array of shape (count, height, width, 4), with tile id 0
+    reserved for the transparent empty tile. Downsampled copies of all tiles are built on demand, so a region of
+    the map can be composed at the resolution it is displayed at.
+
+    Args:
+        tiles: The tile images, excluding the empty tile, as an array of shape (count, height, width, 4).
+    """
+
+    def __init__(self, tiles: np.ndarray):
+        if tiles.ndim != 4 or tiles.shape[3] != 4:
+            raise ValueError(f"Expected tiles of shape (count, height, width, 4), got {tiles.shape}")
+
+        empty = np.zeros((1,) + tiles.shape[1:], dtype=np.uint8)
+        self._levels: list[np.ndarray] = [np.concatenate((empty, tiles.astype(np.uint8)))]
+        # Guards building levels, as chunk jobs compose regions from worker threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_colors(cls, colors: Sequence[tuple[int, ...]], tile_size: int) -> "Tileset":
+        """Create a tileset of solid colored tiles, where color i is used for tile id i + 1."""
+        rgba = np.array([tuple(color) + (255,) * (4 - len(color)) for color in colors], dtype=np.uint8)
+        tiles = np.broadcast_to(rgba[:, None, None, :], (len(rgba), tile_size, tile_size, 4))
+        return cls(np.ascontiguousarray(tiles))
+
+    def __len__(self) -> int:
+        """The number of tiles, including the empty tile."""
+        return len(self._levels[0])
+
+    @property
+    def tile_size(self) -> int:
+        return self._levels[0].shape[1]
+
+    @property
+    def max_level(self) -> int:
+        """The coarsest level available, where each tile is a single pixel."""
+        size, level = self.tile_size, 0
+        while size > 1 and size % 2 == 0:
+            size //= 2
+            level += 1
+        return level
+
+    def tiles(self, level: int = 0) -> np.ndarray:
+        """The tile images downsampled by a factor 2**level."""
+        level = min(max(level, 0), self.max_level)
+        if len(self._levels) <= level:
+            with self._lock:
+                while len(self._levels) <= level:
+                    previous = self._levels[-1]
+                    count, height, width, channels = previous.shape
+                    blocks = previous.reshape(count, height // 2, 2, width // 2, 2, channels).astype(np.uint16)
+                    self._levels.append((blocks.sum(axis=(2, 4)) // 4).astype(np.uint8))
+        return self._levels[level]
+
+    def colors(self) -> np.ndarray:
+        """The average color of each tile, as an array of shape (count, 4)."""
+        return self.tiles(self.max_level).reshape(len(self), -1, 4)[:, 0, :]
+
+    def compose(self, ids: np.ndarray, level: int = 0) -> np.ndarray:
+        """Compose a region of tile ids into a single image.
+
+        All tiles are gathered with one vectorized lookup instead of drawing them one by one. Unknown ids are drawn
+        as empty.
+
+        Args:
+            ids: The tile ids of the region, indexed [row, column].
+            level: The level of detail to compose the region at.
+
+        Returns:
+            An RGBA array of shape (rows * tile height, columns * tile width, 4).
+        """
+        tiles = self.tiles(level)
+        ids = np.where(ids < len(tiles), ids, EMPTY)
+        rows, cols = ids.shape
+        _, height, width, channels = tiles.shape
+        return tiles[ids].transpose(0, 2, 1, 3, 4).reshape(rows * height, cols * width, channels)
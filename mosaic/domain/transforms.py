@@ -0,0 +1,112 @@
+import logging
+from collections.abc import Mapping
+
+import numpy as np
+
+from mosaic.domain.tilemap import EMPTY, TILE_ID_DTYPE, ChunkedTileModel, ChunkKey
+from mosaic.domain.tileset import Tileset
+
+_logger = logging.getLogger(__name__)
+
+
+class ValidationError(ValueError):
+    """Raised when a map fails validation, holding every problem found."""
+
+    def __init__(self, problems: list[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def lookup_table(mapping: Mapping[int, int]) -> np.ndarray:
+    """A table mapping each tile id to its replacement, ids that are not in the mapping map to themselves."""
+    if any(old == EMPTY or new < 0 for old, new in mapping.items()):
+        raise ValueError("Cannot remap the empty tile or map to a negative tile id")
+    table = np.arange(max(mapping, default=EMPTY) + 1, dtype=TILE_ID_DTYPE)
+    for old, new in mapping.items():
+        table[old] = new
+    return table
+
+
+def match_tiles(source: Tileset, target: Tileset) -> np.ndarray:
+    """A lookup table mapping each tile of a tileset to the tile of another tileset with the closest average color."""
+    source_colors = source.colors()[1:].astype(np.int32)
+    target_colors = target.colors()[1:].astype(np.int32)
+    distances = ((source_colors[:, None, :] - target_colors[None, :, :]) ** 2).sum(axis=2)
+    table = np.zeros(len(source), dtype=TILE_ID_DTYPE)
+    table[1:] = distances.argmin(axis=1) + 1
+    return table
+
+
+def _extent(model: ChunkedTileModel, key: ChunkKey) -> tuple[int, int, int, int]:
+    size = model.chunk_size
+    x, y = key[0] * size, key[1] * size
+    return x, y, min(size, model.width - x), min(size, model.height - y)
+
+
+def remap_tiles(model: ChunkedTileModel, table: np.ndarray) -> int:
+    """Replace the tile id of every cell through a lookup table, a single vectorized lookup per chunk.
+
+    Ids past the end of the table are left unchanged, and cells that are mapped to the empty tile are cleared.
+
+    Returns:
+        The number of cells that changed.
+    """
+    table = np.asarray(table, dtype=TILE_ID_DTYPE)
+    last = len(table) - 1
+    changed = 0
+    with model.batch():
+        for key in model.chunk_keys():
+            chunk = model.chunk(key)
+            ids = np.where(chunk.ids <= last, table[np.minimum(chunk.ids, last)], chunk.ids)
+            count = int(np.count_nonzero(ids != chunk.ids))
+            if count:
+                x, y, width, height = _extent(model, key)
+                model.write_region(x, y, ids[:height, :width], chunk.flags[:height, :width])
+                changed += count
+    return changed
+
+
+def validate_model(model: ChunkedTileModel, tile_count: int) -> list[str]:
+    """Check that a model only uses the tiles of a tileset and that its chunks match their stored cell counts.
+
+    Args:
+        model: The model to check.
+        tile_count: The number of tiles of the tileset, including the empty tile, so valid ids are below it.
+
+    Returns:
+        A description of each problem found, empty if the model is valid.
+    """
+    problems = []
+    unknown: set[int] = set()
+    unknown_cells = 0
+    for key in sorted(model.chunk_keys()):
+        expected = None if model.is_loaded(key) else model.source.cell_count(key)
+        chunk = model.chunk(key)
+        if expected is not None and expected != chunk.count:
+            problems.append(f"Chunk {key} holds {chunk.count} tiles, its index records {expected}")
+
+        x, y, width, height = _extent(model, key)
+        if chunk.ids[height:].any() or chunk.ids[:, width:].any():
+            problems.append(f"Chunk {key} has tiles outside of the map bounds")
+
+        invalid = chunk.ids >= tile_count
+        if invalid.any():
+            unknown_cells += int(np.count_nonzero(invalid))
+            unknown.update(np.unique(chunk.ids[invalid]).tolist())
+
+    if unknown:
+        ids = ", ".join(str(tile_id) for tile_id in sorted(unknown)[:10])
+        more = f" and {len(unknown) - 10} more" if len(unknown) > 10 else ""
+        problems.append(f"{unknown_cells} cells use tile ids missing from a tileset of {tile_count} tiles: {ids}{more}")
+    return problems
+
+
+def rechunk(model: ChunkedTileModel, chunk_size: int) -> ChunkedTileModel:
+    """Copy a model into a new model with another chunk size, a region write per chunk of the source."""
+    result = ChunkedTileModel(model.width, model.height, chunk_size)
+    for key in model.chunk_keys():
+        chunk = model.chunk(key)
+        x, y, width, height = _extent(model, key)
+        result.write_region(x, y, chunk.ids[:height, :width], chunk.flags[:height, :width])
+    _logger.debug(f"Rechunked {len(model.chunk_keys())} chunks of {model.chunk_size} into chunks of {chunk_size}")
+    return result
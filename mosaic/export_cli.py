@@ -0,0 +1,95 @@
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from mosaic.domain.layers import LayerStack
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tileset import DEFAULT_PALETTE, Tileset
+from mosaic.persistence.export import export_png
+from mosaic.persistence.mapfile import MapFile
+from mosaic.persistence.tiled import ENCODINGS, export_json, export_tmx, import_tiled
+
+_logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = (".png", ".tmx", ".json")
+TILED_FORMATS = (".tmx", ".json")
+MAP_FORMAT = ".mosaic"
+
+
+def export_map(
+    path: str | os.PathLike,
+    source: ChunkedTileModel | LayerStack,
+    tileset: Tileset,
+    encoding: str = "zlib",
+    workers: int | None = None,
+):
+    """Export a map in the format given by the suffix of the path, a PNG image or a Tiled TMX or JSON map."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".png":
+        export_png(path, source, tileset, workers)
+    elif suffix == ".tmx":
+        export_tmx(path, source, tileset, encoding, workers)
+    elif suffix == ".json":
+        export_json(path, source, tileset, encoding, workers)
+    else:
+        raise ValueError(f"Cannot export to {path}, expected one of {', '.join(EXPORT_FORMATS)}")
+
+
+@contextlib.contextmanager
+def open_map(path: str | os.PathLike) -> Iterator[ChunkedTileModel | LayerStack]:
+    """Open a map file, whose chunks are decoded as they are read, or import a Tiled map."""
+    if Path(path).suffix.lower() in TILED_FORMATS:
+        yield import_tiled(path)
+    else:
+        with MapFile.open(path, read_only=True) as map_file:
+            yield map_file.model
+
+
+def _single_model(source: ChunkedTileModel | LayerStack, layer: str | None) -> ChunkedTileModel:
+    if isinstance(source, ChunkedTileModel):
+        return source
+    if layer is not None:
+        return source.layer(layer).model
+    if len(source) != 1:
+        names = ", ".join(layer.name for layer in source)
+        raise ValueError(f"The map has {len(source)} layers ({names}), a map file holds one, choose it with --layer")
+    return source[0].model
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="mosaic-export",
+        description="Export a map file to a PNG image or a Tiled map, or import a Tiled map into a map file",
+    )
+    parser.add_argument("source", help="a map file, or a Tiled .tmx or .json map to import")
+    parser.add_argument("output", help="a .png image, a Tiled .tmx or .json map, or a .mosaic map file to import into")
+    parser.add_argument("--tile-size", type=int, default=32, help="the size of a tile in pixels")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="zlib", help="the layer data encoding of Tiled maps")
+    parser.add_argument("--workers", type=int, help="the number of worker processes, one per core by default")
+    parser.add_argument("--layer", help="the layer of a Tiled map to import into a map file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    try:
+        with open_map(args.source) as source:
+            if Path(args.output).suffix.lower() == MAP_FORMAT:
+                MapFile.create(args.output, _single_model(source, args.layer)).close()
+            else:
+                tileset = Tileset.from_colors(DEFAULT_PALETTE, args.tile_size)
+                export_map(args.output, source, tileset, args.encoding, args.workers)
+    except (OSError, ValueError, KeyError) as error:
+        _logger.error(f"Failed to convert {args.source}: {error}")
+        return 1
+
+    _logger.info(f"Wrote {args.output} in {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
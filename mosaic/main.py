@@ -3,32 +3,42 @@ import sys
 
 import mosaic.widgets as widgets
 from mosaic import config
-from mosaic.application import MosaicEditor
 from mosaic.core.builder import LazyInit
-from mosaic.domain.tilescene import TileScene
-from mosaic.widgets.main_menu import MainMenu
-from mosaic.widgets.main_window import MainWindow
-from mosaic.widgets.scene_view import SceneView
-from mosaic.widgets.status_bar import StatusBar
 
 logging.basicConfig(level=logging.DEBUG)
 
+# The size in cells of the empty map the editor starts with
+NEW_MAP_SIZE = (256, 256)
+
 
 def register_widgets():
+    # Registered by import path, so that neither the modules nor the scene are loaded before they are needed
     factory = widgets.factory
-    factory.register(MainMenu, instance=LazyInit)
-    factory.register(StatusBar, instance=LazyInit)
-    factory.register(MainWindow, instance=LazyInit)
-    factory.register(SceneView)
-    factory.register(TileScene, instance=TileScene())
+    factory.register("mosaic.widgets.main_menu.MainMenu", instance=LazyInit)
+    factory.register("mosaic.widgets.status_bar.StatusBar", instance=LazyInit)
+    factory.register("mosaic.widgets.main_window.MainWindow", instance=LazyInit)
+    factory.register("mosaic.widgets.scene_view.SceneView")
+    factory.register("mosaic.domain.tilescene.TileScene", instance=LazyInit)
 
 
-def main() -> int:
-    application = MosaicEditor()
+def create_window():
+    from mosaic.domain.tilemap import ChunkedTileModel
+    from mosaic.domain.tilescene import TileScene
 
     config.populate_builder(widgets.factory)
+    window = widgets.resolve("mosaic.widgets.main_window.MainWindow")
+    window.set_scene(TileScene(model=ChunkedTileModel(*NEW_MAP_SIZE)))
+    return window
+
+
+def main() -> int:
+    from mosaic.application import MosaicEditor
+
+    application = MosaicEditor()
 
-    window = widgets.resolve(widgets.MainWindow)
+    window = create_window()
+    if len(sys.argv) > 1:
+        window.open_map(sys.argv[1])
     window.show()
 
     return application.exec()
@@ -0,0 +1,149 @@
+import logging
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from PySide6.QtGui import QImage, QPainter
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.layers import LayerStack
+from mosaic.domain.render_cache import to_qimage
+from mosaic.domain.tilemap import TILE_ID_DTYPE, Chunk, ChunkedTileModel, ChunkKey
+from mosaic.domain.tileset import Tileset
+from mosaic.persistence.png import PngWriter, deflate
+
+_logger = logging.getLogger(__name__)
+
+# The approximate size of the pixels of a band of a PNG export, which bounds its memory use together with the pool
+BAND_BYTES = 8 * 1024 * 1024
+
+
+class ExportLayer(NamedTuple):
+    """A layer of a map as exported."""
+
+    name: str
+    model: ChunkedTileModel
+    visible: bool = True
+    opacity: float = 1.0
+
+
+def export_layers(source: ChunkedTileModel | LayerStack) -> list[ExportLayer]:
+    """The layers of a map, bottom first, a model being a single layer."""
+    if isinstance(source, LayerStack):
+        return [ExportLayer(layer.name, layer.model, layer.visible, layer.opacity) for layer in source]
+    return [ExportLayer("Tile Layer 1", source)]
+
+
+def read_chunk(model: ChunkedTileModel, key: ChunkKey) -> Chunk | None:
+    """A chunk of a model, decoded from its source without loading it into the model if it is not loaded yet."""
+    if model.is_loaded(key) or model.source is None:
+        return model.chunk(key)
+    return model.source.load_chunk(key)
+
+
+def read_chunk_row(model: ChunkedTileModel, row: int, keys: set[ChunkKey]) -> np.ndarray:
+    """The tile ids of a row of chunks across the map, read with read_chunk, given the keys of non-empty chunks."""
+    size = model.chunk_size
+    height = min(size, model.height - row * size)
+    ids = np.zeros((height, model.width), dtype=TILE_ID_DTYPE)
+    for column in range(model.chunk_columns):
+        if (column, row) in keys and (chunk := read_chunk(model, (column, row))) is not None:
+            width = min(size, model.width - column * size)
+            ids[:, column * size : column * size + width] = chunk.ids[:height, :width]
+    return ids
+
+
+def worker_count(workers: int | None) -> int:
+    """The number of worker processes to use, one per core if not given."""
+    return (os.cpu_count() or 1) if workers is None else max(workers, 0)
+
+
+def create_pool(workers: int) -> Executor | None:
+    """A process pool of a number of workers, or None to work in the calling process if there is at most one.
+
+    Workers are spawned rather than forked, as the editor runs threads that a fork would copy mid-flight.
+    """
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def ordered_map(pool: Executor | None, function: Callable, arguments: Iterable[tuple], window: int) -> Iterator:
+    """Map a function over argument tuples on a pool, yielding results in order with at most window in flight."""
+    if pool is None:
+        for args in arguments:
+            yield function(*args)
+        return
+
+    pending = deque()
+    for args in arguments:
+        pending.append(pool.submit(function, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _band_images(source: ChunkedTileModel | LayerStack, tileset: Tileset, band_rows: int) -> Iterator[np.ndarray]:
+    layers = [layer for layer in export_layers(source) if layer.visible and layer.opacity > 0.0]
+    keys = [set(layer.model.chunk_keys()) for layer in layers]
+    width, height, size = source.width, source.height, source.chunk_size
+    tile_size = tileset.tile_size
+    for row in range(-(-height // size)):
+        ids = [read_chunk_row(layer.model, row, layer_keys) for layer, layer_keys in zip(layers, keys)]
+        rows = min(size, height - row * size)
+        for top in range(0, rows, band_rows):
+            with profiler.span("export.band"):
+                band = QImage(width * tile_size, min(band_rows, rows - top) * tile_size, QImage.Format_RGBA8888)
+                band.fill(0)
+                painter = QPainter(band)
+                for layer, layer_ids in zip(layers, ids):
+                    painter.setOpacity(layer.opacity)
+                    painter.drawImage(0, 0, to_qimage(tileset.compose(layer_ids[top : top + band_rows])))
+                painter.end()
+            # Drawing into a straight alpha image converts the premultiplied tiles for the PNG
+            yield np.frombuffer(band.constBits(), dtype=np.uint8).reshape(band.height(), band.width(), 4)
+
+
+@profiler.timed("export.png")
+def export_png(
+    path: str | os.PathLike,
+    source: ChunkedTileModel | LayerStack,
+    tileset: Tileset,
+    workers: int | None = None,
+    level: int = 6,
+):
+    """Render a map at full resolution to a PNG image, band by band, compressing the bands on a process pool.
+
+    Only a few bands of pixels per worker are held in memory at once, and chunks that are not loaded are decoded
+    from the source of a model without being loaded into it, so the memory used does not depend on the height of
+    the map.
+
+    Args:
+        path: The path of the image.
+        source: The map, a single model or a stack of layers, of which visible layers are drawn with their opacity.
+        tileset: The tileset to draw the map with.
+        workers: The number of processes compressing bands, one per core by default, or 0 or 1 for none.
+        level: The zlib compression level.
+    """
+    tile_size = tileset.tile_size
+    width, height = source.width * tile_size, source.height * tile_size
+    band_rows = max(1, min(source.chunk_size, BAND_BYTES // (width * tile_size * 4)))
+    workers = worker_count(workers)
+    pool = create_pool(workers)
+    try:
+        with open(path, "wb") as file:
+            writer = PngWriter(file, width, height)
+            filtered = ((writer.filter(band), level) for band in _band_images(source, tileset, band_rows))
+            for compressed in ordered_map(pool, deflate, filtered, window=2 * max(workers, 1)):
+                writer.write_compressed(*compressed)
+            writer.close()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    _logger.info(f"Exported a {width}x{height} image to {Path(path)}")
@@ -0,0 +1,354 @@
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.tilemap import FLAGS_DTYPE, TILE_ID_DTYPE, Chunk, ChunkedTileModel, ChunkKey, DirtyRegion
+from mosaic.persistence.mapfile import Encoding, MapFile
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"MOSAICJL"
+VERSION = 1
+
+# magic, version, reserved, width, height, chunk size
+_HEADER = struct.Struct("<8sHHIII")
+HEADER_SIZE = 32
+
+# payload length, crc32 of the rest of the record, x, y, width, height, encoding
+_RECORD = struct.Struct("<IIiiHHB3x")
+# Records of at least this many cells are zlib compressed
+COMPRESS_CELLS = 256
+# The number of cells replayed per vectorized batch, which bounds the memory used by a replay
+REPLAY_BATCH_CELLS = 1 << 22
+
+_FLAGS = np.dtype(FLAGS_DTYPE).newbyteorder("<")
+_CELL_BYTES = 4 + _FLAGS.itemsize
+
+DEFAULT_SYNC_INTERVAL = 0.5
+DEFAULT_COMPACT_BYTES = 64 * 1024 * 1024
+
+
+class JournalError(ValueError):
+    pass
+
+
+def encode_record(x: int, y: int, ids: np.ndarray, flags: np.ndarray) -> bytes:
+    """Serialize the contents of a box of cells as a record header followed by its tile ids and flags."""
+    height, width = ids.shape
+    payload = ids.astype("<u4", copy=False).tobytes() + flags.astype(_FLAGS, copy=False).tobytes()
+    encoding = Encoding.RAW
+    if width * height >= COMPRESS_CELLS:
+        payload, encoding = zlib.compress(payload, 1), Encoding.ZLIB
+
+    body = _RECORD.pack(len(payload), 0, x, y, width, height, encoding)[8:] + payload
+    return struct.pack("<II", len(payload), zlib.crc32(body)) + body
+
+
+def read_records(data: bytes | memoryview, offset: int = HEADER_SIZE):
+    """Yield (end offset, x, y, width, height, payload) for every intact record, up to the first torn or corrupt one.
+
+    The payload is decompressed, it holds the tile ids of the box in row-major order followed by its flags.
+    """
+    view = memoryview(data)
+    size = len(view)
+    unpack = _RECORD.unpack_from
+    while offset + _RECORD.size <= size:
+        length, crc, x, y, width, height, encoding = unpack(view, offset)
+        end = offset + _RECORD.size + length
+        if end > size or zlib.crc32(view[offset + 8 : end]) != crc:
+            return
+
+        payload = view[offset + _RECORD.size : end]
+        yield end, x, y, width, height, zlib.decompress(payload) if encoding == Encoding.ZLIB else payload
+        offset = end
+
+
+@profiler.timed("journal.replay")
+def replay(data: bytes | memoryview, model: ChunkedTileModel) -> tuple[int, int]:
+    """Apply the records of a journal to a model, as a single batch of edits.
+
+    Records are only parsed one by one, their cells are then expanded and decoded with vectorized operations in
+    batches of REPLAY_BATCH_CELLS, keeping the last value written to each cell, and written with insert_many.
+
+    Returns:
+        The number of records applied, and the offset after the last intact record.
+    """
+    _check_header(bytes(data[:HEADER_SIZE]), model)
+    count, end = 0, HEADER_SIZE
+    boxes: list[tuple[int, int, int, int]] = []
+    payloads: list[bytes | memoryview] = []
+    cells = 0
+    with model.batch():
+        for end, x, y, width, height, payload in read_records(data):
+            boxes.append((x, y, width, height))
+            payloads.append(payload)
+            cells += width * height
+            if cells >= REPLAY_BATCH_CELLS:
+                _apply(model, boxes, payloads)
+                boxes, payloads, cells = [], [], 0
+            count += 1
+        _apply(model, boxes, payloads)
+    return count, end
+
+
+def _apply(model: ChunkedTileModel, boxes: list[tuple[int, int, int, int]], payloads: list[bytes | memoryview]):
+    if not boxes:
+        return
+
+    x0, y0, widths, heights = np.array(boxes, dtype=np.int64).T
+    cells = widths * heights
+    starts = np.cumsum(cells) - cells
+    record = np.repeat(np.arange(len(boxes)), cells)
+    local = np.arange(len(record)) - starts[record]
+    width = widths[record]
+    xs, ys = x0[record] + local % width, y0[record] + local // width
+
+    buffer = np.frombuffer(b"".join(payloads), dtype=np.uint8)
+    base = starts[record] * _CELL_BYTES
+    ids = _gather(buffer, base + local * 4, np.dtype("<u4"))
+    flags = _gather(buffer, base + cells[record] * 4 + local * _FLAGS.itemsize, _FLAGS)
+
+    # Keep the last write of every cell
+    linear = (ys * model.width + xs)[::-1]
+    _, first = np.unique(linear, return_index=True)
+    last = len(linear) - 1 - first
+    model.insert_many(xs[last], ys[last], ids[last], flags[last])
+
+
+def _gather(buffer: np.ndarray, offsets: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """Read a value of a dtype at each byte offset of a buffer."""
+    return buffer[offsets[:, None] + np.arange(dtype.itemsize)].view(dtype).ravel()
+
+
+def _check_header(data: bytes, model: ChunkedTileModel):
+    if len(data) < HEADER_SIZE:
+        raise JournalError("The journal is too small to have a header")
+
+    magic, version, _, width, height, chunk_size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise JournalError("Not a journal")
+    if version != VERSION:
+        raise JournalError(f"Unsupported journal version {version}")
+    if (width, height, chunk_size) != (model.width, model.height, model.chunk_size):
+        raise JournalError(
+            f"The journal is of a {width}x{height} map with chunks of {chunk_size}, "
+            f"not {model.width}x{model.height} with chunks of {model.chunk_size}"
+        )
+
+
+class _Compaction:
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: dict[ChunkKey, Chunk | None]):
+        self.chunks = chunks
+
+
+class _Stop:
+    pass
+
+
+class Journal:
+    """An append-only log of the edits of a map file, to recover them after a crash.
+
+    Every change notification of the model is recorded as the new contents of its dirty box in each chunk. The GUI
+    thread only copies those cells, a background thread encodes them as compact checksummed records, appends them
+    to the journal and syncs it to disk at most once per sync interval. As records hold contents rather than
+    operations, replaying them in order restores the last state no matter which of them the map file already holds.
+
+    Opening the journal of a map file replays its intact records into the model, dropping a record torn by a crash.
+    Once the journal grows past a size, it is compacted: the edited chunks are copied on the GUI thread, and the
+    background thread saves them to the map file and then truncates the journal.
+
+    Args:
+        map_file: The map file whose model is journaled, and that the journal is compacted into.
+        path: The path of the journal, the path of the map file with a ".journal" suffix by default.
+        sync_interval: The longest time in seconds that written records wait to be synced to disk.
+        compact_bytes: The size of the journal in bytes at which it is compacted into the map file.
+    """
+
+    def __init__(
+        self,
+        map_file: MapFile,
+        path: str | os.PathLike | None = None,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        compact_bytes: int = DEFAULT_COMPACT_BYTES,
+    ):
+        self._map_file = map_file
+        self._model = map_file.model
+        self._path = os.fspath(path) if path is not None else f"{map_file.path}.journal"
+        self._sync_interval = sync_interval
+        self._compact_bytes = compact_bytes
+        self._replayed = 0
+        self._size = self._recover()
+
+        self._file = open(self._path, "r+b")
+        self._file.seek(self._size)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        # An estimate of the size of the journal once the queued records are written
+        self._queued_size = self._size
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        self._model.subscribe(self._on_model_changed)
+
+    @staticmethod
+    def header(model: ChunkedTileModel) -> bytes:
+        """The header of a journal of a model, which records are appended to."""
+        header = _HEADER.pack(MAGIC, VERSION, 0, model.width, model.height, model.chunk_size)
+        return header.ljust(HEADER_SIZE, b"\0")
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def replayed(self) -> int:
+        """The number of records replayed when the journal was opened."""
+        return self._replayed
+
+    @property
+    def size(self) -> int:
+        """The size of the journal in bytes, including the records that are queued to be written."""
+        return self._queued_size
+
+    def flush(self):
+        """Block until every queued record has been written and synced to disk."""
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait()
+
+    def compact(self):
+        """Save the chunks edited since the last compaction to the map file, then empty the journal.
+
+        Only taking a snapshot of the edited chunks happens on the calling thread, saving them and emptying the
+        journal happens on the background thread, after the records queued before.
+        """
+        self._queue.put(_Compaction(self._map_file.take_dirty()))
+        self._queued_size = HEADER_SIZE
+
+    def close(self, compact: bool = True):
+        """Stop journaling, compacting the journal into the map file first unless asked not to."""
+        self._model.unsubscribe(self._on_model_changed)
+        if compact:
+            self.compact()
+        self._queue.put(_Stop())
+        self._thread.join()
+        self._file.close()
+
+    def _recover(self) -> int:
+        if not os.path.exists(self._path) or os.path.getsize(self._path) == 0:
+            with open(self._path, "wb") as file:
+                file.write(self.header(self._model))
+            return HEADER_SIZE
+
+        with open(self._path, "rb") as file:
+            data = file.read()
+        start = time.perf_counter()
+        self._replayed, end = replay(data, self._model)
+        if self._replayed:
+            elapsed = time.perf_counter() - start
+            _logger.info(f"Replayed {self._replayed} journal records from {self._path} in {elapsed:.2f} s")
+        if end < len(data):
+            _logger.warning(f"Dropped {len(data) - end} bytes of torn records at the end of {self._path}")
+            os.truncate(self._path, end)
+        return end
+
+    def _on_model_changed(self, region: DirtyRegion):
+        size = self._model.chunk_size
+        for key, (x0, y0, x1, y1) in region.boxes():
+            chunk = self._model.chunk(key)
+            bx0, by0, bx1, by1 = x0 - key[0] * size, y0 - key[1] * size, x1 - key[0] * size, y1 - key[1] * size
+            if chunk is not None:
+                ids, flags = chunk.ids[by0:by1, bx0:bx1].copy(), chunk.flags[by0:by1, bx0:bx1].copy()
+            else:
+                ids = np.zeros((y1 - y0, x1 - x0), dtype=TILE_ID_DTYPE)
+                flags = np.zeros((y1 - y0, x1 - x0), dtype=FLAGS_DTYPE)
+            self._queue.put((x0, y0, ids, flags))
+            self._queued_size += _RECORD.size + ids.nbytes + flags.nbytes
+
+        if self._queued_size >= self._compact_bytes:
+            self.compact()
+
+    def _run(self):
+        last_sync, unsynced = time.monotonic(), False
+        while True:
+            timeout = max(0.0, last_sync + self._sync_interval - time.monotonic()) if unsynced else None
+            try:
+                items = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            try:
+                unsynced = self._process(items) or unsynced
+                if unsynced and (time.monotonic() - last_sync >= self._sync_interval or not items):
+                    self._sync()
+                    last_sync, unsynced = time.monotonic(), False
+            except Exception:
+                _logger.exception(f"Failed to write the journal {self._path}")
+
+            for item in items:
+                if isinstance(item, threading.Event):
+                    if unsynced:
+                        self._sync()
+                        last_sync, unsynced = time.monotonic(), False
+                    item.set()
+                elif isinstance(item, _Stop):
+                    if unsynced:
+                        self._sync()
+                    return
+
+    def _process(self, items: list) -> bool:
+        """Write the records and run the compactions in the items, returns whether anything is left unsynced."""
+        buffer = bytearray()
+        unsynced = False
+        for item in items:
+            if isinstance(item, tuple):
+                buffer += encode_record(*item)
+            elif isinstance(item, _Compaction):
+                self._write(buffer)
+                buffer.clear()
+                self._compact(item.chunks)
+                unsynced = False
+        if buffer:
+            self._write(buffer)
+            unsynced = True
+        return unsynced
+
+    def _write(self, buffer: bytearray):
+        if buffer:
+            self._file.write(buffer)
+            self._size += len(buffer)
+
+    def _sync(self):
+        with profiler.span("journal.sync"):
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _compact(self, chunks: dict[ChunkKey, Chunk | None]):
+        with profiler.span("journal.compact"):
+            # The journal still holds every record until the map file is synced, so a crash in between loses nothing.
+            # Saving never overwrites what the committed index of the map file uses, so a crash leaves it intact
+            try:
+                self._map_file.write_chunks(chunks)
+            except Exception:
+                self._map_file.mark_dirty(chunks.keys())
+                raise
+            self._file.truncate(HEADER_SIZE)
+            self._file.seek(HEADER_SIZE)
+            self._size = HEADER_SIZE
+            self._sync()
+        _logger.debug(f"Compacted {len(chunks)} chunks from {self._path} into {self._map_file.path}")
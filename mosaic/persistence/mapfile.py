@@ -0,0 +1,325 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections.abc import Iterable
+from enum import IntEnum
+
+import numpy as np
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.tilemap import FLAGS_DTYPE, Chunk, ChunkedTileModel, ChunkKey, DirtyRegion
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"MOSAICMP"
+VERSION = 1
+
+# magic, version, reserved, width, height, chunk size, chunk count, index offset
+_HEADER = struct.Struct("<8sHHIIIIQ")
+HEADER_SIZE = 64
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("cx", "<i4"),
+        ("cy", "<i4"),
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("capacity", "<u4"),
+        ("count", "<u4"),
+        ("encoding", "<u1"),
+        ("reserved", "V3"),
+    ]
+)
+
+
+class MapFileError(ValueError):
+    pass
+
+
+class Encoding(IntEnum):
+    RAW = 0
+    ZLIB = 1
+
+
+def encode_chunk(chunk: Chunk, encoding: Encoding) -> bytes:
+    """Serialize a chunk as its tile ids followed by its flags, in little endian row-major order."""
+    payload = chunk.ids.astype("<u4", copy=False).tobytes() + chunk.flags.tobytes()
+    if encoding == Encoding.ZLIB:
+        return zlib.compress(payload, 1)
+    return payload
+
+
+def decode_chunk(payload: bytes, encoding: Encoding, size: int) -> Chunk:
+    if encoding == Encoding.ZLIB:
+        payload = zlib.decompress(payload)
+
+    cells = size * size
+    chunk = Chunk(size)
+    chunk.ids[:] = np.frombuffer(payload, dtype="<u4", count=cells).reshape(size, size)
+    chunk.flags[:] = np.frombuffer(payload, dtype=FLAGS_DTYPE, count=cells, offset=cells * 4).reshape(size, size)
+    chunk.recount()
+    return chunk
+
+
+class MapFile:
+    """A tile map stored in a single binary file that is read through mmap.
+
+    The file holds a fixed-size header, chunk payloads with a fixed layout (tile ids then flags, optionally zlib
+    compressed) and a chunk index. Opening a file only reads the header and the index, chunks are decoded when the
+    model first touches them. Saving writes only the chunks edited since the last save, followed by a new index, to
+    space that the current index does not use, so the file on disk is never torn.
+
+    Use MapFile.create to write a new file and MapFile.open to open an existing one.
+    """
+
+    def __init__(self, path: str | os.PathLike, compress: bool = True, read_only: bool = False):
+        self._path = os.fspath(path)
+        self._encoding = Encoding.ZLIB if compress else Encoding.RAW
+        self._read_only = read_only
+        self._file = open(self._path, "rb" if read_only else "r+b")
+        self._mmap: mmap.mmap | None = None
+        self._lock = threading.Lock()
+        self._entries: dict[ChunkKey, np.void] = {}
+        # The offset and size of the index the header points at
+        self._index = (HEADER_SIZE, 0)
+        self._dirty: set[ChunkKey] = set()
+
+        try:
+            width, height, chunk_size, count, index_offset = self._read_header()
+            self._map()
+            self._read_index(index_offset, count)
+        except Exception:
+            self.close()
+            raise
+
+        self._model = ChunkedTileModel(width, height, chunk_size)
+        self._model.attach_source(self)
+        self._model.subscribe(self._on_model_changed)
+
+    @classmethod
+    def create(cls, path: str | os.PathLike, model: ChunkedTileModel, compress: bool = True) -> "MapFile":
+        """Write a model to a new file and open it."""
+        encoding = Encoding.ZLIB if compress else Encoding.RAW
+        with open(path, "wb") as file:
+            file.write(bytes(HEADER_SIZE))
+            entries = []
+            for key in sorted(model.chunk_keys()):
+                chunk = model.chunk(key)
+                payload = encode_chunk(chunk, encoding)
+                entries.append((key, file.tell(), len(payload), chunk.count))
+                file.write(payload)
+
+            index = np.zeros(len(entries), dtype=INDEX_DTYPE)
+            for row, ((cx, cy), offset, length, count) in zip(index, entries):
+                row["cx"], row["cy"], row["offset"] = cx, cy, offset
+                row["length"], row["capacity"], row["count"] = length, length, count
+                row["encoding"] = encoding
+
+            index_offset = file.tell()
+            file.write(index.tobytes())
+            file.seek(0)
+            file.write(_header(model, len(entries), index_offset))
+
+        return cls(path, compress)
+
+    @classmethod
+    def open(cls, path: str | os.PathLike, compress: bool = True, read_only: bool = False) -> "MapFile":
+        """Open an existing map file, chunks edited later are saved with the given compression.
+
+        Args:
+            path: The path of the map file.
+            compress: Whether chunks saved later are zlib compressed.
+            read_only: Whether the file is only viewed or exported, which opens it read-only and forbids saving.
+        """
+        return cls(path, compress, read_only)
+
+    @property
+    def read_only(self) -> bool:
+        return self._read_only
+
+    def __enter__(self) -> "MapFile":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def model(self) -> ChunkedTileModel:
+        return self._model
+
+    @property
+    def dirty_chunks(self) -> set[ChunkKey]:
+        return set(self._dirty)
+
+    def chunk_keys(self) -> Iterable[ChunkKey]:
+        return self._entries.keys()
+
+    def cell_count(self, key: ChunkKey) -> int:
+        return int(self._entries[key]["count"])
+
+    def load_chunk(self, key: ChunkKey) -> Chunk:
+        """Decode a chunk from the mapped file, safe to call from worker threads."""
+        with profiler.span("chunk.load"):
+            with self._lock:
+                entry = self._entries[key]
+                offset, length = int(entry["offset"]), int(entry["length"])
+                payload = self._mmap[offset : offset + length]
+            return decode_chunk(payload, Encoding(int(entry["encoding"])), self._model.chunk_size)
+
+    def save(self):
+        """Write the chunks edited since the last save, followed by an updated index and header."""
+        self.write_chunks(self.take_dirty())
+
+    def take_dirty(self) -> dict[ChunkKey, Chunk | None]:
+        """The chunks edited since the last save as they are now, None for those that became empty.
+
+        The chunks are taken from a snapshot of the model, so later edits copy them rather than change them. They
+        are no longer considered edited afterwards, pass them to write_chunks to save them.
+        """
+        snapshot = self._model.snapshot()
+        chunks = {key: snapshot.chunk(key) for key in sorted(self._dirty)}
+        self._dirty.clear()
+        return chunks
+
+    def mark_dirty(self, keys: Iterable[ChunkKey]):
+        """Mark chunks as edited, such as those taken by take_dirty that failed to be written."""
+        self._dirty.update(keys)
+
+    @profiler.timed("map.save")
+    def write_chunks(self, chunks: dict[ChunkKey, Chunk | None]):
+        """Write chunks taken by take_dirty, which is safe on a worker thread while the model keeps being edited.
+
+        Payloads and the new index are only written to space that the current index does not use, the space of
+        payloads and indexes superseded by earlier saves, or past the end of the file. They are synced before the
+        header that points at them is written, so a crash at any point leaves either the old or the new index in
+        effect. Once the new header is committed, the space no longer used at the end of the file is truncated.
+        """
+        if self._read_only:
+            raise MapFileError(f"{self._path} is open read-only")
+        if not chunks:
+            return
+
+        space = _FreeSpace(self._extents())
+        entries = dict(self._entries)
+        for key, chunk in chunks.items():
+            if chunk is None:
+                entries.pop(key, None)
+                continue
+
+            payload = encode_chunk(chunk, self._encoding)
+            offset = space.allocate(len(payload))
+            self._file.seek(offset)
+            self._file.write(payload)
+            entries[key] = _entry(key, offset, len(payload), len(payload), chunk.count, self._encoding)
+
+        index = np.array(list(entries.values()), dtype=INDEX_DTYPE)
+        index_offset = space.allocate(index.nbytes)
+        self._file.seek(index_offset)
+        self._file.write(index.tobytes())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self._file.seek(0)
+        self._file.write(_header(self._model, len(index), index_offset))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        _logger.debug(f"Saved {len(chunks)} chunks to {self._path}")
+        with self._lock:
+            self._entries = entries
+            self._index = (index_offset, index.nbytes)
+            # The mapping is closed first, a mapped file cannot be truncated on every platform
+            self._mmap.close()
+            self._file.truncate(_used_end(self._extents()))
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+        self._file.close()
+
+    def _on_model_changed(self, region: DirtyRegion):
+        self._dirty.update(region.chunks())
+
+    def _read_header(self) -> tuple[int, int, int, int, int]:
+        data = self._file.read(HEADER_SIZE)
+        if len(data) < HEADER_SIZE:
+            raise MapFileError(f"{self._path} is too small to be a map file")
+
+        magic, version, _, width, height, chunk_size, count, index_offset = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise MapFileError(f"{self._path} is not a map file")
+        if version != VERSION:
+            raise MapFileError(f"Unsupported map file version {version}")
+        return width, height, chunk_size, count, index_offset
+
+    def _read_index(self, offset: int, count: int):
+        index = np.frombuffer(self._mmap[offset : offset + count * INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+        self._entries = {(int(entry["cx"]), int(entry["cy"])): entry for entry in index.copy()}
+        self._index = (offset, index.nbytes)
+
+    def _extents(self) -> list[tuple[int, int]]:
+        """The offset and size of every payload and of the index that the header points at, sorted by offset."""
+        extents = [(int(entry["offset"]), int(entry["capacity"])) for entry in self._entries.values()]
+        extents.append(self._index)
+        return sorted(extents)
+
+    def _map(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _FreeSpace:
+    """The gaps between the used extents of a map file, handed out first fit before growing the file.
+
+    Args:
+        used: The offset and size of every used extent, sorted by offset.
+    """
+
+    def __init__(self, used: list[tuple[int, int]]):
+        self._gaps: list[list[int]] = []
+        position = HEADER_SIZE
+        for offset, length in used:
+            if offset > position:
+                self._gaps.append([position, offset - position])
+            position = max(position, offset + length)
+        self._end = position
+
+    def allocate(self, length: int) -> int:
+        """The offset of length free bytes, which are no longer free afterwards."""
+        for gap in self._gaps:
+            if gap[1] >= length:
+                offset = gap[0]
+                gap[0], gap[1] = offset + length, gap[1] - length
+                if not gap[1]:
+                    self._gaps.remove(gap)
+                return offset
+        offset, self._end = self._end, self._end + length
+        return offset
+
+
+def _used_end(extents: list[tuple[int, int]]) -> int:
+    return max([HEADER_SIZE] + [offset + length for offset, length in extents])
+
+
+def _header(model: ChunkedTileModel, count: int, index_offset: int) -> bytes:
+    header = _HEADER.pack(MAGIC, VERSION, 0, model.width, model.height, model.chunk_size, count, index_offset)
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def _entry(key: ChunkKey, offset: int, length: int, capacity: int, count: int, encoding: Encoding) -> np.void:
+    entry = np.zeros((), dtype=INDEX_DTYPE)
+    entry["cx"], entry["cy"], entry["offset"] = key[0], key[1], offset
+    entry["length"], entry["capacity"], entry["count"], entry["encoding"] = length, capacity, count, encoding
+    return entry[()]
@@ -0,0 +1,128 @@
+import struct
+import zlib
+from collections.abc import Iterable
+from typing import BinaryIO
+
+import numpy as np
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Color type 6 is RGBA, with 8 bits per channel
+_IHDR = struct.Struct(">IIBBBBB")
+# A zlib header for the default window size and compression
+_ZLIB_HEADER = b"\x78\x9c"
+_ADLER_BASE = 65521
+# PNG filter type of the scanlines, each row is stored as its difference to the row above
+_FILTER_UP = 2
+
+
+def deflate(data: bytes, level: int = 6) -> tuple[bytes, int, int]:
+    """Compress data as a raw deflate stream ending on a byte boundary, so that streams can be concatenated.
+
+    Meant to run in worker processes, the streams of consecutive pieces of data are joined into a single zlib stream
+    by PngWriter.
+
+    Returns:
+        The compressed data, the Adler-32 checksum of the uncompressed data and its length.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH), zlib.adler32(data), len(data)
+
+
+def adler32_combine(first: int, second: int, second_length: int) -> int:
+    """The Adler-32 checksum of two pieces of data from the checksums of each piece, as zlib's adler32_combine."""
+    remainder = second_length % _ADLER_BASE
+    sum1 = first & 0xFFFF
+    sum2 = remainder * sum1 % _ADLER_BASE
+    sum1 = (sum1 + (second & 0xFFFF) + _ADLER_BASE - 1) % _ADLER_BASE
+    sum2 = (sum2 + (first >> 16) + (second >> 16) + _ADLER_BASE - remainder) % _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def filter_rows(rows: np.ndarray, previous: np.ndarray | None) -> bytes:
+    """Apply the PNG Up filter to RGBA rows of shape (height, width, 4), given the row above them if any."""
+    height, width, _ = rows.shape
+    flat = rows.reshape(height, width * 4)
+    above = np.empty_like(flat)
+    above[0] = previous.reshape(-1) if previous is not None else 0
+    above[1:] = flat[:-1]
+    filtered = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    filtered[:, 0] = _FILTER_UP
+    np.subtract(flat, above, out=filtered[:, 1:])
+    return filtered.tobytes()
+
+
+class PngWriter:
+    """Writes an RGBA PNG image band by band, without holding the whole image in memory.
+
+    The image data of a PNG is a single zlib stream. Each band of rows is filtered and compressed on its own as a
+    raw deflate stream that ends on a byte boundary, so the bands can be compressed in parallel and written as
+    consecutive IDAT chunks, and the checksum of the whole stream is combined from those of the bands.
+
+    Args:
+        file: The binary file to write to.
+        width: The width of the image in pixels.
+        height: The height of the image in pixels.
+    """
+
+    def __init__(self, file: BinaryIO, width: int, height: int):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid image size {width}x{height}")
+
+        self._file = file
+        self._width = width
+        self._height = height
+        self._rows = 0
+        self._adler = 1
+        self._previous: np.ndarray | None = None
+        self._file.write(SIGNATURE)
+        self._write_chunk(b"IHDR", _IHDR.pack(width, height, 8, 6, 0, 0, 0))
+        self._started = False
+
+    @property
+    def rows(self) -> int:
+        """The number of rows written."""
+        return self._rows
+
+    def filter(self, rows: np.ndarray) -> bytes:
+        """Filter the next rows of the image, straight (not premultiplied) RGBA of shape (height, width, 4).
+
+        The result is compressed with deflate, possibly in another process, and passed to write_compressed.
+        """
+        if rows.shape[1:] != (self._width, 4):
+            raise ValueError(f"Expected rows of shape (height, {self._width}, 4), got {rows.shape}")
+        data = filter_rows(rows, self._previous)
+        self._previous = rows[-1].copy()
+        return data
+
+    def write(self, rows: np.ndarray, level: int = 6):
+        """Filter, compress and write the next rows of the image."""
+        self.write_compressed(*deflate(self.filter(rows), level))
+
+    def write_compressed(self, compressed: bytes, adler: int, length: int):
+        """Write rows filtered by filter and compressed by deflate, in the order they were filtered."""
+        payload = compressed if self._started else _ZLIB_HEADER + compressed
+        self._started = True
+        self._adler = adler32_combine(self._adler, adler, length)
+        self._rows += length // (self._width * 4 + 1)
+        self._write_chunk(b"IDAT", payload)
+
+    def close(self):
+        """Finish the image, which needs every row to have been written."""
+        if self._rows != self._height:
+            raise ValueError(f"Wrote {self._rows} rows of an image of height {self._height}")
+        final = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH)
+        self._write_chunk(b"IDAT", final + struct.pack(">I", self._adler))
+        self._write_chunk(b"IEND", b"")
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)) + kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+def write_png(file: BinaryIO, bands: Iterable[np.ndarray], width: int, height: int):
+    """Write bands of straight RGBA rows as a PNG image, compressing them in the calling process."""
+    writer = PngWriter(file, width, height)
+    for rows in bands:
+        writer.write(rows)
+    writer.close()
@@ -0,0 +1,412 @@
+import base64
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import TextIO
+from xml.etree import ElementTree
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+from PySide6.QtGui import QImage
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.layers import LayerStack
+from mosaic.domain.render_cache import to_qimage
+from mosaic.domain.tilemap import CHUNK_SIZE, TILE_ID_DTYPE, ChunkedTileModel
+from mosaic.domain.tileset import Tileset
+from mosaic.persistence.export import (
+    ExportLayer,
+    create_pool,
+    export_layers,
+    ordered_map,
+    read_chunk,
+    worker_count,
+)
+from mosaic.persistence.png import write_png
+
+_logger = logging.getLogger(__name__)
+
+TILED_VERSION = "1.10"
+ENCODINGS = ("csv", "base64", "zlib")
+# The high bits of a global tile id flip and rotate the tile, they have no counterpart in a tile model
+_GID_MASK = 0x0FFFFFFF
+_TILESET_COLUMNS = 16
+
+
+class TiledError(ValueError):
+    pass
+
+
+def encode_data(ids: np.ndarray, encoding: str, json_array: bool = False) -> str:
+    """Encode tile ids as the layer data of a Tiled map, meant to run in worker processes.
+
+    Args:
+        ids: The tile ids of a chunk, which are global tile ids of a tileset whose first id is 1.
+        encoding: "csv", "base64", or "zlib" for zlib compressed base64.
+        json_array: Whether csv data is encoded as a JSON array, as in JSON maps, instead of text, as in TMX maps.
+    """
+    if encoding == "csv":
+        rows = [",".join(map(str, row)) for row in ids.tolist()]
+        return f"[{','.join(rows)}]" if json_array else "\n" + ",\n".join(rows) + "\n"
+
+    data = ids.astype("<u4", copy=False).tobytes()
+    if encoding == "zlib":
+        data = zlib.compress(data)
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_data(data: str | list, encoding: str | None, compression: str | None) -> np.ndarray:
+    """Decode the layer data of a Tiled map into a flat array of global tile ids."""
+    if isinstance(data, list):
+        return np.array(data, dtype=np.uint32)
+    if encoding == "csv":
+        return np.array([value for value in data.replace("\n", "").split(",") if value.strip()], dtype=np.uint32)
+    if encoding != "base64":
+        raise TiledError(f"Unsupported layer data encoding {encoding}")
+
+    raw = base64.b64decode(data.strip())
+    if compression in ("zlib", "gzip"):
+        # Accept both zlib and gzip headers
+        raw = zlib.decompress(raw, zlib.MAX_WBITS | 32)
+    elif compression:
+        raise TiledError(f"Unsupported layer data compression {compression}")
+    return np.frombuffer(raw, dtype="<u4")
+
+
+def _encoded_chunks(layers: list[ExportLayer], encoding: str, json_array: bool, workers: int | None):
+    """Yield (layer, chunk key, chunk size, encoded data) for the non-empty chunks of each layer, in order.
+
+    Chunks are read one at a time and encoded on a process pool, with a bounded number in flight. Each layer ends
+    with an item whose key and data are None.
+    """
+    workers = worker_count(workers)
+    pool = create_pool(workers)
+    try:
+        for layer in layers:
+            size = layer.model.chunk_size
+            keys = sorted(layer.model.chunk_keys(), key=lambda key: (key[1], key[0]))
+            arguments = (
+                (key, chunk.ids, encoding, json_array)
+                for key in keys
+                if (chunk := read_chunk(layer.model, key)) is not None and chunk.count
+            )
+            for key, data in ordered_map(pool, _encode_keyed, arguments, window=4 * max(workers, 1)):
+                yield layer, key, size, data
+            yield layer, None, size, None
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _encode_keyed(key: tuple[int, int], ids: np.ndarray, encoding: str, json_array: bool) -> tuple:
+    return key, encode_data(ids, encoding, json_array)
+
+
+def _check_encoding(encoding: str):
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding}, expected one of {', '.join(ENCODINGS)}")
+
+
+def _write_tileset_image(path: Path, tileset: Tileset) -> tuple[str, int, int, int]:
+    """Write the tiles next to a map as a grid image, returns its relative path, width, height and columns."""
+    tiles = tileset.tiles(0)[1:]
+    count, size = len(tiles), tileset.tile_size
+    columns = max(1, min(count, _TILESET_COLUMNS))
+    rows = -(-count // columns)
+    grid = np.zeros((rows * columns, size, size, 4), dtype=np.uint8)
+    grid[:count] = tiles
+    grid = grid.reshape(rows, columns, size, size, 4).transpose(0, 2, 1, 3, 4).reshape(rows * size, columns * size, 4)
+    # Tiles are premultiplied, PNG images are not
+    image = to_qimage(grid).convertToFormat(QImage.Format_RGBA8888)
+    pixels = np.frombuffer(image.constBits(), dtype=np.uint8).reshape(rows * size, columns * size, 4)
+
+    image_path = path.with_name(f"{path.stem}.tiles.png")
+    with open(image_path, "wb") as file:
+        write_png(file, [pixels], columns * size, rows * size)
+    return image_path.name, columns * size, rows * size, columns
+
+
+def _map_attributes(source: ChunkedTileModel | LayerStack, tileset: Tileset, layer_count: int) -> dict:
+    return {
+        "version": TILED_VERSION,
+        "orientation": "orthogonal",
+        "renderorder": "right-down",
+        "width": source.width,
+        "height": source.height,
+        "tilewidth": tileset.tile_size,
+        "tileheight": tileset.tile_size,
+        "infinite": 1,
+        "nextlayerid": layer_count + 1,
+        "nextobjectid": 1,
+    }
+
+
+@profiler.timed("export.tmx")
+def export_tmx(
+    path: str | os.PathLike,
+    source: ChunkedTileModel | LayerStack,
+    tileset: Tileset,
+    encoding: str = "zlib",
+    workers: int | None = None,
+):
+    """Export a map as a Tiled TMX map, with the tileset written as an image next to it.
+
+    The map is written in the chunked layout of infinite maps, with one chunk per non-empty chunk of each layer, so
+    it is streamed chunk by chunk and the chunks are encoded on a process pool.
+
+    Args:
+        path: The path of the map.
+        source: The map, a single model or a stack of layers.
+        tileset: The tileset of the map, tile id i is global tile id i of the exported tileset.
+        encoding: The encoding of the layer data, "csv", "base64", or "zlib" for zlib compressed base64.
+        workers: The number of processes encoding chunks, one per core by default, or 0 or 1 for none.
+    """
+    _check_encoding(encoding)
+    path = Path(path)
+    layers = export_layers(source)
+    image, image_width, image_height, columns = _write_tileset_image(path, tileset)
+    attributes = _map_attributes(source, tileset, len(layers))
+    data_attributes = 'encoding="csv"' if encoding == "csv" else 'encoding="base64"'
+    if encoding == "zlib":
+        data_attributes += ' compression="zlib"'
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write(f"<map {_xml_attributes(attributes)}>\n")
+        tileset_attributes = {
+            "firstgid": 1,
+            "name": "tiles",
+            "tilewidth": tileset.tile_size,
+            "tileheight": tileset.tile_size,
+            "tilecount": len(tileset) - 1,
+            "columns": columns,
+        }
+        file.write(f" <tileset {_xml_attributes(tileset_attributes)}>\n")
+        file.write(f'  <image source={quoteattr(image)} width="{image_width}" height="{image_height}"/>\n')
+        file.write(" </tileset>\n")
+
+        current = None
+        for layer, key, size, data in _encoded_chunks(layers, encoding, False, workers):
+            if layer is not current:
+                current = layer
+                layer_attributes = {"id": layers.index(layer) + 1, "name": layer.name}
+                layer_attributes.update(width=source.width, height=source.height)
+                if not layer.visible:
+                    layer_attributes["visible"] = 0
+                if layer.opacity != 1.0:
+                    layer_attributes["opacity"] = f"{layer.opacity:g}"
+                file.write(f" <layer {_xml_attributes(layer_attributes)}>\n  <data {data_attributes}>\n")
+            if key is None:
+                file.write("  </data>\n </layer>\n")
+                continue
+            x, y = key[0] * size, key[1] * size
+            file.write(f'   <chunk x="{x}" y="{y}" width="{size}" height="{size}">{data}</chunk>\n')
+        file.write("</map>\n")
+    _logger.info(f"Exported {len(layers)} layers to {path}")
+
+
+def _xml_attributes(attributes: dict) -> str:
+    return " ".join(f"{name}={quoteattr(str(value))}" for name, value in attributes.items())
+
+
+@profiler.timed("export.json")
+def export_json(
+    path: str | os.PathLike,
+    source: ChunkedTileModel | LayerStack,
+    tileset: Tileset,
+    encoding: str = "zlib",
+    workers: int | None = None,
+):
+    """Export a map as a Tiled JSON map, with the tileset written as an image next to it, see export_tmx."""
+    _check_encoding(encoding)
+    path = Path(path)
+    layers = export_layers(source)
+    image, image_width, image_height, columns = _write_tileset_image(path, tileset)
+    document = _map_attributes(source, tileset, len(layers))
+    document.update(type="map", infinite=True, compressionlevel=-1)
+    document["tilesets"] = [
+        {
+            "firstgid": 1,
+            "name": "tiles",
+            "image": image,
+            "imagewidth": image_width,
+            "imageheight": image_height,
+            "tilewidth": tileset.tile_size,
+            "tileheight": tileset.tile_size,
+            "tilecount": len(tileset) - 1,
+            "columns": columns,
+            "margin": 0,
+            "spacing": 0,
+        }
+    ]
+
+    with open(path, "w", encoding="utf-8") as file:
+        # Written piece by piece, the layers and their chunks are streamed
+        file.write(json.dumps(document)[:-1] + ', "layers": [')
+        current = None
+        for layer, key, size, data in _encoded_chunks(layers, encoding, True, workers):
+            if layer is not current:
+                if current is not None:
+                    file.write(", ")
+                current, first = layer, True
+                _write_json_layer(file, layers.index(layer) + 1, layer, source, encoding)
+            if key is None:
+                file.write("]}")
+                continue
+            chunk = {"x": key[0] * size, "y": key[1] * size, "width": size, "height": size}
+            data = data if encoding == "csv" else json.dumps(data)
+            file.write(("" if first else ", ") + json.dumps(chunk)[:-1] + f', "data": {data}}}')
+            first = False
+        file.write("]}\n")
+    _logger.info(f"Exported {len(layers)} layers to {path}")
+
+
+def _write_json_layer(file: TextIO, layer_id: int, layer: ExportLayer, source, encoding: str):
+    attributes = {
+        "type": "tilelayer",
+        "id": layer_id,
+        "name": layer.name,
+        "x": 0,
+        "y": 0,
+        "startx": 0,
+        "starty": 0,
+        "width": source.width,
+        "height": source.height,
+        "visible": layer.visible,
+        "opacity": layer.opacity,
+        "encoding": "csv" if encoding == "csv" else "base64",
+    }
+    if encoding == "zlib":
+        attributes["compression"] = "zlib"
+    file.write(json.dumps(attributes)[:-1] + ', "chunks": [')
+
+
+class _ImportedLayer:
+    __slots__ = ("name", "visible", "opacity", "blocks")
+
+    def __init__(self, name: str, visible: bool, opacity: float):
+        self.name = name
+        self.visible = visible
+        self.opacity = opacity
+        # Blocks of global tile ids as (x, y, ids indexed [row, column])
+        self.blocks: list[tuple[int, int, np.ndarray]] = []
+
+
+@profiler.timed("import.tiled")
+def import_tiled(path: str | os.PathLike, chunk_size: int = CHUNK_SIZE) -> LayerStack:
+    """Import the tile layers of a Tiled map, in TMX or JSON format, as a stack of layers.
+
+    Both finite maps and the chunked layout of infinite maps are supported, with csv, base64, zlib or gzip layer
+    data. Global tile ids are numbered from 1 for the first tile of the first tileset, and flip flags are dropped.
+    The map covers its declared size and every tile, tiles left of or above the origin are moved in.
+
+    Args:
+        path: The path of the map, a .json file is read as a JSON map and anything else as a TMX map.
+        chunk_size: The chunk size of the imported layers.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        width, height, first_gid, layers = _read_json(path)
+    else:
+        width, height, first_gid, layers = _read_tmx(path)
+
+    left, top, right, bottom = 0, 0, width, height
+    for x, y, gids in (block for layer in layers for block in layer.blocks):
+        # Chunks of infinite maps are padded with empty tiles, only the tiles in them extend the map
+        rows, columns = np.flatnonzero(gids.any(axis=1)), np.flatnonzero(gids.any(axis=0))
+        if len(rows):
+            left, top = min(left, x + int(columns[0])), min(top, y + int(rows[0]))
+            right, bottom = max(right, x + int(columns[-1]) + 1), max(bottom, y + int(rows[-1]) + 1)
+
+    stack = LayerStack(right - left, bottom - top, chunk_size)
+    for imported in layers:
+        layer = stack.add_layer(imported.name, visible=imported.visible, opacity=imported.opacity)
+        with layer.model.batch():
+            for x, y, gids in imported.blocks:
+                gids = gids & _GID_MASK
+                ids = np.where(gids >= first_gid, gids - first_gid + 1, 0).astype(TILE_ID_DTYPE)
+                layer.model.write_region(x - left, y - top, ids)
+    _logger.info(f"Imported {len(layers)} layers of a {stack.width}x{stack.height} map from {path}")
+    return stack
+
+
+def _read_tmx(path: Path) -> tuple[int, int, int, list[_ImportedLayer]]:
+    root = ElementTree.parse(path).getroot()
+    if root.tag != "map":
+        raise TiledError(f"{path} is not a TMX map")
+
+    tilesets = root.findall("tileset")
+    first_gid = int(tilesets[0].get("firstgid", 1)) if tilesets else 1
+    width, height = int(root.get("width", 0)), int(root.get("height", 0))
+    layers = []
+    for element in root.iter("layer"):
+        layer = _ImportedLayer(
+            element.get("name", f"Layer {len(layers) + 1}"),
+            element.get("visible", "1") != "0",
+            float(element.get("opacity", 1.0)),
+        )
+        data = element.find("data")
+        if data is not None:
+            encoding, compression = data.get("encoding"), data.get("compression")
+            chunks = data.findall("chunk")
+            if chunks:
+                for chunk in chunks:
+                    layer.blocks.append(_tmx_block(chunk, encoding, compression))
+            else:
+                layer.blocks.append(_tmx_block(data, encoding, compression, width, height))
+        layers.append(layer)
+    return width, height, first_gid, layers
+
+
+def _tmx_block(element, encoding, compression, width=None, height=None) -> tuple[int, int, np.ndarray]:
+    width = int(element.get("width", width))
+    height = int(element.get("height", height))
+    if encoding is None:
+        # The uncompressed XML format lists each tile as an element
+        gids = np.array([int(tile.get("gid", 0)) for tile in element.iter("tile")], dtype=np.uint32)
+    else:
+        gids = decode_data(element.text or "", encoding, compression)
+    return int(element.get("x", 0)), int(element.get("y", 0)), _shaped(gids, width, height)
+
+
+def _read_json(path: Path) -> tuple[int, int, int, list[_ImportedLayer]]:
+    with open(path, encoding="utf-8") as file:
+        document = json.load(file)
+    if document.get("type", "map") != "map":
+        raise TiledError(f"{path} is not a JSON map")
+
+    tilesets = document.get("tilesets") or [{}]
+    first_gid = int(tilesets[0].get("firstgid", 1))
+    width, height = int(document.get("width", 0)), int(document.get("height", 0))
+    layers = []
+    for element in _json_tile_layers(document.get("layers", [])):
+        layer = _ImportedLayer(
+            element.get("name", f"Layer {len(layers) + 1}"),
+            bool(element.get("visible", True)),
+            float(element.get("opacity", 1.0)),
+        )
+        encoding, compression = element.get("encoding", "csv"), element.get("compression")
+        for block in element.get("chunks") or ([element] if "data" in element else []):
+            gids = decode_data(block["data"], encoding, compression)
+            block_width, block_height = int(block.get("width", width)), int(block.get("height", height))
+            layer.blocks.append(
+                (int(block.get("x", 0)), int(block.get("y", 0)), _shaped(gids, block_width, block_height))
+            )
+        layers.append(layer)
+    return width, height, first_gid, layers
+
+
+def _json_tile_layers(layers: list[dict]):
+    for layer in layers:
+        if layer.get("type") == "tilelayer":
+            yield layer
+        elif layer.get("type") == "group":
+            yield from _json_tile_layers(layer.get("layers", []))
+
+
+def _shaped(gids: np.ndarray, width: int, height: int) -> np.ndarray:
+    if len(gids) != width * height:
+        raise TiledError(f"Expected {width * height} tiles in a {width}x{height} block, got {len(gids)}")
+    return gids.reshape(height, width)
@@ -0,0 +1,108 @@
+import logging
+
+import numpy as np
+from PySide6.QtCore import QEvent, QObject, QPointF, QRectF, Qt
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QGraphicsView
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.object_layer import ObjectLayerItem
+from mosaic.domain.tilescene import TileScene
+
+_logger = logging.getLogger(__name__)
+
+
+class ObjectTool(QObject):
+    """Selects and moves the objects of the object layer of a scene with the left mouse button.
+
+    Pressing on an object selects it, or toggles it with control held, and dragging moves the whole selection with a
+    single vectorized offset of the position arrays per mouse move. Pressing on empty space and dragging selects the
+    objects within the rubber band rect. The tool is inactive, and leaves mouse events to other tools, until it is
+    made active.
+
+    Args:
+        view: The view showing a TileScene with an object layer.
+    """
+
+    def __init__(self, view: QGraphicsView):
+        super().__init__(view)
+        self._view = view
+        self._active = False
+        self._last: QPointF | None = None
+        self._anchor: QPointF | None = None
+        self._base = np.empty(0, dtype=np.int64)
+        self._moved = False
+        self._view.viewport().installEventFilter(self)
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    @active.setter
+    def active(self, active: bool):
+        self._active = active
+        self._last = self._anchor = None
+
+    def _layer(self) -> ObjectLayerItem | None:
+        scene = self._view.scene()
+        return scene.object_layer if isinstance(scene, TileScene) else None
+
+    def _position(self, layer: ObjectLayerItem, event: QMouseEvent) -> QPointF:
+        return layer.mapFromScene(self._view.mapToScene(event.position().toPoint()))
+
+    def _press(self, layer: ObjectLayerItem, position: QPointF, extend: bool):
+        store = layer.store
+        index = layer.object_at(position)
+        if index is None:
+            # Rubber band selection, extending the current selection with control held
+            self._base = np.flatnonzero(store.selected) if extend else np.empty(0, dtype=np.int64)
+            if not extend:
+                store.clear_selection()
+            self._anchor = position
+            return
+
+        if extend:
+            store.toggle([index])
+        elif not store.selected[index]:
+            store.select([index])
+        if store.selected[index]:
+            self._last = position
+            self._moved = False
+
+    def _drag(self, layer: ObjectLayerItem, position: QPointF):
+        if self._last is not None:
+            size = layer.tile_size
+            delta = position - self._last
+            layer.store.move_selected(delta.x() / size, delta.y() / size)
+            self._last = position
+            self._moved = True
+        elif self._anchor is not None:
+            found = layer.objects_in(QRectF(self._anchor, position).normalized())
+            layer.store.select(np.union1d(self._base, found))
+
+    def _release(self, layer: ObjectLayerItem):
+        if self._moved:
+            _logger.debug(f"Moved {int(np.count_nonzero(layer.store.selected))} objects")
+            layer.flush_index()
+        self._last = self._anchor = None
+        self._moved = False
+
+    @profiler.timed("object_tool.event")
+    def eventFilter(self, _watched, event) -> bool:
+        # Checked before touching any attribute, since the view delivers other events while it is torn down
+        if not isinstance(event, QMouseEvent) or not self._active:
+            return False
+        layer = self._layer()
+        if layer is None:
+            return False
+
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self._press(layer, self._position(layer, event), Qt.ControlModifier in event.modifiers())
+            return True
+        elif event.type() == QEvent.MouseMove and event.buttons() & Qt.LeftButton:
+            self._drag(layer, self._position(layer, event))
+            return True
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            self._release(layer)
+            return True
+        return False
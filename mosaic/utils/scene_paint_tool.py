@@ -0,0 +1,171 @@
+import itertools
+import logging
+from collections.abc import Callable
+from enum import Enum
+from typing import Any
+
+import numpy as np
+from PySide6.QtCore import QEvent, QObject, Qt
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QGraphicsView
+
+from mosaic.core.instrumentation import profiler
+from mosaic.domain import painting
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate
+from mosaic.domain.tilescene import TileScene
+
+_logger = logging.getLogger(__name__)
+
+
+class PaintMode(Enum):
+    PENCIL = "pencil"
+    LINE = "line"
+    RECT = "rect"
+    FILL = "fill"
+    STAMP = "stamp"
+
+
+class PaintTool(QObject):
+    """Paints tiles into the tile layer of a scene with the left mouse button.
+
+    Every press, drag and release of one gesture is recorded as a single undoable edit, since all edits of a stroke
+    share a merge key, and every edit notifies the tile layer once, so it repaints only the changed area. Lines and
+    rects are drawn between the cell where the button was pressed and the cell where it was released. The tool is
+    inactive, and leaves mouse events to other tools, while its mode is None.
+
+    Args:
+        view: The view showing a TileScene to paint in.
+
+    Attributes:
+        tile_id: The tile to paint with.
+        flags: The flags of the painted cells.
+        brush_size: The width in cells of the pencil and line brush.
+    """
+
+    _strokes = itertools.count()
+
+    def __init__(self, view: QGraphicsView):
+        super().__init__(view)
+        self._view = view
+        self._mode: PaintMode | None = None
+        self.tile_id = 1
+        self.flags = 0
+        self.brush_size = 1
+        self._pattern = np.ones((1, 1), dtype=np.uint32)
+        self._anchor: GridCoordinate | None = None
+        self._last: GridCoordinate | None = None
+        self._stroke = 0
+        self._view.viewport().installEventFilter(self)
+
+    @property
+    def mode(self) -> PaintMode | None:
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode: PaintMode | None):
+        self._mode = mode
+        self._anchor = self._last = None
+
+    @property
+    def pattern(self) -> np.ndarray:
+        """The tile ids stamped by the stamp mode, empty cells are transparent."""
+        return self._pattern
+
+    @pattern.setter
+    def pattern(self, pattern: np.ndarray):
+        self._pattern = np.atleast_2d(np.asarray(pattern, dtype=np.uint32))
+
+    def _scene(self) -> TileScene | None:
+        scene = self._view.scene()
+        return scene if isinstance(scene, TileScene) and scene.tile_layer is not None else None
+
+    def _cell(self, scene: TileScene, event: QMouseEvent) -> GridCoordinate:
+        layer = scene.tile_layer
+        return layer.cell_at(layer.mapFromScene(self._view.mapToScene(event.position().toPoint())), clamp=True)
+
+    def _edit(self, scene: TileScene, text: str, paint: Callable[[ChunkedTileModel], Any]) -> Any:
+        model = scene.tile_layer.model
+        with scene.undo_stack.edit(text, merge_key=("paint", self._stroke), model=model):
+            return paint(model)
+
+    def _press(self, scene: TileScene, cell: GridCoordinate):
+        self._stroke = next(self._strokes)
+        self._anchor = self._last = cell
+        if self._mode is PaintMode.PENCIL:
+            self._pencil(scene, cell)
+        elif self._mode is PaintMode.STAMP:
+            self._stamp(scene, cell)
+        elif self._mode is PaintMode.FILL:
+            filled = self._edit(
+                scene, "Fill", lambda model: painting.flood_fill(model, cell.x, cell.y, self.tile_id, self.flags)
+            )
+            _logger.debug(f"Flood filled {filled} cells from {cell}")
+
+    def _drag(self, scene: TileScene, cell: GridCoordinate):
+        if cell == self._last:
+            return
+        if self._mode is PaintMode.PENCIL:
+            self._pencil(scene, cell)
+        elif self._mode is PaintMode.STAMP:
+            self._stamp(scene, cell)
+        self._last = cell
+
+    def _release(self, scene: TileScene, cell: GridCoordinate):
+        anchor = self._anchor
+        if anchor is None:
+            return
+        x0, x1 = sorted((anchor.x, cell.x))
+        y0, y1 = sorted((anchor.y, cell.y))
+        if self._mode is PaintMode.LINE:
+            self._edit(
+                scene,
+                "Line",
+                lambda model: painting.fill_line(
+                    model, anchor.x, anchor.y, cell.x, cell.y, self.tile_id, self.flags, self.brush_size
+                ),
+            )
+        elif self._mode is PaintMode.RECT:
+            self._edit(
+                scene,
+                "Rectangle",
+                lambda model: model.fill_region(x0, y0, x1 - x0 + 1, y1 - y0 + 1, self.tile_id, self.flags),
+            )
+        self._anchor = self._last = None
+
+    def _pencil(self, scene: TileScene, cell: GridCoordinate):
+        # Connect to the previous cell, so fast drags leave no gaps
+        start = self._last or cell
+        self._edit(
+            scene,
+            "Paint",
+            lambda model: painting.fill_line(
+                model, start.x, start.y, cell.x, cell.y, self.tile_id, self.flags, self.brush_size
+            ),
+        )
+
+    def _stamp(self, scene: TileScene, cell: GridCoordinate):
+        # Stamps snap to a grid of the pattern size from the first stamp, so dragging tiles the pattern seamlessly
+        height, width = self._pattern.shape
+        x = self._anchor.x + (cell.x - self._anchor.x) // width * width
+        y = self._anchor.y + (cell.y - self._anchor.y) // height * height
+        self._edit(scene, "Stamp", lambda model: painting.stamp(model, x, y, self._pattern))
+
+    @profiler.timed("paint_tool.event")
+    def eventFilter(self, _watched, event) -> bool:
+        # Checked before touching any attribute, since the view delivers other events while it is torn down
+        if not isinstance(event, QMouseEvent) or self._mode is None:
+            return False
+        scene = self._scene()
+        if scene is None:
+            return False
+
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self._press(scene, self._cell(scene, event))
+            return True
+        elif event.type() == QEvent.MouseMove and event.buttons() & Qt.LeftButton:
+            self._drag(scene, self._cell(scene, event))
+            return True
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            self._release(scene, self._cell(scene, event))
+            return True
+        return False
@@ -4,6 +4,11 @@ from PySide6.QtCore import QObject, Qt, QEvent
 from PySide6.QtGui import QMouseEvent
 from PySide6.QtWidgets import QGraphicsView
 
+from mosaic.core.instrumentation import profiler
+from mosaic.domain.selection import Selection
+from mosaic.domain.tilemap import GridCoordinate
+from mosaic.domain.tilescene import TileScene
+
 _logger = logging.getLogger(__name__)
 
 
@@ -12,19 +17,70 @@ class SelectionTool(QObject):
         super().__init__(view)  # Pass the view as the parent to ensure proper cleanup
         self._view = view
         self._scene = view.scene()
+        self._anchor: GridCoordinate | None = None
+        self._base: Selection | None = None
         self._view.viewport().installEventFilter(self)
 
+    def _tile_layer(self):
+        return self._scene.tile_layer if isinstance(self._scene, TileScene) else None
+
+    def _clear(self):
+        if layer := self._tile_layer():
+            layer.clear_selection()
+        else:
+            self._scene.clearSelection()
+
+    def _select_at(self, position) -> bool:
+        # Tile layers map positions to cells arithmetically instead of searching the scene index
+        if layer := self._tile_layer():
+            self._anchor = layer.cell_at(layer.mapFromScene(position))
+            self._base = layer.selection.copy()
+            if self._anchor is None:
+                return False
+            layer.select_cell(self._anchor)
+            return True
+
+        if item := self._scene.itemAt(position, self._view.transform()):
+            item.setSelected(True)
+            return True
+        return False
+
+    def _drag_to(self, position) -> bool:
+        # Dragging over a tile layer selects the rubber band rect between the anchor and the cursor as runs of cells
+        if layer := self._tile_layer():
+            if self._anchor is None or self._base is None:
+                return False
+            cell = layer.cell_at(layer.mapFromScene(position), clamp=True)
+            x0, x1 = sorted((self._anchor.x, cell.x))
+            y0, y1 = sorted((self._anchor.y, cell.y))
+            layer.set_selection(self._base | Selection.from_rect(layer.model, x0, y0, x1 + 1, y1 + 1))
+            return True
+
+        if item := self._scene.itemAt(position, self._view.transform()):
+            item.setSelected(True)
+            return True
+        return False
+
+    def _select_similar(self, position, extend: bool) -> bool:
+        # Double clicking a tile layer selects the connected area of the same tile
+        layer = self._tile_layer()
+        if layer is None or (cell := layer.cell_at(layer.mapFromScene(position))) is None:
+            return False
+
+        similar = Selection.similar(layer.model, cell.x, cell.y)
+        layer.set_selection(self._base | similar if extend and self._base is not None else similar)
+        return True
+
+    @profiler.timed("select_tool.event")
     def eventFilter(self, _watched, event) -> bool:
         if isinstance(event, QMouseEvent):
-            position = self._view.mapToScene(event.pos())
+            position = self._view.mapToScene(event.position().toPoint())
             if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
                 if Qt.ControlModifier not in event.modifiers():
-                    self._scene.clearSelection()
-                if item := self._scene.itemAt(position, self._view.transform()):
-                    item.setSelected(True)
-                    return True
+                    self._clear()
+                return self._select_at(position)
+            elif event.type() == QEvent.MouseButtonDblClick and event.button() == Qt.LeftButton:
+                return self._select_similar(position, Qt.ControlModifier in event.modifiers())
             elif event.type() == QEvent.MouseMove and event.buttons() & Qt.LeftButton:
-                if item := self._scene.itemAt(position, self._view.transform()):
-                    item.setSelected(True)
-                    return True
+                return self._drag_to(position)
         return False
@@ -1,48 +1,247 @@
-from PySide6.QtCore import QObject, Qt, QPointF
-from PySide6.QtGui import QWheelEvent, QKeyEvent
+import math
+
+from PySide6.QtCore import QEvent, QObject, QPointF, Qt, QTimer
+from PySide6.QtGui import QKeyEvent, QMouseEvent, QPainter, QWheelEvent
 from PySide6.QtWidgets import QGraphicsView
 
+from mosaic.core.instrumentation import profiler
+
+FRAME_INTERVAL_MS = 16
+IDLE_INTERVAL_MS = 150
+# Pixels scrolled per notch of a mouse wheel without high resolution deltas
+WHEEL_STEP_PIXELS = 60
+# The fraction of the remaining zoom that smooth zooming applies per frame
+SMOOTH_FRACTION = 0.3
+
+
+class RenderQuality(QObject):
+    """Drops the expensive render hints of a view while it moves, and restores them once it has been idle.
+
+    Args:
+        view: The view to lower the render quality of.
+        idle_ms: How long the view has to stand still before the render hints are restored.
+    """
+
+    REDUCED_HINTS = (QPainter.Antialiasing, QPainter.SmoothPixmapTransform)
+
+    def __init__(self, view: QGraphicsView, idle_ms: int = IDLE_INTERVAL_MS):
+        super().__init__(view)
+        self._view = view
+        self._saved: QPainter.RenderHint | None = None
+        self._idle = QTimer(self)
+        self._idle.setSingleShot(True)
+        self._idle.setInterval(idle_ms)
+        self._idle.timeout.connect(self.restore)
+
+    @property
+    def moving(self) -> bool:
+        return self._saved is not None
+
+    def moved(self):
+        """Note that the view moved, lowering its render quality until it has been idle for a while."""
+        if self._saved is None:
+            self._saved = self._view.renderHints()
+            for hint in self.REDUCED_HINTS:
+                self._view.setRenderHint(hint, False)
+        self._idle.start()
 
-class SceneZoomTool(QObject):
-    def __init__(self, view: QGraphicsView):
-        super().__init__()
+    def restore(self):
+        """Restore the render hints the view had before it started moving, which repaints it."""
+        if self._saved is not None:
+            self._view.setRenderHints(self._saved)
+            self._saved = None
+        self._idle.stop()
+
+
+class _FrameTool(QObject):
+    """A tool that accumulates input and applies it to a view at most once per display frame."""
+
+    def __init__(self, view: QGraphicsView, quality: RenderQuality | None):
+        # Owned by the view, so that the frame timer does not outlive it
+        super().__init__(view)
         self._view = view
+        self._quality = quality or RenderQuality(view)
+        self._frame = QTimer(self)
+        self._frame.setInterval(FRAME_INTERVAL_MS)
+        self._frame.timeout.connect(self._on_frame)
+        # The accumulated pan in pixels
+        self._pan = QPointF()
+
+    @property
+    def quality(self) -> RenderQuality:
+        return self._quality
+
+    def _schedule(self):
+        if not self._frame.isActive():
+            self._frame.start()
+
+    def _on_frame(self):
+        with profiler.span("view.frame"):
+            pending = self.flush()
+        if not pending:
+            self._frame.stop()
+
+    def flush(self) -> bool:
+        """Apply the accumulated input, returns whether some is left for later frames."""
+        if self._scroll_pan():
+            self._quality.moved()
+        return False
+
+    def _scroll_pan(self) -> bool:
+        """Scroll the view by the whole pixels of the accumulated pan, returns whether it moved.
+
+        The fraction of a pixel left over is kept for later input, so that slow drags and the small deltas of high
+        resolution wheels still add up to a scroll instead of being rounded away one event at a time.
+        """
+        dx, dy = round(self._pan.x()), round(self._pan.y())
+        if not dx and not dy:
+            return False
+        self._scroll(-dx, -dy)
+        self._pan -= QPointF(dx, dy)
+        return True
+
+    def _scroll(self, dx: float, dy: float):
+        horizontal, vertical = self._view.horizontalScrollBar(), self._view.verticalScrollBar()
+        horizontal.setValue(horizontal.value() + round(dx))
+        vertical.setValue(vertical.value() + round(dy))
+
+
+class SceneZoomTool(_FrameTool):
+    """Zooms a view with the mouse wheel while the zoom modifier is held, and pans it with the wheel otherwise.
+
+    Wheel events only accumulate their deltas, which a timer applies to the view once per display frame, so the time
+    spent per event does not depend on the scene, and a touchpad sending dozens of events per frame causes a single
+    transform update and repaint. Zooming keeps the scene point under the cursor in place and is clamped to a range
+    of scales. With smooth zooming, the view eases towards the accumulated zoom over several frames, and keeps
+    gliding briefly after the wheel stops. The render quality is lowered while the view moves.
+
+    Args:
+        view: The view to zoom and pan.
+        quality: The render quality of the view, shared with other tools moving it.
+        smooth: Whether to ease into each zoom over several frames instead of applying it in the next frame.
+        min_scale: The smallest scale the view can be zoomed out to.
+        max_scale: The largest scale the view can be zoomed in to.
+    """
+
+    def __init__(
+        self,
+        view: QGraphicsView,
+        quality: RenderQuality | None = None,
+        smooth: bool = False,
+        min_scale: float = 1 / 256,
+        max_scale: float = 64.0,
+    ):
+        super().__init__(view, quality)
         self._zoom_factor = 1.0015
         self._zoom_modifier = Qt.ControlModifier
+        self.smooth = smooth
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        # The accumulated zoom as the logarithm of its factor
+        self._zoom = 0.0
+        self._anchor = QPointF()
         self._install_event_filter(view)
 
     def _install_event_filter(self, view: QGraphicsView):
         view.viewport().installEventFilter(self)
         view.setMouseTracking(True)
 
+    @property
+    def scale(self) -> float:
+        return self._view.transform().m11()
+
+    @property
+    def pending(self) -> bool:
+        return self._zoom != 0.0 or bool(round(self._pan.x()) or round(self._pan.y()))
+
     def zoom(self, delta: float, pos: QPointF):
-        factor = self._zoom_factor**delta
-        self._view.scale(factor, factor)
-        self._view.centerOn(pos)
+        """Zoom immediately by a wheel delta, keeping the scene point at a viewport position in place."""
+        self._scale_by(delta * math.log(self._zoom_factor), pos)
+
+    def flush(self) -> bool:
+        if self._zoom:
+            step = self._zoom * SMOOTH_FRACTION if self.smooth and abs(self._zoom) > 1e-3 else self._zoom
+            self._zoom = self._zoom - step if self._scale_by(step, self._anchor) else 0.0
+        self._scroll_pan()
+        self._quality.moved()
+        return self.pending
+
+    def _scale_by(self, log_factor: float, anchor: QPointF) -> bool:
+        """Scale the view around a viewport position, returns False if the scale was clamped."""
+        current = self.scale
+        target = current * math.exp(log_factor)
+        clamped = min(max(target, self.min_scale), self.max_scale)
+        if clamped != current:
+            anchored = self._view.mapToScene(anchor.toPoint())
+            self._view.scale(clamped / current, clamped / current)
+            moved = self._view.mapFromScene(anchored)
+            self._scroll(moved.x() - anchor.x(), moved.y() - anchor.y())
+        return clamped == target
 
+    @profiler.timed("zoom_tool.event")
     def eventFilter(self, _watched, event) -> bool:
-        if isinstance(event, QWheelEvent):
-            if self._zoom_modifier in event.modifiers():
-                scroll = event.angleDelta().y()
-                self.zoom(scroll, event.position())
-                return True
+        if not isinstance(event, QWheelEvent):
+            return False
 
-        return False
+        if self._zoom_modifier in event.modifiers():
+            self._zoom += event.angleDelta().y() * math.log(self._zoom_factor)
+            self._anchor = event.position()
+        elif not event.pixelDelta().isNull():
+            self._pan += QPointF(event.pixelDelta())
+        else:
+            self._pan += QPointF(event.angleDelta()) / 120 * WHEEL_STEP_PIXELS
+        self._schedule()
+        return True
 
 
-class GraphicsViewPan(QObject):
-    def __init__(self, view: QGraphicsView):
-        super().__init__()
-        self._view = view
-        self._pan_modifier = Qt.ControlModifier
+class GraphicsViewPan(_FrameTool):
+    """Pans a view by dragging with the left mouse button while the space key is held.
+
+    Mouse moves only accumulate the distance dragged, which is scrolled once per display frame, and the render
+    quality is lowered while the view moves. The tool is meant to be installed after the other mouse tools of the
+    view, so that it receives the mouse events of a drag before they select or paint anything.
+
+    Args:
+        view: The view to pan.
+        quality: The render quality of the view, shared with other tools moving it.
+    """
+
+    def __init__(self, view: QGraphicsView, quality: RenderQuality | None = None):
+        super().__init__(view, quality)
+        self._last: QPointF | None = None
 
         self._install_event_filter(view)
 
     def _install_event_filter(self, view: QGraphicsView):
         view.installEventFilter(self)
+        view.viewport().installEventFilter(self)
         view.setMouseTracking(True)
 
+    @property
+    def panning(self) -> bool:
+        return self._view.dragMode() == QGraphicsView.DragMode.ScrollHandDrag
+
+    def _drag(self, event: QMouseEvent) -> bool:
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self._last = event.position()
+            self._view.viewport().setCursor(Qt.ClosedHandCursor)
+        elif event.type() == QEvent.MouseMove and self._last is not None:
+            self._pan += event.position() - self._last
+            self._last = event.position()
+            self._schedule()
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            self.flush()
+            self._last = None
+            self._view.viewport().setCursor(Qt.OpenHandCursor)
+        else:
+            return False
+        return True
+
+    @profiler.timed("pan_tool.event")
     def eventFilter(self, _watched, event) -> bool:
+        if isinstance(event, QMouseEvent):
+            return self.panning and self._drag(event)
+
         if event.type() == QKeyEvent.Type.KeyPress:
             if event.key() == Qt.Key_Space:
                 if self._view.dragMode() != QGraphicsView.DragMode.ScrollHandDrag:
@@ -52,5 +251,7 @@ class GraphicsViewPan(QObject):
             if event.key() == Qt.Key_Space:
                 if self._view.dragMode() == QGraphicsView.DragMode.ScrollHandDrag:
                     self._view.setDragMode(QGraphicsView.DragMode.NoDrag)
+                    self.flush()
+                    self._last = None
 
         return False
@@ -1,18 +1,29 @@
-from typing import TypeVar, Type
-
-from PySide6.QtWidgets import QWidget
+import importlib
+from typing import TYPE_CHECKING, TypeVar, Type
 
 from mosaic.core.builder import Builder
 
-# flake8: noqa
-from .main_menu import MainMenu
-from .main_window import MainWindow
-from .status_bar import StatusBar
+if TYPE_CHECKING:
+    from PySide6.QtWidgets import QWidget
+
+# Widget modules pull in QtWidgets, so they are only imported once one of their types is first accessed
+_lazy_types = {
+    "MainMenu": ".main_menu",
+    "MainWindow": ".main_window",
+    "StatusBar": ".status_bar",
+}
 
 factory: Builder = Builder()
 
-T = TypeVar("T", bound=QWidget)
+T = TypeVar("T", bound="QWidget")
+
+
+def __getattr__(name: str):
+    if name in _lazy_types:
+        value = globals()[name] = getattr(importlib.import_module(_lazy_types[name], __name__), name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def resolve(widget_type: Type[T], **kwargs) -> T:
+def resolve(widget_type: Type[T] | str, **kwargs) -> T:
     return factory.resolve(widget_type, **kwargs)
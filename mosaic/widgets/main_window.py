@@ -1,9 +1,22 @@
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QCloseEvent
 from PySide6.QtWidgets import QMainWindow
 
 from mosaic import actions
 from mosaic.widgets.main_menu import MainMenu
 from mosaic.widgets.status_bar import StatusBar
 
+if TYPE_CHECKING:
+    from mosaic.domain.history import UndoStack
+    from mosaic.domain.tilescene import TileScene
+    from mosaic.persistence.journal import Journal
+    from mosaic.persistence.mapfile import MapFile
+
+# The interval in milliseconds at which the journal of an open map file is compacted into it
+COMPACT_INTERVAL = 60_000
+
 
 class MainWindow(QMainWindow):
     def __init__(self, main_menu: MainMenu, status_bar: StatusBar, parent=None):
@@ -12,11 +25,101 @@ class MainWindow(QMainWindow):
 
         self.setMenuBar(main_menu)
         self.setStatusBar(status_bar)
-        # self.setCentralWidget(view)
+        self._status_bar = status_bar
+        self._export: actions.ExportMap | None = None
+        self._map_file: "MapFile | None" = None
+        self._journal: "Journal | None" = None
+        self._compact_timer = QTimer(self)
+        self._compact_timer.setInterval(COMPACT_INTERVAL)
+        self._compact_timer.timeout.connect(self._compact)
 
         self.populate_menus()
 
+    @property
+    def map_file(self) -> "MapFile | None":
+        return self._map_file
+
+    def open_map(self, path: str):
+        """Show the map of a map file, replaying the edits its journal holds and journaling those made from now on.
+
+        The journal is compacted into the map file periodically and when the map is closed. The map shown before is
+        closed once the new one is shown.
+        """
+        # Imported here, so that starting the editor with a new map does not load the persistence layer
+        from mosaic.domain.tilescene import TileScene
+        from mosaic.persistence.journal import Journal
+        from mosaic.persistence.mapfile import MapFile
+
+        map_file = MapFile.open(path)
+        try:
+            journal = Journal(map_file)
+        except Exception:
+            map_file.close()
+            raise
+
+        previous = self._map_file, self._journal
+        self._map_file, self._journal = map_file, journal
+        self.set_scene(TileScene(model=map_file.model))
+        self._close_map(*previous)
+        self._compact_timer.start()
+
+    def close_map(self):
+        """Compact the journal of the open map file into it and close both."""
+        self._compact_timer.stop()
+        self._close_map(self._map_file, self._journal)
+        self._map_file, self._journal = None, None
+
+    def closeEvent(self, event: QCloseEvent):
+        self.close_map()
+        super().closeEvent(event)
+
+    def set_scene(self, scene: "TileScene"):
+        """Show a scene in the window, add the menu actions that work on it and track it in the status bar."""
+        # Imported here, so that resolving the window does not load the tools and the domain layer behind the view
+        from mosaic.widgets.scene_view import SceneView
+
+        self.setCentralWidget(SceneView(scene, self))
+        self._status_bar.track_scene(scene)
+        self.populate_file_menu(scene)
+        if scene.undo_stack is not None:
+            self.populate_edit_menu(scene.undo_stack)
+
     def populate_menus(self):
         menu = self.menuBar()
         if isinstance(menu, MainMenu):
-            menu.file.addAction(actions.Quit(self))
+            self._quit = actions.Quit(self)
+            menu.file.addAction(actions.OpenMap(self))
+            menu.file.addAction(self._quit)
+            menu.view.addAction(actions.TogglePerformance(self._status_bar, self))
+            menu.view.addAction(actions.ExportTrace(self))
+
+    def populate_file_menu(self, scene: "TileScene"):
+        menu = self.menuBar()
+        if isinstance(menu, MainMenu):
+            # The export action of a previous scene is replaced, keeping its separator from the quit action
+            if self._export is None:
+                self._export = actions.ExportMap(scene, self)
+                menu.file.insertAction(self._quit, self._export)
+                menu.file.insertSeparator(self._quit)
+            else:
+                export, self._export = self._export, actions.ExportMap(scene, self)
+                menu.file.insertAction(export, self._export)
+                menu.file.removeAction(export)
+
+    def populate_edit_menu(self, stack: "UndoStack"):
+        menu = self.menuBar()
+        if isinstance(menu, MainMenu):
+            menu.edit.clear()
+            menu.edit.addAction(actions.Undo(stack, self))
+            menu.edit.addAction(actions.Redo(stack, self))
+
+    def _compact(self):
+        if self._journal is not None:
+            self._journal.compact()
+
+    @staticmethod
+    def _close_map(map_file: "MapFile | None", journal: "Journal | None"):
+        if journal is not None:
+            journal.close()
+        if map_file is not None:
+            map_file.close()
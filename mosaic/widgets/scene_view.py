@@ -1,9 +1,12 @@
 from PySide6.QtGui import QPainter
 from PySide6.QtWidgets import QGraphicsView
 
+from mosaic.core.instrumentation import profiler
 from mosaic.domain.tilescene import TileScene
+from mosaic.utils.scene_object_tool import ObjectTool
+from mosaic.utils.scene_paint_tool import PaintTool
 from mosaic.utils.scene_select_tool import SelectionTool
-from mosaic.utils.scene_zoom_tool import SceneZoomTool, GraphicsViewPan
+from mosaic.utils.scene_zoom_tool import GraphicsViewPan, RenderQuality, SceneZoomTool
 
 
 class SceneView(QGraphicsView):
@@ -14,6 +17,29 @@ class SceneView(QGraphicsView):
         self.setRenderHint(QPainter.SmoothPixmapTransform)
         self.setRenderHint(QPainter.TextAntialiasing)
 
-        self._zoom = SceneZoomTool(self)
-        self._pan = GraphicsViewPan(self)
+        self._quality = RenderQuality(self)
+        self._zoom = SceneZoomTool(self, self._quality)
         self._select = SelectionTool(self)
+        # Installed after the selection tool so that, while it has a mode, it receives mouse events first
+        self._paint = PaintTool(self)
+        # Installed after the paint tool, so that while active it moves objects instead of painting under them
+        self._objects = ObjectTool(self)
+        # Installed last so that a space drag pans instead of selecting or painting
+        self._pan = GraphicsViewPan(self, self._quality)
+
+    def paintEvent(self, event):
+        with profiler.span("view.paint"):
+            super().paintEvent(event)
+        profiler.frame()
+
+    @property
+    def paint_tool(self) -> PaintTool:
+        return self._paint
+
+    @property
+    def object_tool(self) -> ObjectTool:
+        return self._objects
+
+    @property
+    def zoom_tool(self) -> SceneZoomTool:
+        return self._zoom
@@ -1,6 +1,62 @@
-from PySide6.QtWidgets import QStatusBar
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QLabel, QStatusBar
+
+from mosaic.core.instrumentation import profiler
+
+if TYPE_CHECKING:
+    from mosaic.domain.tilescene import TileScene
 
 
 class StatusBar(QStatusBar):
+    """The status bar of the main window, which can show live performance figures.
+
+    While the performance overlay is shown, the profiler is enabled and the frame rate, the paint time of the tile
+    layer and the render cache statistics of the tracked scene are refreshed a few times per second.
+    """
+
+    REFRESH_INTERVAL_MS = 500
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._scene: "TileScene | None" = None
+        self._performance = QLabel(self)
+        self._performance.hide()
+        self.addPermanentWidget(self._performance)
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh_performance)
+
+    def track_scene(self, scene: "TileScene | None"):
+        """Show the render cache statistics of a scene in the performance overlay."""
+        self._scene = scene
+
+    @property
+    def performance_visible(self) -> bool:
+        return self._timer.isActive()
+
+    def show_performance(self, visible: bool):
+        """Show or hide the performance overlay, enabling the profiler only while it is shown."""
+        profiler.enable(visible)
+        self._performance.setVisible(visible)
+        if visible:
+            self.refresh_performance()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def performance_text(self) -> str:
+        parts = [f"{profiler.fps():.0f} fps"]
+        if paint := profiler.stats("tile_layer.paint"):
+            parts.append(f"paint {paint.p50_ms:.1f} ms, p95 {paint.p95_ms:.1f}, p99 {paint.p99_ms:.1f}")
+        stats = self._scene.cache_stats() if self._scene is not None else None
+        if stats is not None:
+            parts.append(
+                f"cache {stats.entries} chunks, {stats.size_bytes / 2**20:.1f} of {stats.budget_bytes / 2**20:.0f} "
+                f"MiB, {stats.hit_rate:.0%} hits"
+            )
+        return " | ".join(parts)
+
+    def refresh_performance(self):
+        self._performance.setText(self.performance_text())
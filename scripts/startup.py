@@ -0,0 +1,120 @@
+"""Startup benchmark for the editor.
+
+Launches the editor in fresh interpreters and measures the wall time from launch until the main window has painted
+its first frame. One additional launch with `python -X importtime` breaks the import time down per module. Results
+are written as JSON and can be compared against a baseline to catch startup regressions.
+
+    poetry run startup-benchmark --runs 5 --output startup.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from scripts.tests import project_folder
+
+_PROBE = """
+import time
+
+from PySide6.QtCore import QEvent, QObject
+
+from mosaic.application import MosaicEditor
+from mosaic.main import create_window
+
+
+class _FirstFrame(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            print(f"first-frame {time.time()}", flush=True)
+            application.quit()
+        return False
+
+
+application = MosaicEditor()
+window = create_window()
+probe = _FirstFrame()
+window.installEventFilter(probe)
+window.show()
+application.exec()
+"""
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int, int]]:
+    """Parse the output of `python -X importtime` into (module, depth, self us, cumulative us) rows."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _launch(importtime: bool) -> tuple[float, str]:
+    """Launch the editor once, returning the time to its first frame in ms and the importtime output."""
+    environment = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    command = [sys.executable, "-X", "importtime", "-c", _PROBE] if importtime else [sys.executable, "-c", _PROBE]
+    start = time.time()
+    process = subprocess.run(command, cwd=project_folder(), env=environment, capture_output=True, text=True, check=True)
+    frame = next(line for line in process.stdout.splitlines() if line.startswith("first-frame"))
+    return (float(frame.split()[1]) - start) * 1e3, process.stderr
+
+
+def measure(runs: int) -> dict:
+    frame_times = [_launch(importtime=False)[0] for _ in range(runs)]
+    _, output = _launch(importtime=True)
+    imports = parse_importtime(output)
+    slowest = sorted((row for row in imports if row[0].startswith("mosaic") or row[1] == 0), key=lambda row: -row[3])
+    return {
+        "runs": runs,
+        "time_to_first_frame_ms": statistics.median(frame_times),
+        "import_ms": sum(cumulative for _, depth, _, cumulative in imports if depth == 0) / 1e3,
+        "slowest_imports": [
+            {"module": name, "cumulative_ms": cumulative / 1e3} for name, _, _, cumulative in slowest[:15]
+        ],
+    }
+
+
+def regressions(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """The metrics that are slower than the baseline by more than the relative threshold."""
+    return [
+        f"{metric}: {result[metric]:.1f} ms vs baseline {baseline[metric]:.1f} ms"
+        for metric in ("time_to_first_frame_ms", "import_ms")
+        if metric in baseline and result[metric] > baseline[metric] * (1.0 + threshold)
+    ]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure editor startup time")
+    parser.add_argument("--runs", type=int, default=5, help="number of launches, the median is reported")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown over the baseline")
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(f"Time to first frame: {result['time_to_first_frame_ms']:.1f} ms")
+    print(f"Imports:             {result['import_ms']:.1f} ms")
+    for row in result["slowest_imports"]:
+        print(f"  {row['cumulative_ms']:8.1f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures = regressions(result, json.load(file), args.threshold)
+        for failure in failures:
+            print(f"Regression {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,11 @@
+import os
+
 import pytest
 
 from mosaic.core.builder import Builder
 
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
 
 @pytest.fixture
 def builder() -> Builder:
@@ -0,0 +1,11 @@
+"""Types used to check that deferred registrations are not imported before they are needed."""
+
+
+class Oregano:
+    def __init__(self):
+        self.name = "oregano"
+
+
+class Marinade:
+    def __init__(self, herb: Oregano):
+        self.name = f"{herb.name} marinade"
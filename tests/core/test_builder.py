@@ -1,6 +1,13 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
-from mosaic.core.builder import Builder, LazyInit
+from PySide6.QtCore import QObject
+
+from mosaic.core.builder import Builder, LazyInit, Lifetime, RegistrationError, ResolutionError
 
 
 class Spice:
@@ -33,6 +40,69 @@ class SaltySpiceMix(Spice):
         super().__init__(f"{salt.name} and {spice.name}")
 
 
+class Grinder:
+    def __init__(self, salt: Salt):
+        self.salt = salt
+        self.disposed = False
+
+    def dispose(self):
+        self.disposed = True
+
+
+class SlowSalt(Salt):
+    created = 0
+
+    def __init__(self):
+        time.sleep(0.01)
+        SlowSalt.created += 1
+        super().__init__()
+
+
+class Egg:
+    def __init__(self, chicken: "Chicken"):
+        self.chicken = chicken
+
+
+class Chicken:
+    def __init__(self, egg: Egg):
+        self.egg = egg
+
+
+# Resolve the forward reference, since the builder uses annotations as they are
+Egg.__init__.__annotations__["chicken"] = Chicken
+
+
+class Farm:
+    def __init__(self, chicken: Chicken):
+        self.chicken = chicken
+
+
+class SlowPepper(Pepper):
+    threads: set[int] = set()
+
+    def __init__(self):
+        time.sleep(0.05)
+        SlowPepper.threads.add(threading.get_ident())
+        super().__init__()
+
+
+class Kitchen:
+    def __init__(self, salt: SlowSalt, pepper: SlowPepper):
+        self.salt = salt
+        self.pepper = pepper
+
+
+class SpiceRack(QObject):
+    def __init__(self, salt: SlowSalt):
+        super().__init__()
+        self.salt = salt
+
+
+class Pantry:
+    def __init__(self, rack: SpiceRack):
+        self.rack = rack
+
+
 def spice_factory(name: str = "cumin") -> Spice:
     return Spice(name)
 
@@ -210,3 +280,191 @@ class TestBuilderResolution:
         spice = builder.resolve(Spice, name="cinnamon")
         assert isinstance(spice, Spice)
         assert spice.name == "cinnamon"
+
+
+class TestBuilderLifetimes:
+    def test_transient_by_default(self, builder: Builder):
+        builder.register(Salt)
+        assert builder.resolve(Salt) is not builder.resolve(Salt)
+
+    def test_singleton(self, builder: Builder):
+        builder.register(Herb, alias=Spice, lifetime=Lifetime.SINGLETON, name="thyme")
+        assert builder.resolve(Herb) is builder.resolve(Spice)
+
+    def test_instance_with_transient_lifetime(self, builder: Builder):
+        with pytest.raises(ValueError):
+            builder.register(Salt, instance=Salt(), lifetime=Lifetime.TRANSIENT)
+
+    def test_scoped_requires_scope(self, builder: Builder):
+        builder.register(Salt, lifetime=Lifetime.SCOPED)
+        with pytest.raises(ResolutionError):
+            builder.resolve(Salt)
+
+    def test_scoped_instance_per_scope(self, builder: Builder):
+        builder.register(Salt, lifetime=Lifetime.SCOPED)
+        builder.register(Grinder)
+        first, second = builder.create_scope(), builder.create_scope()
+        assert first.resolve(Salt) is first.resolve(Salt)
+        assert first.resolve(Salt) is not second.resolve(Salt)
+        # Transient types get their scoped dependencies from the scope they are resolved in
+        assert first.resolve(Grinder).salt is first.resolve(Salt)
+        assert first.resolve(Grinder) is not first.resolve(Grinder)
+
+    def test_singleton_shared_by_scopes(self, builder: Builder):
+        builder.register(Salt, instance=LazyInit)
+        assert builder.create_scope().resolve(Salt) is builder.resolve(Salt)
+
+    def test_singleton_cannot_depend_on_scoped(self, builder: Builder):
+        builder.register(Salt, lifetime=Lifetime.SCOPED)
+        builder.register(Grinder, lifetime=Lifetime.SINGLETON)
+        with pytest.raises(ResolutionError):
+            builder.create_scope().resolve(Grinder)
+
+    def test_dispose_nested_scopes(self, builder: Builder):
+        builder.register(Salt)
+        builder.register(Grinder, lifetime=Lifetime.SCOPED)
+        with builder.create_scope() as document:
+            views = [document.create_scope() for _ in range(100)]
+            grinders = [view.resolve(Grinder) for view in views]
+            views[0].dispose()
+            assert grinders[0].disposed and not grinders[1].disposed
+
+        assert all(grinder.disposed for grinder in grinders)
+        assert all(view.disposed for view in views)
+        with pytest.raises(ResolutionError):
+            views[1].resolve(Grinder)
+
+    def test_concurrent_singleton_construction(self, builder: Builder):
+        SlowSalt.created = 0
+        builder.register(SlowSalt, instance=LazyInit)
+        barrier = threading.Barrier(8)
+
+        def resolve(_) -> Salt:
+            barrier.wait()
+            return builder.resolve(SlowSalt)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            salts = list(executor.map(resolve, range(8)))
+        assert SlowSalt.created == 1
+        assert all(salt is salts[0] for salt in salts)
+
+    def test_concurrent_scoped_construction(self, builder: Builder):
+        SlowSalt.created = 0
+        builder.register(SlowSalt, lifetime=Lifetime.SCOPED)
+        scope = builder.create_scope()
+        barrier = threading.Barrier(8)
+
+        def resolve(_) -> Salt:
+            barrier.wait()
+            return scope.resolve(SlowSalt)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            salts = list(executor.map(resolve, range(8)))
+        assert SlowSalt.created == 1
+        assert all(salt is salts[0] for salt in salts)
+
+
+class TestDependencyGraph:
+    def test_topological_order(self, builder: Builder):
+        builder.register(SaltySpiceMix)
+        builder.register(Pepper, alias=Spice)
+        builder.register(Salt)
+        graph = builder.validate()
+        assert graph.dependencies[SaltySpiceMix] == (Salt, Pepper)
+        assert set(graph.layers[0]) == {Salt, Pepper}
+        assert graph.layers[1] == (SaltySpiceMix,)
+        assert graph.order.index(SaltySpiceMix) == 2
+
+    def test_reports_missing(self, builder: Builder):
+        builder.register(SaltySpiceMix)
+        builder.register(Salt)
+        graph = builder.build_graph()
+        assert [(item.typename, item.parameter) for item in graph.missing] == [(SaltySpiceMix, "spice")]
+        with pytest.raises(ResolutionError, match="spice"):
+            builder.validate()
+
+    def test_reports_cycles(self, builder: Builder):
+        builder.register(Egg)
+        builder.register(Chicken)
+        builder.register(Farm)
+        builder.register(Salt)
+        graph = builder.build_graph()
+        assert [set(cycle) for cycle in graph.cycles] == [{Egg, Chicken}]
+        assert graph.order == [Salt]
+        with pytest.raises(ResolutionError, match="cycle"):
+            builder.validate()
+
+    def test_defaults_and_kwargs_are_not_dependencies(self, builder: Builder):
+        builder.register(Chili)
+        builder.register(Herb, name="basil")
+        assert builder.validate().dependencies == {Chili: (), Herb: ()}
+
+    def test_includes_deferred(self, builder: Builder):
+        builder.register(f"{DEFERRED_MODULE}.Oregano")
+        builder.register(f"{DEFERRED_MODULE}.Marinade")
+        assert [cls.__name__ for cls in builder.validate().order] == ["Oregano", "Marinade"]
+
+    def test_warm_up_in_parallel_layers(self, builder: Builder):
+        SlowPepper.threads = set()
+        builder.register(SlowSalt, instance=LazyInit)
+        builder.register(SlowPepper, instance=LazyInit)
+        builder.register(Kitchen, instance=LazyInit)
+        builder.register(SpiceRack, instance=LazyInit)
+        builder.register(Salt)
+
+        warmed = builder.warm_up(max_workers=4)
+        assert set(warmed[:2]) == {SlowSalt, SlowPepper}
+        assert warmed[2:] == [Kitchen]
+        assert threading.get_ident() not in SlowPepper.threads
+        kitchen = builder.resolve(Kitchen)
+        assert kitchen.salt is builder.resolve(SlowSalt)
+
+    def test_warm_up_skips_singletons_with_gui_dependencies(self, builder: Builder):
+        builder.register(SlowSalt, instance=LazyInit)
+        builder.register(SpiceRack)
+        builder.register(Pantry, instance=LazyInit)
+        builder.register(Grinder, lifetime=Lifetime.SINGLETON)
+        builder.register(Salt)
+        assert builder.warm_up() == [SlowSalt, Grinder]
+
+
+DEFERRED_MODULE = "tests.core.deferred_types"
+
+
+class TestDeferredRegistration:
+    @pytest.fixture(autouse=True)
+    def unload(self):
+        sys.modules.pop(DEFERRED_MODULE, None)
+        yield
+        sys.modules.pop(DEFERRED_MODULE, None)
+
+    def test_register_by_path_does_not_import(self, builder: Builder):
+        builder.register(f"{DEFERRED_MODULE}.Oregano", instance=LazyInit)
+        assert DEFERRED_MODULE not in sys.modules
+        assert f"{DEFERRED_MODULE}.Oregano" in builder
+
+    def test_resolve_by_path_imports_once(self, builder: Builder):
+        builder.register(f"{DEFERRED_MODULE}.Oregano", instance=LazyInit)
+        herb = builder.resolve(f"{DEFERRED_MODULE}.Oregano")
+        assert DEFERRED_MODULE in sys.modules
+        assert builder.resolve(type(herb)) is herb
+
+    def test_deferred_dependency(self, builder: Builder):
+        builder.register(f"{DEFERRED_MODULE}.Oregano")
+        builder.register(f"{DEFERRED_MODULE}.Marinade")
+        marinade = builder.resolve(f"{DEFERRED_MODULE}.Marinade")
+        assert marinade.name == "oregano marinade"
+
+    def test_deferred_alias(self, builder: Builder):
+        builder.register(f"{DEFERRED_MODULE}.Oregano", alias=object)
+        assert object in builder
+        assert builder.resolve(object).name == "oregano"
+
+    def test_register_path_twice(self, builder: Builder):
+        builder.register(f"{DEFERRED_MODULE}.Oregano")
+        with pytest.raises(RegistrationError):
+            builder.register(f"{DEFERRED_MODULE}.Oregano")
+
+    def test_resolve_unknown_path(self, builder: Builder):
+        with pytest.raises(ResolutionError):
+            builder.resolve(f"{DEFERRED_MODULE}.Basil")
@@ -0,0 +1,99 @@
+import inspect
+import timeit
+
+import pytest
+
+from mosaic.core.builder import Builder, Context
+
+
+class Grid:
+    def __init__(self, rows: int = 64, cols: int = 64):
+        self.rows = rows
+        self.cols = cols
+
+
+class Palette:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Renderer:
+    def __init__(self, grid: Grid, palette: Palette, antialias: bool = True):
+        self.grid = grid
+        self.palette = palette
+        self.antialias = antialias
+
+
+class Document:
+    def __init__(self, renderer: Renderer, grid: Grid, title: str = "untitled"):
+        self.renderer = renderer
+        self.grid = grid
+        self.title = title
+
+
+def _reflective_create(context: Context, builder: Builder, **kwargs):
+    """Reference implementation that inspects the signature on every call, as the builder used to."""
+    signature = inspect.signature(context.factory or context.typename.__init__)
+    trimmed_params = [param for param in signature.parameters.values() if param.name not in ["self", "args", "kwargs"]]
+    signature = signature.replace(parameters=trimmed_params)
+
+    resolved_kwargs = context.kwargs.copy()
+    for param in signature.parameters.values():
+        if param.name in kwargs:
+            resolved_kwargs[param.name] = kwargs[param.name]
+        elif param.name in context.kwargs:
+            resolved_kwargs[param.name] = context.kwargs[param.name]
+        elif param.default != param.empty:
+            resolved_kwargs[param.name] = param.default
+        else:
+            dependency = builder._context(param.annotation)
+            resolved_kwargs[param.name] = _reflective_create(dependency, builder)
+
+    return (context.factory or context.typename)(**resolved_kwargs)
+
+
+def _populated_builder() -> Builder:
+    builder = Builder()
+    builder.register(Grid)
+    builder.register(Palette, name="default")
+    builder.register(Renderer)
+    builder.register(Document)
+    return builder
+
+
+def _best_of(statement, repeat: int = 5, number: int = 2000) -> float:
+    return min(timeit.repeat(statement, repeat=repeat, number=number))
+
+
+@pytest.mark.benchmark
+def test_compiled_plan_resolves_faster_than_reflection():
+    builder = _populated_builder()
+    context = builder._context(Document)
+
+    reflective = _best_of(lambda: _reflective_create(context, builder))
+    compiled = _best_of(lambda: builder.resolve(Document))
+
+    assert compiled < reflective
+
+
+def test_compiled_plan_matches_reflective_result():
+    builder = _populated_builder()
+    context = builder._context(Document)
+
+    expected = _reflective_create(context, builder, title="map")
+    document = builder.resolve(Document, title="map")
+
+    assert document.title == expected.title
+    assert document.renderer.palette.name == expected.renderer.palette.name
+    assert document.grid.rows == expected.grid.rows
+
+
+def test_plan_is_invalidated_when_registrations_change(builder: Builder):
+    builder.register(Renderer)
+    builder.register(Grid)
+    plan = builder._plan(builder._context(Renderer))
+
+    builder.register(Palette, name="late")
+
+    assert builder._plan(builder._context(Renderer)) is not plan
+    assert builder.resolve(Renderer).palette.name == "late"
@@ -0,0 +1,148 @@
+import json
+import time
+
+import pytest
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QImage, QPainter
+
+from mosaic import actions
+from mosaic.core.builder import Builder
+from mosaic.core.instrumentation import Histogram, Profiler, profiler
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tilescene import TileScene
+from mosaic.widgets.main_menu import MainMenu
+from mosaic.widgets.main_window import MainWindow
+from mosaic.widgets.status_bar import StatusBar
+
+
+@pytest.fixture
+def shared_profiler():
+    profiler.reset()
+    yield profiler
+    profiler.enable(False)
+    profiler.reset()
+
+
+class Salt:
+    pass
+
+
+class TestHistogram:
+    def test_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.add(float(value))
+        stats = histogram.stats()
+        assert (stats.p50_ms, stats.p95_ms, stats.p99_ms, stats.max_ms) == (51.0, 96.0, 100.0, 100.0)
+        assert stats.mean_ms == 50.5
+
+    def test_keeps_the_most_recent_window(self):
+        histogram = Histogram(window=10)
+        for value in range(100):
+            histogram.add(float(value))
+        assert len(histogram) == 10
+        assert histogram.count == 100
+        assert histogram.percentile(0) == 90.0
+
+    def test_empty(self):
+        assert Histogram().stats().p99_ms == 0.0
+
+
+class TestProfiler:
+    def test_disabled_spans_record_nothing(self):
+        profiler = Profiler()
+        with profiler.span("paint"):
+            pass
+        profiler.frame()
+        assert profiler.names() == []
+        assert profiler.fps() == 0.0
+
+    def test_spans_and_timed_functions(self):
+        profiler = Profiler()
+        profiler.enable()
+
+        @profiler.timed("work")
+        def work():
+            time.sleep(0.002)
+            return 3
+
+        with profiler.span("paint"):
+            assert work() == 3
+        assert profiler.names() == ["paint", "work"]
+        assert profiler.stats("work").p50_ms >= 2.0
+        assert profiler.stats("paint").p50_ms >= profiler.stats("work").p50_ms
+        assert profiler.stats("missing") is None
+
+    def test_fps(self):
+        profiler = Profiler()
+        profiler.enable()
+        for _ in range(30):
+            profiler.frame()
+        assert profiler.fps(period=0.5) == 60.0
+
+    def test_exports(self, tmp_path):
+        profiler = Profiler(trace_limit=2)
+        profiler.enable()
+        for _ in range(3):
+            with profiler.span("paint"):
+                pass
+
+        profiler.export_chrome_trace(tmp_path / "trace.json")
+        trace = json.loads((tmp_path / "trace.json").read_text())
+        assert [event["name"] for event in trace["traceEvents"]] == ["paint", "paint"]
+        assert {"ph", "ts", "dur", "pid", "tid"} <= trace["traceEvents"][0].keys()
+        assert trace["otherData"]["spans"]["paint"]["count"] == 3
+
+        profiler.export_json(tmp_path / "summary.json")
+        summary = json.loads((tmp_path / "summary.json").read_text())
+        assert set(summary["spans"]["paint"]) == {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}
+
+    @pytest.mark.benchmark
+    def test_disabled_span_overhead(self):
+        profiler = Profiler()
+        start = time.perf_counter()
+        for _ in range(100_000):
+            with profiler.span("paint"):
+                pass
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.2
+
+    def test_instruments_builder_and_paint(self, qapp, shared_profiler: Profiler):
+        shared_profiler.enable()
+        builder = Builder()
+        builder.register(Salt)
+        builder.resolve(Salt)
+
+        scene = TileScene(model=ChunkedTileModel(64, 64))
+        scene.tile_layer.model.fill_region(0, 0, 64, 64, tile_id=1)
+        image = QImage(64, 64, QImage.Format_ARGB32_Premultiplied)
+        painter = QPainter(image)
+        scene.render(painter, QRectF(0, 0, 64, 64), QRectF(0, 0, 64, 64))
+        painter.end()
+
+        assert {"builder.create", "chunk.rasterize", "tile_layer.paint"} <= set(shared_profiler.names())
+
+
+class TestPerformanceOverlay:
+    def test_toggle_enables_profiler(self, qtbot, shared_profiler: Profiler):
+        status_bar = StatusBar()
+        qtbot.addWidget(status_bar)
+        scene = TileScene(model=ChunkedTileModel(64, 64))
+        status_bar.track_scene(scene)
+        action = actions.TogglePerformance(status_bar)
+
+        action.setChecked(True)
+        assert shared_profiler.enabled and status_bar.performance_visible
+        shared_profiler.record("tile_layer.paint", 0, 2_000_000)
+        assert status_bar.performance_text() == (
+            "0 fps | paint 2.0 ms, p95 2.0, p99 2.0 | cache 0 chunks, 0.0 of 256 MiB, 0% hits"
+        )
+
+        action.setChecked(False)
+        assert not shared_profiler.enabled and not status_bar.performance_visible
+
+    def test_window_tracks_its_scene(self, qtbot):
+        window = MainWindow(MainMenu(), StatusBar())
+        qtbot.addWidget(window)
+        window.set_scene(TileScene(model=ChunkedTileModel(64, 64)))
+        assert "| cache 0 chunks" in window.statusBar().performance_text()
@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+import pytest
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import QImage, QPainter
+
+from mosaic.domain.atlas import PAGE, TextureAtlas, SkylinePacker
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+
+
+def _coverage(atlas: TextureAtlas, padding: int) -> list[np.ndarray]:
+    """How many padded images cover each pixel of each page."""
+    coverage = [np.zeros(page.shape[:2], dtype=np.int32) for page in atlas.pages]
+    for page, x, y, width, height in atlas.rects.tolist():
+        if page >= 0:
+            coverage[page][y - padding : y + height + padding, x - padding : x + width + padding] += 1
+    return coverage
+
+
+def _render(scene: TileScene, source: QRectF, width: int, height: int) -> QImage:
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.black)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, width, height), source)
+    painter.end()
+    return image
+
+
+class TestSkylinePacker:
+    def test_fills_rows_bottom_left(self):
+        packer = SkylinePacker(100, 100)
+        assert [packer.insert(40, 10) for _ in range(3)] == [(0, 0), (40, 0), (0, 10)]
+        assert packer.insert(30, 10) == (40, 10)
+        assert packer.used_height == 20
+
+    def test_rejects_when_full(self):
+        packer = SkylinePacker(64, 64)
+        assert all(packer.insert(32, 32) is not None for _ in range(4))
+        assert packer.insert(1, 1) is None
+        assert packer.occupancy == 1.0
+
+
+class TestTextureAtlas:
+    def test_images_do_not_overlap(self):
+        rng = np.random.default_rng(3)
+        images = [np.full((height, width, 4), 1, dtype=np.uint8) for width, height in rng.integers(4, 40, (300, 2))]
+        atlas = TextureAtlas.pack(images, page_size=256, padding=1)
+        assert len(atlas.pages) > 1
+        assert all(coverage.max() == 1 for coverage in _coverage(atlas, padding=1))
+
+    def test_rects_locate_images(self):
+        rng = np.random.default_rng(5)
+        tiles = rng.integers(0, 255, (50, 16, 16, 4), dtype=np.uint8)
+        atlas = TextureAtlas.from_tileset(Tileset(tiles), page_size=128)
+        assert atlas.rects[0, PAGE] == -1
+        for tile_id in range(1, 51):
+            page, x, y, width, height = atlas.rects[tile_id]
+            assert np.array_equal(atlas.pages[page][y : y + height, x : x + width], tiles[tile_id - 1])
+
+    def test_padding_repeats_edges(self):
+        image = np.arange(4 * 4 * 4, dtype=np.uint8).reshape(4, 4, 4)
+        atlas = TextureAtlas.pack([None, image], padding=2)
+        _, x, y, _, _ = atlas.rects[1]
+        page = atlas.pages[0]
+        assert np.array_equal(page[y - 2, x : x + 4], image[0])
+        assert np.array_equal(page[y : y + 4, x - 1], image[:, 0])
+
+    def test_source_rects_of_unknown_ids(self):
+        atlas = TextureAtlas.from_tileset(Tileset.from_colors([(255, 0, 0)], tile_size=8))
+        rects = atlas.source_rects(np.array([[0, 1, 7]], dtype=np.uint32))
+        assert rects[..., PAGE].tolist() == [[-1, 0, -1]]
+
+    def test_too_large_image(self):
+        with pytest.raises(ValueError):
+            TextureAtlas.pack([np.zeros((64, 64, 4), dtype=np.uint8)], page_size=64)
+
+
+class TestAtlasDrawing:
+    def test_matches_rasterized_chunks(self, qapp):
+        rng = np.random.default_rng(11)
+        tiles = rng.integers(0, 255, (40, 8, 8, 4), dtype=np.uint8)
+        tiles[..., 3] = 255
+        tileset = Tileset(tiles)
+        model = ChunkedTileModel(200, 200)
+        model.insert_many(
+            rng.integers(0, 200, 5000), rng.integers(0, 200, 5000), rng.integers(0, 41, 5000).astype(np.uint32)
+        )
+
+        source = QRectF(100, 60, 256, 192)
+        chunks = _render(TileScene(model=model, tileset=tileset), source, 256, 192)
+        atlas = _render(TileScene(model=model, tileset=tileset, use_atlas=True), source, 256, 192)
+        assert chunks == atlas
+
+    @pytest.mark.benchmark
+    def test_ten_thousand_tile_benchmark(self, qapp):
+        rng = np.random.default_rng(7)
+        tiles = rng.integers(0, 255, (10_000, 32, 32, 4), dtype=np.uint8)
+        tiles[..., 3] = 255
+        tileset = Tileset(tiles)
+        model = ChunkedTileModel(1024, 1024)
+        model.insert_many(
+            *np.meshgrid(np.arange(256), np.arange(256)),
+            rng.integers(1, 10_001, (256, 256)).astype(np.uint32),
+        )
+
+        viewport = QRectF(1000, 1000, 1920, 1080)
+        atlas_scene = TileScene(model=model, tileset=tileset, use_atlas=True)
+        atlas = atlas_scene.tile_layer.atlas
+        _render(atlas_scene, viewport, 1920, 1080)
+        start = time.perf_counter()
+        _render(atlas_scene, viewport, 1920, 1080)
+        atlas_draw = time.perf_counter() - start
+
+        chunk_scene = TileScene(model=model, tileset=tileset)
+        start = time.perf_counter()
+        _render(chunk_scene, viewport, 1920, 1080)
+        cold_draw = time.perf_counter() - start
+
+        assert len(atlas.pages) == 1
+        assert atlas.nbytes < 1.25 * tileset.tiles().nbytes
+        assert atlas_draw < cold_draw
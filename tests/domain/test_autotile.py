@@ -0,0 +1,146 @@
+import time
+
+import numpy as np
+import pytest
+
+from mosaic.domain import painting
+from mosaic.domain.autotile import (
+    BLOB_MASKS,
+    EAST,
+    NORTH,
+    WEST,
+    AutoTiler,
+    Terrain,
+    neighbour_masks,
+    reduce_corners,
+)
+from mosaic.domain.history import UndoStack
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate
+
+# Edge terrains of grass, tiles 1 to 16, and water, tiles 101 to 116
+GRASS = Terrain.edges(range(1, 17))
+WATER = Terrain.edges(range(101, 117))
+
+
+def _edges(model: ChunkedTileModel, x: int, y: int) -> int:
+    """The edge mask a cell of an edge terrain shows, decoded from its tile."""
+    return (model.tile_at(GridCoordinate(x, y)).tile_id - 1) % 100
+
+
+def _naive(ids: np.ndarray, tiler: AutoTiler) -> np.ndarray:
+    """Auto-tile a dense map cell by cell, with neighbours outside of the map counting as the same terrain."""
+    terrain = tiler.terrain_of(ids)
+    result = ids.copy()
+    height, width = ids.shape
+    for y in range(height):
+        for x in range(width):
+            if terrain[y, x] == 0:
+                continue
+            mask = 0
+            for bit, (dx, dy) in enumerate(((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))):
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height) or terrain[ny, nx] == terrain[y, x]:
+                    mask |= 1 << bit
+            result[y, x] = tiler._variants[terrain[y, x], mask]
+    return result
+
+
+class TestAutoTile:
+    def test_blob_masks(self):
+        assert len(BLOB_MASKS) == 47
+        assert reduce_corners(np.array([0xFF, NORTH | 1 | 4, NORTH | WEST | 1])).tolist() == [0xFF, NORTH, 11]
+
+    def test_neighbour_masks(self):
+        terrain = np.array([[0, 1, 0], [1, 1, 1], [0, 0, 0]])
+        assert neighbour_masks(np.pad(terrain, 1, constant_values=0))[1, 1] == NORTH | WEST | EAST
+
+    def test_terrains_cannot_share_tiles(self):
+        with pytest.raises(ValueError):
+            AutoTiler([GRASS, Terrain.edges(range(16, 32))])
+
+    def test_full_pass_matches_naive(self):
+        rng = np.random.default_rng(1)
+        ids = rng.choice([0, 1, 101, 7], size=(70, 90)).astype(np.uint32)
+        model = ChunkedTileModel(90, 70, chunk_size=32)
+        model.write_region(0, 0, ids)
+        tiler = AutoTiler([GRASS, WATER])
+
+        tiler.apply(model)
+
+        assert np.array_equal(model.read_ids(0, 0, 90, 70), _naive(ids, tiler))
+        assert tiler.apply(model) == 0
+
+    def test_borders_at_map_edges(self):
+        model = ChunkedTileModel(8, 8)
+        model.fill_region(0, 0, 3, 3, tile_id=1)
+        AutoTiler([GRASS], connect_edges=False).apply(model)
+
+        assert _edges(model, 0, 0) == 2 | 4
+        assert _edges(model, 1, 1) == 15
+        assert _edges(model, 2, 2) == 1 | 8
+
+    def test_update_after_edit(self):
+        model = ChunkedTileModel(100, 100, chunk_size=16)
+        model.fill_region(10, 10, 20, 20, tile_id=1)
+        tiler = AutoTiler([GRASS])
+        tiler.apply(model)
+        tiler.attach(model)
+        regions = []
+        model.subscribe(regions.append)
+
+        model.fill_region(30, 15, 1, 1, tile_id=1)
+
+        assert _edges(model, 29, 15) == 15
+        assert _edges(model, 30, 15) == 8
+        assert np.array_equal(model.read_ids(0, 0, 100, 100), _naive(model.read_ids(0, 0, 100, 100), tiler))
+        assert len(regions) == 2
+
+        tiler.detach(model)
+        model.remove_region(30, 15, 1, 1)
+        assert _edges(model, 29, 15) == 15
+
+    def test_variants_are_part_of_the_edit(self, qapp):
+        model = ChunkedTileModel(64, 64)
+        model.fill_region(0, 0, 10, 10, tile_id=1)
+        tiler = AutoTiler([GRASS])
+        tiler.apply(model)
+        before = model.read_ids(0, 0, 64, 64)
+        tiler.attach(model)
+        stack = UndoStack(model)
+
+        with stack.edit("Paint"):
+            model.fill_region(10, 5, 5, 1, tile_id=1)
+        assert _edges(model, 9, 5) == 15
+
+        stack.undo()
+        assert np.array_equal(model.read_ids(0, 0, 64, 64), before)
+
+    def test_diagonal_stroke(self):
+        model = ChunkedTileModel(256, 256)
+        model.fill_region(0, 0, 256, 256, tile_id=101)
+        tiler = AutoTiler([GRASS, WATER])
+        tiler.apply(model)
+        tiler.attach(model)
+
+        painting.fill_line(model, 10, 10, 209, 209, tile_id=1)
+        painting.fill_line(model, 20, 10, 219, 209, tile_id=1)
+
+        # A diagonal stroke only touches itself at corners, and the water beside it borders it on two edges
+        assert _edges(model, 100, 100) == 0
+        assert _edges(model, 101, 100) == 1 | 2
+
+    @pytest.mark.benchmark
+    def test_stroke_updates_within_a_frame(self):
+        model = ChunkedTileModel(2048, 2048)
+        model.fill_region(0, 0, 2048, 2048, tile_id=101)
+        tiler = AutoTiler([GRASS, WATER])
+        tiler.apply(model)
+        tiler.attach(model)
+
+        timings = []
+        for offset in range(5):
+            start = time.perf_counter()
+            painting.fill_line(model, 100 + offset * 10, 100, 1099 + offset * 10, 1099, tile_id=1)
+            timings.append(time.perf_counter() - start)
+
+        assert min(timings) < 1 / 60, timings
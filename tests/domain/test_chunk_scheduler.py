@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from mosaic.domain.chunk_scheduler import ChunkScheduler, by_distance
+from mosaic.domain.render_cache import ChunkRenderCache
+from mosaic.domain.tilemap import ChunkedTileModel, GridTile
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.persistence.mapfile import MapFile
+
+
+@pytest.fixture
+def tileset() -> Tileset:
+    return Tileset.from_colors([(255, 0, 0), (0, 0, 255)], tile_size=4)
+
+
+@pytest.fixture
+def map_file(tmp_path):
+    model = ChunkedTileModel(512, 512, chunk_size=32)
+    model.fill_region(0, 0, 512, 512, tile_id=1)
+    path = os.path.join(tmp_path, "map.mosaic")
+    MapFile.create(path, model).close()
+    with MapFile.open(path) as map_file:
+        yield map_file
+
+
+def _render(scene: TileScene, source: QRectF, size: int = 64) -> QImage:
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.black)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, size, size), source)
+    painter.end()
+    return image
+
+
+class TestChunkScheduler:
+    def test_closest_chunks_get_highest_priority(self):
+        keys = [(0, 0), (5, 5), (2, 2), (3, 2)]
+        ordered = by_distance(keys, center=(2.5, 2.5))
+        assert [key for _, key in ordered] == [(2, 2), (3, 2), (0, 0), (5, 5)]
+        priorities = [priority for priority, _ in ordered]
+        assert priorities == sorted(priorities, reverse=True)
+
+    def test_renders_in_background(self, qtbot, map_file: MapFile, tileset: Tileset):
+        cache = ChunkRenderCache()
+        scheduler = ChunkScheduler(map_file.model, tileset, cache)
+        keys = [(0, 0), (1, 0), (0, 1)]
+        with qtbot.waitSignals([scheduler.rendered] * len(keys), timeout=5000):
+            scheduler.request(keys, 0, center=(0.5, 0.5))
+
+        assert scheduler.pending == 0
+        assert all((key, 0) in cache for key in keys)
+        # Chunks decoded by the workers are handed to the model
+        assert all(map_file.model.is_loaded(key) for key in keys)
+
+    def test_new_request_cancels_stale_jobs(self, qtbot, map_file: MapFile, tileset: Tileset):
+        cache = ChunkRenderCache()
+        scheduler = ChunkScheduler(map_file.model, tileset, cache, max_threads=1)
+        scheduler.request(map_file.model.chunk_keys(), 0, center=(0.0, 0.0))
+        scheduler.request([(15, 15)], 0, center=(15.5, 15.5))
+        assert scheduler.pending <= 1
+
+        qtbot.waitUntil(lambda: scheduler.pending == 0, timeout=5000)
+        scheduler.wait_for_done()
+        qtbot.wait(10)
+        assert ((15, 15), 0) in cache
+        assert len(cache) < len(map_file.model.chunk_keys())
+
+    def test_discards_result_of_edited_chunk(self, qtbot, tileset: Tileset):
+        model = ChunkedTileModel(64, 64, chunk_size=32)
+        model.fill_region(0, 0, 32, 32, tile_id=1)
+        cache = ChunkRenderCache()
+        scheduler = ChunkScheduler(model, tileset, cache)
+        scheduler.request([(0, 0)], 0, center=(0.5, 0.5))
+        model.insert(GridTile(3, 3, tile_id=2))
+
+        qtbot.waitUntil(lambda: scheduler.pending == 0, timeout=5000)
+        assert ((0, 0), 0) not in cache
+
+
+class TestBackgroundLoading:
+    def test_paint_never_rasterizes(self, qtbot, map_file: MapFile, tileset: Tileset):
+        scene = TileScene(model=map_file.model, tileset=tileset, background_loading=True)
+        layer = scene.tile_layer
+
+        # The first frame only draws placeholders and queues the visible chunks
+        image = _render(scene, QRectF(0, 0, 256, 256), size=256)
+        assert QColor(image.pixel(128, 128)) != QColor(255, 0, 0)
+        assert layer.scheduler.pending == 4
+        assert scene.cache_stats().rasterizations == 0
+
+        qtbot.waitUntil(lambda: layer.scheduler.pending == 0, timeout=5000)
+        rasterized = scene.cache_stats().rasterizations
+        image = _render(scene, QRectF(0, 0, 256, 256), size=256)
+        assert QColor(image.pixel(128, 128)) == QColor(255, 0, 0)
+        assert scene.cache_stats().rasterizations == rasterized
+        assert layer.scheduler.pending == 0
+
+    def test_draws_stale_image_while_pending(self, qtbot, tileset: Tileset):
+        model = ChunkedTileModel(64, 64, chunk_size=32)
+        model.fill_region(0, 0, 64, 64, tile_id=1)
+        scene = TileScene(model=model, tileset=tileset, background_loading=True)
+        _render(scene, QRectF(0, 0, 256, 256), size=256)
+        qtbot.waitUntil(lambda: scene.tile_layer.scheduler.pending == 0, timeout=5000)
+
+        model.insert(GridTile(0, 0, tile_id=2))
+        image = _render(scene, QRectF(0, 0, 256, 256), size=256)
+        assert QColor(image.pixel(2, 2)) == QColor(255, 0, 0)
+
+        qtbot.waitUntil(lambda: scene.tile_layer.scheduler.pending == 0, timeout=5000)
+        image = _render(scene, QRectF(0, 0, 256, 256), size=256)
+        assert QColor(image.pixel(2, 2)) == QColor(0, 0, 255)
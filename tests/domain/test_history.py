@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from mosaic import actions
+from mosaic.domain.history import UndoStack
+from mosaic.domain.tilemap import ChunkedTileModel, DirtyRegion, GridTile
+from mosaic.domain.tilescene import TileScene
+from mosaic.main import create_window
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    model = ChunkedTileModel(512, 512, chunk_size=32)
+    model.fill_region(0, 0, 100, 100, tile_id=1)
+    return model
+
+
+@pytest.fixture
+def stack(qapp, model: ChunkedTileModel) -> UndoStack:
+    return UndoStack(model)
+
+
+def _snapshot(model: ChunkedTileModel) -> tuple[np.ndarray, np.ndarray]:
+    return model.read_region(0, 0, model.width, model.height)
+
+
+def _assert_state(model: ChunkedTileModel, state: tuple[np.ndarray, np.ndarray]):
+    ids, flags = _snapshot(model)
+    assert np.array_equal(ids, state[0])
+    assert np.array_equal(flags, state[1])
+
+
+class TestUndoStack:
+    def test_undo_and_redo(self, model: ChunkedTileModel, stack: UndoStack):
+        before = _snapshot(model)
+        with stack.edit("Fill"):
+            model.fill_region(50, 50, 100, 100, tile_id=2, flags=3)
+            model.remove_region(0, 0, 10, 10)
+        after = _snapshot(model)
+
+        assert stack.undo()
+        _assert_state(model, before)
+        assert stack.redo()
+        _assert_state(model, after)
+        assert not stack.redo()
+
+    def test_deltas_only_store_changed_cells(self, model: ChunkedTileModel, stack: UndoStack):
+        with stack.edit("Paint"):
+            model.fill_region(0, 0, 200, 200, tile_id=1)
+        # 200 x 200 cells were written, but only those outside of the existing 100 x 100 fill changed
+        changed = 200 * 200 - 100 * 100
+        # Twenty chunks went from empty to a single tile, and store that tile instead of the contents of every cell
+        whole = 20 * 32 * 32
+        assert stack.nbytes == (changed - whole) * (4 + 4 + 1 + 4 + 1) + 20 * (4 + 1 + 4 + 1)
+
+    def test_large_fills_are_undone(self, model: ChunkedTileModel, stack: UndoStack):
+        before = _snapshot(model)
+        with stack.edit("Fill"):
+            model.fill_region(0, 0, 512, 512, tile_id=3, flags=1)
+        after = _snapshot(model)
+
+        assert stack.nbytes < 512 * 512
+        assert stack.undo()
+        _assert_state(model, before)
+        assert stack.redo()
+        _assert_state(model, after)
+
+    def test_released_chunks_are_restored(self, model: ChunkedTileModel, stack: UndoStack):
+        with stack.edit("Erase"):
+            model.remove_region(0, 0, 512, 512)
+        assert len(model) == 0
+        stack.undo()
+        assert len(model) == 100 * 100
+
+    def test_stroke_events_are_merged(self, model: ChunkedTileModel, stack: UndoStack):
+        before = _snapshot(model)
+        for x in range(150, 400):
+            with stack.edit("Brush", merge_key="stroke-1"):
+                model.fill_region(x, 200, 3, 3, tile_id=2)
+                model.insert(GridTile(x, 300, tile_id=(x % 3) + 1))
+        with stack.edit("Brush", merge_key="stroke-2"):
+            model.insert(GridTile(0, 0, tile_id=3))
+
+        assert stack.count == 2
+        stack.undo()
+        stack.undo()
+        _assert_state(model, before)
+
+    def test_new_edit_discards_redo(self, model: ChunkedTileModel, stack: UndoStack):
+        with stack.edit("A"):
+            model.insert(GridTile(200, 200, tile_id=2))
+        stack.undo()
+        with stack.edit("B"):
+            model.insert(GridTile(201, 200, tile_id=2))
+        assert not stack.can_redo()
+        assert stack.undo_text() == "B"
+
+    def test_memory_limit_evicts_oldest(self, model: ChunkedTileModel, stack: UndoStack):
+        stack.memory_limit = 50_000
+        for step in range(10):
+            with stack.edit(f"Fill {step}"):
+                model.fill_region(0, 200, 100, 10, tile_id=step + 2)
+        # Each fill changes 1000 cells, 14 bytes each
+        assert stack.count == 3
+        assert stack.nbytes <= 50_000
+        assert stack.undo_text() == "Fill 9"
+
+    def test_undo_notifies_once(self, model: ChunkedTileModel, stack: UndoStack):
+        with stack.edit("Scatter"):
+            for x in range(0, 500, 7):
+                model.insert(GridTile(x, (x * 13) % 512, tile_id=2))
+
+        regions: list[DirtyRegion] = []
+        model.subscribe(regions.append)
+        stack.undo()
+        assert len(regions) == 1
+        stack.redo()
+        assert len(regions) == 2
+
+    def test_empty_edit_is_not_recorded(self, model: ChunkedTileModel, stack: UndoStack):
+        with stack.edit("Nothing"):
+            model.fill_region(0, 0, 10, 10, tile_id=1)
+        assert stack.count == 0
+
+
+class TestEditActions:
+    def test_actions_follow_stack(self, qapp):
+        model = ChunkedTileModel(64, 64)
+        scene = TileScene(model=model)
+        undo, redo = actions.Undo(scene.undo_stack), actions.Redo(scene.undo_stack)
+        assert not undo.isEnabled() and not redo.isEnabled()
+
+        with scene.undo_stack.edit("Paint"):
+            model.insert(GridTile(1, 1, tile_id=2))
+        assert undo.isEnabled() and undo.text() == "Undo Paint"
+
+        undo.trigger()
+        assert model.tile_at(GridTile(1, 1, tile_id=0).coordinate()) is None
+        assert redo.isEnabled() and not undo.isEnabled()
+
+    def test_window_adds_actions_for_scene(self, qtbot):
+        window = create_window()
+        qtbot.addWidget(window)
+        scene = window.centralWidget().scene()
+        undo, redo = window.menuBar().edit.actions()
+        assert isinstance(undo, actions.Undo) and isinstance(redo, actions.Redo)
+
+        with scene.undo_stack.edit("Paint"):
+            scene.tile_layer.model.insert(GridTile(1, 1, tile_id=2))
+        undo.trigger()
+        assert len(scene.tile_layer.model) == 0
@@ -0,0 +1,179 @@
+import pytest
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from mosaic.domain.compositor import ChunkCompositor
+from mosaic.domain.layers import LayerStack
+from mosaic.domain.tilemap import ChunkedTileModel, DirtyRegion, GridCoordinate
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.utils.scene_paint_tool import PaintMode
+from mosaic.widgets.scene_view import SceneView
+
+
+@pytest.fixture
+def tileset() -> Tileset:
+    return Tileset.from_colors([(255, 0, 0), (0, 0, 255)], tile_size=4)
+
+
+@pytest.fixture
+def stack() -> LayerStack:
+    stack = LayerStack(64, 64, chunk_size=16)
+    stack.add_layer("ground").model.fill_region(0, 0, 64, 64, tile_id=1)
+    stack.add_layer("decoration").model.fill_region(0, 0, 20, 20, tile_id=2)
+    stack.add_layer("collision", visible=False).model.fill_region(0, 0, 64, 64, tile_id=2)
+    return stack
+
+
+def _render(scene: TileScene, source: QRectF, size: int) -> QImage:
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.black)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, size, size), source)
+    painter.end()
+    return image
+
+
+class TestLayerStack:
+    def test_layers_in_drawing_order(self, stack: LayerStack):
+        assert [layer.name for layer in stack] == ["ground", "decoration", "collision"]
+        stack.move_layer(stack.layer("collision"), 0)
+        assert [layer.name for layer in stack.drawn_layers()] == ["ground", "decoration"]
+        assert stack.index(stack.layer("collision")) == 0
+        with pytest.raises(KeyError):
+            stack.layer("water")
+
+    def test_active_layer(self, stack: LayerStack):
+        assert stack.active is stack[0]
+        stack.active = stack[1]
+        stack.remove_layer(stack[1])
+        assert stack.active is stack[0]
+        with pytest.raises(ValueError):
+            stack.active = LayerStack(1, 1).add_layer("orphan")
+
+    def test_rejects_mismatched_models(self, stack: LayerStack):
+        with pytest.raises(ValueError):
+            stack.add_layer("small", ChunkedTileModel(32, 64, chunk_size=16))
+        with pytest.raises(ValueError):
+            stack.add_layer("invisible", opacity=1.5)
+
+    def test_forwards_edits_and_display_changes(self, stack: LayerStack):
+        edits: list[tuple[str, DirtyRegion]] = []
+        shown: list[str] = []
+        stack.subscribe(lambda layer, region: edits.append((layer.name, region)))
+        stack.subscribe_display(lambda layer: shown.append(layer.name))
+
+        stack.layer("decoration").model.fill_region(30, 30, 2, 2, tile_id=1)
+        stack.layer("collision").visible = True
+        stack.layer("collision").visible = True
+        stack.layer("ground").opacity = 0.5
+        removed = stack.layer("decoration")
+        stack.remove_layer(removed)
+        removed.model.fill_region(0, 0, 1, 1, tile_id=1)
+
+        assert [(name, region.bounds()) for name, region in edits] == [("decoration", (30, 30, 32, 32))]
+        assert shown == ["collision", "ground", "decoration"]
+
+    def test_chunk_keys_of_drawn_layers(self, stack: LayerStack):
+        stack.layer("ground").visible = False
+        assert sorted(stack.chunk_keys_in(0, 0, 64, 64)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+        assert len(stack.chunk_keys_in(0, 0, 64, 64, drawn_only=False)) == 16
+
+
+class TestChunkCompositor:
+    @pytest.fixture
+    def compositor(self, qapp, stack: LayerStack, tileset: Tileset) -> ChunkCompositor:
+        compositor = ChunkCompositor(stack, tileset)
+        for cy in range(4):
+            for cx in range(4):
+                compositor.image((cx, cy), 0)
+        return compositor
+
+    @staticmethod
+    def _rasterizations(stack: LayerStack) -> dict[str, int]:
+        return {layer.name: layer.cache.rasterizations for layer in stack}
+
+    def test_hidden_layers_are_not_rasterized(self, stack: LayerStack, compositor: ChunkCompositor):
+        assert self._rasterizations(stack) == {"ground": 16, "decoration": 4, "collision": 0}
+        assert compositor.cache.rasterizations == 16
+
+    def test_flattens_layers_in_order(self, stack: LayerStack, compositor: ChunkCompositor):
+        assert QColor(compositor.image((0, 0), 0).pixel(0, 0)) == QColor(0, 0, 255)
+        assert QColor(compositor.image((3, 3), 0).pixel(0, 0)) == QColor(255, 0, 0)
+
+        stack.layer("decoration").opacity = 0.5
+        color = QColor(compositor.image((0, 0), 0).pixel(0, 0))
+        assert color.red() == pytest.approx(128, abs=2) and color.blue() == pytest.approx(128, abs=2)
+
+        stack.move_layer(stack.layer("ground"), 1)
+        assert QColor(compositor.image((0, 0), 0).pixel(0, 0)) == QColor(255, 0, 0)
+
+    def test_toggling_visibility_only_flattens_again(self, stack: LayerStack, compositor: ChunkCompositor):
+        before = self._rasterizations(stack)
+        stack.layer("decoration").visible = False
+        for cy in range(4):
+            for cx in range(4):
+                compositor.image((cx, cy), 0)
+        stack.layer("decoration").visible = True
+        compositor.image((0, 0), 0)
+
+        assert self._rasterizations(stack) == before
+        # The four chunks of the decoration layer, flattened once when hidden and once when shown again
+        assert compositor.cache.rasterizations == 16 + 4 + 1
+
+    def test_edit_rasterizes_only_the_dirty_layer_chunk(self, stack: LayerStack, compositor: ChunkCompositor):
+        stack.layer("ground").model.fill_region(40, 40, 2, 2, tile_id=2)
+        stack.layer("collision").model.fill_region(0, 0, 64, 64, tile_id=1)
+        for cy in range(4):
+            for cx in range(4):
+                compositor.image((cx, cy), 0)
+
+        assert self._rasterizations(stack) == {"ground": 17, "decoration": 4, "collision": 0}
+        assert compositor.cache.rasterizations == 17
+
+
+class TestLayerStackItem:
+    @pytest.fixture
+    def scene(self, qapp, stack: LayerStack, tileset: Tileset) -> TileScene:
+        return TileScene(layers=stack, tileset=tileset)
+
+    def test_renders_flattened_layers(self, scene: TileScene):
+        image = _render(scene, QRectF(0, 0, 128, 128), size=128)
+        assert QColor(image.pixel(10, 10)) == QColor(0, 0, 255)
+        assert QColor(image.pixel(100, 100)) == QColor(255, 0, 0)
+
+        scene.layers.layer("collision").visible = True
+        scene.layers.layer("decoration").visible = False
+        scene.layers.layer("ground").visible = False
+        image = _render(scene, QRectF(0, 0, 128, 128), size=128)
+        assert QColor(image.pixel(100, 100)) == QColor(0, 0, 255)
+
+    def test_layers_are_only_watched_through_the_stack(self, qapp, stack: LayerStack, tileset: Tileset):
+        listeners = {layer.name: len(layer.model._listeners) for layer in stack}
+        TileScene(layers=stack, tileset=tileset)
+        assert {layer.name: len(layer.model._listeners) for layer in stack} == listeners
+
+    def test_renders_zoomed_out(self, scene: TileScene):
+        scene.layers.layer("decoration").model.fill_region(0, 0, 64, 64, tile_id=2)
+        scene.layers.layer("decoration").opacity = 0.5
+        image = _render(scene, QRectF(0, 0, 256, 256), size=8)
+        color = QColor(image.pixel(4, 4))
+        assert color.red() == pytest.approx(128, abs=2) and color.blue() == pytest.approx(128, abs=2)
+
+    def test_paints_and_undoes_on_the_active_layer(self, qtbot, scene: TileScene):
+        view = SceneView(scene)
+        qtbot.addWidget(view)
+        view.resize(300, 300)
+        view.centerOn(QPointF(128, 128))
+        ground, decoration = scene.layers.layer("ground"), scene.layers.layer("decoration")
+
+        view.paint_tool.mode, view.paint_tool.tile_id = PaintMode.FILL, 3
+        scene.layers.active = decoration
+        qtbot.mouseClick(view.viewport(), Qt.LeftButton, pos=view.mapFromScene(QPointF(128, 128)))
+        assert len(decoration.model) == 64 * 64
+        assert len(ground.model) == 64 * 64
+
+        scene.layers.active = ground
+        assert scene.undo_stack.undo()
+        assert len(decoration.model) == 20 * 20
+        assert scene.tile_layer.model.tile_at(GridCoordinate(32, 32)).tile_id == 1
@@ -0,0 +1,221 @@
+import time
+
+import numpy as np
+import pytest
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from mosaic.domain.object_layer import ROTATION_STEPS, ObjectSprites
+from mosaic.domain.objects import ObjectHandle, ObjectStore
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.widgets.scene_view import SceneView
+
+
+@pytest.fixture
+def store() -> ObjectStore:
+    store = ObjectStore()
+    store.add_many([1.5, 4.5, 10.5], [1.5, 2.5, 10.5], [0, 1, 2], [0.0, 90.0, 180.0])
+    return store
+
+
+def _render(scene: TileScene, source: QRectF, size: int = 64) -> QImage:
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.black)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, size, size), source)
+    painter.end()
+    return image
+
+
+class TestObjectStore:
+    def test_fields_are_arrays(self, store: ObjectStore):
+        assert len(store) == 3
+        assert store.xs.tolist() == [1.5, 4.5, 10.5]
+        assert store.types.tolist() == [0, 1, 2]
+        assert store.rotations.tolist() == [0.0, 90.0, 180.0]
+        assert not store.selected.any()
+
+    def test_handles_survive_removal(self, store: ObjectStore):
+        handle = store.handle(int(store.keys[2]))
+        store.remove([0])
+        assert handle.index == 1
+        assert handle.position == (10.5, 10.5)
+
+        handle.position = (3.0, 4.0)
+        handle.rotation = 45.0
+        handle.type_id = 7
+        assert (store.xs[1], store.ys[1], store.rotations[1], store.types[1]) == (3.0, 4.0, 45.0, 7)
+
+        store.remove([1])
+        assert not handle.alive
+        with pytest.raises(KeyError):
+            handle.position
+
+    def test_handles_are_slotted(self, store: ObjectStore):
+        handle = store.add(0.0, 0.0, 3)
+        assert isinstance(handle, ObjectHandle)
+        assert not hasattr(handle, "__dict__")
+        assert handle == store.handle(handle.key)
+        assert len(store) == 4
+
+    def test_bulk_select_and_move(self):
+        store = ObjectStore()
+        rng = np.random.default_rng(3)
+        store.add_many(rng.uniform(0, 100, 50_000), rng.uniform(0, 100, 50_000), 0)
+        changes = []
+        store.subscribe(changes.append)
+
+        inside = store.in_rect(10, 10, 20, 20)
+        store.select(inside)
+        xs, ys = store.xs.copy(), store.ys.copy()
+        store.move_selected(2.0, -1.0)
+        assert np.array_equal(store.xs[inside], xs[inside] + 2.0)
+        assert np.array_equal(store.ys[inside], ys[inside] - 1.0)
+        others = ~store.selected
+        assert np.array_equal(store.xs[others], xs[others])
+        # One notification per bulk operation, with the slots that changed
+        assert len(changes) == 2 and np.array_equal(changes[1], inside)
+
+        store.select([0], extend=True)
+        assert store.selected[0] and np.count_nonzero(store.selected) == len(inside) + 1
+        store.clear_selection()
+        assert not store.selected.any()
+
+    def test_remove_compacts_and_keeps_keys(self, store: ObjectStore):
+        store.select([0, 2])
+        keys = store.keys[[1]].tolist()
+        store.remove_selected()
+        assert store.keys.tolist() == keys
+        assert store.xs.tolist() == [4.5]
+        assert store.indices_of(keys).tolist() == [0]
+
+        added = store.add_many(np.arange(100.0), np.zeros(100), 5)
+        assert len(store) == 101
+        assert store.indices_of(added[-1:]).tolist() == [100]
+
+    def test_keys_grow_geometrically(self):
+        store = ObjectStore()
+        keys = [store.add(float(key), 0.0, 0).key for key in range(1000)]
+        assert keys == list(range(1000))
+        assert store.indices_of(keys).tolist() == keys
+        assert not store.contains(1000)
+        with pytest.raises(KeyError):
+            store.indices_of([1000])
+        # Adding objects one at a time reserves at most twice the memory of adding them at once
+        bulk = ObjectStore()
+        bulk.add_many(np.zeros(1000), np.zeros(1000), 0)
+        assert store.nbytes <= 2 * bulk.nbytes
+
+
+class TestObjectSprites:
+    def test_stamps_are_resampled_and_cached(self):
+        sprites = ObjectSprites.from_colors([(255, 0, 0), (0, 0, 255)], size=32)
+        stamp = sprites.stamp(1, 0, 16)
+        assert stamp is sprites.stamp(1, ROTATION_STEPS, 16)
+        assert np.abs(stamp.rows).max() <= 8 and np.abs(stamp.columns).max() <= 8
+        assert len(sprites.stamp(0, 8, 16).rows) == pytest.approx(len(stamp.rows), rel=0.1)
+
+    def test_small_stamps_are_squares_of_the_average_color(self):
+        sprites = ObjectSprites.from_colors([(255, 0, 0)], size=32)
+        stamp = sprites.stamp(0, 5, 2)
+        assert len(stamp.rows) == 4
+        red, _, _, alpha = np.unique(stamp.colors).view(np.uint8)
+        assert alpha == 255 and red > 200
+
+
+class TestObjectLayerItem:
+    @pytest.fixture
+    def scene(self, qapp, store: ObjectStore) -> TileScene:
+        return TileScene(tileset=Tileset.from_colors([(0, 0, 0)], tile_size=8), objects=store)
+
+    def test_scene_keeps_no_per_object_items(self, scene: TileScene, store: ObjectStore):
+        store.add_many(np.arange(1000.0), np.arange(1000.0), 1)
+        # The object layer and the boundary
+        assert len(scene.items()) == 2
+
+    def test_culls_with_index(self, scene: TileScene):
+        layer = scene.object_layer
+        assert sorted(layer.objects_in(QRectF(0, 0, 40, 24)).tolist()) == [0, 1]
+        assert layer.object_at(QPointF(12, 12)) == 0
+        assert layer.object_at(QPointF(30, 30)) is None
+
+    def test_moved_objects_are_found_before_rebuild(self, scene: TileScene, store: ObjectStore):
+        layer = scene.object_layer
+        layer.objects_in(QRectF(0, 0, 1, 1))
+        store.move([2], -9.0, -9.0)
+        assert layer.stale_count == 1
+        assert sorted(layer.objects_in(QRectF(0, 0, 40, 24)).tolist()) == [0, 1, 2]
+        layer.flush_index()
+        assert sorted(layer.objects_in(QRectF(0, 0, 40, 24)).tolist()) == [0, 1, 2]
+        assert layer.stale_count == 0
+
+    def test_renders_sprites_and_selection(self, scene: TileScene, store: ObjectStore):
+        image = _render(scene, QRectF(0, 0, 64, 64))
+        # The center of the first object, and the empty space between objects
+        assert QColor(image.pixel(12, 13)) != QColor(Qt.black)
+        assert QColor(image.pixel(24, 10)) == QColor(Qt.black)
+
+        store.select([0])
+        image = _render(scene, QRectF(0, 0, 64, 64))
+        assert QColor(image.pixel(8, 12)) == QColor(Qt.white)
+
+    def test_renders_zoomed_out(self, scene: TileScene, store: ObjectStore):
+        image = _render(scene, QRectF(0, 0, 640, 640), size=64)
+        assert QColor(image.pixel(8, 8)) != QColor(Qt.black)
+
+    @pytest.mark.benchmark
+    def test_pan_over_50k_objects(self, qapp):
+        store = ObjectStore()
+        rng = np.random.default_rng(5)
+        count = 50_000
+        xs, ys = rng.uniform(0, 1024, count), rng.uniform(0, 1024, count)
+        store.add_many(xs, ys, rng.integers(0, 8, count), rng.uniform(0, 360, count))
+        scene = TileScene(tileset=Tileset.from_colors([(0, 0, 0)], tile_size=32), objects=store)
+
+        timings = []
+        for scale in (1.0, 0.25, 0.03):
+            # Warm up the resampled sprites of the scale, as zooming does before panning
+            _render(scene, QRectF(0, 0, 800 / scale, 600 / scale), size=800)
+            start = time.perf_counter()
+            for step in range(10):
+                _render(scene, QRectF(step * 40 / scale, step * 20 / scale, 800 / scale, 600 / scale), size=800)
+            timings.append((time.perf_counter() - start) / 10)
+
+        assert max(timings) < 1 / 60
+
+
+class TestObjectTool:
+    @pytest.fixture
+    def view(self, qtbot, store: ObjectStore) -> SceneView:
+        scene = TileScene(tileset=Tileset.from_colors([(0, 0, 0)], tile_size=8), objects=store)
+        view = SceneView(scene)
+        qtbot.addWidget(view)
+        view.resize(200, 200)
+        view.centerOn(QPointF(60, 60))
+        view.object_tool.active = True
+        return view
+
+    def test_click_selects_and_drag_moves_selection(self, qtbot, view: SceneView, store: ObjectStore):
+        viewport = view.viewport()
+        qtbot.mouseClick(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(12, 12)))
+        assert store.selected.tolist() == [True, False, False]
+        qtbot.mouseClick(viewport, Qt.LeftButton, Qt.ControlModifier, view.mapFromScene(QPointF(36, 20)))
+        assert store.selected.tolist() == [True, True, False]
+
+        qtbot.mousePress(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(12, 12)))
+        qtbot.mouseMove(viewport, view.mapFromScene(QPointF(28, 20)))
+        qtbot.mouseRelease(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(28, 20)))
+        assert store.xs.tolist() == [3.5, 6.5, 10.5]
+        assert store.ys.tolist() == [2.5, 3.5, 10.5]
+        assert view.scene().object_layer.object_at(QPointF(28, 20)) == 0
+
+    def test_rubber_band_selects_objects_in_rect(self, qtbot, view: SceneView, store: ObjectStore):
+        viewport = view.viewport()
+        qtbot.mousePress(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(30, 0)))
+        qtbot.mouseMove(viewport, view.mapFromScene(QPointF(100, 100)))
+        qtbot.mouseRelease(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(100, 100)))
+        assert store.selected.tolist() == [False, True, True]
+
+        qtbot.mouseClick(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(150, 150)))
+        assert not store.selected.any()
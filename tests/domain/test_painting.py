@@ -0,0 +1,196 @@
+import time
+
+import numpy as np
+import pytest
+from PySide6.QtCore import QPointF, Qt
+
+from mosaic.domain import flood, painting
+from mosaic.domain.selection import Selection
+from mosaic.domain.tilemap import ChunkedTileModel, DirtyRegion, GridCoordinate
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.utils.scene_paint_tool import PaintMode
+from mosaic.widgets.scene_view import SceneView
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    return ChunkedTileModel(100, 80, chunk_size=16)
+
+
+def _ids(model: ChunkedTileModel) -> np.ndarray:
+    return model.read_ids(0, 0, model.width, model.height)
+
+
+class TestFloodFill:
+    def test_fills_enclosed_area(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 100, 80, tile_id=1)
+        painting.fill_line(model, 10, 0, 10, 79, tile_id=2)
+        assert painting.flood_fill(model, 0, 0, tile_id=3) == 10 * 80
+        ids = _ids(model)
+        assert (ids[:, :10] == 3).all() and (ids[:, 11:] == 1).all()
+
+    def test_fills_empty_area(self, model: ChunkedTileModel):
+        model.fill_region(20, 20, 10, 10, tile_id=1)
+        assert painting.flood_fill(model, 0, 0, tile_id=2) == 100 * 80 - 100
+        assert len(model) == 100 * 80
+
+    def test_erases(self, model: ChunkedTileModel):
+        model.fill_region(20, 20, 10, 10, tile_id=1)
+        assert painting.flood_fill(model, 25, 25, tile_id=0) == 100
+        assert len(model) == 0
+        assert not model.chunk_keys()
+
+    def test_diagonal(self, model: ChunkedTileModel):
+        model.insert_many(np.arange(5), np.arange(5), 1)
+        assert painting.flood_fill(model, 0, 0, tile_id=2) == 1
+        assert painting.flood_fill(model, 1, 1, tile_id=3, diagonal=True) == 4
+
+    def test_same_tile_is_not_filled(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 10, 10, tile_id=1)
+        assert painting.flood_fill(model, 5, 5, tile_id=1) == 0
+        assert painting.flood_fill(model, 50, 50, tile_id=0) == 0
+        assert painting.flood_fill(model, -1, 5, tile_id=2) == 0
+
+    def test_notifies_once(self, model: ChunkedTileModel):
+        regions: list[DirtyRegion] = []
+        model.subscribe(regions.append)
+        painting.flood_fill(model, 0, 0, tile_id=2)
+        assert len(regions) == 1
+        assert regions[0].bounds() == (0, 0, 100, 80)
+
+    @pytest.mark.parametrize("diagonal", [False, True])
+    @pytest.mark.parametrize("batch_chunks", [0, 1000])
+    def test_fragmented_area_matches_labelling(self, model: ChunkedTileModel, monkeypatch, diagonal, batch_chunks):
+        # Chunk by chunk, or labelling every chunk the area may reach at once
+        monkeypatch.setattr(flood, "BATCH_CHUNKS", batch_chunks)
+        rng = np.random.default_rng(5)
+        model.fill_region(0, 0, 100, 80, tile_id=1)
+        model.fill_mask(0, 0, rng.random((80, 100)) < 0.3, tile_id=2)
+        ids = _ids(model)
+        for x, y in rng.integers(0, 80, (6, 2)):
+            expected, x0, y0 = flood.connected_mask(ids == ids[y, x], x, y, diagonal)
+            area = flood.connected_chunks(model, x, y, diagonal)
+            filled = np.zeros((80, 112), dtype=bool)
+            for (cx, cy), mask in area.items():
+                filled[cy * 16 : (cy + 1) * 16, cx * 16 : (cx + 1) * 16] = mask
+            assert filled.sum() == expected.sum()
+            assert filled[y0 : y0 + expected.shape[0], x0 : x0 + expected.shape[1]][expected].all()
+
+    @pytest.mark.benchmark
+    def test_fragmented_millions_of_cells(self):
+        model = ChunkedTileModel(2048, 2048)
+        model.fill_region(0, 0, 2048, 2048, tile_id=1)
+        model.fill_mask(0, 0, np.random.default_rng(1).random((2048, 2048)) < 0.05, tile_id=2)
+        model.fill_region(1024, 1024, 1, 1, tile_id=1)
+
+        timings = []
+        for tile_id in (3, 4, 5):
+            start = time.perf_counter()
+            filled = painting.flood_fill(model, 1024, 1024, tile_id)
+            timings.append(time.perf_counter() - start)
+
+        assert filled > 2048 * 2048 * 0.9
+        assert min(timings) < 0.17
+
+    @pytest.mark.benchmark
+    def test_millions_of_cells_are_interactive(self):
+        model = ChunkedTileModel(2048, 2048)
+        model.fill_region(0, 0, 2048, 2048, tile_id=1)
+        painting.fill_line(model, 1000, 0, 1000, 2000, tile_id=2)
+
+        timings = []
+        for tile_id in (3, 4, 5):
+            start = time.perf_counter()
+            filled = painting.flood_fill(model, 5, 5, tile_id)
+            timings.append(time.perf_counter() - start)
+
+        assert filled == 2048 * 2048 - 2001
+        assert min(timings) < 0.05
+
+
+class TestShapes:
+    def test_line_cells(self):
+        xs, ys = painting.line_cells(0, 0, 6, 3)
+        assert list(zip(xs.tolist(), ys.tolist())) == [(0, 0), (1, 1), (2, 1), (3, 2), (4, 2), (5, 3), (6, 3)]
+        xs, ys = painting.line_cells(4, 4, 4, 4)
+        assert xs.tolist() == [4] and ys.tolist() == [4]
+
+    def test_wide_line_is_clipped(self, model: ChunkedTileModel):
+        painting.fill_line(model, 0, 0, 99, 0, tile_id=1, width=3)
+        assert len(model) == 100 * 2
+
+    def test_fill_selection(self, model: ChunkedTileModel):
+        selection = Selection.from_rect(model, 5, 5, 50, 50) - Selection.from_rect(model, 10, 10, 20, 20)
+        regions: list[DirtyRegion] = []
+        model.subscribe(regions.append)
+        painting.fill_selection(model, selection, tile_id=4)
+        assert len(model) == 45 * 45 - 100
+        assert len(regions) == 1
+
+    def test_stamp_keeps_transparent_cells(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 10, 10, tile_id=1)
+        painting.stamp(model, 98, 2, np.array([[2, 0, 2], [0, 3, 0]]))
+        painting.stamp(model, 2, 2, np.array([[2, 0], [0, 3]]))
+        ids = _ids(model)
+        assert ids[2:4, 2:4].tolist() == [[2, 1], [1, 3]]
+        assert ids[2:4, 98:].tolist() == [[2, 0], [0, 3]]
+
+    def test_fill_pattern(self, model: ChunkedTileModel):
+        painting.fill_pattern(model, 1, 1, 6, 4, np.array([[1, 2], [3, 4]]))
+        assert _ids(model)[1:4, 1:6].tolist() == [[1, 2, 1, 2, 1], [3, 4, 3, 4, 3], [1, 2, 1, 2, 1]]
+
+
+class TestPaintTool:
+    @pytest.fixture
+    def view(self, qtbot) -> SceneView:
+        model = ChunkedTileModel(64, 64)
+        scene = TileScene(model=model, tileset=Tileset.from_colors([(255, 0, 0), (0, 0, 255)], tile_size=8))
+        view = SceneView(scene)
+        qtbot.addWidget(view)
+        view.resize(300, 300)
+        view.centerOn(QPointF(100, 100))
+        return view
+
+    @staticmethod
+    def _drag(qtbot, view: SceneView, *points: tuple[float, float]):
+        viewport = view.viewport()
+        positions = [view.mapFromScene(QPointF(*point)) for point in points]
+        qtbot.mousePress(viewport, Qt.LeftButton, pos=positions[0])
+        for position in positions[1:]:
+            qtbot.mouseMove(viewport, position)
+        qtbot.mouseRelease(viewport, Qt.LeftButton, pos=positions[-1])
+
+    def test_inactive_without_mode(self, qtbot, view: SceneView):
+        self._drag(qtbot, view, (12, 12))
+        assert len(view.scene().tile_layer.model) == 0
+        assert view.scene().tile_layer.selected_cells() == {(1, 1)}
+
+    def test_pencil_stroke_is_one_edit(self, qtbot, view: SceneView):
+        view.paint_tool.mode = PaintMode.PENCIL
+        self._drag(qtbot, view, (4, 4), (60, 4), (60, 60))
+        model = view.scene().tile_layer.model
+        assert len(model) == 8 + 7
+        assert view.scene().undo_stack.count == 1
+        view.scene().undo_stack.undo()
+        assert len(model) == 0
+
+    def test_rect_and_fill(self, qtbot, view: SceneView):
+        tool = view.paint_tool
+        tool.mode, tool.tile_id = PaintMode.RECT, 2
+        self._drag(qtbot, view, (84, 84), (4, 4))
+        tool.mode, tool.tile_id = PaintMode.FILL, 1
+        self._drag(qtbot, view, (40, 40))
+
+        model = view.scene().tile_layer.model
+        assert model.tile_at(GridCoordinate(5, 5)).tile_id == 1
+        assert model.tile_at(GridCoordinate(11, 11)) is None
+        assert view.scene().undo_stack.undo_text() == "Fill"
+        assert view.scene().undo_stack.count == 2
+
+    def test_stamp_drag_tiles_pattern(self, qtbot, view: SceneView):
+        tool = view.paint_tool
+        tool.mode, tool.pattern = PaintMode.STAMP, [[1, 2]]
+        self._drag(qtbot, view, (4, 4), (12, 4), (20, 4), (28, 4))
+        assert _ids(view.scene().tile_layer.model)[0, :5].tolist() == [1, 2, 1, 2, 0]
+        assert view.scene().undo_stack.count == 1
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from mosaic.domain.pyramid import TilePyramid, downsample
+from mosaic.domain.tilemap import ChunkedTileModel, GridTile
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+
+COLORS = np.array([[0, 0, 0, 0], [200, 0, 0, 255], [0, 100, 0, 255]], dtype=np.uint8)
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    return ChunkedTileModel(100, 60, chunk_size=16)
+
+
+def _full_rebuild(model: ChunkedTileModel) -> TilePyramid:
+    pyramid = TilePyramid(model, COLORS)
+    pyramid.build()
+    return pyramid
+
+
+class TestTilePyramid:
+    def test_downsample_pads_odd_edges(self):
+        block = np.full((3, 3, 4), 200, dtype=np.uint8)
+        result = downsample(block)
+        assert result.shape == (2, 2, 4)
+        assert result[0, 0, 0] == 200
+        assert result[1, 1, 0] == 50
+
+    def test_levels_halve_until_single_pixel(self, model: ChunkedTileModel):
+        pyramid = TilePyramid(model, COLORS)
+        assert pyramid.max_level == 7
+        assert pyramid.level(1).shape == (30, 50, 4)
+        assert pyramid.level(7).shape == (1, 1, 4)
+
+    def test_averages_tile_colors(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 2, 1, tile_id=1)
+        model.fill_region(0, 1, 2, 1, tile_id=2)
+        pyramid = TilePyramid(model, COLORS)
+        assert tuple(pyramid.level(1)[0, 0]) == (100, 50, 0, 255)
+        assert tuple(pyramid.level(2)[0, 0]) == (25, 12, 0, 63)
+
+    def test_build_is_lazy(self, model: ChunkedTileModel):
+        pyramid = TilePyramid(model, COLORS)
+        model.insert(GridTile(0, 0, tile_id=1))
+        assert not pyramid.built
+        pyramid.level(1)
+        assert pyramid.built
+
+    def test_incremental_update_matches_rebuild(self, model: ChunkedTileModel):
+        pyramid = TilePyramid(model, COLORS)
+        model.fill_region(10, 10, 50, 30, tile_id=1)
+        pyramid.build()
+
+        model.insert(GridTile(33, 21, tile_id=2))
+        model.remove_region(90, 0, 10, 60)
+        model.fill_region(95, 55, 5, 5, tile_id=2)
+
+        expected = _full_rebuild(model)
+        for level in range(1, pyramid.max_level + 1):
+            assert np.array_equal(pyramid.level(level), expected.level(level))
+
+    def test_single_edit_only_touches_ancestors(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 100, 60, tile_id=1)
+        pyramid = TilePyramid(model, COLORS)
+        before = [pyramid.level(level).copy() for level in range(1, pyramid.max_level + 1)]
+
+        model.insert(GridTile(41, 17, tile_id=2))
+
+        for level, previous in enumerate(before, start=1):
+            changed = np.argwhere((pyramid.level(level) != previous).any(axis=2))
+            assert {tuple(cell) for cell in changed} <= {(17 >> level, 41 >> level)}
+        assert not np.array_equal(pyramid.level(1), before[0])
+
+
+class TestOverviewRendering:
+    def test_whole_map_overview_uses_pyramid(self, qapp):
+        model = ChunkedTileModel(4096, 4096)
+        model.fill_region(0, 0, 4096, 2048, tile_id=1)
+        scene = TileScene(model=model, tileset=Tileset.from_colors([(255, 0, 0)], tile_size=32))
+        scene.tile_layer.pyramid.build()
+
+        image = QImage(512, 512, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        scene.render(painter, QRectF(0, 0, 512, 512), QRectF(0, 0, 4096 * 32, 4096 * 32))
+        painter.end()
+
+        assert QColor(image.pixel(256, 128)) == QColor(255, 0, 0)
+        assert QColor(image.pixel(256, 384)) == QColor(Qt.black)
+        assert scene.cache_stats().rasterizations == 0
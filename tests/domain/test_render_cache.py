@@ -0,0 +1,107 @@
+import pytest
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import QImage, QPainter
+
+from mosaic.domain.render_cache import ChunkRenderCache
+from mosaic.domain.tilemap import ChunkedTileModel, GridTile
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+
+
+def _image(size: int = 16) -> QImage:
+    image = QImage(size, size, QImage.Format_RGBA8888_Premultiplied)
+    image.fill(Qt.red)
+    return image
+
+
+def _render(scene: TileScene, source: QRectF):
+    image = QImage(64, 64, QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, 64, 64), source)
+    painter.end()
+
+
+@pytest.fixture
+def scene(qapp) -> TileScene:
+    model = ChunkedTileModel(256, 256, chunk_size=16)
+    model.fill_region(0, 0, 256, 256, tile_id=1)
+    return TileScene(model=model, tileset=Tileset.from_colors([(255, 0, 0), (0, 255, 0)], tile_size=4))
+
+
+class TestChunkRenderCache:
+    def test_miss_then_hit(self, qapp):
+        cache = ChunkRenderCache()
+        assert cache.get((0, 0), 0) is None
+        cache.put((0, 0), 0, _image())
+        assert cache.get((0, 0), 0) is not None
+        assert (cache.hits, cache.misses, cache.rasterizations) == (1, 1, 1)
+
+    def test_levels_are_cached_separately(self, qapp):
+        cache = ChunkRenderCache()
+        cache.put((0, 0), 0, _image())
+        assert cache.get((0, 0), 1) is None
+
+    def test_evicts_least_recently_used(self, qapp):
+        size = _image().sizeInBytes()
+        cache = ChunkRenderCache(budget_bytes=2 * size)
+        cache.put((0, 0), 0, _image())
+        cache.put((1, 0), 0, _image())
+        cache.get((0, 0), 0)
+        cache.put((2, 0), 0, _image())
+
+        assert ((0, 0), 0) in cache
+        assert ((1, 0), 0) not in cache
+        assert cache.size_bytes == 2 * size
+        assert cache.evictions == 1
+
+    def test_shrinking_budget_evicts(self, qapp):
+        cache = ChunkRenderCache()
+        for x in range(4):
+            cache.put((x, 0), 0, _image())
+        cache.budget_bytes = _image().sizeInBytes()
+        assert len(cache) == 1
+
+    def test_dirty_entries_miss_but_stay_available_as_placeholder(self, qapp):
+        cache = ChunkRenderCache()
+        cache.put((0, 0), 0, _image())
+        cache.put((0, 0), 2, _image(4))
+        cache.mark_dirty([(0, 0)])
+
+        assert cache.get((0, 0), 0) is None
+        assert cache.get((0, 0), 2) is None
+        assert cache.stale((0, 0), 0) is not None
+
+
+class TestTileLayerCaching:
+    def test_pan_over_unchanged_map_does_not_rasterize(self, scene: TileScene):
+        _render(scene, QRectF(0, 0, 256, 256))
+        rasterized = scene.cache_stats().rasterizations
+
+        for offset in range(0, 768, 64):
+            _render(scene, QRectF(offset, offset, 256, 256))
+        for offset in range(768, 0, -64):
+            _render(scene, QRectF(offset, offset, 256, 256))
+        _render(scene, QRectF(0, 0, 256, 256))
+
+        stats = scene.cache_stats()
+        assert stats.rasterizations > rasterized
+        rasterized = stats.rasterizations
+
+        _render(scene, QRectF(128, 128, 256, 256))
+        assert scene.cache_stats().rasterizations == rasterized
+        assert scene.cache_stats().hits > 0
+
+    def test_edit_rasterizes_only_affected_chunk(self, scene: TileScene):
+        _render(scene, QRectF(0, 0, 256, 256))
+        rasterized = scene.cache_stats().rasterizations
+
+        scene.tile_layer.model.insert(GridTile(20, 20, tile_id=2))
+        _render(scene, QRectF(0, 0, 256, 256))
+
+        assert scene.cache_stats().rasterizations == rasterized + 1
+
+    def test_zoom_levels_are_cached_per_bucket(self, scene: TileScene):
+        _render(scene, QRectF(0, 0, 1024, 1024))
+        zoomed_out = scene.cache_stats().rasterizations
+        _render(scene, QRectF(0, 0, 1024, 1024))
+        assert scene.cache_stats().rasterizations == zoomed_out
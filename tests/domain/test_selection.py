@@ -0,0 +1,151 @@
+import time
+
+import numpy as np
+import pytest
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from mosaic.domain.flood import connected_runs, label_runs
+from mosaic.domain.selection import Selection
+from mosaic.domain.spatial_index import CellRuns
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.widgets.scene_view import SceneView
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    return ChunkedTileModel(100, 70, chunk_size=16)
+
+
+def _cells(selection: Selection) -> set[tuple[int, int]]:
+    xs, ys = selection.cells()
+    return set(zip(xs.tolist(), ys.tolist()))
+
+
+class TestConnectedRuns:
+    def test_follows_winding_paths(self):
+        mask = np.zeros((7, 7), dtype=bool)
+        mask[0, :] = mask[:, 6] = mask[6, :] = mask[2:, 0] = mask[2, :5] = mask[2:5, 4] = True
+        mask[4, 2:5] = True
+        runs = connected_runs(mask, 0, 0)
+        assert len(runs) == mask.sum()
+        assert np.array_equal(runs.to_mask(0, 0, 7, 7), mask)
+
+    def test_diagonal_connectivity(self):
+        mask = np.eye(5, dtype=bool)
+        assert len(connected_runs(mask, 0, 0)) == 1
+        assert len(connected_runs(mask, 0, 0, diagonal=True)) == 5
+
+    def test_labels_components(self):
+        mask = np.array([[1, 1, 0, 1], [0, 1, 0, 1], [1, 0, 0, 1]], dtype=bool)
+        runs = CellRuns.from_mask(mask)
+        labels = label_runs(runs)
+        assert len(set(labels.tolist())) == 3
+
+    def test_empty_seed(self):
+        assert not connected_runs(np.zeros((3, 3), dtype=bool), 1, 1)
+
+
+class TestSelection:
+    def test_rect_and_contains(self, model: ChunkedTileModel):
+        selection = Selection.from_rect(model, 10, 5, 40, 25)
+        assert len(selection) == 600
+        assert (10, 5) in selection and (39, 24) in selection
+        assert (40, 5) not in selection
+        assert selection.bounds() == (10, 5, 40, 25)
+
+    def test_set_operations(self, model: ChunkedTileModel):
+        a = Selection.from_rect(model, 0, 0, 20, 20)
+        b = Selection.from_rect(model, 10, 10, 30, 30)
+        assert len(a | b) == 400 + 400 - 100
+        assert len(a & b) == 100
+        assert len(a - b) == 300
+        assert (a & b).bounds() == (10, 10, 20, 20)
+        assert not (a - a)
+
+    def test_invert_stays_within_map(self, model: ChunkedTileModel):
+        selection = Selection.from_rect(model, 0, 0, 50, 70)
+        inverted = ~selection
+        assert len(inverted) == 50 * 70
+        assert inverted.bounds() == (50, 0, 100, 70)
+        assert ~inverted == selection
+
+    def test_select_similar_contiguous(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 30, 30, tile_id=1)
+        model.fill_region(50, 50, 10, 10, tile_id=1)
+        model.fill_region(10, 0, 2, 30, tile_id=2)
+        contiguous = Selection.similar(model, 0, 0)
+        assert len(contiguous) == 10 * 30
+        assert len(Selection.similar(model, 0, 0, contiguous=False)) == 10 * 30 + 18 * 30 + 100
+
+    def test_select_similar_grows_across_chunks(self):
+        model = ChunkedTileModel(30, 22, chunk_size=4)
+        ids = (np.random.default_rng(2).random((22, 30)) < 0.55).astype(np.uint32)
+        model.write_region(0, 0, ids)
+        for diagonal in (False, True):
+            expected = Selection.like(model)
+            expected.add_runs(connected_runs(ids == ids[9, 11], 11, 9, diagonal))
+            assert Selection.similar(model, 11, 9, diagonal=diagonal) == expected
+
+    def test_select_similar_empty(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 100, 10, tile_id=1)
+        assert len(Selection.similar(model, 5, 50)) == 100 * 60
+        assert len(Selection.similar(model, 5, 50, contiguous=False)) == 100 * 60
+
+    def test_outline_of_rect(self, model: ChunkedTileModel):
+        selection = Selection.from_rect(model, 2, 3, 5, 7)
+        segments = {tuple(segment) for segment in selection.outline(0, 0, 100, 70).tolist()}
+        assert segments == {(2, 3, 5, 3), (2, 7, 5, 7), (2, 3, 2, 7), (5, 3, 5, 7)}
+
+    @pytest.mark.benchmark
+    def test_half_of_large_map_is_interactive(self):
+        model = ChunkedTileModel(2048, 2048)
+        model.fill_region(0, 0, 2048, 1024, tile_id=1)
+
+        start = time.perf_counter()
+        half = Selection.similar(model, 0, 0)
+        similar = time.perf_counter() - start
+
+        band = Selection.from_rect(model, 512, 512, 1536, 1536)
+        start = time.perf_counter()
+        union = half | band
+        intersection = half & band
+        difference = half - band
+        inverted = ~half
+        operations = time.perf_counter() - start
+
+        assert len(half) == 2048 * 1024
+        assert len(union) == 2048 * 1024 + 1024 * 512
+        assert len(intersection) == 1024 * 512
+        assert len(difference) == 2048 * 1024 - 1024 * 512
+        assert len(inverted) == 2048 * 1024
+        assert similar < 0.05
+        assert operations < 0.25
+
+
+class TestSelectionOverlay:
+    def test_draws_outline_only(self, qapp, model: ChunkedTileModel):
+        scene = TileScene(model=model, tileset=Tileset.from_colors([(255, 0, 0)], tile_size=4))
+        scene.tile_layer.set_selection(Selection.from_rect(model, 2, 2, 8, 8))
+
+        image = QImage(64, 64, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        scene.render(painter, QRectF(0, 0, 64, 64), QRectF(0, 0, 64, 64))
+        painter.end()
+
+        assert QColor(image.pixel(8, 20)) == QColor(Qt.white)
+        assert QColor(image.pixel(20, 20)) == QColor(Qt.black)
+
+    def test_double_click_selects_similar(self, qtbot, model: ChunkedTileModel):
+        model.fill_region(0, 0, 10, 10, tile_id=1)
+        scene = TileScene(model=model, tileset=Tileset.from_colors([(255, 0, 0)], tile_size=4))
+        view = SceneView(scene)
+        qtbot.addWidget(view)
+        view.resize(200, 200)
+        view.centerOn(QPointF(40, 40))
+
+        qtbot.mouseDClick(view.viewport(), Qt.LeftButton, pos=view.mapFromScene(QPointF(6, 6)))
+        assert _cells(scene.tile_layer.selection) == {(x, y) for x in range(10) for y in range(10)}
@@ -0,0 +1,160 @@
+import time
+
+import numpy as np
+import pytest
+from PySide6.QtCore import QPointF, Qt
+
+from mosaic.domain.spatial_index import CellRuns, PointGrid, TileGridIndex
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate, GridTile
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.widgets.scene_view import SceneView
+
+
+class TestCellRuns:
+    def test_rect_is_one_run_per_row(self):
+        runs = CellRuns.from_rect(10, 5, 1010, 405)
+        assert runs.run_count == 400
+        assert len(runs) == 400_000
+        assert runs.bounds() == (10, 5, 1010, 405)
+        assert (10, 5) in runs and (1009, 404) in runs
+        assert (1010, 5) not in runs and (9, 5) not in runs
+
+    def test_union_merges_overlapping_and_touching_runs(self):
+        runs = CellRuns([0, 0, 0, 1], [0, 5, 3, 0], [2, 8, 5, 1])
+        assert list(runs) == [(0, 0, 2), (0, 3, 8), (1, 0, 1)]
+        merged = runs.union(CellRuns.from_rect(2, 0, 3, 1))
+        assert list(merged) == [(0, 0, 8), (1, 0, 1)]
+
+    def test_mask_round_trip(self):
+        rng = np.random.default_rng(3)
+        mask = rng.random((40, 70)) < 0.4
+        runs = CellRuns.from_mask(mask, x=-5, y=7)
+        assert len(runs) == mask.sum()
+        assert np.array_equal(runs.to_mask(-5, 7, 65, 47), mask)
+
+        xs, ys = runs.cells()
+        assert np.array_equal(
+            np.sort(ys * 1000 + xs), np.sort((np.nonzero(mask)[0] + 7) * 1000 + np.nonzero(mask)[1] - 5)
+        )
+
+    def test_clipped(self):
+        runs = CellRuns.from_rect(0, 0, 10, 10).clipped(5, 8, 20, 20)
+        assert list(runs) == [(8, 5, 10), (9, 5, 10)]
+
+
+class TestTileGridIndex:
+    @pytest.fixture
+    def index(self) -> TileGridIndex:
+        model = ChunkedTileModel(2048, 2048)
+        model.fill_region(100, 100, 400, 400, tile_id=1)
+        model.insert(GridTile(1500, 1800, tile_id=2))
+        return TileGridIndex(model)
+
+    def test_query_point(self, index: TileGridIndex):
+        assert index.query_point(150.5, 120.2) == GridTile(150, 120, tile_id=1)
+        assert index.query_point(50.0, 50.0) is None
+        assert index.query_point(-1.0, 0.0) is None
+
+    def test_query_rect_returns_occupied_runs(self, index: TileGridIndex):
+        runs = index.query_rect(0, 0, 2048, 2048)
+        assert len(runs) == 400 * 400 + 1
+        assert runs.run_count == 401
+        assert list(index.query_rect(90, 99, 110, 101)) == [(100, 100, 110)]
+
+    def test_nearest(self, index: TileGridIndex):
+        assert index.nearest(50.5, 300.5) == GridCoordinate(100, 300)
+        assert index.nearest(1490.0, 1790.0) == GridCoordinate(1500, 1800)
+        assert index.nearest(1490.0, 1790.0, max_distance=5) is None
+
+    @pytest.mark.benchmark
+    def test_query_time(self, index: TileGridIndex):
+        start = time.perf_counter()
+        for _ in range(100):
+            index.query_point(1234.5, 432.1)
+        point_time = (time.perf_counter() - start) / 100
+
+        start = time.perf_counter()
+        for _ in range(10):
+            index.nearest(1000.0, 1000.0)
+        nearest_time = (time.perf_counter() - start) / 10
+
+        assert point_time < 1e-3
+        assert nearest_time < 5e-3
+
+
+class TestPointGrid:
+    @pytest.fixture
+    def points(self) -> tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(7)
+        return rng.uniform(-50, 2000, 50_000), rng.uniform(0, 2000, 50_000)
+
+    @pytest.fixture
+    def grid(self, points) -> PointGrid:
+        grid = PointGrid(cell_size=8)
+        grid.build(*points)
+        return grid
+
+    @pytest.mark.parametrize("rect", [(10, 10, 50, 40), (-100, -100, 3000, 3000), (100, 300, 1200, 900), (-5, 7, 3, 9)])
+    def test_query_rect_matches_brute_force(self, grid: PointGrid, points, rect):
+        xs, ys = points
+        x0, y0, x1, y1 = rect
+        expected = np.flatnonzero((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1))
+        assert np.array_equal(np.sort(grid.query_rect(*rect)), expected)
+
+    def test_query_outside_and_empty(self, grid: PointGrid):
+        assert len(grid.query_rect(5000, 5000, 6000, 6000)) == 0
+        empty = PointGrid()
+        empty.build([], [])
+        assert len(empty) == 0 and empty.bounds() is None
+        assert len(empty.query_rect(0, 0, 10, 10)) == 0
+
+    @pytest.mark.parametrize("point", [(500.3, 700.9), (-40, 3.5), (1999.9, 1999.9), (-3000, -400), (800, 5000)])
+    def test_nearest_matches_brute_force(self, grid: PointGrid, points, point):
+        xs, ys = points
+        assert grid.nearest(*point) == int(np.argmin(np.hypot(xs - point[0], ys - point[1])))
+
+    def test_nearest_sparse_points(self):
+        rng = np.random.default_rng(3)
+        xs, ys = rng.uniform(0, 1000, 40), rng.uniform(0, 1000, 40)
+        grid = PointGrid(cell_size=4)
+        grid.build(xs, ys)
+        for x, y in rng.uniform(-200, 1200, (50, 2)):
+            assert grid.nearest(x, y) == int(np.argmin(np.hypot(xs - x, ys - y)))
+
+    def test_nearest_within_max_distance(self, grid: PointGrid, points):
+        xs, ys = points
+        distance = float(np.hypot(xs - 500.3, ys - 700.9).min())
+        assert grid.nearest(500.3, 700.9, max_distance=distance * 0.99) is None
+        assert grid.nearest(500.3, 700.9, max_distance=distance) == grid.nearest(500.3, 700.9)
+        assert grid.nearest(-3000, -400, max_distance=100) is None
+        assert PointGrid().nearest(0, 0) is None
+
+    @pytest.mark.benchmark
+    def test_query_time(self, grid: PointGrid):
+        start = time.perf_counter()
+        for _ in range(100):
+            grid.query_rect(400, 400, 480, 445)
+        elapsed = (time.perf_counter() - start) / 100
+
+        assert elapsed < 1e-3
+
+
+class TestRubberBandSelection:
+    def test_drag_selects_rect_as_runs(self, qtbot, qapp):
+        model = ChunkedTileModel(2048, 2048)
+        scene = TileScene(model=model, tileset=Tileset.from_colors([(255, 0, 0)], tile_size=1))
+        view = SceneView(scene)
+        qtbot.addWidget(view)
+        view.resize(800, 800)
+        view.centerOn(QPointF(300, 300))
+        viewport = view.viewport()
+
+        qtbot.mousePress(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(10.25, 10.25)))
+        qtbot.mouseMove(viewport, view.mapFromScene(QPointF(500.25, 400.25)))
+        qtbot.mouseRelease(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(500.25, 400.25)))
+
+        selection = scene.tile_layer.selection
+        assert len(selection) == 491 * 391
+        assert selection.to_runs().run_count == 391
+        assert selection.bounds() == (10, 10, 501, 401)
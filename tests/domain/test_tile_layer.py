@@ -0,0 +1,70 @@
+import pytest
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QImage, QPainter
+
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate, GridTile
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import Tileset
+from mosaic.widgets.scene_view import SceneView
+
+
+@pytest.fixture
+def tileset() -> Tileset:
+    return Tileset.from_colors([(255, 0, 0), (0, 0, 255)], tile_size=8)
+
+
+@pytest.fixture
+def scene(qapp, tileset: Tileset) -> TileScene:
+    model = ChunkedTileModel(1024, 1024)
+    return TileScene(model=model, tileset=tileset)
+
+
+def _render(scene: TileScene, source: QRectF, size: int = 64) -> QImage:
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.black)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, size, size), source)
+    painter.end()
+    return image
+
+
+class TestTileLayerItem:
+    def test_scene_keeps_no_per_tile_items(self, scene: TileScene):
+        scene.tile_layer.model.fill_region(0, 0, 500, 500, tile_id=1)
+        # The tile layer and the boundary
+        assert len(scene.items()) == 2
+
+    def test_renders_tiles_from_model(self, scene: TileScene):
+        scene.tile_layer.model.insert(GridTile(1, 0, tile_id=2))
+        image = _render(scene, QRectF(0, 0, 16, 16), size=16)
+        assert QColor(image.pixel(12, 4)) == QColor(0, 0, 255)
+        assert QColor(image.pixel(4, 12)) == QColor(Qt.black)
+
+    def test_renders_zoomed_out(self, scene: TileScene):
+        scene.tile_layer.model.fill_region(0, 0, 1024, 1024, tile_id=1)
+        image = _render(scene, QRectF(0, 0, 8192, 8192), size=64)
+        assert QColor(image.pixel(32, 32)) == QColor(255, 0, 0)
+
+    def test_cell_at(self, scene: TileScene):
+        assert scene.cell_at(QPointF(17.5, 9.0)) == GridCoordinate(2, 1)
+        assert scene.cell_at(QPointF(-1.0, 0.0)) is None
+
+
+class TestSelectionTool:
+    def test_selects_cells_arithmetically(self, qtbot, scene: TileScene):
+        view = SceneView(scene)
+        qtbot.addWidget(view)
+        view.resize(200, 200)
+        view.centerOn(QPointF(40, 40))
+        viewport = view.viewport()
+
+        qtbot.mousePress(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(12, 12)))
+        qtbot.mouseMove(viewport, view.mapFromScene(QPointF(20, 12)))
+        qtbot.mouseRelease(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(20, 12)))
+        assert scene.tile_layer.selected_cells() == {(1, 1), (2, 1)}
+
+        qtbot.mouseClick(viewport, Qt.LeftButton, pos=view.mapFromScene(QPointF(4, 4)))
+        assert scene.tile_layer.selected_cells() == {(0, 0)}
+
+        qtbot.mouseClick(viewport, Qt.LeftButton, Qt.ControlModifier, view.mapFromScene(QPointF(28, 4)))
+        assert scene.tile_layer.selected_cells() == {(0, 0), (3, 0)}
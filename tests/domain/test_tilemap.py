@@ -0,0 +1,177 @@
+import threading
+
+import numpy as np
+import pytest
+
+from mosaic.domain.tilemap import ChunkedTileModel, DirtyRegion, GridCoordinate, GridTile
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    return ChunkedTileModel(4096, 4096, chunk_size=64)
+
+
+class TestChunkedTileModel:
+    def test_new_model_allocates_no_chunks(self, model: ChunkedTileModel):
+        assert model.nbytes == 0
+        assert len(model) == 0
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            ChunkedTileModel(0, 10)
+
+    def test_insert_and_tile_at(self, model: ChunkedTileModel):
+        model.insert(GridTile(100, 200, tile_id=7, flags=2))
+        assert model.tile_at(GridCoordinate(100, 200)) == GridTile(100, 200, 7, 2)
+        assert model.tile_at(GridCoordinate(101, 200)) is None
+        assert model.chunk_keys() == [(1, 3)]
+
+    def test_tile_at_outside_of_map(self, model: ChunkedTileModel):
+        assert model.tile_at(GridCoordinate(-1, 0)) is None
+        assert model.tile_at(GridCoordinate(4096, 0)) is None
+
+    def test_insert_outside_of_map(self, model: ChunkedTileModel):
+        with pytest.raises(IndexError):
+            model.insert(GridTile(4096, 0, tile_id=1))
+
+    def test_remove_releases_empty_chunk(self, model: ChunkedTileModel):
+        model.insert(GridTile(5, 5, tile_id=3))
+        model.remove(GridCoordinate(5, 5))
+        assert model.tile_at(GridCoordinate(5, 5)) is None
+        assert model.nbytes == 0
+
+    def test_memory_scales_with_painted_area(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 128, 64, tile_id=1)
+        assert model.chunk_keys() == [(0, 0), (1, 0)]
+        assert len(model) == 128 * 64
+
+    def test_insert_many_spans_chunks(self, model: ChunkedTileModel):
+        xs = np.array([0, 63, 64, 4095])
+        ys = np.array([0, 63, 64, 4095])
+        model.insert_many(xs, ys, np.array([1, 2, 3, 4]))
+        assert [model.tile_at(GridCoordinate(x, y)).tile_id for x, y in zip(xs, ys)] == [1, 2, 3, 4]
+        assert len(model.chunk_keys()) == 3
+
+    def test_insert_many_with_scalar_id(self, model: ChunkedTileModel):
+        xs, ys = np.meshgrid(np.arange(10, 20), np.arange(30, 40))
+        model.insert_many(xs, ys, 9)
+        assert len(model) == 100
+
+    def test_insert_many_with_empty_id_clears(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 4, 4, tile_id=1)
+        model.insert_many(np.array([0, 1]), np.array([0, 0]), 0)
+        assert len(model) == 14
+
+    def test_remove_region(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 200, 200, tile_id=5)
+        model.remove_region(50, 50, 100, 100)
+        assert len(model) == 200 * 200 - 100 * 100
+        assert model.tile_at(GridCoordinate(50, 50)) is None
+        assert model.tile_at(GridCoordinate(49, 50)).tile_id == 5
+
+    def test_remove_region_releases_chunks(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 64, 64, tile_id=5)
+        model.remove_region(-10, -10, 100, 100)
+        assert model.chunk_keys() == []
+
+    def test_read_region(self, model: ChunkedTileModel):
+        model.insert(GridTile(63, 63, tile_id=4, flags=1))
+        model.insert(GridTile(64, 64, tile_id=8))
+        ids, flags = model.read_region(62, 62, 4, 4)
+        assert ids[1, 1] == 4 and flags[1, 1] == 1
+        assert ids[2, 2] == 8
+        assert np.count_nonzero(ids) == 2
+
+    def test_read_region_outside_of_map(self, model: ChunkedTileModel):
+        model.insert(GridTile(0, 0, tile_id=4))
+        ids, _ = model.read_region(-2, -2, 4, 4)
+        assert ids.shape == (4, 4)
+        assert ids[2, 2] == 4
+
+    def test_write_region_round_trip(self, model: ChunkedTileModel):
+        ids = np.arange(1, 101, dtype=np.uint32).reshape(10, 10)
+        model.write_region(60, 60, ids)
+        read, _ = model.read_region(60, 60, 10, 10)
+        assert np.array_equal(read, ids)
+
+
+class TestChangeNotification:
+    def test_edit_notifies_dirty_chunks(self, model: ChunkedTileModel):
+        regions: list[DirtyRegion] = []
+        model.subscribe(regions.append)
+        model.insert_many(np.array([1, 70]), np.array([1, 1]), 3)
+        assert len(regions) == 1
+        assert sorted(regions[0].chunks()) == [(0, 0), (1, 0)]
+        assert regions[0].bounds() == (1, 1, 71, 2)
+
+    def test_batch_coalesces_notifications(self, model: ChunkedTileModel):
+        regions: list[DirtyRegion] = []
+        model.subscribe(regions.append)
+        with model.batch():
+            model.insert(GridTile(1, 1, tile_id=1))
+            model.insert(GridTile(2, 2, tile_id=1))
+        assert len(regions) == 1
+        assert regions[0].bounds() == (1, 1, 3, 3)
+
+    def test_noop_edit_does_not_notify(self, model: ChunkedTileModel):
+        regions: list[DirtyRegion] = []
+        model.subscribe(regions.append)
+        model.remove_region(0, 0, 10, 10)
+        assert regions == []
+
+
+class TestSnapshot:
+    def test_snapshot_is_unaffected_by_edits(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 200, 100, tile_id=3)
+        snapshot = model.snapshot()
+
+        model.fill_region(10, 10, 5, 5, tile_id=4)
+        model.remove_region(100, 0, 100, 100)
+        model.insert(GridTile(4000, 4000, tile_id=9))
+
+        assert snapshot.tile_at(GridCoordinate(10, 10)).tile_id == 3
+        assert snapshot.tile_at(GridCoordinate(150, 50)).tile_id == 3
+        assert snapshot.tile_at(GridCoordinate(4000, 4000)) is None
+        assert len(snapshot) == 200 * 100
+        assert np.all(snapshot.read_ids(0, 0, 200, 100) == 3)
+        assert model.tile_at(GridCoordinate(10, 10)).tile_id == 4
+
+    def test_chunks_are_copied_once_on_write(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 256, 64, tile_id=3)
+        snapshot = model.snapshot()
+        assert all(model.chunk(key) is snapshot.chunk(key) for key in model.chunk_keys())
+
+        model.insert(GridTile(0, 0, tile_id=5))
+        copied = model.chunk((0, 0))
+        model.insert(GridTile(1, 0, tile_id=5))
+
+        assert model.chunk((0, 0)) is copied
+        assert copied is not snapshot.chunk((0, 0))
+        assert all(model.chunk(key) is snapshot.chunk(key) for key in [(1, 0), (2, 0), (3, 0)])
+
+    def test_snapshot_is_read_only(self, model: ChunkedTileModel):
+        model.insert(GridTile(0, 0, tile_id=5))
+        snapshot = model.snapshot()
+
+        with pytest.raises(TypeError):
+            snapshot.insert(GridTile(1, 0, tile_id=5))
+        with pytest.raises(TypeError):
+            snapshot.remove_region(0, 0, 10, 10)
+        assert snapshot.snapshot() is snapshot
+
+    def test_background_reads_are_consistent(self, model: ChunkedTileModel):
+        model.fill_region(0, 0, 1024, 1024, tile_id=1)
+        snapshot = model.snapshot()
+        sums = []
+
+        def read():
+            for _ in range(20):
+                sums.append(int(snapshot.read_ids(0, 0, 1024, 1024).sum()))
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        for tile_id in range(2, 40):
+            model.fill_region(0, 0, 1024, 1024, tile_id=tile_id)
+        thread.join()
+
+        assert sums == [1024 * 1024] * 20
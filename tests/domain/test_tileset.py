@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from mosaic.domain.tile_layer import level_for_scale
+from mosaic.domain.tileset import Tileset
+
+
+@pytest.fixture
+def tileset() -> Tileset:
+    return Tileset.from_colors([(255, 0, 0), (0, 0, 255)], tile_size=8)
+
+
+class TestTileset:
+    def test_empty_tile_is_transparent(self, tileset: Tileset):
+        assert len(tileset) == 3
+        assert not tileset.tiles()[0].any()
+
+    def test_levels_downsample_to_single_pixel(self, tileset: Tileset):
+        assert tileset.max_level == 3
+        assert tileset.tiles(3).shape == (3, 1, 1, 4)
+        assert tuple(tileset.colors()[1]) == (255, 0, 0, 255)
+
+    def test_levels_are_built_once_across_threads(self):
+        tileset = Tileset.from_colors([(255, 0, 0)] * 64, tile_size=64)
+        with ThreadPoolExecutor(8) as pool:
+            levels = list(pool.map(tileset.tiles, [tileset.max_level] * 32))
+        assert all(level is levels[0] for level in levels)
+        assert len(tileset._levels) == tileset.max_level + 1
+
+    def test_compose(self, tileset: Tileset):
+        image = tileset.compose(np.array([[1, 0], [2, 9]], dtype=np.uint32))
+        assert image.shape == (16, 16, 4)
+        assert tuple(image[0, 0]) == (255, 0, 0, 255)
+        assert tuple(image[0, 8]) == (0, 0, 0, 0)
+        assert tuple(image[8, 0]) == (0, 0, 255, 255)
+        assert tuple(image[8, 8]) == (0, 0, 0, 0)
+
+    def test_level_for_scale(self):
+        assert level_for_scale(2.0, 5) == 0
+        assert level_for_scale(0.5, 5) == 1
+        assert level_for_scale(0.3, 5) == 1
+        assert level_for_scale(0.001, 5) == 5
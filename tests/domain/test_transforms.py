@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate, GridTile
+from mosaic.domain.tileset import Tileset
+from mosaic.domain.transforms import lookup_table, match_tiles, rechunk, remap_tiles, validate_model
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    model = ChunkedTileModel(200, 100, chunk_size=32)
+    model.fill_region(0, 0, 50, 20, tile_id=3, flags=1)
+    model.fill_region(100, 50, 10, 10, tile_id=5)
+    model.insert(GridTile(199, 99, tile_id=12))
+    return model
+
+
+class TestTransforms:
+    def test_lookup_table(self):
+        assert lookup_table({3: 7, 5: 0}).tolist() == [0, 1, 2, 7, 4, 0]
+        with pytest.raises(ValueError):
+            lookup_table({0: 1})
+
+    def test_remap_tiles(self, model: ChunkedTileModel):
+        regions = []
+        model.subscribe(regions.append)
+
+        changed = remap_tiles(model, lookup_table({3: 7, 5: 0}))
+
+        assert changed == 50 * 20 + 10 * 10
+        assert len(regions) == 1
+        assert model.tile_at(GridCoordinate(10, 10)) == GridTile(10, 10, tile_id=7, flags=1)
+        assert model.tile_at(GridCoordinate(105, 55)) is None
+        assert model.tile_at(GridCoordinate(199, 99)).tile_id == 12
+        assert len(model) == 50 * 20 + 1
+
+    def test_match_tiles(self):
+        source = Tileset.from_colors([(255, 0, 0), (0, 0, 255), (0, 250, 0)], 1)
+        target = Tileset.from_colors([(0, 255, 0), (250, 10, 10)], 1)
+        assert match_tiles(source, target).tolist() == [0, 2, 2, 1]
+
+    def test_validate_model(self, model: ChunkedTileModel):
+        assert validate_model(model, tile_count=13) == []
+
+        problems = validate_model(model, tile_count=5)
+        assert len(problems) == 1
+        assert "101 cells" in problems[0] and "5, 12" in problems[0]
+
+    def test_rechunk(self, model: ChunkedTileModel):
+        result = rechunk(model, 48)
+
+        assert (result.width, result.height, result.chunk_size) == (200, 100, 48)
+        assert len(result) == len(model)
+        ids, flags = result.read_region(0, 0, 200, 100)
+        expected_ids, expected_flags = model.read_region(0, 0, 200, 100)
+        assert np.array_equal(ids, expected_ids)
+        assert np.array_equal(flags, expected_flags)
@@ -0,0 +1,176 @@
+import io
+import os
+import zlib
+
+import numpy as np
+import pytest
+from PySide6.QtGui import QImage
+
+from mosaic import actions
+from mosaic.domain.layers import LayerStack
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tilescene import TileScene
+from mosaic.domain.tileset import DEFAULT_PALETTE, Tileset
+from mosaic.export_cli import main
+from mosaic.persistence import export
+from mosaic.persistence.export import export_png
+from mosaic.persistence.mapfile import MapFile
+from mosaic.persistence.png import PngWriter, adler32_combine
+from mosaic.persistence.tiled import TiledError, export_json, export_tmx, import_tiled
+from mosaic.widgets.main_menu import MainMenu
+from mosaic.widgets.main_window import MainWindow
+from mosaic.widgets.status_bar import StatusBar
+
+from benchmarks.maps import synthetic_map
+
+
+@pytest.fixture
+def tileset() -> Tileset:
+    return Tileset.from_colors(DEFAULT_PALETTE, 4)
+
+
+@pytest.fixture
+def stack() -> LayerStack:
+    stack = LayerStack(150, 90)
+    stack.add_layer("ground", synthetic_map(150, 90, seed=1))
+    stack.add_layer("detail", synthetic_map(150, 90, density=0.3, seed=2), opacity=0.5)
+    stack.add_layer("hidden & <odd>", synthetic_map(150, 90, seed=3), visible=False)
+    return stack
+
+
+def _read_png(path) -> np.ndarray:
+    image = QImage(os.fspath(path)).convertToFormat(QImage.Format_RGBA8888)
+    return np.frombuffer(image.constBits(), dtype=np.uint8).reshape(image.height(), image.width(), 4).copy()
+
+
+def _assert_same_layers(expected: LayerStack, actual: LayerStack):
+    assert [(layer.name, layer.visible, layer.opacity) for layer in actual] == [
+        (layer.name, layer.visible, layer.opacity) for layer in expected
+    ]
+    for left, right in zip(expected, actual):
+        assert np.array_equal(
+            left.model.read_ids(0, 0, expected.width, expected.height),
+            right.model.read_ids(0, 0, expected.width, expected.height),
+        )
+
+
+class TestPng:
+    def test_adler32_combine(self):
+        first, second = b"mosaic " * 1000, b"tiles" * 77
+        combined = adler32_combine(zlib.adler32(first), zlib.adler32(second), len(second))
+        assert combined == zlib.adler32(first + second)
+
+    def test_bands_form_one_image(self, qapp):
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 256, (37, 11, 4), dtype=np.uint8)
+        file = io.BytesIO()
+        writer = PngWriter(file, 11, 37)
+        for top in range(0, 37, 5):
+            writer.write(pixels[top : top + 5])
+        writer.close()
+
+        image = QImage.fromData(file.getvalue()).convertToFormat(QImage.Format_RGBA8888)
+        assert np.array_equal(np.frombuffer(image.constBits(), dtype=np.uint8).reshape(37, 11, 4), pixels)
+
+    def test_export_model(self, qapp, tmp_path, tileset: Tileset, monkeypatch):
+        # Small bands, so the map is written in many of them
+        monkeypatch.setattr(export, "BAND_BYTES", 150 * 4 * 4 * 4 * 3)
+        model = synthetic_map(150, 90)
+        export_png(tmp_path / "map.png", model, tileset, workers=0)
+        assert np.array_equal(_read_png(tmp_path / "map.png"), tileset.compose(model.read_ids(0, 0, 150, 90)))
+
+    def test_export_layers_on_process_pool(self, qapp, tmp_path, tileset: Tileset, stack: LayerStack):
+        export_png(tmp_path / "serial.png", stack, tileset, workers=0)
+        export_png(tmp_path / "parallel.png", stack, tileset, workers=2)
+        serial, parallel = _read_png(tmp_path / "serial.png"), _read_png(tmp_path / "parallel.png")
+        assert serial.shape == (360, 600, 4)
+        assert np.array_equal(serial, parallel)
+
+        ground = tileset.compose(stack.layer("ground").model.read_ids(0, 0, 150, 90))
+        detail = stack.layer("detail").model.read_ids(0, 0, 150, 90)
+        # Where the detail layer is empty, only the ground layer is drawn
+        empty = np.repeat(np.repeat(detail == 0, 4, axis=0), 4, axis=1)
+        assert np.array_equal(serial[empty], ground[empty])
+        assert not np.array_equal(serial[~empty], ground[~empty])
+
+    def test_does_not_load_map_file_chunks(self, qapp, tmp_path, tileset: Tileset):
+        path = tmp_path / "map.mosaic"
+        MapFile.create(path, synthetic_map(150, 90)).close()
+        with MapFile.open(path) as map_file:
+            export_png(tmp_path / "map.png", map_file.model, tileset, workers=0)
+            assert map_file.model.loaded_chunk_keys() == []
+            expected = tileset.compose(map_file.model.read_ids(0, 0, 150, 90))
+        assert np.array_equal(_read_png(tmp_path / "map.png"), expected)
+
+
+class TestTiled:
+    @pytest.mark.parametrize("encoding", ["csv", "base64", "zlib"])
+    @pytest.mark.parametrize("suffix", [".tmx", ".json"])
+    def test_round_trip(self, qapp, tmp_path, tileset: Tileset, stack: LayerStack, encoding: str, suffix: str):
+        exporter = export_tmx if suffix == ".tmx" else export_json
+        path = tmp_path / f"map{suffix}"
+        exporter(path, stack, tileset, encoding=encoding, workers=0)
+        assert (tmp_path / "map.tiles.png").exists()
+
+        imported = import_tiled(path)
+        assert (imported.width, imported.height) == (150, 90)
+        _assert_same_layers(stack, imported)
+
+    def test_parallel_export_matches(self, qapp, tmp_path, tileset: Tileset, stack: LayerStack):
+        export_tmx(tmp_path / "serial.tmx", stack, tileset, workers=0)
+        export_tmx(tmp_path / "parallel.tmx", stack, tileset, workers=2)
+        serial = (tmp_path / "serial.tmx").read_text().replace("serial.tiles", "parallel.tiles")
+        assert serial == (tmp_path / "parallel.tmx").read_text()
+
+    def test_import_finite_map(self, tmp_path):
+        (tmp_path / "finite.tmx").write_text(
+            '<map width="3" height="2" tilewidth="8" tileheight="8">'
+            '<tileset firstgid="5" source="tiles.tsx"/>'
+            '<layer name="a" width="3" height="2" opacity="0.25"><data encoding="csv">5,6,0,\n7,2147483653,0</data>'
+            "</layer></map>"
+        )
+        stack = import_tiled(tmp_path / "finite.tmx")
+        layer = stack.layer("a")
+        assert layer.opacity == 0.25
+        assert layer.model.read_ids(0, 0, 3, 2).tolist() == [[1, 2, 0], [3, 1, 0]]
+
+    def test_import_rejects_bad_data(self, tmp_path):
+        (tmp_path / "bad.tmx").write_text(
+            '<map width="2" height="2"><layer name="a"><data encoding="csv">1,2,3</data></layer></map>'
+        )
+        with pytest.raises(TiledError):
+            import_tiled(tmp_path / "bad.tmx")
+
+
+class TestExportCommand:
+    def test_exports_and_imports(self, qapp, tmp_path):
+        model = synthetic_map(100, 70)
+        MapFile.create(tmp_path / "map.mosaic", model).close()
+        assert main([str(tmp_path / "map.mosaic"), str(tmp_path / "map.json"), "--workers", "0"]) == 0
+        assert main([str(tmp_path / "map.mosaic"), str(tmp_path / "map.png"), "--tile-size", "2"]) == 0
+        assert QImage(str(tmp_path / "map.png")).size().toTuple() == (200, 140)
+
+        assert main([str(tmp_path / "map.json"), str(tmp_path / "copy.mosaic")]) == 0
+        with MapFile.open(tmp_path / "copy.mosaic") as copy:
+            assert np.array_equal(copy.model.read_ids(0, 0, 100, 70), model.read_ids(0, 0, 100, 70))
+
+        assert main([str(tmp_path / "map.mosaic"), str(tmp_path / "map.bmp")]) == 1
+
+    def test_action(self, qtbot, tmp_path):
+        scene = TileScene(model=ChunkedTileModel(40, 30))
+        scene.tile_layer.model.fill_region(0, 0, 10, 10, tile_id=3)
+        action = actions.ExportMap(scene)
+        action.export(str(tmp_path / "map.tmx"))
+        assert import_tiled(tmp_path / "map.tmx").layer("Tile Layer 1").model.read_ids(0, 0, 40, 30).sum() == 300
+
+    def test_window_adds_action_for_scene(self, qtbot):
+        window = MainWindow(MainMenu(), StatusBar())
+        qtbot.addWidget(window)
+        window.set_scene(TileScene(model=ChunkedTileModel(40, 30)))
+        scene = TileScene(model=ChunkedTileModel(40, 30))
+        window.set_scene(scene)
+
+        open_action, export, separator, exit_action = window.menuBar().file.actions()
+        assert isinstance(open_action, actions.OpenMap)
+        assert isinstance(export, actions.ExportMap) and export._scene is scene
+        assert separator.isSeparator() and isinstance(exit_action, actions.Quit)
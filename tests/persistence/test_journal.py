@@ -0,0 +1,176 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate, GridTile
+from mosaic.persistence.journal import HEADER_SIZE, Journal, JournalError, encode_record, read_records, replay
+from mosaic.persistence.mapfile import MapFile
+from mosaic.widgets.main_menu import MainMenu
+from mosaic.widgets.main_window import MainWindow
+from mosaic.widgets.status_bar import StatusBar
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    model = ChunkedTileModel(512, 256, chunk_size=32)
+    model.fill_region(0, 0, 40, 40, tile_id=2)
+    path = os.path.join(tmp_path, "map.mosaic")
+    MapFile.create(path, model).close()
+    return path
+
+
+def _edit(model: ChunkedTileModel):
+    model.fill_region(10, 10, 100, 50, tile_id=5, flags=3)
+    model.insert(GridTile(500, 250, tile_id=9))
+    model.remove_region(0, 0, 20, 20)
+    with model.batch():
+        model.insert(GridTile(1, 1, tile_id=7))
+        model.insert(GridTile(300, 3, tile_id=8))
+
+
+def _assert_same(expected: ChunkedTileModel, actual: ChunkedTileModel):
+    assert sorted(actual.chunk_keys()) == sorted(expected.chunk_keys())
+    for key in expected.chunk_keys():
+        assert np.array_equal(actual.chunk(key).ids, expected.chunk(key).ids)
+        assert np.array_equal(actual.chunk(key).flags, expected.chunk(key).flags)
+
+
+class TestJournal:
+    def test_replays_edits_after_a_crash(self, path: str):
+        with MapFile.open(path) as map_file:
+            journal = Journal(map_file)
+            _edit(map_file.model)
+            # Crash without compacting, the map file itself is left as it was
+            journal.close(compact=False)
+            expected = map_file.model
+
+            with MapFile.open(path) as recovered:
+                assert recovered.model.tile_at(GridTile(500, 250, 0).coordinate()) is None
+                with Journal(recovered) as journal:
+                    # One record per chunk of each change notification
+                    assert journal.replayed == 12
+                    _assert_same(expected, recovered.model)
+                    assert recovered.dirty_chunks
+
+    def test_drops_torn_record(self, path: str):
+        with MapFile.open(path) as map_file:
+            journal = Journal(map_file)
+            map_file.model.insert(GridTile(100, 100, tile_id=4))
+            journal.close(compact=False)
+
+        with open(f"{path}.journal", "ab") as file:
+            file.write(encode_record(0, 0, np.ones((4, 4), np.uint32), np.zeros((4, 4), np.uint8))[:-3])
+
+        with MapFile.open(path) as map_file, Journal(map_file) as journal:
+            assert journal.replayed == 1
+            assert map_file.model.tile_at(GridTile(100, 100, 0).coordinate()).tile_id == 4
+            assert map_file.model.tile_at(GridTile(0, 0, 0).coordinate()).tile_id == 2
+            journal.flush()
+            assert os.path.getsize(journal.path) == journal.size
+
+    def test_compacts_into_map_file(self, path: str):
+        with MapFile.open(path) as map_file:
+            journal = Journal(map_file, compact_bytes=4096)
+            map_file.model.fill_region(0, 0, 200, 200, tile_id=6)
+            journal.flush()
+            assert os.path.getsize(journal.path) == HEADER_SIZE
+            assert not map_file.dirty_chunks
+
+            map_file.model.insert(GridTile(300, 200, tile_id=1))
+            journal.close()
+            assert os.path.getsize(journal.path) == HEADER_SIZE
+            expected = map_file.model
+
+            with MapFile.open(path) as reopened:
+                _assert_same(expected, reopened.model)
+
+    def test_compaction_keeps_map_file_bounded(self, path: str):
+        sizes = []
+        with MapFile.open(path) as map_file, Journal(map_file) as journal:
+            for tile_id in range(1, 21):
+                map_file.model.fill_region(0, 0, 40, 40, tile_id=tile_id)
+                journal.compact()
+                journal.flush()
+                sizes.append(os.path.getsize(path))
+
+        # At most the committed chunks and those superseded by the last compaction, rather than every compaction
+        assert max(sizes) < 3 * sizes[0]
+        with MapFile.open(path) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(20, 20)).tile_id == 20
+
+    def test_rejects_journal_of_other_map(self, path: str, tmp_path):
+        with MapFile.open(path) as map_file:
+            Journal(map_file).close(compact=False)
+
+        other = os.path.join(tmp_path, "other.mosaic")
+        MapFile.create(other, ChunkedTileModel(64, 64)).close()
+        with MapFile.open(other) as map_file, pytest.raises(JournalError):
+            Journal(map_file, path=f"{path}.journal")
+
+    def test_replay_keeps_last_write(self):
+        model = ChunkedTileModel(64, 64, chunk_size=16)
+        data = bytearray(Journal.header(model))
+        data += encode_record(0, 0, np.full((16, 16), 3, np.uint32), np.ones((16, 16), np.uint8))
+        data += encode_record(4, 4, np.zeros((2, 2), np.uint32), np.zeros((2, 2), np.uint8))
+        data += encode_record(5, 5, np.full((1, 1), 9, np.uint32), np.full((1, 1), 2, np.uint8))
+
+        assert [record[1:5] for record in read_records(data)] == [(0, 0, 16, 16), (4, 4, 2, 2), (5, 5, 1, 1)]
+        assert replay(data, model) == (3, len(data))
+        ids, flags = model.read_region(0, 0, 16, 16)
+        assert len(model) == 16 * 16 - 3
+        assert ids[5, 5] == 9 and flags[5, 5] == 2
+        assert ids[4, 4] == 0 and flags[4, 4] == 0
+        assert ids[0, 0] == 3 and flags[0, 0] == 1
+
+    @pytest.mark.benchmark
+    def test_replays_a_million_edits(self):
+        model = ChunkedTileModel(4096, 4096)
+        rng = np.random.default_rng(0)
+        one, flags = np.ones((1, 1), np.uint32), np.zeros((1, 1), np.uint8)
+        data = bytearray(Journal.header(model))
+        for x, y in rng.integers(0, 4096, (1_000_000, 2)).tolist():
+            data += encode_record(x, y, one, flags)
+
+        start = time.perf_counter()
+        assert replay(data, model)[0] == 1_000_000
+        elapsed = time.perf_counter() - start
+        assert elapsed < 10.0
+
+
+class TestEditorJournal:
+    def test_open_recovers_and_close_compacts(self, qtbot, path: str):
+        with MapFile.open(path) as map_file:
+            journal = Journal(map_file)
+            map_file.model.fill_region(0, 0, 10, 10, tile_id=5)
+            journal.close(compact=False)
+
+        window = MainWindow(MainMenu(), StatusBar())
+        qtbot.addWidget(window)
+        window.open_map(path)
+        model = window.centralWidget().scene().tile_layer.model
+        assert model is window.map_file.model
+        assert model.tile_at(GridCoordinate(5, 5)).tile_id == 5
+
+        model.fill_region(20, 20, 10, 10, tile_id=6)
+        window.close()
+        assert window.map_file is None
+        assert os.path.getsize(f"{path}.journal") == HEADER_SIZE
+        with MapFile.open(path, read_only=True) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(5, 5)).tile_id == 5
+            assert map_file.model.tile_at(GridCoordinate(25, 25)).tile_id == 6
+
+    def test_open_closes_previous_map(self, qtbot, path: str, tmp_path):
+        other = os.path.join(tmp_path, "other.mosaic")
+        MapFile.create(other, ChunkedTileModel(64, 64)).close()
+        window = MainWindow(MainMenu(), StatusBar())
+        qtbot.addWidget(window)
+        window.open_map(path)
+        window.map_file.model.insert(GridTile(1, 1, tile_id=7))
+        window.open_map(other)
+
+        assert window.map_file.path == other
+        with MapFile.open(path, read_only=True) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(1, 1)).tile_id == 7
+        window.close()
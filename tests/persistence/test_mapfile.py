@@ -0,0 +1,160 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate, GridTile
+from mosaic.persistence import mapfile
+from mosaic.persistence.mapfile import MapFile, MapFileError
+
+
+@pytest.fixture
+def model() -> ChunkedTileModel:
+    model = ChunkedTileModel(1024, 512, chunk_size=32)
+    model.fill_region(0, 0, 100, 40, tile_id=3, flags=1)
+    model.insert(GridTile(1000, 500, tile_id=77))
+    return model
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return os.path.join(tmp_path, "map.mosaic")
+
+
+def _assert_same(expected: ChunkedTileModel, actual: ChunkedTileModel):
+    assert (actual.width, actual.height, actual.chunk_size) == (expected.width, expected.height, expected.chunk_size)
+    assert sorted(actual.chunk_keys()) == sorted(expected.chunk_keys())
+    for key in expected.chunk_keys():
+        assert np.array_equal(actual.chunk(key).ids, expected.chunk(key).ids)
+        assert np.array_equal(actual.chunk(key).flags, expected.chunk(key).flags)
+
+
+class TestMapFile:
+    @pytest.mark.parametrize("compress", [True, False])
+    def test_round_trip(self, model: ChunkedTileModel, path: str, compress: bool):
+        MapFile.create(path, model, compress=compress).close()
+        with MapFile.open(path) as map_file:
+            _assert_same(model, map_file.model)
+
+    def test_open_decodes_chunks_lazily(self, model: ChunkedTileModel, path: str):
+        MapFile.create(path, model).close()
+        with MapFile.open(path) as map_file:
+            assert map_file.model.loaded_chunk_keys() == []
+            assert len(map_file.model) == len(model)
+
+            assert map_file.model.tile_at(GridCoordinate(1000, 500)).tile_id == 77
+            assert map_file.model.loaded_chunk_keys() == [(31, 15)]
+
+    def test_save_writes_only_dirty_chunks(self, model: ChunkedTileModel, path: str):
+        MapFile.create(path, model).close()
+        with MapFile.open(path) as map_file:
+            map_file.model.insert(GridTile(5, 5, tile_id=9))
+            map_file.model.insert(GridTile(600, 300, tile_id=4))
+            assert map_file.dirty_chunks == {(0, 0), (18, 9)}
+            map_file.save()
+            assert map_file.dirty_chunks == set()
+            assert sorted(map_file.model.loaded_chunk_keys()) == [(0, 0), (18, 9)]
+
+        with MapFile.open(path) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(5, 5)).tile_id == 9
+            assert map_file.model.tile_at(GridCoordinate(600, 300)).tile_id == 4
+            assert map_file.model.tile_at(GridCoordinate(6, 5)).tile_id == 3
+
+    def test_save_reuses_superseded_space(self, model: ChunkedTileModel, path: str):
+        MapFile.create(path, model, compress=False).close()
+        sizes = []
+        with MapFile.open(path, compress=False) as map_file:
+            for tile_id in range(1, 21):
+                map_file.model.fill_region(0, 0, 100, 40, tile_id=tile_id)
+                map_file.save()
+                sizes.append(os.path.getsize(path))
+
+        # Saves alternate between the space superseded by the save before and the end of the file, which is truncated
+        assert max(sizes[2:]) <= max(sizes[:2])
+        with MapFile.open(path) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(50, 20)).tile_id == 20
+
+    def test_interrupted_save_keeps_committed_chunks(self, model: ChunkedTileModel, path: str, monkeypatch):
+        MapFile.create(path, model).close()
+        with MapFile.open(path) as map_file:
+            for tile_id in (4, 5):
+                map_file.model.fill_region(0, 0, 100, 40, tile_id=tile_id)
+                map_file.save()
+            expected = map_file.model.snapshot()
+
+            def crash(*_):
+                raise OSError("Disk unplugged")
+
+            map_file.model.fill_region(0, 0, 1024, 512, tile_id=6)
+            monkeypatch.setattr(mapfile, "_header", crash)
+            with pytest.raises(OSError):
+                map_file.save()
+            monkeypatch.undo()
+
+        with MapFile.open(path) as map_file:
+            _assert_same(expected, map_file.model)
+
+    def test_read_only(self, model: ChunkedTileModel, path: str):
+        MapFile.create(path, model).close()
+        with MapFile.open(path, read_only=True) as map_file:
+            _assert_same(model, map_file.model)
+            map_file.model.insert(GridTile(5, 5, tile_id=9))
+            with pytest.raises(MapFileError):
+                map_file.save()
+
+    def test_save_drops_chunks_that_became_empty(self, model: ChunkedTileModel, path: str):
+        MapFile.create(path, model).close()
+        with MapFile.open(path) as map_file:
+            map_file.model.remove_region(1000, 500, 1, 1)
+            map_file.save()
+
+        with MapFile.open(path) as map_file:
+            assert (31, 15) not in map_file.model.chunk_keys()
+
+    def test_open_invalid_file(self, path: str):
+        with open(path, "wb") as file:
+            file.write(b"not a map" * 10)
+        with pytest.raises(MapFileError):
+            MapFile.open(path)
+
+    def test_snapshot_of_unloaded_chunks(self, model: ChunkedTileModel, path: str):
+        MapFile.create(path, model).close()
+        with MapFile.open(path, compress=False) as map_file:
+            snapshot = map_file.model.snapshot()
+            map_file.model.fill_region(0, 0, 10, 10, tile_id=9)
+            map_file.model.insert(GridTile(1000, 500, tile_id=5))
+            map_file.save()
+
+            assert snapshot.tile_at(GridCoordinate(0, 0)).tile_id == 3
+            assert snapshot.tile_at(GridCoordinate(1000, 500)).tile_id == 77
+            assert len(snapshot) == len(model)
+            _assert_same(model, snapshot)
+
+
+@pytest.mark.benchmark
+class TestMapFileBenchmark:
+    def test_open_time_is_independent_of_map_size(self, path: str):
+        model = ChunkedTileModel(4096, 4096)
+        rng = np.random.default_rng(0)
+        model.write_region(0, 0, rng.integers(0, 64, size=(2048, 2048), dtype=np.uint32))
+
+        MapFile.create(path, model).close()
+
+        start = time.perf_counter()
+        map_file = MapFile.open(path)
+        open_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        map_file.model.tile_at(GridCoordinate(1024, 1024))
+        first_chunk_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        map_file.model.read_region(0, 0, 4096, 4096)
+        full_load_time = time.perf_counter() - start
+
+        _assert_same(model, map_file.model)
+        map_file.close()
+
+        assert open_time < full_load_time
+        assert first_chunk_time < full_load_time
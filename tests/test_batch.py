@@ -0,0 +1,104 @@
+import json
+import sys
+
+import pytest
+
+from mosaic.batch import BatchOptions, BatchRunner, MapReport, Pipeline, create_builder, format_summary, main
+from mosaic.domain.tilemap import ChunkedTileModel, GridCoordinate
+from mosaic.persistence.mapfile import MapFile
+
+
+@pytest.fixture
+def maps(tmp_path) -> list[str]:
+    paths = []
+    for index in range(3):
+        model = ChunkedTileModel(300, 200, chunk_size=32)
+        model.fill_region(0, 0, 100 + index, 50, tile_id=3)
+        model.fill_region(150, 100, 20, 20, tile_id=5, flags=2)
+        path = str(tmp_path / f"map{index}.mosaic")
+        MapFile.create(path, model).close()
+        paths.append(path)
+    return paths
+
+
+class TestBatch:
+    def test_builder_resolves_services_without_widgets(self):
+        builder = create_builder(BatchOptions(chunk_size=64))
+        runner = builder.resolve(BatchRunner)
+        assert isinstance(runner, BatchRunner)
+        assert [step.name for step in builder.resolve(Pipeline).steps] == ["rechunk"]
+        assert "mosaic.widgets.main_window.MainWindow" not in builder
+
+    def test_remaps_in_place(self, maps: list[str]):
+        pipeline = Pipeline(BatchOptions(remap={3: 7}, validate=True))
+        report = pipeline.process(maps[0])
+
+        assert report.error is None
+        assert report.cells == 100 * 50 + 20 * 20
+        assert list(report.timings) == ["load", "remap", "validate", "save"]
+        with MapFile.open(maps[0]) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(10, 10)).tile_id == 7
+            assert map_file.model.tile_at(GridCoordinate(155, 105)).tile_id == 5
+
+    def test_rechunks_into_output_directory(self, maps: list[str], tmp_path):
+        output = tmp_path / "output"
+        output.mkdir()
+        report = Pipeline(BatchOptions(output=str(output), chunk_size=64)).process(maps[1])
+
+        assert report.error is None
+        with MapFile.open(output / "map1.mosaic") as map_file:
+            assert map_file.model.chunk_size == 64
+            assert len(map_file.model) == 101 * 50 + 20 * 20
+        with MapFile.open(maps[1]) as map_file:
+            assert map_file.model.chunk_size == 32
+
+    def test_rechunks_in_place(self, maps: list[str]):
+        assert Pipeline(BatchOptions(chunk_size=16)).process(maps[0]).error is None
+        with MapFile.open(maps[0]) as map_file:
+            assert map_file.model.chunk_size == 16
+            assert map_file.model.tile_at(GridCoordinate(155, 105)).flags == 2
+
+    def test_validation_fails_map(self, maps: list[str]):
+        report = Pipeline(BatchOptions(remap={3: 40}, validate=True)).process(maps[0])
+        assert report.error is not None and "40" in report.error
+
+        with MapFile.open(maps[0]) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(10, 10)).tile_id == 3
+
+    def test_runs_on_process_pool_with_memory_limit(self, maps: list[str]):
+        # Memory is only limited and measured on POSIX systems
+        posix = sys.platform != "win32"
+        options = BatchOptions(remap={5: 6}, workers=2, memory_limit=4 * 2**30 if posix else None)
+        reports = list(create_builder(options).resolve(BatchRunner).run(maps))
+
+        assert [report.path for report in reports] == maps
+        assert all(report.error is None for report in reports)
+        if posix:
+            assert all(report.peak_memory > 0 for report in reports)
+        with MapFile.open(maps[2]) as map_file:
+            assert map_file.model.tile_at(GridCoordinate(155, 105)).tile_id == 6
+
+    def test_command(self, maps: list[str], tmp_path, capsys):
+        remap = tmp_path / "remap.json"
+        remap.write_text(json.dumps({"3": 4}))
+        tileset = tmp_path / "tileset.json"
+        tileset.write_text(json.dumps([[0, 0, 0], [255, 255, 255]]))
+
+        assert main([str(tmp_path), "--remap", str(remap), "--workers", "0", "--validate"]) == 0
+        summary = capsys.readouterr().out
+        assert "3 of 3 maps processed, 0 failed" in summary
+        assert "map2.mosaic" in summary and "remap" in summary
+
+        assert main([maps[0], "--tileset", str(tileset), "--workers", "0", "--validate"]) == 0
+        options = ["--source-tileset", str(tileset), "--workers", "0", "--validate"]
+        assert main([maps[0]] + options) == 0
+        remap.write_text(json.dumps({"1": 9, "2": 9}))
+        assert main([maps[0], "--remap", str(remap)] + options) == 1
+        assert "failed" in capsys.readouterr().out
+
+    def test_format_summary(self):
+        summary = format_summary([MapReport("a.mosaic", 10, 1, {"load": 0.001}), MapReport("b.mosaic", error="bad")])
+        lines = summary.splitlines()
+        assert lines[0].split()[:4] == ["map", "cells", "chunks", "load"]
+        assert lines[2].endswith("failed: bad")
+        assert lines[-1] == "1 of 2 maps processed, 1 failed"
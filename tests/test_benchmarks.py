@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+
+from benchmarks import suite
+from benchmarks.maps import synthetic_ids, synthetic_map
+
+
+def _result(**medians: tuple[float, str]) -> dict:
+    return {"metrics": {name: {"median": median, "unit": unit} for name, (median, unit) in medians.items()}}
+
+
+class TestBenchmarks:
+    def test_synthetic_maps_are_reproducible(self):
+        ids = synthetic_ids(300, 200, tile_count=5, density=0.5, seed=3)
+        assert ids.shape == (200, 300)
+        assert ids.max() <= 5
+        assert 0.3 < np.count_nonzero(ids) / ids.size < 0.7
+        assert np.array_equal(ids, synthetic_ids(300, 200, tile_count=5, density=0.5, seed=3))
+        assert len(synthetic_map(300, 200, density=1.0)) == 300 * 200
+
+    def test_runs_headless(self, qapp, tmp_path):
+        output = tmp_path / "benchmarks.json"
+        assert (
+            suite.main(["--size", "256", "--repeat", "1", "--zoom", "1", "--zoom", "0.1", "--output", str(output)]) == 0
+        )
+
+        result = json.loads(output.read_text())
+        assert {
+            "scene_construction",
+            "render_zoom_0.1_cold",
+            "render_zoom_1",
+            "selection_drag",
+            "autotile_stroke",
+            "objects_pan_zoom_1",
+        } <= set(result["metrics"])
+        assert result["metrics"]["builder_resolve_singleton"]["unit"] == "ops/s"
+
+    def test_regressions(self):
+        baseline = _result(render=(10.0, "ms"), resolve=(1000.0, "ops/s"))
+        assert suite.regressions(_result(render=(11.5, "ms"), resolve=(850.0, "ops/s")), baseline, 0.2) == []
+        assert len(suite.regressions(_result(render=(13.0, "ms"), resolve=(800.0, "ops/s")), baseline, 0.2)) == 2
+        assert suite.regressions(_result(added=(1.0, "ms")), baseline, 0.2) == []
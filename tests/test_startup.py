@@ -0,0 +1,56 @@
+import subprocess
+import sys
+
+from mosaic.application import _version
+from scripts.startup import parse_importtime, regressions
+from scripts.tests import project_folder
+
+IMPORTTIME = """import time:       self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        500 | mosaic.core.builder
+import time:      1000 |       1000 |     pydantic
+"""
+
+
+def _imported_modules(code: str) -> set[str]:
+    output = subprocess.run(
+        [sys.executable, "-c", f"import sys\n{code}\nprint(' '.join(sys.modules))"],
+        cwd=project_folder(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(output.split())
+
+
+class TestStartup:
+    def test_widgets_package_is_lazy(self):
+        modules = _imported_modules("import mosaic.widgets")
+        assert "mosaic.widgets.main_window" not in modules
+        assert "PySide6.QtWidgets" not in modules
+
+    def test_main_defers_widgets_and_scene(self):
+        modules = _imported_modules("import mosaic.main\nmosaic.main.register_widgets()")
+        assert "mosaic.widgets.main_window" not in modules
+        assert "mosaic.domain.tilescene" not in modules
+        assert "numpy" not in modules
+
+    def test_batch_is_headless(self):
+        modules = _imported_modules("import mosaic.batch\nmosaic.batch.create_builder(mosaic.batch.BatchOptions())")
+        assert not any(module.startswith("PySide6") for module in modules)
+
+    def test_lazy_widget_attribute(self):
+        modules = _imported_modules("import mosaic.widgets\nmosaic.widgets.MainWindow")
+        assert "mosaic.widgets.main_window" in modules
+
+    def test_version_without_installed_metadata(self):
+        assert _version()
+
+    def test_parse_importtime(self):
+        rows = parse_importtime(IMPORTTIME)
+        assert rows == [("_io", 1, 120, 120), ("mosaic.core.builder", 0, 300, 500), ("pydantic", 2, 1000, 1000)]
+
+    def test_regressions(self):
+        baseline = {"time_to_first_frame_ms": 100.0, "import_ms": 50.0}
+        assert regressions({"time_to_first_frame_ms": 115.0, "import_ms": 50.0}, baseline, 0.2) == []
+        assert len(regressions({"time_to_first_frame_ms": 130.0, "import_ms": 70.0}, baseline, 0.2)) == 2
@@ -0,0 +1,107 @@
+import pytest
+from PySide6.QtCore import QPoint, QPointF, Qt
+from PySide6.QtGui import QPainter, QWheelEvent
+from PySide6.QtWidgets import QApplication
+
+from mosaic.domain.tilemap import ChunkedTileModel
+from mosaic.domain.tilescene import TileScene
+from mosaic.widgets.scene_view import SceneView
+
+
+@pytest.fixture
+def view(qtbot) -> SceneView:
+    view = SceneView(TileScene(model=ChunkedTileModel(1024, 1024)))
+    qtbot.addWidget(view)
+    view.resize(400, 300)
+    view.show()
+    return view
+
+
+def _wheel(view: SceneView, angle: int, modifiers=Qt.ControlModifier, pos=QPointF(200, 150), pixels=QPoint()):
+    event = QWheelEvent(
+        pos, view.mapToGlobal(pos), pixels, QPoint(0, angle), Qt.NoButton, modifiers, Qt.NoScrollPhase, False
+    )
+    return QApplication.sendEvent(view.viewport(), event)
+
+
+class TestSceneZoomTool:
+    def test_events_are_applied_once_per_frame(self, view: SceneView):
+        tool = view.zoom_tool
+        for _ in range(20):
+            assert _wheel(view, 12)
+        assert tool.scale == 1.0 and tool.pending
+
+        assert not tool.flush()
+        assert tool.scale == pytest.approx(1.0015**240)
+
+    def test_keeps_point_under_cursor(self, view: SceneView):
+        view.centerOn(512, 512)
+        anchor = QPointF(100, 80)
+        before = view.mapToScene(anchor.toPoint())
+        _wheel(view, 480, pos=anchor)
+        view.zoom_tool.flush()
+        after = view.mapToScene(anchor.toPoint())
+        assert after.x() == pytest.approx(before.x(), abs=1.0)
+        assert after.y() == pytest.approx(before.y(), abs=1.0)
+
+    def test_clamps_scale(self, view: SceneView):
+        tool = view.zoom_tool
+        tool.max_scale = 2.0
+        _wheel(view, 5000)
+        tool.flush()
+        assert tool.scale == 2.0 and not tool.pending
+
+    def test_smooth_zoom_eases_over_frames(self, view: SceneView):
+        tool = view.zoom_tool
+        tool.smooth = True
+        _wheel(view, 240)
+        scales = []
+        while tool.flush():
+            scales.append(tool.scale)
+        assert len(scales) > 3
+        assert scales == sorted(scales)
+        assert tool.scale == pytest.approx(1.0015**240)
+
+    def test_wheel_without_modifier_pans(self, view: SceneView):
+        scrollbar = view.verticalScrollBar()
+        before = scrollbar.value()
+        _wheel(view, 0, Qt.NoModifier, pixels=QPoint(0, -40))
+        view.zoom_tool.flush()
+        assert scrollbar.value() == before + 40
+        assert view.zoom_tool.scale == 1.0
+
+    def test_fractional_pan_is_carried_over(self, view: SceneView):
+        scrollbar = view.verticalScrollBar()
+        before = scrollbar.value()
+        # Each event scrolls half a pixel
+        for _ in range(6):
+            _wheel(view, -1, Qt.NoModifier)
+            view.zoom_tool.flush()
+        assert scrollbar.value() == before + 3
+
+    def test_timer_applies_zoom_and_restores_quality(self, qtbot, view: SceneView):
+        tool = view.zoom_tool
+        _wheel(view, 120)
+        qtbot.waitUntil(lambda: tool.scale != 1.0, timeout=1000)
+        assert tool.quality.moving
+        assert not view.renderHints() & QPainter.SmoothPixmapTransform
+
+        qtbot.waitUntil(lambda: not tool.quality.moving, timeout=2000)
+        assert view.renderHints() & QPainter.SmoothPixmapTransform
+        assert view.renderHints() & QPainter.Antialiasing
+
+
+class TestGraphicsViewPan:
+    def test_space_drag_pans_without_selecting(self, qtbot, view: SceneView):
+        scrollbar = view.horizontalScrollBar()
+        before = scrollbar.value()
+        viewport = view.viewport()
+        qtbot.keyPress(view, Qt.Key_Space)
+        qtbot.mousePress(viewport, Qt.LeftButton, pos=QPoint(200, 150))
+        for x in (190, 180, 170):
+            qtbot.mouseMove(viewport, QPoint(x, 150))
+        qtbot.mouseRelease(viewport, Qt.LeftButton, pos=QPoint(170, 150))
+        qtbot.keyRelease(view, Qt.Key_Space)
+
+        assert scrollbar.value() == before + 30
+        assert not view.scene().tile_layer.selection